@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import streamlit as st
 
@@ -6,7 +6,7 @@ st.set_page_config(page_title="CMMS Fábrica", layout="wide")
 
 # 🔐 Login y cierre de sesión
 from cmms_fabrica.modulos.app_login import login_usuario, cerrar_sesion
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
 
 # 💄 Estilos responsive
 from cmms_fabrica.modulos.estilos import aplicar_estilos
@@ -26,9 +26,15 @@ from cmms_fabrica.crud.crud_inventario import app_inventario
 # Módulo de usuarios (admin)
 from cmms_fabrica.modulos.app_usuarios import app_usuarios
 
+# Auditoría de trazabilidad (admin)
+from cmms_fabrica.modulos.app_trazabilidad import app as app_trazabilidad
+
 # Reportes técnicos
 from cmms_fabrica.modulos.app_reportes import app as app_reportes
 
+# Proyección de carga preventiva
+from cmms_fabrica.modulos.app_proyeccion_preventivos import app as app_proyeccion_preventivos
+
 # Visualización de grafo CMMS
 from cmms_fabrica.modulos.app_grafo_cmms import app as app_grafo_cmms
 
@@ -51,36 +57,140 @@ with st.sidebar:
     st.button("Cerrar sesión", on_click=cerrar_sesion, use_container_width=True)
 
 # Verificamos la conexión a la base de datos
-if db is None:
-    st.error(f"Error: No se pudo conectar a la base de datos MongoDB. {mongo_error}")
+if resolver_db(db) is None:
+    st.error(f"Error: No se pudo conectar a la base de datos MongoDB. {obtener_error_mongo()}")
     st.stop()
 
+# 🗂️ Índices declarados y jerarquía de activos (una vez por proceso)
+from cmms_fabrica.modulos.indices import asegurar_indices_al_iniciar
+from cmms_fabrica.modulos.jerarquia_activos import asegurar_jerarquia_al_iniciar
+from cmms_fabrica.modulos.vencimientos_planes import asegurar_campos_al_iniciar
+
+asegurar_indices_al_iniciar(db)
+asegurar_jerarquia_al_iniciar(db)
+asegurar_campos_al_iniciar(db)
+
+# ⏱️ Tareas de mantenimiento en segundo plano (un lease en MongoDB evita ejecuciones duplicadas)
+from cmms_fabrica.modulos.planificador import iniciar_planificador_al_iniciar
+
+iniciar_planificador_al_iniciar(db)
+
 def render_home(context: Dict[str, Any]) -> None:
     st.title("Bienvenido al CMMS de la Fábrica")
     kpi_historial()
 
     if context["rol"] == "admin":
         st.markdown("## 🧹 Mantenimiento de Almacenamiento (MongoDB)")
-        from cmms_fabrica.modulos.almacenamiento import (
-            listar_colecciones_ordenadas,
-            limpiar_coleccion_mas_cargada,
-            obtener_tamano_total_mb,
+        import pandas as pd
+        from cmms_fabrica.modulos.almacenamiento import LIMITE_MB, limpiar_coleccion_mas_cargada
+        from cmms_fabrica.modulos.monitor_almacenamiento import (
+            MB,
+            estimar_plan_limpieza,
+            muestra_vigente,
+            pronosticar,
+            serie_total,
+            tomar_muestra,
         )
 
-        uso_actual = obtener_tamano_total_mb()
-        st.markdown(f"**Uso actual estimado de la base de datos:** `{uso_actual:.2f} MB`")
-        st.markdown("### 📁 Colecciones rotables ordenadas por carga:")
-        datos = listar_colecciones_ordenadas()
-        for nombre, cantidad, campo_fecha, es_critica in datos:
-            st.write(f"- `{nombre}` → {cantidad} documentos")
-        if st.button("🧹 Ejecutar limpieza automática"):
-            resultado = limpiar_coleccion_mas_cargada()
+        if st.button("📸 Tomar muestra ahora"):
+            tomar_muestra(db)
+        muestra = muestra_vigente(db)
+        if not muestra:
+            st.info("ℹ️ No hay estadísticas de almacenamiento disponibles.")
+            return
+
+        serie = serie_total(db)
+        pronostico = pronosticar(serie, LIMITE_MB)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Uso estimado", f"{muestra['total_mb']:.1f} MB", f"límite {LIMITE_MB} MB", delta_color="off")
+        if pronostico:
+            col2.metric("Crecimiento", f"{pronostico.mb_por_dia:+.2f} MB/día")
+            col3.metric(
+                "Límite estimado",
+                f"{pronostico.fecha_limite:%d/%m/%Y}" if pronostico.fecha_limite else "sin crecimiento",
+            )
+        else:
+            col2.caption("El pronóstico necesita al menos dos muestras.")
+
+        st.markdown("### 📁 Colecciones por espacio ocupado:")
+        tabla = pd.DataFrame([
+            {
+                "Colección": nombre,
+                "Documentos": stats["documentos"],
+                "Datos (MB)": round(stats["bytes_datos"] / MB, 2),
+                "Almacenamiento (MB)": round(stats["bytes_almacenamiento"] / MB, 2),
+                "Índices (MB)": round(stats["bytes_indices"] / MB, 2),
+                "Tamaño medio (B)": round(stats["tamano_medio"]),
+            }
+            for nombre, stats in muestra["colecciones"].items()
+        ]).sort_values("Almacenamiento (MB)", ascending=False)
+        st.dataframe(tabla, use_container_width=True, hide_index=True)
+        if len(serie) > 1:
+            st.line_chart(pd.DataFrame(serie).set_index("fecha")["total_mb"])
+
+        st.markdown("### 🔮 Estimación de limpieza (sin borrar)")
+        plan = pd.DataFrame(estimar_plan_limpieza(db, muestra))
+        if not plan.empty:
+            plan["mb"] = plan["mb"].round(2)
+            st.dataframe(
+                plan.rename(columns={"coleccion": "Colección", "criterio": "Criterio", "documentos": "Documentos", "mb": "MB liberados"}),
+                use_container_width=True,
+                hide_index=True,
+            )
+
+        _render_tareas_programadas()
+
+        from cmms_fabrica.modulos.archivo_frio import archivo_configurado
+
+        if not archivo_configurado():
+            st.warning(
+                "⚠️ La limpieza está deshabilitada: definí `CMMS_ARCHIVO_DIR` en almacenamiento persistente "
+                "y compartido por todos los workers para conservar lo que se borra."
+            )
+        if st.button("🧹 Ejecutar limpieza automática", disabled=not archivo_configurado()):
+            barra = st.progress(0.0, text="Eliminando por lotes…")
+
+            def _avance(eliminados: int, objetivo: Optional[int]) -> None:
+                fraccion = min(eliminados / objetivo, 1.0) if objetivo else 0.0
+                barra.progress(fraccion, text=f"Eliminados: {eliminados}")
+
+            resultado = limpiar_coleccion_mas_cargada(al_avanzar=_avance)
+            barra.empty()
             if resultado:
                 nombre, cantidad = resultado
                 st.success(f"✅ Se eliminaron {cantidad} documentos antiguos de `{nombre}`.")
             else:
                 st.info("ℹ️ No se requería limpieza: colecciones por debajo del mínimo.")
 
+def _render_tareas_programadas() -> None:
+    import pandas as pd
+    from cmms_fabrica.modulos.planificador import estado_tareas, historial_tareas, solicitar_ejecucion
+
+    st.markdown("### ⏱️ Tareas programadas")
+    tareas = estado_tareas(db)
+    if not tareas:
+        return
+    columnas = {
+        "tarea": "Tarea",
+        "descripcion": "Descripción",
+        "intervalo_min": "Cada (min)",
+        "estado": "Estado",
+        "ultima_ejecucion": "Última ejecución (UTC)",
+        "ultima_duracion_s": "Duración (s)",
+        "proxima": "Próxima (UTC)",
+        "ultimo_error": "Último error",
+    }
+    tabla = pd.DataFrame(tareas).reindex(columns=list(columnas)).rename(columns=columnas)
+    st.dataframe(tabla, use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns([3, 1])
+    nombre = col1.selectbox("Tarea", [t["tarea"] for t in tareas], label_visibility="collapsed")
+    if col2.button("▶️ Ejecutar ahora"):
+        solicitar_ejecucion(db, nombre)
+        st.info("La tarea se ejecutará en la próxima revisión del planificador.")
+    with st.expander("Historial de ejecuciones"):
+        st.dataframe(pd.DataFrame(historial_tareas(db, nombre, limite=20)), use_container_width=True, hide_index=True)
+
 def _render_inventario(context: Dict[str, Any]) -> None:
     app_inventario(context["usuario"])
 
@@ -96,6 +206,7 @@ MENU_CONFIG: List[MenuEntry] = [
     {"label": "🏠 Inicio", "callback": render_home},
     {"label": "🧱 Activos Técnicos", "callback": lambda ctx: crud_activos_tecnicos()},
     {"label": "📑 Planes Preventivos", "callback": lambda ctx: crud_planes_preventivos()},
+    {"label": "📆 Proyección Preventiva", "callback": lambda ctx: app_proyeccion_preventivos()},
     {"label": "🚨 Tareas Correctivas", "callback": lambda ctx: crud_tareas_correctivas()},
     {"label": "📂 Tareas Técnicas", "callback": lambda ctx: crud_tareas_tecnicas()},
     {"label": "🔍 Observaciones Técnicas", "callback": lambda ctx: crud_observaciones()},
@@ -109,6 +220,7 @@ MENU_CONFIG: List[MenuEntry] = [
     {"label": "🤖 Asistente Técnico", "callback": lambda ctx: asistente_tecnico()},
     {"label": "🧰 Asistente de Mejora Continua", "callback": lambda ctx: asistente_mejora()},
     {"label": "👥 Usuarios", "callback": _render_usuarios, "roles": {"admin"}},
+    {"label": "🧭 Auditoría de Trazabilidad", "callback": lambda ctx: app_trazabilidad(ctx["rol"]), "roles": {"admin"}},
 ]
 
 def _allowed(entry: MenuEntry, context: Dict[str, Any]) -> bool:
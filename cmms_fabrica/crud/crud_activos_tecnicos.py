@@ -2,7 +2,8 @@
 🔧 CRUD de Activos Técnicos – CMMS Fábrica
 
 Este módulo permite la gestión completa de activos técnicos (agregar, ver, editar, eliminar).
-Registra automáticamente los eventos en la colección `historial` para trazabilidad completa.
+Registra automáticamente los eventos en la colección `historial` para trazabilidad completa
+y mantiene la jerarquía materializada (`ancestros`) usada para consultar subactivos.
 
 ✅ Normas aplicables:
 - ISO 14224
@@ -12,17 +13,47 @@ Registra automáticamente los eventos en la colección `historial` para trazabil
 
 import streamlit as st
 from datetime import datetime
-from cmms_fabrica.modulos.conexion_mongo import db
+from pymongo.errors import DuplicateKeyError
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import IdDuplicadoError
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
-from cmms_fabrica.modulos.utilidades_formularios import select_usuarios
+from cmms_fabrica.modulos.jerarquia_activos import (
+    CicloJerarquiaError,
+    calcular_ancestros,
+    reubicar_subarbol,
+)
+from cmms_fabrica.modulos.cache_catalogos import invalidar_catalogo
+from cmms_fabrica.modulos.utilidades_formularios import catalogo_activos, select_usuarios
+
+
+class ActivoDuplicadoError(IdDuplicadoError):
+    """Ya existe otro activo técnico con el mismo ``id_activo_tecnico``."""
+
+
+def _verificar_id_libre(coleccion, id_activo: str, _id=None):
+    filtro = {"id_activo_tecnico": id_activo}
+    if _id is not None:
+        filtro["_id"] = {"$ne": _id}
+    if coleccion.find_one(filtro, {"_id": 1}):
+        raise ActivoDuplicadoError(f"Ya existe un activo técnico con el ID '{id_activo}'.")
 
 
 def crear_activo(data: dict, database=db):
-    """Inserta un activo y registra el evento en historial."""
+    """Inserta un activo y registra el evento en historial.
+
+    Lanza ``ActivoDuplicadoError`` (sin escribir nada) si el ID ya está en uso.
+    """
+    database = resolver_db(database)
     if database is None:
         return None
     coleccion = database["activos_tecnicos"]
-    coleccion.insert_one(data)
+    _verificar_id_libre(coleccion, data["id_activo_tecnico"])
+    data["ancestros"] = calcular_ancestros(data["id_activo_tecnico"], data.get("pertenece_a"), database)
+    try:
+        coleccion.insert_one(data)
+    except DuplicateKeyError:  # alta simultánea con el mismo ID (índice único)
+        raise ActivoDuplicadoError(f"Ya existe un activo técnico con el ID '{data['id_activo_tecnico']}'.") from None
+    invalidar_catalogo("activos_tecnicos")
     registrar_evento_historial(
         tipo_evento="Alta de activo técnico",
         id_activo=data["id_activo_tecnico"],
@@ -33,8 +64,67 @@ def crear_activo(data: dict, database=db):
     return data["id_activo_tecnico"]
 
 
+def editar_activo(anterior: dict, nuevos_datos: dict, database=db):
+    """Actualiza un activo, su jerarquía y la de sus subactivos.
+
+    Lanza ``CicloJerarquiaError`` (sin escribir nada) si el nuevo padre es el
+    propio activo o uno de sus descendientes, y ``ActivoDuplicadoError`` si el
+    nuevo ID pertenece a otro activo.
+    """
+    database = resolver_db(database)
+    if database is None:
+        return None
+    coleccion = database["activos_tecnicos"]
+    id_anterior = anterior.get("id_activo_tecnico")
+    id_nuevo = nuevos_datos["id_activo_tecnico"]
+    ancestros = calcular_ancestros(id_anterior, nuevos_datos.get("pertenece_a"), database)
+    if id_nuevo in ancestros:
+        raise CicloJerarquiaError(f"'{id_nuevo}' no puede pertenecer a sí mismo")
+    if id_nuevo != id_anterior:
+        _verificar_id_libre(coleccion, id_nuevo, anterior["_id"])
+
+    cambios = {"$set": {**nuevos_datos, "ancestros": ancestros}}
+    if "pertenece_a" not in nuevos_datos:
+        cambios["$unset"] = {"pertenece_a": ""}
+    try:
+        coleccion.update_one({"_id": anterior["_id"]}, cambios)
+    except DuplicateKeyError:
+        raise ActivoDuplicadoError(f"Ya existe un activo técnico con el ID '{id_nuevo}'.") from None
+    if id_anterior:
+        reubicar_subarbol(id_anterior, id_nuevo, ancestros, database)
+    invalidar_catalogo("activos_tecnicos")
+
+    registrar_evento_historial(
+        tipo_evento="Edición de activo técnico",
+        id_activo=id_nuevo,
+        descripcion=f"Se editó el activo '{nuevos_datos['nombre']}'",
+        usuario=nuevos_datos["usuario_registro"],
+        id_origen=id_nuevo,
+    )
+    return id_nuevo
+
+
+def eliminar_activo(datos: dict, database=db):
+    """Elimina un activo y deja a sus subactivos con la cadena cortada en él."""
+    database = resolver_db(database)
+    if database is None:
+        return None
+    database["activos_tecnicos"].delete_one({"_id": datos["_id"]})
+    if datos.get("id_activo_tecnico"):
+        reubicar_subarbol(datos["id_activo_tecnico"], None, None, database)
+    invalidar_catalogo("activos_tecnicos")
+    registrar_evento_historial(
+        tipo_evento="Baja de activo técnico",
+        id_activo=datos.get("id_activo_tecnico"),
+        descripcion=f"Se eliminó el activo '{datos.get('nombre', '')}'",
+        usuario=datos.get("usuario_registro", "desconocido"),
+        id_origen=datos.get("id_activo_tecnico"),
+    )
+    return datos.get("id_activo_tecnico")
+
+
 def app():
-    if db is None:
+    if resolver_db(db) is None:
         st.error("MongoDB no disponible")
         return
     coleccion = db["activos_tecnicos"]
@@ -74,7 +164,7 @@ def app():
             )
             estado = st.selectbox("Estado", opciones_estado, index=estado_index)
 
-            activos_existentes = list(coleccion.find({}, {"_id": 0, "id_activo_tecnico": 1}))
+            activos_existentes = catalogo_activos(db)
             ids_disponibles = sorted([a["id_activo_tecnico"] for a in activos_existentes if a.get("id_activo_tecnico") != id_activo])
             ids_disponibles.insert(0, "")
             valor_default = defaults.get("pertenece_a") if defaults else ""
@@ -123,8 +213,11 @@ def app():
         st.subheader("➕ Agregar nuevo activo técnico")
         data = form_activo()
         if data:
-            crear_activo(data, db)
-            st.success("Activo técnico agregado correctamente.")
+            try:
+                crear_activo(data, db)
+                st.success("Activo técnico agregado correctamente.")
+            except (CicloJerarquiaError, ActivoDuplicadoError) as e:
+                st.error(str(e))
 
     elif choice == "Ver":
         st.subheader("📋 Lista de activos técnicos filtrable")
@@ -174,15 +267,11 @@ def app():
 
             nuevos_datos = form_activo(defaults=datos)
             if nuevos_datos:
-                coleccion.update_one({"_id": datos["_id"]}, {"$set": nuevos_datos})
-                registrar_evento_historial(
-                    tipo_evento="Edición de activo técnico",
-                    id_activo=nuevos_datos["id_activo_tecnico"],
-                    descripcion=f"Se editó el activo '{nuevos_datos['nombre']}'",
-                    usuario=nuevos_datos["usuario_registro"],
-                    id_origen=nuevos_datos["id_activo_tecnico"],
-                )
-                st.success("Activo técnico actualizado correctamente.")
+                try:
+                    editar_activo(datos, nuevos_datos, db)
+                    st.success("Activo técnico actualizado correctamente.")
+                except (CicloJerarquiaError, ActivoDuplicadoError) as e:
+                    st.error(str(e))
         else:
             st.info("No hay activos cargados.")
 
@@ -194,14 +283,7 @@ def app():
             seleccion = st.selectbox("Seleccionar activo", list(opciones.keys()))
             datos = opciones[seleccion]
             if st.button("Eliminar definitivamente"):
-                coleccion.delete_one({"_id": datos["_id"]})
-                registrar_evento_historial(
-                    tipo_evento="Baja de activo técnico",
-                    id_activo=datos.get("id_activo_tecnico"),
-                    descripcion=f"Se eliminó el activo '{datos.get('nombre', '')}'",
-                    usuario=datos.get("usuario_registro", "desconocido"),
-                    id_origen=datos.get("id_activo_tecnico"),
-                )
+                eliminar_activo(datos, db)
                 st.success("Activo técnico eliminado. Refrescar la página para ver los cambios.")
         else:
             st.info("No hay activos cargados.")
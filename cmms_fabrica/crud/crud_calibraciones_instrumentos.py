@@ -9,7 +9,8 @@ Descripción: Permite registrar, visualizar, editar y eliminar eventos de calibr
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from cmms_fabrica.modulos.conexion_mongo import db
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import generar_id
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
 from cmms_fabrica.modulos.utilidades_formularios import (
     select_activo_tecnico,
@@ -19,6 +20,7 @@ from cmms_fabrica.modulos.utilidades_formularios import (
 
 def crear_calibracion(data: dict, database=db):
     """Inserta un registro de calibración y registra el evento."""
+    database = resolver_db(database)
     if database is None:
         return None
     coleccion = database["calibraciones"]
@@ -35,7 +37,21 @@ def crear_calibracion(data: dict, database=db):
 
 
 def generar_id_calibracion():
-    return f"CAL-{int(datetime.now().timestamp())}"
+    return generar_id("CAL-")
+
+
+def calibraciones_por_vencer(database=db, dias=30):
+    """Calibraciones vencidas o que vencen en los próximos ``dias`` (índice ``ix_fecha_proxima``)."""
+    database = resolver_db(database)
+    if database is None:
+        return []
+    # fecha_proxima se guarda como "AAAA-MM-DD": el orden de texto es el cronológico
+    limite = (datetime.today() + timedelta(days=dias)).strftime("%Y-%m-%d")
+    cursor = database["calibraciones"].find(
+        {"fecha_proxima": {"$gt": "", "$lte": limite}},
+        {"_id": 0, "id_activo_tecnico": 1, "fecha_proxima": 1, "resultado": 1, "observaciones": 1},
+    ).sort("fecha_proxima", 1)
+    return list(cursor)
 
 def form_calibracion(defaults=None):
     ids_activos = select_activo_tecnico(db)
@@ -102,7 +118,7 @@ def form_calibracion(defaults=None):
     return None
 
 def app():
-    if db is None:
+    if resolver_db(db) is None:
         st.error("MongoDB no disponible")
         return
     coleccion = db["calibraciones"]
@@ -128,17 +144,13 @@ def app():
             st.info("No hay calibraciones registradas.")
             return
 
-        df = pd.DataFrame(registros)
-        df["fecha_proxima"] = pd.to_datetime(df["fecha_proxima"], errors="coerce")
-        hoy = datetime.today()
-        df_alerta = df[df["fecha_proxima"].notna() & (df["fecha_proxima"] <= hoy + timedelta(days=30))]
+        # Consulta por rango sobre ``ix_fecha_proxima``: siempre refleja las altas y ediciones recientes
+        alertas = calibraciones_por_vencer(db)
+        df_alerta = pd.DataFrame(alertas, columns=["id_activo_tecnico", "fecha_proxima", "resultado", "observaciones"])
 
         st.markdown("### ⚠️ Calibraciones vencidas o próximas")
         if not df_alerta.empty:
-            st.dataframe(
-                df_alerta[["id_activo_tecnico", "fecha_proxima", "resultado", "observaciones"]],
-                use_container_width=True,
-            )
+            st.dataframe(df_alerta, use_container_width=True)
         else:
             st.success("Todas las calibraciones están al día ✅")
 
@@ -6,22 +6,27 @@ Este módulo permite registrar, visualizar, editar y eliminar consumos técnicos
 colección ``historial`` para asegurar trazabilidad conforme a ISO 9001.
 
 ✅ Esta versión calcula promedios diarios y mensuales a partir de diferencias entre lecturas acumulativas.
+✅ Las lecturas de horómetros vinculados (``medidores_uso``) actualizan los planes preventivos por uso;
+   al registrar, editar o eliminar una lectura se aplica la más reciente del medidor.
 """
 
 from datetime import datetime, timedelta
 import pandas as pd
 import streamlit as st
 
-from cmms_fabrica.modulos.conexion_mongo import db
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import generar_id
 from cmms_fabrica.modulos.estilos import aplicar_estilos
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+from cmms_fabrica.modulos.medidores_uso import MEDIDORES_HORAS, aplicar_ultima_lectura, vincular_medidor, vinculos
+from cmms_fabrica.modulos.utilidades_formularios import catalogo_activos
 
 TIPOS_CONSUMO = ["UTE", "OSE", "Schulz SRP 3040", "Atlas Copco GX7"]
 UNIDADES = ["kWh", "m³", "h"]
 
 
 def generar_id_consumo() -> str:
-    return f"CON-{int(datetime.now().timestamp())}"
+    return generar_id("CON-")
 
 
 def form_consumo(usuario: str, defaults: dict | None = None) -> dict | None:
@@ -56,15 +61,25 @@ def form_consumo(usuario: str, defaults: dict | None = None) -> dict | None:
     return None
 
 
+def actualizar_planes_por_uso(database, *medidores: str) -> None:
+    """Reaplica la lectura vigente de los horómetros afectados a sus planes por uso."""
+    for medidor in dict.fromkeys(m for m in medidores if m in MEDIDORES_HORAS):
+        actualizados = aplicar_ultima_lectura(medidor, database)
+        if actualizados:
+            st.info(f"Planes por uso actualizados con la lectura de {medidor}:")
+            st.dataframe(pd.DataFrame(actualizados), hide_index=True)
+
+
 def app(database=db, usuario: str = ""):
     aplicar_estilos()
+    database = resolver_db(database)
     if database is None:
         st.error("MongoDB no disponible")
         return
     coleccion = database["consumos"]
 
     st.title("⚡ Gestión de Consumos Técnicos")
-    menu = ["Registrar", "Ver", "Editar", "Eliminar"]
+    menu = ["Registrar", "Ver", "Editar", "Eliminar", "Medidores y planes"]
     choice = st.sidebar.radio("Acción", menu)
 
     if choice == "Registrar":
@@ -80,6 +95,7 @@ def app(database=db, usuario: str = ""):
                 id_origen=data["id_consumo"],
             )
             st.success("Consumo registrado correctamente.")
+            actualizar_planes_por_uso(database, data["tipo_consumo"])
 
     elif choice == "Ver":
         st.subheader("📋 Registros de Consumo")
@@ -156,6 +172,7 @@ def app(database=db, usuario: str = ""):
                 id_origen=nuevos_datos["id_consumo"],
             )
             st.success("Consumo actualizado correctamente.")
+            actualizar_planes_por_uso(database, datos.get("tipo_consumo"), nuevos_datos["tipo_consumo"])
 
     elif choice == "Eliminar":
         st.subheader("🗑️ Eliminar consumo")
@@ -176,3 +193,36 @@ def app(database=db, usuario: str = ""):
                 id_origen=datos["id_consumo"],
             )
             st.success("Consumo eliminado. Actualizá la vista para confirmar.")
+            actualizar_planes_por_uso(database, datos.get("tipo_consumo"))
+
+    elif choice == "Medidores y planes":
+        st.subheader("⏲️ Horómetros vinculados a planes por uso")
+        actuales = {v["medidor"]: v for v in vinculos(database)}
+        if actuales:
+            st.dataframe(pd.DataFrame(actuales.values()), hide_index=True)
+
+        medidor = st.selectbox("Medidor", MEDIDORES_HORAS)
+        vinculo = actuales.get(medidor, {})
+        activos = {a["id_activo_tecnico"]: f"{a['id_activo_tecnico']} – {a.get('nombre', 'Sin nombre')}" for a in catalogo_activos(database)}
+        if not activos:
+            st.warning("⚠️ No hay activos técnicos cargados.")
+            return
+        ids_activos = list(activos)
+        id_activo = st.selectbox(
+            "Activo técnico",
+            ids_activos,
+            index=ids_activos.index(vinculo["id_activo_tecnico"]) if vinculo.get("id_activo_tecnico") in ids_activos else 0,
+            format_func=activos.get,
+        )
+        planes = [
+            p["id_plan"]
+            for p in database["planes_preventivos"].find(
+                {"id_activo_tecnico": id_activo, "tipo_programacion": {"$in": ["uso", "ambos"]}}, {"id_plan": 1}
+            )
+        ]
+        seleccion = st.multiselect(
+            "Planes preventivos por uso", planes, default=[p for p in vinculo.get("planes", []) if p in planes]
+        )
+        if st.button("Guardar vínculo"):
+            actualizados = vincular_medidor(medidor, id_activo, seleccion, database)
+            st.success(f"Vínculo guardado. Planes actualizados con la última lectura: {len(actualizados)}.")
@@ -10,23 +10,30 @@ trazabilidad según ISO 9001 e ISO 55001.
 import pandas as pd
 import streamlit as st
 from datetime import datetime
-from cmms_fabrica.modulos.conexion_mongo import db
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+from cmms_fabrica.modulos.generador_ids import IdDuplicadoError, id_unico, verificar_id_libre
 
 
 # --- Helper: obtener colección de inventario de forma consistente ---
 def get_coleccion():
-    if db is None:
+    database = resolver_db(db)
+    if database is None:
         return None
-    return db["inventario"]
+    return database["inventario"]
 
 
 def crear_item_inventario(data: dict):
-    """Inserta un item de inventario y registra el evento."""
+    """Inserta un item de inventario y registra el evento.
+
+    Lanza ``IdDuplicadoError`` (sin escribir nada) si el ID ya está en uso.
+    """
     col = get_coleccion()
     if col is None:
         return None
-    col.insert_one(data)
+    verificar_id_libre(col, "id_item", data.get("id_item"), "un ítem")
+    with id_unico(data.get("id_item"), "un ítem"):
+        col.insert_one(data)
     registrar_evento_historial(
         tipo_evento="Alta de inventario",
         id_activo=data.get("maquina_compatible"),   # activo técnico asociado si aplica
@@ -37,6 +44,29 @@ def crear_item_inventario(data: dict):
     return data.get("id_item")
 
 
+def editar_item_inventario(anterior: dict, nuevos_datos: dict, usuario: str):
+    """Actualiza un ítem y registra el evento.
+
+    Lanza ``IdDuplicadoError`` (sin escribir nada) si el nuevo ID pertenece a otro ítem.
+    """
+    col = get_coleccion()
+    if col is None:
+        return None
+    id_item = nuevos_datos["id_item"]
+    if id_item != anterior.get("id_item"):
+        verificar_id_libre(col, "id_item", id_item, "un ítem", anterior["_id"])
+    with id_unico(id_item, "un ítem"):
+        col.update_one({"_id": anterior["_id"]}, {"$set": nuevos_datos})
+    registrar_evento_historial(
+        tipo_evento="Edición de ítem inventario",
+        id_activo=nuevos_datos.get("maquina_compatible", ""),
+        descripcion=f"Edición de ítem: {nuevos_datos['descripcion']}",
+        usuario=usuario,
+        id_origen=id_item,
+    )
+    return id_item
+
+
 def cargar_inventario() -> pd.DataFrame:
     """Devuelve el inventario completo como DataFrame."""
     col = get_coleccion()
@@ -165,13 +195,13 @@ def app_inventario(usuario: str) -> None:
         st.subheader("➕ Agregar nuevo ítem")
         data = form_item(key="form_nuevo_item")
         if data:
-            if col.find_one({"id_item": data["id_item"]}):
-                st.error("⚠️ Ya existe un ítem con ese ID.")
-            else:
-                data["usuario_registro"] = usuario
-                data["fecha_registro"] = datetime.now()
+            data["usuario_registro"] = usuario
+            data["fecha_registro"] = datetime.now()
+            try:
                 crear_item_inventario(data)
                 st.success("Ítem agregado correctamente.")
+            except IdDuplicadoError as e:
+                st.error(f"⚠️ {e}")
 
     elif accion == "Ver":
         st.subheader("📄 Inventario Técnico")
@@ -188,15 +218,11 @@ def app_inventario(usuario: str) -> None:
             seleccionado_datos = opciones[seleccionado]
             nuevos_datos = form_item(defaults=seleccionado_datos, key="editar_item")
             if nuevos_datos:
-                col.update_one({"_id": seleccionado_datos["_id"]}, {"$set": nuevos_datos})
-                registrar_evento_historial(
-                    tipo_evento="Edición de ítem inventario",
-                    id_activo=nuevos_datos.get("maquina_compatible", ""),
-                    descripcion=f"Edición de ítem: {nuevos_datos['descripcion']}",
-                    usuario=usuario,
-                    id_origen=nuevos_datos["id_item"],
-                )
-                st.success("Ítem actualizado correctamente.")
+                try:
+                    editar_item_inventario(seleccionado_datos, nuevos_datos, usuario)
+                    st.success("Ítem actualizado correctamente.")
+                except IdDuplicadoError as e:
+                    st.error(f"⚠️ {e}")
 
     elif accion == "Eliminar":
         st.subheader("🗑️ Eliminar ítem de inventario")
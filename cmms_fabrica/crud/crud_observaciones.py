@@ -8,7 +8,9 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
+from cmms_fabrica.modulos.generador_ids import generar_id
+from cmms_fabrica.modulos.utilidades_formularios import catalogo_activos
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
 
 tipos_observacion = ["Advertencia", "Hallazgo", "Ruido", "Otro"]
@@ -17,7 +19,7 @@ criticidades = ["Sin clasificar", "Baja", "Media", "Alta", "Crítica"]
 
 
 def generar_id_observacion():
-    return f"OBS_{int(datetime.now().timestamp())}"
+    return generar_id("OBS_")
 
 
 def _normalizar_criticidad(valor):
@@ -27,12 +29,7 @@ def _normalizar_criticidad(valor):
 
 
 def form_observacion(activos, defaults=None):
-    activos_lista = list(
-        activos.find(
-            {},
-            {"_id": 0, "id_activo_tecnico": 1, "nombre": 1, "pertenece_a": 1}
-        )
-    )
+    activos_lista = catalogo_activos(activos.database)
 
     if not activos_lista:
         st.warning("⚠️ No hay activos técnicos registrados.")
@@ -132,8 +129,8 @@ def form_observacion(activos, defaults=None):
 
 
 def app():
-    if db is None:
-        st.error(f"MongoDB no disponible. {mongo_error}")
+    if resolver_db(db) is None:
+        st.error(f"MongoDB no disponible. {obtener_error_mongo()}")
         st.stop()
 
     coleccion = db["observaciones"]
@@ -17,19 +17,29 @@ import pandas as pd
 import streamlit as st
 
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
-from cmms_fabrica.modulos.conexion_mongo import db
-from cmms_fabrica.modulos.utilidades_formularios import select_proveedores_externos
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import IdDuplicadoError, generar_id, id_unico, verificar_id_libre
+from cmms_fabrica.modulos.medidores_uso import fecha_estimada
+from cmms_fabrica.modulos.utilidades_formularios import catalogo_activos, select_proveedores_externos
+from cmms_fabrica.modulos.vencimientos_planes import campos_derivados, planes_por_vencer, planes_vencidos
 
 
 # ---------------------------------------------------------------------
 # Helpers básicos
 # ---------------------------------------------------------------------
 def crear_plan_preventivo(data: dict, database=db):
-    """Inserta un plan preventivo y registra el evento en historial."""
+    """Inserta un plan preventivo y registra el evento en historial.
+
+    Lanza ``IdDuplicadoError`` (sin escribir nada) si el ID ya está en uso.
+    """
+    database = resolver_db(database)
     if database is None:
         return None
     coleccion = database["planes_preventivos"]
-    coleccion.insert_one(data)
+    verificar_id_libre(coleccion, "id_plan", data["id_plan"], "un plan preventivo")
+    data.update(campos_derivados(data))
+    with id_unico(data["id_plan"], "un plan preventivo"):
+        coleccion.insert_one(data)
     registrar_evento_historial(
         tipo_evento="Alta de plan preventivo",
         id_activo=data["id_activo_tecnico"],
@@ -40,16 +50,40 @@ def crear_plan_preventivo(data: dict, database=db):
     return data["id_plan"]
 
 
+def editar_plan_preventivo(anterior: dict, nuevos_datos: dict, database=db):
+    """Actualiza un plan y registra el evento en historial.
+
+    Lanza ``IdDuplicadoError`` (sin escribir nada) si el nuevo ID pertenece a otro plan.
+    """
+    database = resolver_db(database)
+    if database is None:
+        return None
+    coleccion = database["planes_preventivos"]
+    id_plan = nuevos_datos["id_plan"]
+    if id_plan != anterior.get("id_plan"):
+        verificar_id_libre(coleccion, "id_plan", id_plan, "un plan preventivo", anterior["_id"])
+    with id_unico(id_plan, "un plan preventivo"):
+        coleccion.update_one({"_id": anterior["_id"]}, {"$set": nuevos_datos})
+    registrar_evento_historial(
+        tipo_evento="Edición de plan preventivo",
+        id_activo=nuevos_datos["id_activo_tecnico"],
+        descripcion=f"Edición de plan para activo: {nuevos_datos['id_activo_tecnico']}",
+        usuario=nuevos_datos["usuario_registro"],
+        id_origen=id_plan,
+    )
+    return id_plan
+
+
 def generar_id_plan() -> str:
-    """Genera un ID único simple para el plan."""
-    return f"PP-{int(datetime.now().timestamp())}"
+    """Genera un ID único para el plan."""
+    return generar_id("PP-")
 
 
 # ---------------------------------------------------------------------
 # App principal
 # ---------------------------------------------------------------------
 def app():
-    if db is None:
+    if resolver_db(db) is None:
         st.error("MongoDB no disponible")
         return
 
@@ -85,11 +119,7 @@ def app():
             # ---------------------------------------------------------
             # Activo técnico asociado (obligatorio)
             # ---------------------------------------------------------
-            activos_lista = list(
-                db["activos_tecnicos"].find(
-                    {}, {"_id": 0, "id_activo_tecnico": 1, "nombre": 1}
-                )
-            )
+            activos_lista = catalogo_activos(db)
             if activos_lista:
                 opciones = [
                     f"{a['id_activo_tecnico']} – {a.get('nombre', 'Sin nombre')}"
@@ -208,7 +238,7 @@ def app():
                     "Lectura actual de uso",
                     min_value=0.0,
                     value=float(defaults.get("lectura_actual_uso", 0.0)),
-                    help="Lectura real de hoy. Si no la tenés, dejá el valor anterior.",
+                    help="Lectura real de hoy. Si el activo tiene un horómetro vinculado en Consumos, se actualiza sola.",
                 )
 
             # ---------------------------------------------------------
@@ -303,8 +333,11 @@ def app():
         st.subheader("➕ Alta de Plan Preventivo")
         data = form_plan()
         if data:
-            crear_plan_preventivo(data, db)
-            st.success("✅ Plan preventivo registrado correctamente.")
+            try:
+                crear_plan_preventivo(data, db)
+                st.success("✅ Plan preventivo registrado correctamente.")
+            except IdDuplicadoError as e:
+                st.error(str(e))
 
     # -----------------------------------------------------------------
     # 2) Ver Planes
@@ -353,79 +386,37 @@ def app():
                         f"**Uso umbral:** {p.get('umbral_uso', '-') } {p.get('unidad_uso', '')} | "
                         f"**Frecuencia:** {freq} | **Estado:** {p.get('estado', '-')}"
                     )
+                    if p.get("fecha_estimada_uso"):
+                        st.caption(
+                            f"⏲️ {p.get('medidor_uso', 'Medidor')}: {p.get('tasa_uso_diaria', 0):.1f} "
+                            f"{p.get('unidad_uso', '')}/día, vence por uso el {p['fecha_estimada_uso']:%Y-%m-%d}"
+                        )
 
     # -----------------------------------------------------------------
     # 3) Planes vencidos (tiempo, uso o ambos)
     # -----------------------------------------------------------------
     elif choice == "Planes vencidos":
         st.subheader("⏰ Planes preventivos vencidos")
-        hoy = date.today()
-        planes = list(coleccion.find())
-        vencidos = []
-
-        for p in planes:
-            # solo activos
-            if p.get("estado") != "Activo":
-                continue
-
-            tipo_prog = p.get("tipo_programacion", "tiempo")
-            vencio_por_tiempo = False
-            vencio_por_uso = False
-
-            # --- por tiempo
-            if tipo_prog in ("tiempo", "ambos"):
-                pf = p.get("proxima_fecha")
-                if pf:
-                    try:
-                        fecha_plan = datetime.strptime(pf, "%Y-%m-%d").date()
-                        if fecha_plan < hoy:
-                            vencio_por_tiempo = True
-                    except ValueError:
-                        # fecha mal cargada: la ignoramos
-                        pass
-
-            # --- por uso
-            if tipo_prog in ("uso", "ambos"):
-                umbral = float(p.get("umbral_uso", 0) or 0)
-                ult = float(p.get("ultima_lectura_uso", 0) or 0)
-                act = float(p.get("lectura_actual_uso", 0) or 0)
-                consumido = act - ult
-                if umbral > 0 and consumido >= umbral:
-                    vencio_por_uso = True
-
-            if vencio_por_tiempo or vencio_por_uso:
-                p["_vencio_por_tiempo"] = vencio_por_tiempo
-                p["_vencio_por_uso"] = vencio_por_uso
-                vencidos.append(p)
+        vencidos = planes_vencidos(db)
 
         if not vencidos:
             st.success("👌 No hay planes vencidos (ni por tiempo ni por uso).")
         else:
-            rows = []
-            for p in vencidos:
-                rows.append(
-                    {
-                        "id_plan": p.get("id_plan"),
-                        "id_activo_tecnico": p.get("id_activo_tecnico"),
-                        "tipo_programacion": p.get("tipo_programacion", "tiempo"),
-                        "proxima_fecha": p.get("proxima_fecha", ""),
-                        "venció_por_tiempo": p.get("_vencio_por_tiempo", False),
-                        "umbral_uso": p.get("umbral_uso", ""),
-                        "ultima_lectura_uso": p.get("ultima_lectura_uso", ""),
-                        "lectura_actual_uso": p.get("lectura_actual_uso", ""),
-                        "consumido": (
-                            float(p.get("lectura_actual_uso", 0) or 0)
-                            - float(p.get("ultima_lectura_uso", 0) or 0)
-                        ),
-                        "venció_por_uso": p.get("_vencio_por_uso", False),
-                        "responsable": p.get("responsable", ""),
-                    }
-                )
-
-            df = pd.DataFrame(rows)
+            df = pd.DataFrame(vencidos)
             st.dataframe(df, use_container_width=True)
             st.info(f"📦 Total de planes vencidos: **{len(vencidos)}**")
 
+        st.subheader("📅 Planes que vencen próximamente")
+        dias = st.number_input("Próximos días", min_value=1, max_value=365, value=30, step=1)
+        por_vencer = planes_por_vencer(db, int(dias))
+        if por_vencer:
+            st.dataframe(
+                pd.DataFrame(por_vencer)[["id_plan", "id_activo_tecnico", "proxima_fecha", "responsable"]],
+                use_container_width=True,
+            )
+        else:
+            st.info(f"Ningún plan vence por tiempo en los próximos {int(dias)} días.")
+
     # -----------------------------------------------------------------
     # 4) Editar plan
     # -----------------------------------------------------------------
@@ -440,15 +431,16 @@ def app():
             if datos:
                 nuevos_datos = form_plan(defaults=datos)
                 if nuevos_datos:
-                    coleccion.update_one({"_id": datos["_id"]}, {"$set": nuevos_datos})
-                    registrar_evento_historial(
-                        tipo_evento="Edición de plan preventivo",
-                        id_activo=nuevos_datos["id_activo_tecnico"],
-                        descripcion=f"Edición de plan para activo: {nuevos_datos['id_activo_tecnico']}",
-                        usuario=nuevos_datos["usuario_registro"],
-                        id_origen=nuevos_datos["id_plan"],
-                    )
-                    st.success("✅ Plan actualizado correctamente.")
+                    nuevos_datos.update(campos_derivados(nuevos_datos))
+                    if datos.get("tasa_uso_diaria"):
+                        nuevos_datos["fecha_estimada_uso"] = fecha_estimada(
+                            nuevos_datos["uso_restante"], datos["tasa_uso_diaria"], date.today()
+                        )
+                    try:
+                        editar_plan_preventivo(datos, nuevos_datos, db)
+                        st.success("✅ Plan actualizado correctamente.")
+                    except IdDuplicadoError as e:
+                        st.error(str(e))
         else:
             st.info("No hay planes para editar.")
 
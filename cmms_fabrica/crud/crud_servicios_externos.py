@@ -12,16 +12,25 @@ Cada cambio se documenta automáticamente en la colección `historial`.
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from cmms_fabrica.modulos.conexion_mongo import db
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import IdDuplicadoError, generar_id, id_unico, verificar_id_libre
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+from cmms_fabrica.modulos.cache_catalogos import invalidar_catalogo
 
 
 def crear_proveedor(data: dict, database=db):
-    """Inserta un proveedor externo y registra el evento."""
+    """Inserta un proveedor externo y registra el evento.
+
+    Lanza ``IdDuplicadoError`` (sin escribir nada) si el ID ya está en uso.
+    """
+    database = resolver_db(database)
     if database is None:
         return None
     coleccion = database["servicios_externos"]
-    coleccion.insert_one(data)
+    verificar_id_libre(coleccion, "id_proveedor", data["id_proveedor"], "un proveedor")
+    with id_unico(data["id_proveedor"], "un proveedor"):
+        coleccion.insert_one(data)
+    invalidar_catalogo("servicios_externos")
     registrar_evento_historial(
         tipo_evento="Alta de proveedor externo",
         id_activo=None,
@@ -31,8 +40,34 @@ def crear_proveedor(data: dict, database=db):
     )
     return data["id_proveedor"]
 
+
+def editar_proveedor(anterior: dict, nuevos_datos: dict, database=db):
+    """Actualiza un proveedor y registra el evento.
+
+    Lanza ``IdDuplicadoError`` (sin escribir nada) si el nuevo ID pertenece a otro proveedor.
+    """
+    database = resolver_db(database)
+    if database is None:
+        return None
+    coleccion = database["servicios_externos"]
+    id_proveedor = nuevos_datos["id_proveedor"]
+    if id_proveedor != anterior.get("id_proveedor"):
+        verificar_id_libre(coleccion, "id_proveedor", id_proveedor, "un proveedor", anterior["_id"])
+    with id_unico(id_proveedor, "un proveedor"):
+        coleccion.update_one({"_id": anterior["_id"]}, {"$set": nuevos_datos})
+    invalidar_catalogo("servicios_externos")
+    registrar_evento_historial(
+        tipo_evento="Edición de proveedor externo",
+        id_activo=None,
+        descripcion=f"Se actualizó proveedor {nuevos_datos['nombre']}",
+        usuario=nuevos_datos["usuario_registro"],
+        id_origen=id_proveedor,
+    )
+    return id_proveedor
+
+
 def app():
-    if db is None:
+    if resolver_db(db) is None:
         st.error("MongoDB no disponible")
         return
     coleccion = db["servicios_externos"]
@@ -44,7 +79,7 @@ def app():
 
     def form_proveedor(defaults=None):
         with st.form("form_proveedor_externo"):
-            id_proveedor = st.text_input("ID del Proveedor", value=defaults.get("id_proveedor") if defaults else f"PROV_{int(datetime.now().timestamp())}")
+            id_proveedor = st.text_input("ID del Proveedor", value=defaults.get("id_proveedor") if defaults else generar_id("PROV_"))
             nombre = st.text_input("Nombre o Razón Social", value=defaults.get("nombre") if defaults else "")
             especialidad = st.text_input("Especialidad o rubro", value=defaults.get("especialidad") if defaults else "")
             contacto = st.text_input("Nombre de contacto", value=defaults.get("contacto") if defaults else "")
@@ -73,8 +108,11 @@ def app():
         st.subheader("➕ Nuevo Proveedor Técnico")
         data = form_proveedor()
         if data:
-            crear_proveedor(data, db)
-            st.success("Proveedor registrado correctamente.")
+            try:
+                crear_proveedor(data, db)
+                st.success("Proveedor registrado correctamente.")
+            except IdDuplicadoError as e:
+                st.error(str(e))
 
     elif choice == "Ver Proveedores":
         st.subheader("📋 Servicios Externos Registrados")
@@ -115,15 +153,11 @@ def app():
         datos = opciones[seleccion]
         nuevos_datos = form_proveedor(defaults=datos)
         if nuevos_datos:
-            coleccion.update_one({"_id": datos["_id"]}, {"$set": nuevos_datos})
-            registrar_evento_historial(
-                tipo_evento="Edición de proveedor externo",
-                id_activo=None,
-                descripcion=f"Se actualizó proveedor {nuevos_datos['nombre']}",
-                usuario=nuevos_datos["usuario_registro"],
-                id_origen=nuevos_datos["id_proveedor"],
-            )
-            st.success("Proveedor actualizado correctamente.")
+            try:
+                editar_proveedor(datos, nuevos_datos, db)
+                st.success("Proveedor actualizado correctamente.")
+            except IdDuplicadoError as e:
+                st.error(str(e))
 
     elif choice == "Eliminar Proveedor":
         st.subheader("🗑️ Eliminar Proveedor Técnico")
@@ -136,6 +170,7 @@ def app():
         datos = opciones[seleccion]
         if st.button("Eliminar definitivamente"):
             coleccion.delete_one({"_id": datos["_id"]})
+            invalidar_catalogo("servicios_externos")
             registrar_evento_historial(
                 tipo_evento="Baja de proveedor externo",
                 id_activo=None,
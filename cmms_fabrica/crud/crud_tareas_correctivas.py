@@ -19,6 +19,7 @@ import pandas as pd
 import streamlit as st
 
 from cmms_fabrica.modulos.conexion_mongo import get_db
+from cmms_fabrica.modulos.generador_ids import generar_id
 from cmms_fabrica.modulos.repository import CMMSRepository, HistorialEvent
 from cmms_fabrica.modulos.utilidades_formularios import (
     select_activo_tecnico,
@@ -27,7 +28,7 @@ from cmms_fabrica.modulos.utilidades_formularios import (
 
 
 def generar_id_tarea() -> str:
-    return f"TC-{int(datetime.now().timestamp())}"
+    return generar_id("TC-")
 
 
 def _to_date(value: Optional[object]) -> date:
@@ -11,9 +11,11 @@ Normas aplicables: ISO 9001:2015 | ISO 55001 | ISO 14224
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from cmms_fabrica.modulos.conexion_mongo import db
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import generar_id
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
 from cmms_fabrica.modulos.utilidades_formularios import (
+    catalogo_activos,
     select_activo_tecnico,
     select_proveedores_externos,
 )
@@ -21,6 +23,7 @@ from cmms_fabrica.modulos.utilidades_formularios import (
 
 def crear_tarea_tecnica(data: dict, database=db):
     """Inserta una tarea técnica y registra el evento."""
+    database = resolver_db(database)
     if database is None:
         return None
     coleccion = database["tareas_tecnicas"]
@@ -38,7 +41,7 @@ estados_posibles = ["Pendiente", "En curso", "Finalizada"]
 tipos_tecnica_canonicas = ["Relevamiento", "Diagnóstico", "Gestión", "Presupuesto"]
 
 def generar_id_tarea_tecnica():
-    return f"TT-{int(datetime.now().timestamp())}"
+    return generar_id("TT-")
 
 def form_tecnica(defaults=None):
     tipo_actual = defaults.get("tipo_tecnica") if defaults else None
@@ -50,7 +53,7 @@ def form_tecnica(defaults=None):
         hoy = datetime.today()
 
         # Activos técnicos
-        activos = list(db["activos_tecnicos"].find({}, {"_id": 0, "id_activo_tecnico": 1, "pertenece_a": 1}))
+        activos = catalogo_activos(db)
         id_map = {
             a["id_activo_tecnico"]: (
                 f"{a['id_activo_tecnico']} (pertenece a {a['pertenece_a']})" if a.get("pertenece_a")
@@ -120,7 +123,7 @@ def form_tecnica(defaults=None):
     return None
 
 def app():
-    if db is None:
+    if resolver_db(db) is None:
         st.error("MongoDB no disponible")
         return
     coleccion = db["tareas_tecnicas"]
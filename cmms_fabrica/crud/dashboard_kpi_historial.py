@@ -4,6 +4,11 @@
 Este módulo presenta indicadores clave de mantenimiento y soporte técnico a partir de la colección historial,
 que consolida eventos preventivos, correctivos, técnicos, observaciones y calibraciones.
 
+Los indicadores y gráficos se calculan sobre `historial_rollups` (conteos diarios y mensuales
+mantenidos al registrar cada evento). Mientras los rollups no existan, se calculan con una
+agregación en MongoDB (`consultas_historial`); del historial solo viajan los conteos y los
+eventos más recientes de la tabla de detalle.
+
 ✅ Normas aplicables:
 - ISO 55001 (Indicadores de gestión de mantenimiento alineados al ciclo de vida del activo)
 - ISO 14224 (Clasificación y análisis de eventos técnicos)
@@ -12,32 +17,24 @@ que consolida eventos preventivos, correctivos, técnicos, observaciones y calib
 
 import streamlit as st
 import pandas as pd
-import matplotlib
-
-# Configurar backend sin interfaz gráfica para compatibilidad con Render y otros entornos headless.
-if not matplotlib.get_backend().lower().startswith("agg"):
-    matplotlib.use("Agg", force=True)
-
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime
-from cmms_fabrica.modulos.conexion_mongo import db
-
-
-def categorizar_tipo_evento(tipo_evento: str) -> str:
-    texto = str(tipo_evento or "").strip().lower()
-
-    if "observ" in texto:
-        return "observacion"
-    if "correctiv" in texto:
-        return "correctiva"
-    if "preventiv" in texto:
-        return "preventiva"
-    if "calibr" in texto:
-        return "calibracion"
-    if "tecnica" in texto or "técnica" in texto:
-        return "tecnica"
-    return "otro"
+from cmms_fabrica.crud.generador_historial import categorizar_tipo_evento  # compatibilidad: antes se definía aquí
+from cmms_fabrica.crud.rollups_historial import (
+    COLECCION_ROLLUPS,
+    consultar_rollups,
+    reconstruir_rollups,
+)
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.graficos import GRAFICOS_NATIVOS, grafico_barras, grafico_lineas_mensual
+from cmms_fabrica.modulos.jerarquia_activos import ids_del_subarbol
+from cmms_fabrica.modulos.utilidades_formularios import catalogo_activos
+from cmms_fabrica.modulos.consultas_historial import (
+    eventos_recientes,
+    resumen_desde_dataframe,
+    resumen_kpis,
+)
+
+LIMITE_DETALLE = 200
 
 
 def filtrar_ultimo_evento_por_origen(df: pd.DataFrame) -> pd.DataFrame:
@@ -61,12 +58,33 @@ def filtrar_ultimo_evento_por_origen(df: pd.DataFrame) -> pd.DataFrame:
     idx = df_ordenado.groupby(["id_activo_tecnico", "tipo_evento_categoria", "id_origen"])["fecha_evento"].idxmax()
     return df_ordenado.loc[idx].reset_index(drop=True)
 
+
+def origenes_desde_rollups(buckets: list) -> pd.DataFrame:
+    """Expande los buckets a una fila por origen, con las columnas que usan los KPIs.
+
+    La fecha de cada fila es la del último evento del bucket, suficiente para
+    elegir el último bucket de cada origen con `filtrar_ultimo_evento_por_origen`.
+    """
+    filas = [
+        {
+            "id_activo_tecnico": bucket.get("id_activo_tecnico"),
+            "tipo_evento_categoria": bucket.get("categoria"),
+            "id_origen": origen,
+            "fecha_evento": bucket.get("ultima_fecha"),
+            "criticidad": bucket.get("criticidad"),
+            "usuario_registro": bucket.get("usuario_registro"),
+        }
+        for bucket in buckets
+        for origen in bucket.get("origenes", [])
+    ]
+    columnas = ["id_activo_tecnico", "tipo_evento_categoria", "id_origen", "fecha_evento", "criticidad", "usuario_registro"]
+    return pd.DataFrame(filas, columns=columnas)
+
+
 def app():
-    if db is None:
+    if resolver_db(db) is None:
         st.error("MongoDB no disponible")
         return
-    coleccion = db["historial"]
-    activos_tecnicos = db["activos_tecnicos"]
 
     st.title("📊 Dashboard de KPIs – Historial Técnico")
     
@@ -80,9 +98,11 @@ def app():
         default=["preventiva", "correctiva", "tecnica", "observacion", "calibracion"]
     )
 
+    nativos = st.sidebar.checkbox("Gráficos interactivos", value=GRAFICOS_NATIVOS)
+
     # Filtro por activo técnico con jerarquía
     st.sidebar.header("🧩 Activo Técnico (opcional)")
-    activos = list(activos_tecnicos.find())
+    activos = catalogo_activos(db)
     opciones = ["Todos"] + sorted([
         f"{a['id_activo_tecnico']} (pertenece a {a['pertenece_a']})" if a.get("pertenece_a")
         else a["id_activo_tecnico"]
@@ -94,100 +114,66 @@ def app():
     # Construir lista de IDs válidos
     ids_filtrados = None
     if id_filtrado != "Todos":
-        subactivos = [a["id_activo_tecnico"] for a in activos if a.get("pertenece_a") == id_filtrado]
-        ids_filtrados = [id_filtrado] + subactivos
+        ids_filtrados = ids_del_subarbol(id_filtrado, db)
+        subactivos = ids_filtrados[1:]
         st.sidebar.success(f"Incluyendo {len(subactivos)} subactivo(s) de '{id_filtrado}'")
 
-    # Consulta
-    query = {
-        "fecha_evento": {
-            "$gte": datetime.combine(fecha_inicio, datetime.min.time()),
-            "$lte": datetime.combine(fecha_fin, datetime.max.time())
-        }
-    }
-    if ids_filtrados:
-        query["id_activo_tecnico"] = {"$in": ids_filtrados}
-
-    registros = list(coleccion.find(query))
-    df = pd.DataFrame(registros)
-
-    if df.empty:
+    if db[COLECCION_ROLLUPS].count_documents({}, limit=1):
+        # Rollups: unos cientos de buckets en lugar de todos los eventos
+        buckets = consultar_rollups(fecha_inicio, fecha_fin, tipo_evento, ids_filtrados, database=db)
+        df = origenes_desde_rollups(buckets)
+        df["fecha_evento"] = pd.to_datetime(df["fecha_evento"])
+        resumen = resumen_desde_dataframe(filtrar_ultimo_evento_por_origen(df))
+    else:
+        if db["historial"].count_documents({}, limit=1) and st.sidebar.button("🔄 Precalcular indicadores"):
+            with st.spinner("Procesando historial..."):
+                reconstruir_rollups(db)
+            st.rerun()
+        resumen = resumen_kpis(fecha_inicio, fecha_fin, tipo_evento, ids_filtrados, database=db)
+
+    if resumen.vacio:
         st.warning("No hay datos en el período seleccionado.")
         st.stop()
 
-    # Procesamiento
-    df["fecha_evento"] = pd.to_datetime(df["fecha_evento"])
-    df["tipo_evento_categoria"] = df["tipo_evento"].apply(categorizar_tipo_evento)
-    df = df[df["tipo_evento_categoria"].isin(tipo_evento)]
-
-    if df.empty:
-        st.warning("No hay datos en el período seleccionado.")
-        st.stop()
-
-    df["mes"] = df["fecha_evento"].dt.to_period("M")
-    df["usuario_registro"] = df.get("usuario_registro", df.get("usuario", "desconocido"))
-    df["criticidad"] = df.get("criticidad", "").replace("", "Sin clasificar").fillna("Sin clasificar")
-    df = filtrar_ultimo_evento_por_origen(df)
-
     # KPIs Principales
     st.header("📌 Indicadores Clave")
     col1, col2, col3 = st.columns(3)
-    col1.metric("Eventos Registrados", len(df))
-    col2.metric("Activos Afectados", df["id_activo_tecnico"].nunique())
-    col3.metric("Usuarios Participantes", df["usuario_registro"].nunique())
+    col1.metric("Eventos Registrados", resumen.eventos)
+    col2.metric("Activos Afectados", resumen.activos)
+    col3.metric("Usuarios Participantes", resumen.usuarios)
 
     st.subheader("🚦 Distribución de criticidad")
-    criticidad_counts = df["criticidad"].value_counts().reindex(
-        ["Crítica", "Alta", "Media", "Baja", "Sin clasificar"], fill_value=0
-    )
-    st.bar_chart(criticidad_counts)
+    st.bar_chart(resumen.por_criticidad)
 
     # Gráfico: Eventos por tipo
     st.subheader("📈 Eventos por Tipo")
-    tipo_counts = df["tipo_evento_categoria"].value_counts().sort_index()
-    fig1, ax1 = plt.subplots()
-    tipo_counts.plot(kind="bar", ax=ax1, color="skyblue", edgecolor="black")
-    ax1.set_ylabel("Cantidad")
-    ax1.set_xlabel("Tipo de Evento")
-    ax1.set_title("Eventos registrados por tipo")
-    st.pyplot(fig1)
-
-    # Gráfico: Evolución mensual
+    grafico_barras(resumen.por_tipo, "Eventos registrados por tipo", "Tipo de Evento", nativo=nativos)
+
+    # Gráfico: Evolución mensual (eje limitado al período filtrado)
     st.subheader("📆 Evolución Mensual de Eventos")
-    mensual = df.groupby(["mes", "tipo_evento_categoria"]).size().unstack(fill_value=0)
-    mensual.index = mensual.index.to_timestamp()
-
-    fig2, ax2 = plt.subplots()
-    mensual.plot(ax=ax2, marker="o")
-    ax2.set_ylabel("Cantidad")
-    ax2.set_xlabel("Mes")
-    ax2.set_title("Evolución mensual por tipo de evento")
-    ax2.legend(title="Tipo de Evento", loc="upper left")
-
-    # Limitar a 2025 y mejorar etiquetas
-    ax2.set_xlim([pd.Timestamp("2025-01-01"), pd.Timestamp("2025-12-31")])
-    ax2.xaxis.set_major_locator(mdates.MonthLocator())
-    ax2.xaxis.set_major_formatter(mdates.DateFormatter("%b"))
-    ax2.tick_params(axis='x', rotation=0)
-    st.pyplot(fig2)
+    grafico_lineas_mensual(
+        resumen.mensual,
+        "Evolución mensual por tipo de evento",
+        "Tipo de Evento",
+        desde=pd.Timestamp(fecha_inicio).replace(day=1),
+        hasta=pd.Timestamp(fecha_fin),
+        nativo=nativos,
+    )
 
     # Gráfico: Eventos por activo técnico
     st.subheader("🔍 Eventos por Activo Técnico")
-    por_activo = df["id_activo_tecnico"].value_counts().sort_values(ascending=False)
-    fig3, ax3 = plt.subplots()
-    por_activo.plot(kind="bar", ax=ax3, color="lightgreen", edgecolor="black")
-    ax3.set_ylabel("Cantidad")
-    ax3.set_xlabel("Activo Técnico")
-    ax3.set_title("Eventos por activo técnico")
-    plt.xticks(rotation=90)
-    st.pyplot(fig3)
-
-    # Tabla detallada
+    grafico_barras(
+        resumen.por_activo, "Eventos por activo técnico", "Activo Técnico",
+        color="lightgreen", rotacion=90, nativo=nativos,
+    )
+
+    # Tabla detallada: solo los eventos más recientes del período
     st.subheader("📋 Detalle de Eventos Técnicos")
-    st.dataframe(df[[
-        "fecha_evento", "tipo_evento", "id_activo_tecnico",
-        "criticidad", "descripcion", "usuario_registro"
-    ]].sort_values("fecha_evento", ascending=False))
+    detalle = eventos_recientes(
+        fecha_inicio, fecha_fin, tipo_evento, ids_filtrados, limite=LIMITE_DETALLE, database=db
+    )
+    st.caption(f"Últimos {len(detalle)} eventos del período")
+    st.dataframe(detalle)
 
 if __name__ == "__main__":
     app()
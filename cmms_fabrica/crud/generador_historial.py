@@ -2,17 +2,213 @@
 
 Este módulo centraliza la inserción de eventos en la colección ``historial``
 garantizando trazabilidad según las directrices de ISO 9001 e ISO 55001.
+
+Cada evento suma además en ``historial_rollups`` (ver ``rollups_historial``),
+que alimenta el tablero de KPIs.
+
+Para operaciones masivas (limpiezas, importaciones, migraciones) existe un
+modo por lotes: los eventos se encolan y se insertan con
+``insert_many(ordered=False)`` por tamaño, por tiempo o al salir del proceso::
+
+    with registro_en_lote(tamano_lote=1000):
+        for item in items:
+            registrar_evento_historial(...)
+
+El buffer activo vive en un ``ContextVar``: solo encola los eventos del hilo
+(o tarea) que activó el modo por lotes, no los de otras sesiones de
+Streamlit que corren en el mismo proceso.
 """
 
 from __future__ import annotations
 
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 import logging
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+import threading
+import weakref
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from cmms_fabrica.crud.rollups_historial import registrar_en_rollups
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
+from cmms_fabrica.modulos.generador_ids import generar_id
 import streamlit as st
 
 logger = logging.getLogger(__name__)
 
+
+# Categorías estándar de ``tipo_evento``: se evalúan en orden y gana la primera
+# cuyo fragmento aparezca en el texto. ``consultas_historial`` traduce estas
+# mismas reglas a una expresión de agregación de MongoDB.
+REGLAS_CATEGORIA: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (("observ",), "observacion"),
+    (("correctiv",), "correctiva"),
+    (("preventiv",), "preventiva"),
+    (("calibr",), "calibracion"),
+    (("tecnica", "técnica"), "tecnica"),
+)
+CATEGORIA_POR_DEFECTO = "otro"
+
+# ``id_origen`` de los eventos registrados sin documento de origen
+ORIGEN_FALTANTE = "HUÉRFANO"
+ORIGENES_FALTANTES = (None, "", ORIGEN_FALTANTE)
+
+
+def categorizar_tipo_evento(tipo_evento: str) -> str:
+    """Normaliza el texto libre de ``tipo_evento`` a una categoría estándar."""
+    texto = str(tipo_evento or "").strip().lower()
+    for fragmentos, categoria in REGLAS_CATEGORIA:
+        if any(fragmento in texto for fragmento in fragmentos):
+            return categoria
+    return CATEGORIA_POR_DEFECTO
+
+
+# Eventos que se retienen por buffer, en lotes, mientras MongoDB no responde
+MAX_LOTES_PENDIENTES = 10
+
+
+class BufferHistorial:
+    """Cola de eventos de ``historial`` que se vuelca en bloque.
+
+    Si un volcado falla los eventos vuelven a la cola, hasta
+    ``max_pendientes``; por encima de ese tope se descartan los más viejos
+    (con un error en el log) para no crecer sin límite durante una caída.
+    """
+
+    def __init__(
+        self,
+        tamano_lote: int = 500,
+        intervalo_s: Optional[float] = 2.0,
+        max_pendientes: Optional[int] = None,
+    ):
+        self.tamano_lote = max(1, tamano_lote)
+        self.intervalo_s = intervalo_s
+        self.max_pendientes = max(self.tamano_lote, max_pendientes or self.tamano_lote * MAX_LOTES_PENDIENTES)
+        self.descartados = 0
+        self._pendientes: List[Dict[str, Any]] = []
+        self._coleccion = None
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        if intervalo_s:
+            self._hilo = threading.Thread(
+                target=self._bucle_temporizado, name="historial-lote", daemon=True
+            )
+            self._hilo.start()
+
+    def __len__(self) -> int:
+        return len(self._pendientes)
+
+    def agregar(self, evento: Dict[str, Any], coleccion) -> None:
+        with self._lock:
+            self._coleccion = coleccion
+            self._pendientes.append(evento)
+            lleno = len(self._pendientes) >= self.tamano_lote
+        if lleno:
+            self.flush()
+
+    def flush(self) -> int:
+        """Inserta los eventos pendientes y devuelve cuántos se escribieron."""
+        with self._lock:
+            if not self._pendientes:
+                return 0
+            lote, self._pendientes = self._pendientes, []
+            coleccion = self._coleccion
+
+        escritos = lote
+        try:
+            resultado = coleccion.insert_many(lote, ordered=False)
+            insertados = len(resultado.inserted_ids)
+        except BulkWriteError as exc:
+            detalle = exc.details or {}
+            insertados = detalle.get("nInserted", 0)
+            fallidos = {error.get("index") for error in detalle.get("writeErrors", [])}
+            escritos = [evento for i, evento in enumerate(lote) if i not in fallidos]
+            logger.warning(
+                "Lote de historial con %s errores de escritura",
+                len(fallidos),
+            )
+        except PyMongoError as exc:
+            # Los eventos ya tienen _id: reintentar no duplica los que sí se escribieron
+            logger.warning("No se pudo volcar el lote de historial: %s", exc)
+            with self._lock:
+                self._pendientes = lote + self._pendientes
+                exceso = len(self._pendientes) - self.max_pendientes
+                if exceso > 0:
+                    del self._pendientes[:exceso]
+                    self.descartados += exceso
+            if exceso > 0:
+                logger.error("Cola de historial llena: se descartaron %s eventos sin registrar", exceso)
+            return 0
+
+        registrar_en_rollups(escritos, coleccion.database)
+        logger.info("Lote de historial volcado: %s eventos", insertados)
+        return insertados
+
+    def cerrar(self) -> int:
+        self._detener.set()
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=1)
+        return self.flush()
+
+    def _bucle_temporizado(self) -> None:
+        while not self._detener.wait(self.intervalo_s):
+            self.flush()
+
+
+_buffer_actual: ContextVar[Optional[BufferHistorial]] = ContextVar("buffer_historial", default=None)
+# Todos los buffers vivos, para volcarlos al salir del proceso
+_buffers = weakref.WeakSet()
+
+
+def activar_modo_lote(tamano_lote: int = 500, intervalo_s: Optional[float] = 2.0) -> BufferHistorial:
+    """Encola los próximos eventos de este contexto en lugar de insertarlos uno a uno."""
+    anterior = _buffer_actual.get()
+    if anterior is not None:
+        anterior.cerrar()
+    buffer = BufferHistorial(tamano_lote=tamano_lote, intervalo_s=intervalo_s)
+    _buffers.add(buffer)
+    _buffer_actual.set(buffer)
+    return buffer
+
+
+def desactivar_modo_lote() -> int:
+    """Vuelca lo pendiente y vuelve a la inserción directa."""
+    buffer = _buffer_actual.get()
+    if buffer is None:
+        return 0
+    _buffer_actual.set(None)
+    return buffer.cerrar()
+
+
+def flush() -> int:
+    """Vuelca sincrónicamente los eventos encolados de este contexto (útil en tests)."""
+    buffer = _buffer_actual.get()
+    return buffer.flush() if buffer is not None else 0
+
+
+@contextmanager
+def registro_en_lote(tamano_lote: int = 500, intervalo_s: Optional[float] = 2.0) -> Iterator[BufferHistorial]:
+    """Activa el modo por lotes dentro del bloque y vuelca todo al salir."""
+    buffer = BufferHistorial(tamano_lote=tamano_lote, intervalo_s=intervalo_s)
+    _buffers.add(buffer)
+    token = _buffer_actual.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer_actual.reset(token)
+        buffer.cerrar()
+
+
+@atexit.register
+def _volcar_todo() -> None:
+    for buffer in list(_buffers):
+        buffer.flush()
+
+
 def registrar_evento_historial(
     tipo_evento: str,
     id_activo: str | None,
@@ -26,25 +222,28 @@ def registrar_evento_historial(
     """Inserta un evento consolidado en la colección ``historial``.
 
     Devuelve el identificador generado para facilitar la trazabilidad
-    de acuerdo con ISO 9001.
+    de acuerdo con ISO 9001. Con el modo por lotes activo el evento se
+    encola y se escribe en el próximo volcado.
     """
 
-    if db is None:
+    database = resolver_db(db)
+    if database is None:
         logger.warning("MongoDB no disponible. Evento no registrado.")
         try:
-            st.warning(f"MongoDB no disponible. {mongo_error or 'Evento no registrado.'}")
+            st.warning(f"MongoDB no disponible. {obtener_error_mongo() or 'Evento no registrado.'}")
         except Exception:
             pass
         return ""
 
-    historial = db["historial"]
+    historial = database["historial"]
 
     evento = {
-        "id_evento": f"HIST_{int(datetime.now().timestamp())}",
+        "id_evento": generar_id("HIST_", database),
         "id_activo_tecnico": id_activo,
         "fecha_evento": datetime.now(),
         "tipo_evento": tipo_evento,
-        "id_origen": id_origen or "HUÉRFANO",
+        "categoria_evento": categorizar_tipo_evento(tipo_evento),
+        "id_origen": id_origen or ORIGEN_FALTANTE,
         "descripcion": descripcion,
         "usuario_registro": usuario,
         "proveedor_externo": proveedor_externo,
@@ -52,7 +251,13 @@ def registrar_evento_historial(
         "criticidad": criticidad or "",
     }
 
+    buffer = _buffer_actual.get()
+    if buffer is not None:
+        buffer.agregar(evento, historial)
+        return evento["id_evento"]
+
     historial.insert_one(evento)
+    registrar_en_rollups([evento], database)
     logger.info("Evento registrado en historial: %s", evento["id_evento"])
     return evento["id_evento"]
 
@@ -0,0 +1,322 @@
+"""📦 Rollups de Historial – CMMS Fábrica
+
+Mantiene la colección ``historial_rollups`` con conteos por día y por mes
+agrupados por categoría, activo técnico, criticidad y usuario. Cada evento
+registrado suma en su bucket diario y mensual con ``$inc`` + ``upsert``, de
+modo que el tablero de KPIs lee unos cientos de filas en lugar del historial
+completo.
+
+Cada bucket guarda además los ``id_origen`` que contiene, para conservar el
+criterio de "último evento por origen" de los KPIs sin leer los eventos.
+
+Reconstrucción (backfill o tras una corrección manual del historial)::
+
+    python -m cmms_fabrica.crud.rollups_historial
+    python -m cmms_fabrica.crud.rollups_historial --desde 2025-01-01
+
+La reconstrucción convive con el registro en vivo sin contar dos veces:
+
+- solo recalcula períodos cerrados (días anteriores a hoy y meses anteriores
+  al actual, con un margen ``MARGEN_CIERRE`` tras la medianoche); los eventos
+  nuevos siempre caen en el día y el mes en curso, que se mantienen con ``$inc``;
+- los buckets se calculan en una colección auxiliar y después reemplazan a
+  los vivos uno por uno: el tablero nunca lee el rango vacío o a medias.
+
+Los eventos que la limpieza pasó al archivo frío (``archivo_frio``) se leen
+junto con los vivos, así que reconstruir no hace desaparecer de los KPIs los
+meses ya archivados.
+
+Normas:
+- ISO 55001 (Indicadores de gestión de mantenimiento)
+- ISO 9001:2015 (Seguimiento y medición de procesos)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import uuid
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+from cmms_fabrica.modulos import archivo_frio
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION_ROLLUPS = "historial_rollups"
+COLECCION_RECONSTRUCCION = "historial_rollups_reconstruccion"
+# Tras la medianoche, lapso en que el día anterior todavía se considera abierto
+# (lotes de historial que se vuelcan con unos segundos de demora)
+MARGEN_CIERRE = timedelta(minutes=15)
+CAMPOS_BUCKET = ("periodo", "fecha", "categoria", "id_activo_tecnico", "criticidad", "usuario_registro")
+PERIODOS = ("dia", "mes")
+SIN_CLASIFICAR = "Sin clasificar"
+
+CAMPOS_HISTORIAL = {
+    "_id": 0,
+    "fecha_evento": 1,
+    "tipo_evento": 1,
+    "categoria_evento": 1,
+    "id_activo_tecnico": 1,
+    "id_origen": 1,
+    "criticidad": 1,
+    "usuario_registro": 1,
+    "usuario": 1,
+}
+
+ClaveBucket = Tuple[str, datetime, str, Optional[str], str, str]
+
+
+def inicio_periodo(fecha: datetime, periodo: str) -> datetime:
+    """Trunca ``fecha`` al inicio del día o del mes."""
+    if periodo == "mes":
+        return datetime(fecha.year, fecha.month, 1)
+    return datetime(fecha.year, fecha.month, fecha.day)
+
+
+def _clave_evento(evento: Dict[str, Any], periodo: str) -> Optional[ClaveBucket]:
+    # Import diferido: generador_historial importa este módulo al registrar
+    from cmms_fabrica.crud.generador_historial import categorizar_tipo_evento
+
+    fecha = evento.get("fecha_evento")
+    if not isinstance(fecha, datetime):
+        return None
+    return (
+        periodo,
+        inicio_periodo(fecha, periodo),
+        evento.get("categoria_evento") or categorizar_tipo_evento(evento.get("tipo_evento")),
+        evento.get("id_activo_tecnico"),
+        evento.get("criticidad") or SIN_CLASIFICAR,
+        evento.get("usuario_registro") or evento.get("usuario") or "desconocido",
+    )
+
+
+def _agrupar(eventos: Iterable[Dict[str, Any]], acumulado: Optional[Dict] = None) -> Dict[ClaveBucket, Dict[str, Any]]:
+    acumulado = acumulado if acumulado is not None else {}
+    for evento in eventos:
+        for periodo in PERIODOS:
+            clave = _clave_evento(evento, periodo)
+            if clave is None:
+                continue
+            bucket = acumulado.setdefault(clave, {"cantidad": 0, "origenes": set(), "ultima_fecha": None})
+            bucket["cantidad"] += 1
+            bucket["origenes"].add(str(evento.get("id_origen") or ""))
+            fecha = evento["fecha_evento"]
+            if bucket["ultima_fecha"] is None or fecha > bucket["ultima_fecha"]:
+                bucket["ultima_fecha"] = fecha
+    return acumulado
+
+
+def _operaciones(acumulado: Dict[ClaveBucket, Dict[str, Any]]) -> List[UpdateOne]:
+    operaciones = []
+    for (periodo, fecha, categoria, activo, criticidad, usuario), bucket in acumulado.items():
+        operaciones.append(UpdateOne(
+            {
+                "periodo": periodo,
+                "fecha": fecha,
+                "categoria": categoria,
+                "id_activo_tecnico": activo,
+                "criticidad": criticidad,
+                "usuario_registro": usuario,
+            },
+            {
+                "$inc": {"cantidad": bucket["cantidad"]},
+                "$addToSet": {"origenes": {"$each": sorted(bucket["origenes"])}},
+                "$max": {"ultima_fecha": bucket["ultima_fecha"]},
+            },
+            upsert=True,
+        ))
+    return operaciones
+
+
+def acumular_eventos(eventos: Iterable[Dict[str, Any]], database=None) -> int:
+    """Suma ``eventos`` en sus buckets diario y mensual.
+
+    Un lote de eventos se agrega en memoria antes de escribir, así que cada
+    bucket recibe una sola operación. Devuelve la cantidad de buckets tocados.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+    operaciones = _operaciones(_agrupar(eventos))
+    if operaciones:
+        database[COLECCION_ROLLUPS].bulk_write(operaciones, ordered=False)
+    return len(operaciones)
+
+
+def registrar_en_rollups(eventos: Iterable[Dict[str, Any]], database=None) -> None:
+    """Como :func:`acumular_eventos`, pero un fallo nunca corta el registro del evento."""
+    try:
+        acumular_eventos(eventos, database)
+    except Exception as exc:
+        # El historial es la fuente de verdad: el rollup se recupera con reconstruir_rollups
+        logger.warning("No se pudo actualizar %s: %s", COLECCION_ROLLUPS, exc)
+
+
+def periodos_cerrados(ahora: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Inicio del primer día y del primer mes que todavía reciben eventos en vivo."""
+    corte = inicio_periodo((ahora or datetime.now()) - MARGEN_CIERRE, "dia")
+    return corte, inicio_periodo(corte, "mes")
+
+
+def _eventos_a_reconstruir(database, filtro_fecha: Dict[str, datetime], tamano_lote: int) -> Iterable[Dict[str, Any]]:
+    """Eventos vivos del rango y, a continuación, los archivados que ya no están en ``historial``."""
+    historial = database["historial"]
+    query = {"fecha_evento": filtro_fecha} if filtro_fecha else {}
+    yield from historial.find(query, CAMPOS_HISTORIAL).batch_size(tamano_lote)
+
+    hasta = filtro_fecha["$lt"] - timedelta(microseconds=1)
+    lote: List[Dict[str, Any]] = []
+
+    def sin_copia_viva(lote):
+        # Un lote archivado y no borrado (limpieza interrumpida) sigue vivo: ya se contó arriba
+        vivos = {d["_id"] for d in historial.find({"_id": {"$in": [e.get("_id") for e in lote]}}, {"_id": 1})}
+        return [e for e in lote if e.get("_id") not in vivos]
+
+    for evento in archivo_frio.leer("historial", filtro_fecha.get("$gte"), hasta):
+        lote.append(evento)
+        if len(lote) >= tamano_lote:
+            yield from sin_copia_viva(lote)
+            lote = []
+    if lote:
+        yield from sin_copia_viva(lote)
+
+
+def _volcar_en_reemplazo(database, auxiliar, filtro_fecha, corte_mes: datetime, tamano_lote: int) -> None:
+    """Reemplaza los buckets vivos del rango por los de ``auxiliar`` y borra los que sobran."""
+    rollups = database[COLECCION_ROLLUPS]
+    token = uuid.uuid4().hex
+    operaciones: List[ReplaceOne] = []
+    for bucket in auxiliar.find({"$or": [{"periodo": "dia"}, {"fecha": {"$lt": corte_mes}}]}, {"_id": 0}):
+        clave = {campo: bucket.get(campo) for campo in CAMPOS_BUCKET}
+        operaciones.append(ReplaceOne(clave, {**bucket, "reconstruccion": token}, upsert=True))
+        if len(operaciones) >= tamano_lote:
+            rollups.bulk_write(operaciones, ordered=False)
+            operaciones = []
+    if operaciones:
+        rollups.bulk_write(operaciones, ordered=False)
+    # Buckets del rango que ya no tienen eventos (correcciones manuales del historial)
+    rollups.delete_many({
+        "$or": [
+            {"periodo": "dia", "fecha": filtro_fecha},
+            {"periodo": "mes", "fecha": {**filtro_fecha, "$lt": min(filtro_fecha["$lt"], corte_mes)}},
+        ],
+        "reconstruccion": {"$ne": token},
+    })
+
+
+def reconstruir_rollups(
+    database=None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    tamano_lote: int = 5000,
+    ahora: Optional[datetime] = None,
+) -> int:
+    """Recalcula los rollups de los períodos cerrados leyendo ``historial`` en streaming.
+
+    El rango se amplía a meses completos para que los buckets mensuales queden
+    coherentes y se recorta en el día en curso (ver :func:`periodos_cerrados`).
+    Devuelve la cantidad de eventos procesados.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+
+    corte_dia, corte_mes = periodos_cerrados(ahora)
+    filtro_fecha: Dict[str, datetime] = {"$lt": corte_dia}
+    if desde:
+        filtro_fecha["$gte"] = datetime(desde.year, desde.month, 1)
+    if hasta:
+        ultimo_dia = monthrange(hasta.year, hasta.month)[1]
+        filtro_fecha["$lt"] = min(corte_dia, datetime(hasta.year, hasta.month, ultimo_dia) + timedelta(days=1))
+
+    auxiliar = database[f"{COLECCION_RECONSTRUCCION}_{uuid.uuid4().hex[:12]}"]
+    procesados = 0
+    try:
+        acumulado: Dict[ClaveBucket, Dict[str, Any]] = {}
+        pendientes = 0
+        for evento in _eventos_a_reconstruir(database, filtro_fecha, tamano_lote):
+            _agrupar([evento], acumulado)
+            procesados += 1
+            pendientes += 1
+            if pendientes >= tamano_lote:
+                auxiliar.bulk_write(_operaciones(acumulado), ordered=False)
+                acumulado, pendientes = {}, 0
+        if acumulado:
+            auxiliar.bulk_write(_operaciones(acumulado), ordered=False)
+        _volcar_en_reemplazo(database, auxiliar, filtro_fecha, corte_mes, tamano_lote)
+    finally:
+        auxiliar.drop()
+
+    logger.info("Rollups reconstruidos a partir de %s eventos", procesados)
+    return procesados
+
+
+def filtro_rango(desde: date, hasta: date) -> Dict[str, Any]:
+    """Filtro que cubre ``[desde, hasta]`` con meses completos y días sueltos en los bordes."""
+    primer_mes = date(desde.year, desde.month, 1)
+    if desde.day != 1:
+        primer_mes = (primer_mes + timedelta(days=32)).replace(day=1)
+    fin_hasta = date(hasta.year, hasta.month, monthrange(hasta.year, hasta.month)[1])
+    ultimo_mes = date(hasta.year, hasta.month, 1) if hasta == fin_hasta else (
+        date(hasta.year, hasta.month, 1) - timedelta(days=1)
+    ).replace(day=1)
+
+    def _dt(d: date) -> datetime:
+        return datetime(d.year, d.month, d.day)
+
+    if primer_mes > ultimo_mes:
+        return {"periodo": "dia", "fecha": {"$gte": _dt(desde), "$lte": _dt(hasta)}}
+
+    tramos: List[Dict[str, Any]] = [
+        {"periodo": "mes", "fecha": {"$gte": _dt(primer_mes), "$lte": _dt(ultimo_mes)}}
+    ]
+    if desde < primer_mes:
+        tramos.append({"periodo": "dia", "fecha": {"$gte": _dt(desde), "$lt": _dt(primer_mes)}})
+    fin_ultimo_mes = (ultimo_mes + timedelta(days=32)).replace(day=1)
+    if hasta >= fin_ultimo_mes:
+        tramos.append({"periodo": "dia", "fecha": {"$gte": _dt(fin_ultimo_mes), "$lte": _dt(hasta)}})
+    return tramos[0] if len(tramos) == 1 else {"$or": tramos}
+
+
+def consultar_rollups(
+    desde: date,
+    hasta: date,
+    categorias: Optional[List[str]] = None,
+    ids_activos: Optional[List[str]] = None,
+    database=None,
+) -> List[Dict[str, Any]]:
+    """Devuelve los buckets que cubren el rango, sin el ``_id`` de Mongo."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    query = filtro_rango(desde, hasta)
+    if categorias is not None:
+        query = {"$and": [query, {"categoria": {"$in": list(categorias)}}]}
+    if ids_activos:
+        query = {"$and": [query, {"id_activo_tecnico": {"$in": list(ids_activos)}}]}
+    return list(database[COLECCION_ROLLUPS].find(query, {"_id": 0}))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reconstrucción de historial_rollups")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument("--lote", type=int, default=5000, help="Eventos por escritura")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+
+    procesados = reconstruir_rollups(database, args.desde, args.hasta, args.lote)
+    print("eventos_procesados:", procesados)
+
+
+if __name__ == "__main__":
+    main()
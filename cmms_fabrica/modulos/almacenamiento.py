@@ -1,7 +1,11 @@
 """📦 Herramientas de Mantenimiento de Almacenamiento – CMMS Fábrica
 
 Controla el tamaño total de MongoDB y permite limpieza de colecciones rotables,
-respetando antigüedad, umbrales y el rol central de `historial`.
+respetando antigüedad, umbrales y el rol central de `historial`. El borrado
+se hace en lotes con pausas y es reanudable (ver `borrado_por_lotes`); cada
+lote se guarda antes en el archivo frío comprimido (ver `archivo_frio`), de
+modo que los registros se conservan fuera de la base. Sin `CMMS_ARCHIVO_DIR`
+(almacenamiento persistente y compartido por los workers) no se borra nada.
 
 Normas:
 - ISO 9001:2015 (Control de registros)
@@ -9,11 +13,18 @@ Normas:
 """
 
 from __future__ import annotations
+import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+from cmms_fabrica.modulos.archivo_frio import ArchivoFrio, archivo_configurado
+from cmms_fabrica.modulos.borrado_por_lotes import borrar_por_lotes
 from cmms_fabrica.modulos.conexion_mongo import db
+from cmms_fabrica.modulos.monitor_almacenamiento import MB, estadisticas_coleccion
+from cmms_fabrica.modulos.planificador import COLECCION_DERIVADOS, guardar_derivado, leer_derivado
+
+logger = logging.getLogger(__name__)
 
 # 📏 Límite total estimado permitido antes de ejecutar limpieza (ajustable)
 LIMITE_MB: int = 400
@@ -36,12 +47,23 @@ COLECCIONES_CRITICAS = {"historial"}
 # ⏱️ Antigüedad máxima para colecciones críticas (p. ej. 365 días)
 MAX_DIAS_HISTORIAL = 365
 
+# 🧾 Uso medido antes de la última limpieza automática (en ``valores_derivados``)
+CLAVE_ULTIMA_LIMPIEZA = "ultima_limpieza_almacenamiento"
+
 
 def obtener_tamano_total_mb() -> float:
-    """Devuelve el tamaño total estimado de la base de datos en MB."""
-    stats = db.command("dbstats")
-    total_bytes = stats.get("storageSize", 0)
-    return total_bytes / (1024 * 1024)
+    """Devuelve el espacio ocupado por los datos de la base en MB.
+
+    WiredTiger no libera el ``storageSize`` de los documentos borrados, así
+    que se descuenta el espacio libre reutilizable (``freeStorageSize``); si
+    el servidor no lo informa, se usa ``dataSize``.
+    """
+    stats = db.command("dbstats", freeStorage=1)
+    if "freeStorageSize" in stats:
+        total_bytes = stats.get("storageSize", 0) - stats.get("freeStorageSize", 0)
+    else:
+        total_bytes = stats.get("dataSize", 0)
+    return total_bytes / MB
 
 
 def listar_colecciones_ordenadas() -> List[Tuple[str, int, str, bool]]:
@@ -59,40 +81,52 @@ def listar_colecciones_ordenadas() -> List[Tuple[str, int, str, bool]]:
     return sorted(datos, key=lambda x: x[1], reverse=True)
 
 
+def _registrar_limpieza(id_origen: str, descripcion: str) -> None:
+    registrar_evento_historial(
+        tipo_evento="limpieza",
+        id_activo=None,
+        id_origen=id_origen,
+        descripcion=descripcion,
+        usuario="sistema",
+    )
+
+
+def _archivo_disponible(nombre: str) -> bool:
+    """El archivo frío es la única copia de lo que se borra: sin él no se limpia."""
+    if archivo_configurado():
+        return True
+    logger.warning("Limpieza de %s omitida: CMMS_ARCHIVO_DIR no está configurado", nombre)
+    return False
+
+
 def _limpiar_por_antiguedad(
     nombre: str,
     campo_fecha: str,
     dias: int,
     minimo: int = 200,
+    al_avanzar: Optional[Callable[[int, Optional[int]], None]] = None,
 ) -> int:
     """
-    Limpia documentos más viejos que N días.
+    Limpia documentos más viejos que N días, en lotes por el rango de fechas.
     Útil para `historial`.
     """
+    if not _archivo_disponible(nombre):
+        return 0
     coleccion = db[nombre]
-    total = coleccion.count_documents({})
-    if total < minimo:
+    # Conteo acotado: solo importa saber si hay al menos ``minimo``
+    if coleccion.count_documents({}, limit=minimo) < minimo:
         return 0
 
     fecha_limite = datetime.utcnow() - timedelta(days=dias)
-
-    # Solo borro los que tienen fecha y son viejos
-    to_delete = {"$and": [{campo_fecha: {"$lt": fecha_limite}}]}
-    res = coleccion.delete_many(to_delete)
-    eliminados = res.deleted_count or 0
-
-    if eliminados:
-        registrar_evento_historial(
-            tipo_evento="limpieza",
-            id_activo=None,
-            id_origen=nombre,
-            descripcion=(
-                f"Se eliminaron {eliminados} documentos de `{nombre}` "
-                f"anteriores a {dias} días."
-            ),
-            usuario="sistema",
-        )
-    return eliminados
+    resultado = borrar_por_lotes(
+        nombre,
+        campo_fecha,
+        fecha_limite=fecha_limite,
+        al_avanzar=al_avanzar,
+        antes_de_borrar=ArchivoFrio(nombre, campo_fecha).guardar,
+        database=db,
+    )
+    return resultado.eliminados
 
 
 def _limpiar_por_porcentaje(
@@ -100,12 +134,16 @@ def _limpiar_por_porcentaje(
     campo_fecha: str,
     porcentaje: float = 0.3,
     minimo: int = 100,
+    al_avanzar: Optional[Callable[[int, Optional[int]], None]] = None,
 ) -> int:
     """
-    Limpia una porción de la colección, empezando por los más viejos.
+    Limpia una porción de la colección, empezando por los más viejos, en lotes.
     """
+    if not _archivo_disponible(nombre):
+        return 0
     coleccion = db[nombre]
-    total = coleccion.count_documents({})
+    # Conteo de metadatos: el porcentaje no necesita exactitud
+    total = coleccion.estimated_document_count()
     if total < minimo:
         return 0
 
@@ -113,29 +151,15 @@ def _limpiar_por_porcentaje(
     if cantidad_a_eliminar <= 0:
         return 0
 
-    # Traigo los más viejos primero
-    documentos = (
-        coleccion.find({}, {"_id": 1, campo_fecha: 1})
-        .sort(campo_fecha, 1)
-        .limit(cantidad_a_eliminar)
-    )
-    ids_a_borrar = [doc["_id"] for doc in documentos if campo_fecha in doc]
-
-    if not ids_a_borrar:
-        return 0
-
-    coleccion.delete_many({"_id": {"$in": ids_a_borrar}})
-
-    registrar_evento_historial(
-        tipo_evento="limpieza",
-        id_activo=None,
-        id_origen=nombre,
-        descripcion=(
-            f"Se eliminaron {len(ids_a_borrar)} documentos antiguos de `{nombre}`."
-        ),
-        usuario="sistema",
+    resultado = borrar_por_lotes(
+        nombre,
+        campo_fecha,
+        max_documentos=cantidad_a_eliminar,
+        al_avanzar=al_avanzar,
+        antes_de_borrar=ArchivoFrio(nombre, campo_fecha).guardar,
+        database=db,
     )
-    return len(ids_a_borrar)
+    return resultado.eliminados
 
 
 def limpiar_coleccion(
@@ -143,48 +167,98 @@ def limpiar_coleccion(
     campo_fecha: str,
     porcentaje: float = 0.3,
     minimo: int = 100,
+    registrar: bool = True,
+    al_avanzar: Optional[Callable[[int, Optional[int]], None]] = None,
 ) -> int:
     """
     Decide la estrategia de limpieza según si la colección es crítica o no.
+
+    Con ``registrar`` deja un evento resumen en `historial`; quien limpia
+    varias colecciones en una misma ejecución lo desactiva y registra uno solo.
     """
     if nombre in COLECCIONES_CRITICAS:
         # limpieza segura por antigüedad
-        return _limpiar_por_antiguedad(
+        eliminados = _limpiar_por_antiguedad(
             nombre,
             campo_fecha,
             dias=MAX_DIAS_HISTORIAL,
             minimo=minimo,
+            al_avanzar=al_avanzar,
         )
-    # resto de las colecciones, por porcentaje
-    return _limpiar_por_porcentaje(
-        nombre,
-        campo_fecha,
-        porcentaje=porcentaje,
-        minimo=minimo,
-    )
+        detalle = f"anteriores a {MAX_DIAS_HISTORIAL} días"
+    else:
+        # resto de las colecciones, por porcentaje
+        eliminados = _limpiar_por_porcentaje(
+            nombre,
+            campo_fecha,
+            porcentaje=porcentaje,
+            minimo=minimo,
+            al_avanzar=al_avanzar,
+        )
+        detalle = "antiguos"
+
+    if eliminados and registrar:
+        _registrar_limpieza(nombre, f"Se archivaron y eliminaron {eliminados} documentos {detalle} de `{nombre}`.")
+    return eliminados
 
 
-def ejecutar_limpieza_si_es_necesario() -> bool:
+def ejecutar_limpieza_si_es_necesario(
+    al_avanzar: Optional[Callable[[str, int, Optional[int]], None]] = None,
+) -> bool:
     """
     Ejecuta limpieza automática si se supera el límite de almacenamiento total.
-    Recorre las colecciones en orden de carga.
+    Recorre las colecciones en orden de carga y registra un único evento
+    resumen en `historial`.
+
+    ``dbstats`` se consulta una sola vez: después de cada colección el uso se
+    reevalúa restando lo liberado (documentos eliminados × ``avgObjSize``).
+
+    Si la ejecución anterior ya limpió y el uso medido no bajó desde entonces,
+    no vuelve a borrar: otra pasada solo recortaría más registros sin liberar
+    espacio.
     """
     uso_actual = obtener_tamano_total_mb()
     if uso_actual < LIMITE_MB:
+        db[COLECCION_DERIVADOS].delete_one({"_id": CLAVE_ULTIMA_LIMPIEZA})
+        return False
+    if not _archivo_disponible("almacenamiento"):
+        return False
+    anterior = leer_derivado(db, CLAVE_ULTIMA_LIMPIEZA)
+    if anterior and uso_actual >= anterior[0]["uso_mb"]:
+        logger.warning(
+            "Limpieza omitida: el uso (%.1f MB) no bajó desde la limpieza del %s (%.1f MB)",
+            uso_actual, anterior[1], anterior[0]["uso_mb"],
+        )
         return False
 
-    total_eliminados = 0
+    uso_estimado = uso_actual
+    por_coleccion: Dict[str, int] = {}
     for nombre, _, campo_fecha, _ in listar_colecciones_ordenadas():
-        eliminados = limpiar_coleccion(nombre, campo_fecha)
-        total_eliminados += eliminados
+        tamano_medio = estadisticas_coleccion(db, nombre)["tamano_medio"]
+        avance = (lambda n, o, nombre=nombre: al_avanzar(nombre, n, o)) if al_avanzar else None
+        eliminados = limpiar_coleccion(nombre, campo_fecha, registrar=False, al_avanzar=avance)
+        if eliminados:
+            por_coleccion[nombre] = eliminados
         # reevalúo después de cada limpieza
-        if obtener_tamano_total_mb() < LIMITE_MB:
+        uso_estimado -= eliminados * tamano_medio / MB
+        if uso_estimado < LIMITE_MB:
             break
 
+    total_eliminados = sum(por_coleccion.values())
+    if total_eliminados:
+        detalle = ", ".join(f"{n}: {c}" for n, c in por_coleccion.items())
+        _registrar_limpieza(
+            "almacenamiento",
+            f"Limpieza automática ({uso_actual:.1f} MB ≥ {LIMITE_MB} MB): "
+            f"se archivaron y eliminaron {total_eliminados} documentos ({detalle}).",
+        )
+        guardar_derivado(db, CLAVE_ULTIMA_LIMPIEZA, {"uso_mb": uso_actual, "eliminados": total_eliminados})
     return total_eliminados > 0
 
 
-def limpiar_coleccion_mas_cargada() -> Optional[Tuple[str, int]]:
+def limpiar_coleccion_mas_cargada(
+    al_avanzar: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> Optional[Tuple[str, int]]:
     """
     Limpia automáticamente la colección rotable con más documentos.
     Devuelve (nombre, cantidad_eliminada) o None.
@@ -194,5 +268,5 @@ def limpiar_coleccion_mas_cargada() -> Optional[Tuple[str, int]]:
         return None
 
     nombre, _, campo_fecha, _ = lista[0]
-    eliminados = limpiar_coleccion(nombre, campo_fecha)
+    eliminados = limpiar_coleccion(nombre, campo_fecha, al_avanzar=al_avanzar)
     return (nombre, eliminados) if eliminados > 0 else None
@@ -4,7 +4,7 @@ import json
 from datetime import datetime
 from openai import OpenAI
 from cmms_fabrica.modulos.estilos import aplicar_estilos
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
 from cmms_fabrica.modulos.conexion_openai import obtener_api_key_openai
 
 # Configuración general
@@ -48,8 +48,8 @@ def serializar_bd_mongo(limit_por_col=10):
     return json.dumps(contexto, default=convertir)
 
 def app():
-    if db is None:
-        st.error(f"No hay conexión con MongoDB. {mongo_error}")
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
         st.stop()
 
     obtener_api_key_openai()
@@ -4,7 +4,7 @@ Visualización de grafo CMMS con Streamlit, NetworkX y Pyvis.
 """
 
 from __future__ import annotations
-from typing import Dict, Optional, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 import importlib
 import streamlit as st
 import streamlit.components.v1 as components
@@ -23,7 +23,8 @@ if TYPE_CHECKING or PYVIS_SPEC:
 else:  # pragma: no cover - fallback path cuando Pyvis no está disponible
     Network = None  # type: ignore[assignment]
 
-from cmms_fabrica.modulos.conexion_mongo import get_db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import get_db, obtener_error_mongo
+from cmms_fabrica.modulos.layout_grafo import a_pixeles, calcular_posiciones
 
 # Colores corporativos consistentes para cada tipo de nodo
 COLOR_ACTIVO = "#1976d2"
@@ -31,40 +32,155 @@ COLOR_HISTORIAL = "#b0bec5"
 COLOR_ORIGEN = "#ff9800"
 COLOR_PROVEEDOR = "#e53935"
 
+# Campos de historial que usa el grafo: el resto del documento no viaja
+CAMPOS_HISTORIAL_GRAFO = {
+    "_id": 1,
+    "id_activo_tecnico": 1,
+    "descripcion": 1,
+    "fecha_evento": 1,
+    "tipo_evento": 1,
+    "id_origen": 1,
+    "proveedor_externo": 1,
+}
+CAMPOS_ACTIVO_GRAFO = {"_id": 0, "id_activo_tecnico": 1, "nombre": 1}
+LIMITE_EVENTOS = 400
+
+
+def _agregar_activos(grafo: "nx.DiGraph", activos) -> None:
+    for activo in activos:
+        activo_id = activo.get("id_activo_tecnico")
+        if not activo_id:
+            continue
+        grafo.add_node(
+            activo_id,
+            label=activo.get("nombre", activo_id),
+            title=f"Activo: {activo.get('nombre', activo_id)}",
+            tipo="activo",
+            color=COLOR_ACTIVO,
+        )
+
+
+def _agregar_proveedor(grafo: "nx.DiGraph", proveedor: str) -> str:
+    nodo_proveedor = f"proveedor::{proveedor}"
+    grafo.add_node(
+        nodo_proveedor,
+        label=proveedor,
+        title=f"Proveedor externo: {proveedor}",
+        tipo="proveedor",
+        color=COLOR_PROVEEDOR,
+    )
+    return nodo_proveedor
+
+
+def _grafo_agregado(
+    grafo: "nx.DiGraph",
+    db,
+    historial_filter: Dict[str, Any],
+    limite: Optional[int],
+    incluir_origenes: bool,
+) -> None:
+    """Aristas activo→origen y activo→proveedor con peso = cantidad de eventos.
+
+    El tamaño del grafo depende de la cantidad de entidades, no de eventos.
+    ``limite`` conserva las aristas de mayor peso.
+    """
+    claves = {"activo": "$id_activo_tecnico", "proveedor": "$proveedor_externo"}
+    if incluir_origenes:
+        claves["origen"] = "$id_origen"
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {**historial_filter, "id_activo_tecnico": historial_filter.get("id_activo_tecnico", {"$ne": None})}},
+        {"$group": {
+            "_id": claves,
+            "cantidad": {"$sum": 1},
+            "tipos": {"$addToSet": "$tipo_evento"},
+            "ultima_fecha": {"$max": "$fecha_evento"},
+        }},
+        {"$sort": {"cantidad": -1}},
+    ]
+    if limite:
+        pipeline.append({"$limit": int(limite)})
+
+    pesos: Dict[tuple, Dict[str, Any]] = {}
+    for grupo in db["historial"].aggregate(pipeline, allowDiskUse=True):
+        activo_id = grupo["_id"].get("activo")
+        if activo_id not in grafo:
+            continue
+        destinos = []
+        if grupo["_id"].get("origen"):
+            destinos.append(("origen", grupo["_id"]["origen"]))
+        if grupo["_id"].get("proveedor"):
+            destinos.append(("proveedor", grupo["_id"]["proveedor"]))
+        for tipo, valor in destinos:
+            arista = pesos.setdefault((activo_id, tipo, valor), {"cantidad": 0, "tipos": set(), "ultima_fecha": None})
+            arista["cantidad"] += grupo["cantidad"]
+            arista["tipos"].update(t for t in grupo.get("tipos") or [] if t)
+            fecha = grupo.get("ultima_fecha")
+            if fecha is not None and (arista["ultima_fecha"] is None or fecha > arista["ultima_fecha"]):
+                arista["ultima_fecha"] = fecha
+
+    for (activo_id, tipo, valor), arista in pesos.items():
+        if tipo == "origen":
+            nodo = f"origen::{valor}"
+            grafo.add_node(
+                nodo,
+                label=valor,
+                title=f"Origen ({', '.join(sorted(arista['tipos'])) or 'sin tipo'}): {valor}",
+                tipo="origen",
+                color=COLOR_ORIGEN,
+            )
+        else:
+            nodo = _agregar_proveedor(grafo, valor)
+        fecha = arista["ultima_fecha"]
+        fecha_txt = fecha.isoformat() if hasattr(fecha, "isoformat") else str(fecha or "-")
+        grafo.add_edge(
+            activo_id,
+            nodo,
+            weight=arista["cantidad"],
+            value=arista["cantidad"],
+            title=f"{arista['cantidad']} evento(s), último {fecha_txt}",
+        )
+
+
 # Función para construir el grafo
-def construir_grafo(db, filtros: Optional[Dict[str, str]] = None) -> "nx.DiGraph":
+def construir_grafo(
+    db,
+    filtros: Optional[Dict[str, str]] = None,
+    limite: Optional[int] = None,
+    incluir_origenes: bool = True,
+    agregado: bool = False,
+) -> "nx.DiGraph":
+    """Construye un grafo dirigido representando las relaciones del CMMS.
+
+    - ``limite``: máximo de eventos (los más recientes) o, en modo agregado,
+      de grupos activo/origen/proveedor (los de más eventos).
+    - ``incluir_origenes``: agrega los documentos de origen (``id_origen``).
+    - ``agregado``: en lugar de un nodo por evento, aristas con peso.
+    """
     if nx is None:
         raise RuntimeError(
             "NetworkX no está instalado. Instale el paquete `networkx` para construir el grafo."
         )
-    """Construye un grafo dirigido representando las relaciones del CMMS."""
     filtros = filtros or {}
     grafo = nx.DiGraph()
 
-    activos_filter: Dict[str, str] = {}
-    historial_filter: Dict[str, str] = {}
+    activos_filter: Dict[str, Any] = {}
+    historial_filter: Dict[str, Any] = {}
 
     if "id_activo_tecnico" in filtros and filtros["id_activo_tecnico"]:
         activos_filter["id_activo_tecnico"] = filtros["id_activo_tecnico"]
         historial_filter["id_activo_tecnico"] = filtros["id_activo_tecnico"]
 
     # Obtener los activos
-    activos = list(db["activos_tecnicos"].find(activos_filter))
-    # Obtener el historial
-    historial = list(db["historial"].find(historial_filter))
+    _agregar_activos(grafo, db["activos_tecnicos"].find(activos_filter, CAMPOS_ACTIVO_GRAFO))
 
-    # Añadir activos al grafo
-    for activo in activos:
-        activo_id = activo.get("id_activo_tecnico")
-        if not activo_id:
-            continue
-        grafo.add_node(
-            activo_id,
-            label=activo.get("nombre", activo_id),
-            title=f"Activo: {activo.get('nombre', activo_id)}",
-            tipo="activo",
-            color=COLOR_ACTIVO,
-        )
+    if agregado:
+        _grafo_agregado(grafo, db, historial_filter, limite, incluir_origenes)
+        return grafo
+
+    # Obtener el historial: los eventos más recientes, solo con los campos usados
+    historial = db["historial"].find(historial_filter, CAMPOS_HISTORIAL_GRAFO).sort("fecha_evento", -1)
+    if limite:
+        historial = historial.limit(int(limite))
 
     # Añadir historial y relaciones
     for evento in historial:
@@ -90,7 +206,7 @@ def construir_grafo(db, filtros: Optional[Dict[str, str]] = None) -> "nx.DiGraph
 
         tipo_evento = evento.get("tipo_evento")
         id_origen = evento.get("id_origen")
-        if tipo_evento and id_origen:
+        if incluir_origenes and tipo_evento and id_origen:
             nodo_origen = f"{tipo_evento}::{id_origen}"
             grafo.add_node(
                 nodo_origen,
@@ -103,37 +219,39 @@ def construir_grafo(db, filtros: Optional[Dict[str, str]] = None) -> "nx.DiGraph
 
         proveedor = evento.get("proveedor_externo")
         if proveedor:
-            nodo_proveedor = f"proveedor::{proveedor}"
-            grafo.add_node(
-                nodo_proveedor,
-                label=proveedor,
-                title=f"Proveedor externo: {proveedor}",
-                tipo="proveedor",
-                color=COLOR_PROVEEDOR,
-            )
-            grafo.add_edge(nodo_historial, nodo_proveedor)
+            grafo.add_edge(nodo_historial, _agregar_proveedor(grafo, proveedor))
 
     return grafo
 
 # Función para mostrar el grafo en Streamlit
-def mostrar_grafo(grafo: "nx.DiGraph") -> None:
+def generar_html_grafo(grafo: "nx.DiGraph", altura: str = "700px") -> str:
+    """HTML de Pyvis con posiciones calculadas en el servidor y sin física.
+
+    Las posiciones salen de la caché de ``layout_grafo`` cuando el contenido
+    del grafo no cambió; el navegador solo dibuja.
+    """
     if Network is None:
         raise RuntimeError(
             "Pyvis no está instalado. Instale el paquete `pyvis` para visualizar el grafo."
         )
-    """Renderiza el grafo utilizando Pyvis y lo incrusta en Streamlit."""
-    net = Network(height="700px", width="100%", directed=True, notebook=False)
-    net.toggle_physics(True)
+    posiciones = a_pixeles(calcular_posiciones(grafo))
+    net = Network(height=altura, width="100%", directed=True, notebook=False)
+    net.toggle_physics(False)
 
     for node_id, atributos in grafo.nodes(data=True):
-        net.add_node(node_id, **atributos)
+        x, y = posiciones[str(node_id)]
+        net.add_node(node_id, x=x, y=y, physics=False, **atributos)
 
     for origen, destino, atributos in grafo.edges(data=True):
         net.add_edge(origen, destino, **atributos)
 
     # Render en memoria, no escribimos a disco
-    html = net.generate_html()
-    components.html(html, height=750, scrolling=True)
+    return net.generate_html()
+
+
+def mostrar_grafo(grafo: "nx.DiGraph") -> None:
+    """Renderiza el grafo utilizando Pyvis y lo incrusta en Streamlit."""
+    components.html(generar_html_grafo(grafo), height=750, scrolling=True)
 
 # Función principal del módulo Streamlit
 def app() -> None:
@@ -142,9 +260,22 @@ def app() -> None:
     db = get_db()
 
     if db is None:
-        st.error(f"No se pudo conectar a la base de datos. {mongo_error}")
+        st.error(f"No se pudo conectar a la base de datos. {obtener_error_mongo()}")
         st.stop()
 
+    modo = st.radio(
+        "Modo",
+        ["Eventos recientes", "Agregado por entidad", "Exploración jerárquica"],
+        horizontal=True,
+        help=(
+            "El modo agregado une los eventos en aristas activo→origen/proveedor con peso; "
+            "la exploración parte de los sistemas y abre cada nodo bajo demanda"
+        ),
+    )
+    if modo == "Exploración jerárquica":
+        explorar(db)
+        return
+
     activos_cursor = db["activos_tecnicos"].find({}, {"_id": 0, "id_activo_tecnico": 1})
     activos_disponibles = sorted({
         doc.get("id_activo_tecnico")
@@ -154,13 +285,49 @@ def app() -> None:
     opciones = ["(todos)"] + activos_disponibles
 
     seleccionado = st.selectbox("Activo técnico", opciones)
-    limite = st.slider("Cantidad máxima de eventos", 50, 1000, 400, 50)
+    agregado = modo == "Agregado por entidad"
+    etiqueta_limite = "Cantidad máxima de relaciones" if agregado else "Cantidad máxima de eventos"
+    limite = st.slider(etiqueta_limite, 50, 1000, LIMITE_EVENTOS, 50)
     ver_documentos = st.checkbox("Incluir documentos de origen", value=True)
 
     filtros = None
     if seleccionado != "(todos)":
         filtros = {"id_activo_tecnico": seleccionado}
 
-    grafo = construir_grafo(db, filtros)
+    grafo = construir_grafo(db, filtros, limite=limite, incluir_origenes=ver_documentos, agregado=agregado)
     st.info(f"Nodos: {grafo.number_of_nodes()} | Aristas: {grafo.number_of_edges()}")
     mostrar_grafo(grafo)
+
+
+def explorar(db) -> None:
+    """Exploración por expansión: el estado vive en la sesión del usuario."""
+    # Import diferido: exploracion_grafo reutiliza constantes de este módulo
+    from cmms_fabrica.modulos.exploracion_grafo import ExploradorGrafo
+
+    explorador = st.session_state.get("explorador_grafo")
+    if explorador is None or st.button("↺ Reiniciar exploración"):
+        explorador = ExploradorGrafo(db)
+        st.session_state["explorador_grafo"] = explorador
+        explorador.raices()
+
+    # Pyvis no devuelve los clics a Streamlit: la expansión se elige en la lista
+    visibles = sorted(explorador.grafo().nodes(data=True), key=lambda t: (t[1].get("tipo", ""), str(t[1].get("label"))))
+    etiquetas = {n: f"{d.get('label', n)} · {d.get('tipo', '')}" for n, d in visibles}
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        nodo = st.selectbox("Nodo", list(etiquetas), format_func=etiquetas.get) if etiquetas else None
+    with col2:
+        if nodo is not None and nodo in explorador.expandidos:
+            if st.button("➖ Contraer"):
+                explorador.contraer(nodo)
+                st.rerun()
+        elif nodo is not None and st.button("➕ Expandir"):
+            explorador.expandir(nodo)
+            st.rerun()
+
+    grafo = explorador.grafo()
+    st.info(
+        f"Nodos: {grafo.number_of_nodes()} | Aristas: {grafo.number_of_edges()} | "
+        f"Consultas a MongoDB en esta sesión: {explorador.consultas}"
+    )
+    mostrar_grafo(grafo)
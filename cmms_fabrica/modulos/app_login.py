@@ -2,7 +2,7 @@ import streamlit as st
 import hashlib
 import secrets
 import time
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
 
 def hash_password(password: str) -> str:
     """Generate salted password hash in the form salt$hash."""
@@ -27,8 +27,8 @@ def cerrar_sesion():
 
 def login_usuario():
     # Verificar conexión antes de usar la colección
-    if db is None:
-        st.error(f"No hay conexión con MongoDB. {mongo_error}")
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
         st.stop()
 
     coleccion = db["usuarios"]
@@ -6,7 +6,7 @@ import json
 from datetime import datetime
 from openai import OpenAI
 from cmms_fabrica.modulos.estilos import aplicar_estilos
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
 from cmms_fabrica.modulos.conexion_openai import obtener_api_key_openai
 
 # Configuración general
@@ -46,8 +46,8 @@ def serializar_documentos(doc_list):
     return json.dumps(doc_list, default=convertir)
 
 def app():
-    if db is None:
-        st.error(f"No hay conexión con MongoDB. {mongo_error}")
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
         st.stop()
 
     obtener_api_key_openai()
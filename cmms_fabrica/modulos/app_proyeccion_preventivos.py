@@ -0,0 +1,56 @@
+"""
+📆 Proyección de Carga Preventiva – CMMS Fábrica
+
+Normas aplicables: ISO 55001 (Planificación del mantenimiento) | ISO 9001:2015
+
+Descripción: Intervenciones preventivas proyectadas por semana para los próximos meses, por activo
+técnico o por responsable, con `proyeccion_preventivos` (planes por tiempo, por uso y ambos).
+"""
+
+import streamlit as st
+
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
+from cmms_fabrica.modulos.graficos import grafico_mapa_calor
+from cmms_fabrica.modulos.proyeccion_preventivos import AGRUPACIONES, matriz_carga, proyectar_calendario
+
+HORIZONTES = [6, 9, 12]
+
+
+def app() -> None:
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
+        st.stop()
+
+    st.title("📆 Proyección de Carga Preventiva")
+
+    col1, col2 = st.columns(2)
+    meses = col1.selectbox("Horizonte (meses)", HORIZONTES, index=len(HORIZONTES) - 1)
+    por = col2.radio("Agrupar por", list(AGRUPACIONES), horizontal=True, format_func=str.capitalize)
+
+    ocurrencias = proyectar_calendario(db, meses=meses)
+    if ocurrencias.empty:
+        st.info("No hay planes activos con fecha o lecturas de uso suficientes para proyectar.")
+        return
+
+    matriz = matriz_carga(ocurrencias, por, meses=meses)
+    por_semana = matriz.sum(axis=0)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Intervenciones proyectadas", len(ocurrencias))
+    c2.metric("Promedio semanal", f"{por_semana.mean():.1f}")
+    c3.metric("Semana más cargada", f"{por_semana.idxmax():%d/%m/%Y}", f"{por_semana.max()} intervenciones", delta_color="off")
+
+    grafico_mapa_calor(matriz, f"Intervenciones por semana ({meses} meses)", "Semana (lunes)", por.capitalize())
+
+    with st.expander("Detalle de intervenciones"):
+        detalle = ocurrencias.assign(fecha=ocurrencias["fecha"].dt.date).drop(columns="semana")
+        st.dataframe(detalle.sort_values(["fecha", "id_plan"]), use_container_width=True, hide_index=True)
+        st.caption(
+            f"Planes por uso proyectados con la tasa medida: {ocurrencias.loc[ocurrencias['origen'] == 'uso', 'id_plan'].nunique()}"
+        )
+
+    st.download_button(
+        "⬇️ Descargar matriz (CSV)",
+        matriz.rename(columns=lambda c: f"{c:%Y-%m-%d}").to_csv().encode("utf-8"),
+        file_name=f"carga_preventiva_{por}_{meses}m.csv",
+        mime="text/csv",
+    )
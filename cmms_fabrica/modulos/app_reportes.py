@@ -11,99 +11,374 @@ y los movimientos recientes en `inventario`, con filtros por tipo de evento, fec
 
 import streamlit as st
 import pandas as pd
+import fpdf
 from fpdf import FPDF
 from datetime import datetime, date
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
-import os
+from cmms_fabrica.crud.generador_historial import ORIGEN_FALTANTE, categorizar_tipo_evento  # compatibilidad: antes se definía aquí
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
+from cmms_fabrica.modulos.cola_reportes import COMPLETADO, ESTADOS_ACTIVOS, cola
+from cmms_fabrica.modulos.consultas_historial import (
+    COLUMNAS_REPORTE,
+    filtro_historial,
+    lotes_ultimos_por_tarea_y_activo,
+    ultimos_por_tarea_y_activo,
+)
+from cmms_fabrica.modulos.exportacion import (
+    COLUMNAS_POR_COLECCION,
+    FORMATOS,
+    escribir_xlsx,
+    exportar_a_bytes,
+    filtro_fechas,
+    lotes_de_coleccion,
+    parquet_disponible,
+)
+from cmms_fabrica.modulos.jerarquia_activos import ids_del_subarbol
+from cmms_fabrica.modulos.utilidades_formularios import catalogo_activos
 from io import BytesIO
 
 
-def categorizar_tipo_evento(tipo_evento: str) -> str:
-    """Normaliza descripciones de evento a categorías estándar para reportes."""
-    valor = (tipo_evento or "").lower()
-    if "observ" in valor:
-        return "observacion"
-    if "correctiv" in valor:
-        return "correctiva"
-    if "preventiv" in valor:
-        return "preventiva"
-    if "calibr" in valor:
-        return "calibracion"
-    if "tecnica" in valor or "técnica" in valor:
-        return "tecnica"
-    return "otro"
-
 # 🔐 Función para eliminar caracteres no soportados por PDF
 def safe_text(text):
     if not isinstance(text, str):
         text = str(text)
     return text.encode("latin-1", "ignore").decode("latin-1")
 
+# 📄 Columnas de la tabla de eventos: (campo, encabezado, ancho en mm)
+COLUMNAS_PDF = [
+    ("fecha_evento", "Fecha", 24),
+    ("id_activo_tecnico", "Activo", 24),
+    ("tipo_evento", "Tipo de evento", 34),
+    ("id_origen", "Origen", 22),
+    ("criticidad", "Crit.", 13),
+    ("usuario_registro", "Usuario", 20),
+    ("descripcion", "Descripción / Observaciones", 53),
+]
+ALTO_FILA = 5
+FILAS_POR_LOTE = 2000
+
+
+def _texto_celda(valor, campo):
+    if campo == "fecha_evento" and hasattr(valor, "strftime"):
+        return valor.strftime("%Y-%m-%d %H:%M")
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return ORIGEN_FALTANTE if campo == "id_origen" else "-"
+    return str(valor)
+
+
+def iterar_filas(fuente, tamano_lote=FILAS_POR_LOTE):
+    """Recorre un DataFrame, lotes de DataFrames o un cursor de dicts fila por fila.
+
+    Un DataFrame grande se convierte a registros por tramos para no duplicarlo
+    completo en memoria.
+    """
+    if fuente is None:
+        return
+    if isinstance(fuente, pd.DataFrame):
+        df = fuente
+        fuente = (df.iloc[i:i + tamano_lote] for i in range(0, len(df), tamano_lote))
+    for elemento in fuente:
+        if isinstance(elemento, pd.DataFrame):
+            yield from elemento.to_dict("records")
+        else:
+            yield elemento
+
+
+# Versión de FPDF cuyos internos (``buffer``, ``pages``, ``_out``,
+# ``_endpage``, ``current_font``) reemplaza ``_Fpdf172``. Con cualquier otra
+# versión se usa solo la API pública; tests/test_reportes.py falla si cambia.
+VERSION_FPDF_OPTIMIZADA = "1.7.2"
+
+
+class _BufferPdf:
+    """Reemplazo de ``FPDF.buffer``: acumula en una lista y conserva ``len()``.
+
+    FPDF usa ``len(self.buffer)`` para los offsets de la tabla xref y hace
+    ``self.buffer += ...`` por cada objeto, que con un string crece en tiempo
+    cuadrático con el tamaño del documento.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._largo = 0
+
+    def __iadd__(self, texto):
+        self._partes.append(texto)
+        self._largo += len(texto)
+        return self
+
+    def __len__(self):
+        return self._largo
+
+    def __str__(self):
+        return "".join(self._partes)
+
+
+class _FpdfPublico(FPDF):
+    """Base portable: solo la API pública de FPDF."""
+
+    def _ancho(self, texto):
+        return self.get_string_width(texto)
+
+
+class _Fpdf172(FPDF):
+    """Base para FPDF 1.7.2: evita las concatenaciones cuadráticas de sus internos."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._contenido_pagina = []
+        self.buffer = _BufferPdf()
+
+    def output(self, name="", dest=""):
+        if self.state < 3:
+            self.close()
+        self.buffer = str(self.buffer)
+        return super().output(name, dest)
+
+    def _out(self, s):
+        # FPDF concatena cada operación al string de la página (costo cuadrático
+        # con miles de celdas); se acumula en una lista y se une al cerrarla.
+        if self.state == 2:
+            self._contenido_pagina.append(s.decode("latin1") if isinstance(s, bytes) else str(s))
+        else:
+            super()._out(s)
+
+    def _endpage(self):
+        if self._contenido_pagina:
+            self.pages[self.page] += "\n".join(self._contenido_pagina) + "\n"
+            self._contenido_pagina = []
+        super()._endpage()
+
+    def _ancho(self, texto):
+        """Ancho en mm con la fuente actual (versión rápida de ``get_string_width``)."""
+        cw = self.current_font["cw"]
+        try:
+            unidades = sum(map(cw.__getitem__, texto))
+        except KeyError:
+            return self.get_string_width(texto)
+        return unidades * self.font_size / 1000.0
+
+
+_BaseFpdf = _Fpdf172 if fpdf.__version__ == VERSION_FPDF_OPTIMIZADA else _FpdfPublico
+
+
 # 📄 Clase PDF personalizada
-class PDF(FPDF):
+class PDF(_BaseFpdf):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tabla_activa = False
+        self._ajustados = {}
+
     def header(self):
         self.set_font("Arial", "B", 14)
         self.cell(0, 10, safe_text("Reporte de Actividades Técnicas – CMMS Fábrica"), ln=True, align="C")
         self.ln(5)
+        # Al cortar página dentro de la tabla se repiten los encabezados
+        if self._tabla_activa:
+            self._encabezado_tabla()
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 8, f"Página {self.page_no()}", align="C")
+
+    def _encabezado_tabla(self):
+        self.set_font("Arial", "B", 8)
+        self.set_fill_color(230, 230, 230)
+        for _, titulo, ancho in COLUMNAS_PDF:
+            self.cell(ancho, ALTO_FILA + 1, safe_text(titulo), border=1, fill=True)
+        self.ln()
+        self.set_font("Arial", "", 7)
+
+    def _ajustar(self, texto, ancho):
+        """Recorta el texto al ancho de la celda (una línea por evento)."""
+        clave = (texto, ancho)
+        ajustado = self._ajustados.get(clave)
+        if ajustado is not None:
+            return ajustado
+        ajustado = safe_text(texto).replace("\n", " ")
+        disponible = ancho - 2
+        ancho_texto = self._ancho(ajustado)
+        if ancho_texto > disponible:
+            # Corte proporcional primero; el ajuste fino recorre pocos caracteres
+            ajustado = ajustado[:max(1, int(len(ajustado) * disponible / ancho_texto))]
+            while ajustado and self._ancho(ajustado + "...") > disponible:
+                ajustado = ajustado[:-1]
+            ajustado += "..."
+        # Fechas, tipos, usuarios y orígenes se repiten mucho entre filas
+        if len(self._ajustados) < 5000:
+            self._ajustados[clave] = ajustado
+        return ajustado
 
     def chapter_body(self, titulo, df):
+        """Tabla compacta de eventos: una fila por evento.
+
+        ``df`` puede ser un DataFrame, un iterable de DataFrames (lotes) o un
+        cursor de documentos; se consume fila por fila. Devuelve la cantidad
+        de eventos escritos.
+        """
         self.set_font("Arial", "B", 12)
         self.cell(0, 10, safe_text(titulo), ln=True)
-        self.set_font("Arial", "", 10)
-        self.ln(2)
-        for _, row in df.iterrows():
-            self.multi_cell(0, 6, safe_text(f"Activo técnico: {row.get('id_activo_tecnico', '-')}"), 0)
-            self.multi_cell(0, 6, safe_text(f"Fecha: {row.get('fecha_evento', '-').strftime('%Y-%m-%d %H:%M')}"), 0)
-            self.multi_cell(0, 6, safe_text(f"Tipo de evento: {row.get('tipo_evento', '-')}"), 0)
-            origen = row.get('id_origen') or "HUÉRFANO"
-            self.multi_cell(0, 6, safe_text(f"ID de origen: {origen}"), 0)
-            self.multi_cell(0, 6, safe_text(f"Usuario: {row.get('usuario_registro', '-')}"), 0)
-            self.multi_cell(0, 6, safe_text(f"Criticidad: {row.get('criticidad', '-')}"), 0)
-            self.set_font("Arial", "B", 10)
-            self.multi_cell(0, 6, safe_text("Descripción:"), 0)
-            self.set_font("Arial", "", 10)
-            self.multi_cell(0, 6, safe_text(row.get("descripcion", "-")), 0)
-            self.multi_cell(0, 6, safe_text(f"Observaciones: {row.get('observaciones', '-')}"), 0)
-            self.ln(3)
+        self.ln(1)
+        self._tabla_activa = True
+        self._encabezado_tabla()
+        escritos = 0
+        for fila in iterar_filas(df):
+            for campo, _, ancho in COLUMNAS_PDF:
+                valor = fila.get(campo)
+                if campo == "descripcion":
+                    observaciones = fila.get("observaciones")
+                    texto = _texto_celda(valor, campo)
+                    if observaciones and observaciones != "-" and not pd.isna(observaciones):
+                        texto = f"{texto} | Obs: {observaciones}"
+                else:
+                    texto = _texto_celda(valor, campo)
+                self.cell(ancho, ALTO_FILA, self._ajustar(texto, ancho), border=1)
+            self.ln()
+            escritos += 1
+        self._tabla_activa = False
+        return escritos
+
 
 # 📤 Generador de PDF
 def generar_pdf(df_eventos, df_inventario, nombre):
+    """Arma el reporte en memoria y devuelve los bytes del PDF.
+
+    ``df_eventos`` puede ser un DataFrame, lotes de DataFrames o un cursor,
+    así un período largo no necesita materializarse completo. Con
+    ``df_inventario=None`` se omite la sección de inventario.
+    """
     pdf = PDF()
+    pdf.set_title(safe_text(nombre))
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
-    if not df_eventos.empty:
-        pdf.chapter_body("Últimos eventos técnicos por activo", df_eventos)
-    else:
+    escritos = pdf.chapter_body("Últimos eventos técnicos por activo", df_eventos)
+    if not escritos:
         pdf.set_font("Arial", "I", 10)
         pdf.cell(0, 10, safe_text("No se registraron eventos técnicos en este período."), ln=True)
+    if df_inventario is None:
+        # Reportes por activo: el inventario no pertenece a ningún activo
+        return pdf.output(dest="S").encode("latin-1")
     pdf.ln(5)
     pdf.set_font("Arial", "B", 12)
     pdf.cell(0, 10, safe_text("Movimientos recientes en Inventario"), ln=True)
     pdf.ln(2)
     if not df_inventario.empty:
         pdf.set_font("Arial", "", 10)
-        for _, row in df_inventario.iterrows():
-            fecha = row['fecha_evento'].strftime('%Y-%m-%d')
-            pdf.multi_cell(0, 6, safe_text(f"{fecha} – {row.get('id_item', '-')} – {row.get('descripcion', '-')}"), 0)
+        for fila in iterar_filas(df_inventario):
+            fecha = fila["fecha_evento"].strftime('%Y-%m-%d')
+            pdf.multi_cell(0, 6, safe_text(f"{fecha} – {fila.get('id_item', '-')} – {fila.get('descripcion', '-')}"), 0)
     else:
         pdf.set_font("Arial", "I", 10)
         pdf.cell(0, 10, safe_text("No hubo movimientos en inventario."), ln=True)
-    os.makedirs("reportes", exist_ok=True)
-    ruta = f"reportes/reporte_{nombre.lower().replace(' ', '_')}.pdf"
-    pdf.output(ruta)
-    return ruta
+    return pdf.output(dest="S").encode("latin-1")
 
 # 📥 Generador de Excel
 def generar_excel(df_eventos, df_inventario):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+    """Libro con eventos e inventario escrito fila por fila (``constant_memory``).
+
+    ``df_eventos`` puede ser un DataFrame o lotes de DataFrames.
+    """
+    hojas = {}
+    if isinstance(df_eventos, pd.DataFrame):
         if not df_eventos.empty:
-            df_eventos.to_excel(writer, sheet_name="Eventos Técnicos", index=False)
-        if not df_inventario.empty:
-            df_inventario.to_excel(writer, sheet_name="Inventario", index=False)
+            hojas["Eventos Técnicos"] = ([df_eventos], list(df_eventos.columns))
+    elif df_eventos is not None:
+        hojas["Eventos Técnicos"] = (df_eventos, COLUMNAS_REPORTE)
+    if df_inventario is not None and not df_inventario.empty:
+        hojas["Inventario"] = ([df_inventario], list(df_inventario.columns))
+    output = BytesIO()
+    escribir_xlsx(hojas, output)
     output.seek(0)
     return output
 
+# 📦 Movimientos de inventario del período
+def movimientos_inventario(fecha_desde, fecha_hasta, database=None):
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return pd.DataFrame()
+    df_inv = pd.DataFrame(list(database["inventario"].find({
+        "ultima_actualizacion": {
+            "$gte": fecha_desde.strftime("%Y-%m-%d"),
+            "$lte": fecha_hasta.strftime("%Y-%m-%d")
+        }
+    }, {"_id": 0, "id_item": 1, "descripcion": 1, "ultima_actualizacion": 1})))
+    if not df_inv.empty:
+        df_inv["fecha_evento"] = pd.to_datetime(df_inv["ultima_actualizacion"])
+    return df_inv
+
+
+# 🧾 Reporte completo a partir de los parámetros de un trabajo de la cola
+def generar_reporte(tipo, parametros, database=None, al_avanzar=None):
+    """Arma el PDF o el Excel de ``parametros`` y devuelve los bytes.
+
+    ``parametros``: ``desde``/``hasta`` (AAAA-MM-DD), ``categorias`` y ``ids``
+    (subárbol del activo o ``None``). ``al_avanzar(filas, total)`` recibe el
+    avance después de cada lote; ``total`` es la cantidad de eventos del
+    período antes de quedarse con el último por tarea (cota superior).
+    """
+    database = resolver_db(database if database is not None else db)
+    desde = date.fromisoformat(parametros["desde"])
+    hasta = date.fromisoformat(parametros["hasta"])
+    categorias, ids = parametros.get("categorias"), parametros.get("ids")
+    total = database["historial"].count_documents(filtro_historial(desde, hasta, ids)) if al_avanzar else None
+
+    def lotes_con_avance():
+        filas = 0
+        for lote in lotes_ultimos_por_tarea_y_activo(desde, hasta, categorias, ids, database=database):
+            yield lote
+            filas += len(lote)
+            if al_avanzar:
+                al_avanzar(filas, total)
+
+    if tipo == "zip":
+        # Un PDF por activo del subárbol elegido (o por activo raíz) en un ZIP
+        from cmms_fabrica.modulos.reportes_lote import generar_zip_por_activo
+
+        return generar_zip_por_activo(desde, hasta, categorias, raices=ids, database=database)
+
+    df_inv = movimientos_inventario(desde, hasta, database)
+    if tipo == "pdf":
+        return generar_pdf(lotes_con_avance(), df_inv, nombre="reporte")
+    if tipo == "xlsx":
+        return generar_excel(lotes_con_avance(), df_inv).getvalue()
+    raise ValueError(f"Tipo de reporte no soportado: {tipo}")
+
+
+ETIQUETAS_TRABAJO = {"pdf": "PDF", "xlsx": "Excel", "zip": "ZIP por activo"}
+MIME_TRABAJO = {
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+}
+
+
+def _panel_trabajo(trabajo):
+    """Estado de un trabajo de la cola con su botón de descarga al terminar."""
+    etiqueta = ETIQUETAS_TRABAJO.get(trabajo["tipo"], trabajo["tipo"])
+    if trabajo["estado"] in ESTADOS_ACTIVOS:
+        st.progress(trabajo.get("progreso", 0.0), text=f"{etiqueta}: {trabajo.get('mensaje', '')}")
+        if st.button("🔄 Actualizar estado", key=f"actualizar_{trabajo['_id']}"):
+            st.rerun()
+    elif trabajo["estado"] == COMPLETADO:
+        contenido = cola().artefacto(trabajo["_id"])
+        if contenido is None:
+            st.info(f"El {etiqueta} no está en la caché de este servidor; se está regenerando.")
+            if st.button("🔄 Actualizar estado", key=f"actualizar_{trabajo['_id']}"):
+                st.rerun()
+            return
+        p = trabajo["parametros"]
+        extension = trabajo["tipo"]
+        st.download_button(
+            f"⬇️ Descargar {etiqueta}" + (" (caché)" if trabajo.get("desde_cache") else ""),
+            data=contenido,
+            file_name=f"reporte_{p['desde'].replace('-', '')}_{p['hasta'].replace('-', '')}.{extension}",
+            mime=MIME_TRABAJO.get(extension),
+            key=f"descargar_{trabajo['_id']}",
+        )
+    else:
+        st.error(f"No se pudo generar el {etiqueta}: {trabajo.get('mensaje', '')}")
+
+
 # 🔍 Filtrar última actualización por tarea y activo técnico
 def filtrar_ultimo_por_tarea_y_activo(df):
     """Devuelve la última entrada por combinación de activo técnico y tarea."""
@@ -120,14 +395,10 @@ def filtrar_ultimo_por_activo(df):
 
 # 🚀 Interfaz principal
 def app():
-    if db is None:
-        st.error(f"No hay conexión con MongoDB. {mongo_error}")
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
         st.stop()
 
-    coleccion = db["historial"]
-    activos_tecnicos = db["activos_tecnicos"]
-    inventario = db["inventario"]
-
     st.title("📄 Reportes Técnicos del CMMS")
 
     with st.sidebar:
@@ -136,7 +407,7 @@ def app():
         fecha_hasta = st.date_input("Hasta", value=date.today())
         tipo_evento = st.multiselect("Tipo de Evento", ["preventiva", "correctiva", "tecnica", "calibracion", "observacion"],
                                      default=["preventiva", "correctiva", "tecnica", "calibracion", "observacion"])
-        activos = list(activos_tecnicos.find({}, {"_id": 0, "id_activo_tecnico": 1, "pertenece_a": 1}))
+        activos = catalogo_activos(db)
         opciones = ["Todos"] + sorted([
             f"{a['id_activo_tecnico']} (pertenece a {a['pertenece_a']})" if a.get("pertenece_a") else a["id_activo_tecnico"]
             for a in activos
@@ -148,67 +419,26 @@ def app():
         st.error("⚠️ Rango de fechas inválido.")
         return
 
-    query = {
-        "fecha_evento": {
-            "$gte": datetime.combine(fecha_desde, datetime.min.time()),
-            "$lte": datetime.combine(fecha_hasta, datetime.max.time())
-        }
-    }
+    ids = None
     if id_activo:
-        subactivos = [a["id_activo_tecnico"] for a in activos if a.get("pertenece_a") == id_activo]
-        ids = [id_activo] + subactivos
-        query["id_activo_tecnico"] = {"$in": ids}
+        ids = ids_del_subarbol(id_activo, db)
+        subactivos = ids[1:]
         st.sidebar.success(f"Incluye {len(subactivos)} subactivo(s)")
 
-    datos = list(coleccion.find(query, {"_id": 0}))
-    if not datos:
-        st.warning("No se encontraron eventos técnicos en este período.")
-        return
-
-    df = pd.DataFrame(datos)
-    df["fecha_evento"] = pd.to_datetime(df["fecha_evento"])
-    df["categoria_evento"] = df["tipo_evento"].apply(categorizar_tipo_evento)
-    df = df[df["categoria_evento"].isin(tipo_evento)].copy()
-    if df.empty:
-        st.warning("No se encontraron eventos técnicos para las categorías seleccionadas.")
+    # Categoría y "último por tarea y activo" se resuelven en MongoDB
+    df_filtrado = ultimos_por_tarea_y_activo(fecha_desde, fecha_hasta, tipo_evento, ids, database=db)
+    if df_filtrado.empty:
+        st.warning("No se encontraron eventos técnicos para el período y las categorías seleccionadas.")
         return
 
-    for campo in ["usuario_registro", "descripcion", "observaciones", "id_origen", "criticidad"]:
-        if campo not in df.columns:
-            df[campo] = "" if campo == "id_origen" else "-"
-    df["usuario_registro"] = df["usuario_registro"].fillna("desconocido")
-    df["id_origen"] = df["id_origen"].replace("-", "").fillna("HUÉRFANO")
-
-    df_filtrado = filtrar_ultimo_por_tarea_y_activo(df)
-
-    columnas = [
-        "fecha_evento",
-        "tipo_evento",
-        "id_activo_tecnico",
-        "id_origen",
-        "criticidad",
-        "descripcion",
-        "usuario_registro",
-        "observaciones",
-    ]
-    for col in columnas:
-        if col not in df_filtrado.columns:
-            df_filtrado[col] = "HUÉRFANO" if col == "id_origen" else "-"
-    if "id_origen" in df_filtrado.columns:
-        df_filtrado["id_origen"] = df_filtrado["id_origen"].replace("-", "").fillna("HUÉRFANO")
+    columnas = COLUMNAS_REPORTE
     st.markdown("### ✅ Última actualización por tarea y activo técnico")
-    st.dataframe(df_filtrado[columnas].sort_values("fecha_evento", ascending=False), use_container_width=True)
+    st.dataframe(df_filtrado[columnas], use_container_width=True)
 
     st.markdown("### 📦 Movimientos recientes en Inventario")
-    df_inv = pd.DataFrame(list(inventario.find({
-        "ultima_actualizacion": {
-            "$gte": fecha_desde.strftime("%Y-%m-%d"),
-            "$lte": fecha_hasta.strftime("%Y-%m-%d")
-        }
-    }, {"_id": 0, "id_item": 1, "descripcion": 1, "ultima_actualizacion": 1})))
+    df_inv = movimientos_inventario(fecha_desde, fecha_hasta, db)
 
     if not df_inv.empty:
-        df_inv["fecha_evento"] = pd.to_datetime(df_inv["ultima_actualizacion"])
         st.dataframe(df_inv[["fecha_evento", "id_item", "descripcion"]])
     else:
         st.markdown(
@@ -222,17 +452,59 @@ def app():
 
     deshabilitar_export = df_filtrado.empty
 
+    # Los archivos se generan en la cola de fondo; el estado vive en MongoDB
+    parametros = {
+        "desde": fecha_desde.isoformat(),
+        "hasta": fecha_hasta.isoformat(),
+        "categorias": list(tipo_evento),
+        "ids": ids,
+    }
+    usuario = st.session_state.get("usuario")
     col1, col2 = st.columns(2)
     with col1:
         if st.button("📄 Generar PDF", disabled=deshabilitar_export):
-            archivo = generar_pdf(df_filtrado[columnas], df_inv, nombre="reporte")
-            with open(archivo, "rb") as f:
-                st.download_button("⬇️ Descargar PDF", data=f, file_name=os.path.basename(archivo), mime="application/pdf")
+            st.session_state["trabajo_pdf"] = cola().solicitar("pdf", parametros, usuario)["_id"]
     with col2:
-        if st.button("📥 Descargar Excel", disabled=deshabilitar_export):
-            excel = generar_excel(df_filtrado[columnas], df_inv)
-            st.download_button("⬇️ Descargar Excel", data=excel, file_name="reporte.xlsx",
-                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        if st.button("📥 Generar Excel", disabled=deshabilitar_export):
+            st.session_state["trabajo_xlsx"] = cola().solicitar("xlsx", parametros, usuario)["_id"]
+
+    ayuda_zip = "Un PDF por cada activo del subárbol elegido" if ids else "Un PDF por cada activo raíz"
+    if st.button("🗂️ Generar PDF por activo (ZIP)", disabled=deshabilitar_export, help=ayuda_zip):
+        st.session_state["trabajo_zip"] = cola().solicitar("zip", parametros, usuario)["_id"]
+
+    mostrados = set()
+    for clave in ("trabajo_pdf", "trabajo_xlsx", "trabajo_zip"):
+        trabajo = cola().estado(st.session_state[clave]) if st.session_state.get(clave) else None
+        if trabajo:
+            _panel_trabajo(trabajo)
+            mostrados.add(trabajo["_id"])
+
+    recientes = [t for t in cola().recientes(usuario, limite=5) if t["_id"] not in mostrados]
+    if recientes:
+        with st.expander("🧾 Mis reportes recientes"):
+            for trabajo in recientes:
+                p = trabajo["parametros"]
+                st.caption(
+                    f"{trabajo['creado']:%Y-%m-%d %H:%M} · {trabajo['tipo'].upper()} · "
+                    f"{p['desde']} → {p['hasta']} · {trabajo['estado']}"
+                )
+                _panel_trabajo(trabajo)
+
+    with st.expander("🗄️ Exportar historial completo del período"):
+        formatos = [f for f in FORMATOS if f != "parquet" or parquet_disponible()]
+        formato = st.selectbox("Formato", formatos)
+        if st.button("Preparar exportación"):
+            query = filtro_fechas("fecha_evento", fecha_desde, fecha_hasta)
+            if ids:
+                query["id_activo_tecnico"] = {"$in": ids}
+            columnas_historial = COLUMNAS_POR_COLECCION["historial"]
+            lotes = lotes_de_coleccion("historial", query, columnas_historial, "fecha_evento", database=db)
+            datos = exportar_a_bytes(formato, lotes, columnas_historial, hoja="historial")
+            st.download_button(
+                f"⬇️ Descargar {formato.upper()}",
+                data=datos,
+                file_name=f"historial_{fecha_desde:%Y%m%d}_{fecha_hasta:%Y%m%d}.{formato}",
+            )
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,71 @@
+"""
+🧭 Módulo de Auditoría de Trazabilidad – CMMS Fábrica
+
+Normas aplicables: ISO 9001:2015 (Control de registros) | ISO 55001
+
+Descripción: Muestra los documentos de origen sin evento en `historial`, los eventos cuyo origen ya no existe
+y los eventos incompletos, usando el auditor por conjuntos de `deteccion_huerfanos`.
+*Solo accesible para administradores.*
+"""
+
+import streamlit as st
+import pandas as pd
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
+from cmms_fabrica.modulos.deteccion_huerfanos import ORIGENES, auditar_trazabilidad
+
+TITULOS = {
+    "sin_historial": "Documentos sin evento en historial",
+    "eventos_sin_origen": "Eventos cuyo documento de origen no existe",
+    "eventos_incompletos": "Eventos sin id_origen o sin activo técnico",
+}
+
+
+def app(rol_logueado: str) -> None:
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
+        st.stop()
+
+    st.title("🧭 Auditoría de Trazabilidad")
+
+    if rol_logueado != "admin":
+        st.warning("⚠️ Acceso restringido. Solo administradores pueden acceder a este módulo.")
+        return
+
+    colecciones = st.multiselect(
+        "Colecciones de origen",
+        list(ORIGENES),
+        default=list(ORIGENES),
+        format_func=lambda c: ORIGENES[c].etiqueta,
+    )
+
+    if st.button("🔎 Ejecutar auditoría", disabled=not colecciones):
+        st.session_state["auditoria_trazabilidad"] = auditar_trazabilidad(db, colecciones)
+
+    resultado = st.session_state.get("auditoria_trazabilidad")
+    if not resultado:
+        st.info("La auditoría recorre historial una vez por colección; ejecutala a demanda.")
+        return
+
+    resumen = pd.DataFrame([
+        {"Colección": ORIGENES[nombre].etiqueta, **{TITULOS[k]: len(v) for k, v in hallazgos.items()}}
+        for nombre, hallazgos in resultado.items()
+    ])
+    st.dataframe(resumen, use_container_width=True, hide_index=True)
+
+    for nombre, hallazgos in resultado.items():
+        total = sum(len(v) for v in hallazgos.values())
+        if not total:
+            continue
+        with st.expander(f"{ORIGENES[nombre].etiqueta} — {total} hallazgo(s)"):
+            for clave, valores in hallazgos.items():
+                if not valores:
+                    continue
+                st.markdown(f"**{TITULOS[clave]}**")
+                if isinstance(valores[0], dict):
+                    st.dataframe(pd.DataFrame(valores), use_container_width=True, hide_index=True)
+                else:
+                    st.dataframe(
+                        pd.DataFrame({ORIGENES[nombre].campo_id if clave == "sin_historial" else "id_origen": valores}),
+                        use_container_width=True,
+                        hide_index=True,
+                    )
@@ -9,14 +9,15 @@ Descripción: Permite registrar, visualizar, modificar y eliminar usuarios con c
 
 import streamlit as st
 import pandas as pd
-from cmms_fabrica.modulos.conexion_mongo import db, mongo_error
+from cmms_fabrica.modulos.conexion_mongo import db, obtener_error_mongo, resolver_db
 from cmms_fabrica.modulos.app_login import hash_password
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+from cmms_fabrica.modulos.cache_catalogos import invalidar_catalogo
 
 
 def app_usuarios(usuario_logueado: str, rol_logueado: str) -> None:
-    if db is None:
-        st.error(f"No hay conexión con MongoDB. {mongo_error}")
+    if resolver_db(db) is None:
+        st.error(f"No hay conexión con MongoDB. {obtener_error_mongo()}")
         st.stop()
 
     coleccion = db["usuarios"]
@@ -62,6 +63,7 @@ def app_usuarios(usuario_logueado: str, rol_logueado: str) -> None:
                     "rol": rol,
                 }
                 coleccion.insert_one(nuevo)
+                invalidar_catalogo("usuarios")
                 registrar_evento_historial(
                     tipo_evento="Alta usuario",
                     id_activo="-",
@@ -120,6 +122,7 @@ def app_usuarios(usuario_logueado: str, rol_logueado: str) -> None:
 
             if st.button("Eliminar Usuario Seleccionado"):
                 coleccion.delete_one({"usuario": usuario_sel})
+                invalidar_catalogo("usuarios")
                 registrar_evento_historial(
                     tipo_evento="Baja usuario",
                     id_activo="-",
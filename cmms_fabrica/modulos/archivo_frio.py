@@ -0,0 +1,302 @@
+"""🧊 Archivo Frío – CMMS Fábrica
+
+Guarda fuera de MongoDB los documentos que la limpieza de almacenamiento va
+a borrar, para conservar los registros sin ocupar espacio en la base:
+
+- NDJSON comprimido con gzip, particionado por colección y mes del campo de
+  fecha: ``<dir>/<coleccion>/<AAAA>/<coleccion>-<AAAA-MM>.ndjson.gz``
+- cada lote archivado se agrega como un miembro gzip nuevo, así que una
+  partición se extiende sin reescribirla;
+- los tipos de MongoDB (fechas, ``ObjectId``) se serializan con
+  ``bson.json_util`` y vuelven con el mismo tipo al leer;
+- ``manifiesto.json`` indexa cada partición con su rango de fechas y su
+  cantidad de documentos: las lecturas abren solo las particiones que se
+  solapan con el período pedido;
+- la escritura (particiones y manifiesto) se serializa entre procesos con un
+  bloqueo de archivo (``manifiesto.lock``), de modo que varios workers pueden
+  archivar en la misma carpeta.
+
+El archivo es la única copia de lo que la limpieza borra: ``CMMS_ARCHIVO_DIR``
+debe apuntar a almacenamiento persistente y compartido por todos los workers
+(volumen montado, NFS). Sin esa variable no se archiva y la limpieza no borra.
+
+El motor de borrado (:mod:`borrado_por_lotes`) llama a
+:meth:`ArchivoFrio.guardar` con cada lote antes de borrarlo, y
+:mod:`consultas_historial` suma los eventos archivados cuando el período de
+un reporte o KPI cae fuera de los datos vivos.
+
+Variables de entorno:
+- ``CMMS_ARCHIVO_DIR``: carpeta del archivo (obligatoria para archivar; sin valor por defecto)
+
+Uso por consola::
+
+    python -m cmms_fabrica.modulos.archivo_frio
+    python -m cmms_fabrica.modulos.archivo_frio --coleccion historial
+
+Normas:
+- ISO 9001:2015 (Control y conservación de registros)
+- ISO 55001 (Información del activo durante todo su ciclo de vida)
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from bson import json_util
+
+try:  # bloqueo entre procesos (POSIX)
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: solo el bloqueo del proceso
+    fcntl = None
+
+DIRECTORIO_ARCHIVO: Optional[str] = os.getenv("CMMS_ARCHIVO_DIR") or None
+MANIFIESTO = "manifiesto.json"
+BLOQUEO = "manifiesto.lock"
+SIN_FECHA = "sin_fecha"
+
+_lock = threading.Lock()
+# directorio -> (mtime del manifiesto, contenido)
+_manifiestos: Dict[str, tuple] = {}
+
+
+class ArchivoNoConfigurado(RuntimeError):
+    """``CMMS_ARCHIVO_DIR`` no está definido: no hay dónde conservar lo que se borra."""
+
+
+def archivo_configurado() -> bool:
+    return bool(DIRECTORIO_ARCHIVO)
+
+
+def _directorio(directorio: Optional[str]) -> Optional[str]:
+    return directorio or DIRECTORIO_ARCHIVO
+
+
+@contextmanager
+def _bloqueo_escritura(directorio: str) -> Iterator[None]:
+    """Exclusión entre hilos del proceso y entre procesos que comparten ``directorio``."""
+    os.makedirs(directorio, exist_ok=True)
+    with _lock, open(os.path.join(directorio, BLOQUEO), "a") as archivo_bloqueo:
+        if fcntl is not None:
+            fcntl.flock(archivo_bloqueo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo_bloqueo, fcntl.LOCK_UN)
+
+
+def como_fecha(valor: Any) -> Optional[datetime]:
+    """``datetime`` a partir de fechas, ``date`` o texto ISO; ``None`` si no se puede."""
+    if isinstance(valor, datetime):
+        return valor.replace(tzinfo=None)
+    if isinstance(valor, date):
+        return datetime.combine(valor, datetime.min.time())
+    if isinstance(valor, str):
+        try:
+            return datetime.fromisoformat(valor.replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return None
+
+
+def particion(valor: Any) -> str:
+    fecha = como_fecha(valor)
+    return fecha.strftime("%Y-%m") if fecha else SIN_FECHA
+
+
+def ruta_particion(nombre: str, clave: str) -> str:
+    """Ruta relativa al directorio del archivo."""
+    anio = clave[:4] if clave != SIN_FECHA else SIN_FECHA
+    return os.path.join(nombre, anio, f"{nombre}-{clave}.ndjson.gz")
+
+
+def leer_manifiesto(directorio: Optional[str] = None, usar_cache: bool = True) -> Dict[str, Any]:
+    """Contenido de ``manifiesto.json`` (cacheado por fecha de modificación).
+
+    Quien lo va a reescribir lo lee sin caché: en un disco compartido la
+    resolución de la fecha de modificación puede no distinguir dos escrituras.
+    """
+    directorio = _directorio(directorio)
+    if not directorio:
+        return {"particiones": {}}
+    ruta = os.path.join(directorio, MANIFIESTO)
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return {"particiones": {}}
+    cacheado = _manifiestos.get(directorio)
+    if usar_cache and cacheado and cacheado[0] == mtime:
+        return cacheado[1]
+    with open(ruta, encoding="utf-8") as f:
+        contenido = json.load(f)
+    _manifiestos[directorio] = (mtime, contenido)
+    return contenido
+
+
+def _escribir_manifiesto(directorio: str, contenido: Dict[str, Any]) -> None:
+    ruta = os.path.join(directorio, MANIFIESTO)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporal, ruta)
+
+
+class ArchivoFrio:
+    """Escritor de una colección: agrega lotes a sus particiones mensuales."""
+
+    def __init__(self, nombre: str, campo_fecha: str, directorio: Optional[str] = None):
+        self.nombre = nombre
+        self.campo_fecha = campo_fecha
+        self.directorio = _directorio(directorio)
+        if not self.directorio:
+            raise ArchivoNoConfigurado("definí CMMS_ARCHIVO_DIR en almacenamiento persistente y compartido")
+        self.archivados = 0
+
+    def guardar(self, documentos: Iterable[Dict[str, Any]]) -> int:
+        """Archiva ``documentos`` y actualiza el manifiesto. Devuelve cuántos se guardaron."""
+        grupos: Dict[str, List[Dict[str, Any]]] = {}
+        for documento in documentos:
+            grupos.setdefault(particion(documento.get(self.campo_fecha)), []).append(documento)
+        if not grupos:
+            return 0
+
+        with _bloqueo_escritura(self.directorio):
+            manifiesto = leer_manifiesto(self.directorio, usar_cache=False)
+            entradas = dict(manifiesto.get("particiones", {}))
+            for clave, grupo in grupos.items():
+                relativa = ruta_particion(self.nombre, clave)
+                ruta = os.path.join(self.directorio, relativa)
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                with gzip.open(ruta, "ab") as f:
+                    for documento in grupo:
+                        f.write(json_util.dumps(documento, json_options=json_util.RELAXED_JSON_OPTIONS).encode("utf-8"))
+                        f.write(b"\n")
+
+                fechas = [f for f in (como_fecha(d.get(self.campo_fecha)) for d in grupo) if f]
+                entrada = dict(entradas.get(relativa) or {
+                    "coleccion": self.nombre,
+                    "campo_fecha": self.campo_fecha,
+                    "particion": clave,
+                    "documentos": 0,
+                    "desde": None,
+                    "hasta": None,
+                })
+                entrada["documentos"] += len(grupo)
+                if fechas:
+                    desde = min([min(fechas)] + ([como_fecha(entrada["desde"])] if entrada["desde"] else []))
+                    hasta = max([max(fechas)] + ([como_fecha(entrada["hasta"])] if entrada["hasta"] else []))
+                    entrada["desde"], entrada["hasta"] = desde.isoformat(), hasta.isoformat()
+                entrada["bytes"] = os.path.getsize(ruta)
+                entrada["actualizado"] = datetime.now().isoformat(timespec="seconds")
+                entradas[relativa] = entrada
+            _escribir_manifiesto(self.directorio, {**manifiesto, "particiones": entradas})
+
+        cantidad = sum(len(g) for g in grupos.values())
+        self.archivados += cantidad
+        return cantidad
+
+
+def particiones(
+    nombre: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    directorio: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Entradas del manifiesto de ``nombre`` que se solapan con ``[desde, hasta]``.
+
+    Sin rango se devuelven todas, incluida la partición sin fecha.
+    """
+    resultado = []
+    for relativa, entrada in sorted(leer_manifiesto(directorio).get("particiones", {}).items()):
+        if entrada.get("coleccion") != nombre:
+            continue
+        inicio, fin = como_fecha(entrada.get("desde")), como_fecha(entrada.get("hasta"))
+        if desde is not None or hasta is not None:
+            if inicio is None or fin is None:
+                continue
+            if (desde is not None and fin < desde) or (hasta is not None and inicio > hasta):
+                continue
+        resultado.append({**entrada, "archivo": relativa})
+    return resultado
+
+
+def hay_archivo(
+    nombre: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    directorio: Optional[str] = None,
+) -> bool:
+    return bool(particiones(nombre, desde, hasta, directorio))
+
+
+def leer(
+    nombre: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    filtro: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    directorio: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Documentos archivados de ``nombre`` en ``[desde, hasta]`` (en streaming).
+
+    Un lote archivado dos veces (interrupción entre archivar y borrar) se
+    devuelve una sola vez. Las particiones son disjuntas por mes, así que los
+    ``_id`` vistos se recuerdan solo dentro de cada una: la memoria crece con
+    la partición más grande, no con el período pedido.
+    """
+    directorio = _directorio(directorio)
+    if not directorio:
+        return
+    for entrada in particiones(nombre, desde, hasta, directorio):
+        vistos = set()
+        campo_fecha = entrada["campo_fecha"]
+        with gzip.open(os.path.join(directorio, entrada["archivo"]), "rt", encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                documento = json_util.loads(linea)
+                fecha = como_fecha(documento.get(campo_fecha))
+                if desde is not None and (fecha is None or fecha < desde):
+                    continue
+                if hasta is not None and (fecha is None or fecha > hasta):
+                    continue
+                clave = str(documento.get("_id"))
+                if clave in vistos:
+                    continue
+                vistos.add(clave)
+                if filtro is None or filtro(documento):
+                    yield documento
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Resumen del archivo frío de colecciones")
+    parser.add_argument("--coleccion", help="Solo esta colección")
+    parser.add_argument("--dir", default=None, help=f"Carpeta del archivo (por defecto {DIRECTORIO_ARCHIVO})")
+    args = parser.parse_args(argv)
+
+    if not _directorio(args.dir):
+        print("❌ Archivo frío sin configurar. Definí CMMS_ARCHIVO_DIR o usá --dir.")
+        return
+
+    entradas = leer_manifiesto(args.dir).get("particiones", {})
+    if not entradas:
+        print("ℹ️ El archivo frío está vacío.")
+        return
+    for relativa, entrada in sorted(entradas.items()):
+        if args.coleccion and entrada.get("coleccion") != args.coleccion:
+            continue
+        print(
+            f"{relativa}: {entrada['documentos']} documentos, "
+            f"{entrada.get('desde') or '-'} → {entrada.get('hasta') or '-'}, "
+            f"{entrada.get('bytes', 0) / 1024:.1f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""🧹 Borrado por Lotes – CMMS Fábrica
+
+Motor de borrado para la limpieza de almacenamiento. En lugar de un único
+``delete_many`` gigante (o de cargar miles de ``_id`` en una lista):
+
+- recorre el rango de fechas indexado de la colección, de lo más viejo a lo
+  más nuevo, en lotes de tamaño fijo (``find().sort().limit()`` + un
+  ``delete_many`` por ``_id`` del lote);
+- pausa entre lotes para no superar un objetivo de documentos por segundo y
+  dejar lugar a otros escritores del clúster compartido;
+- guarda el objetivo y el avance en ``trabajos_borrado`` después de cada
+  lote: una ejecución interrumpida se retoma con el mismo objetivo;
+- informa el avance con un callback;
+- con ``antes_de_borrar`` entrega cada lote completo (p. ej. al archivo
+  frío) antes de borrarlo: si ese paso falla, el lote no se borra.
+
+El registro en ``historial`` queda a cargo del llamador (un evento resumen
+por ejecución).
+
+Variables de entorno:
+- ``CMMS_BORRADO_LOTE``: documentos por lote (por defecto 500)
+- ``CMMS_BORRADO_OPS_S``: documentos borrados por segundo como máximo (por defecto 2000; 0 = sin pausa)
+
+Normas:
+- ISO 9001:2015 (Control de registros)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION_TRABAJOS = "trabajos_borrado"
+TAMANO_LOTE = int(os.getenv("CMMS_BORRADO_LOTE", "500"))
+OPS_POR_SEGUNDO = float(os.getenv("CMMS_BORRADO_OPS_S", "2000"))
+
+
+@dataclass
+class ResultadoBorrado:
+    coleccion: str
+    eliminados: int = 0
+    lotes: int = 0
+    objetivo: Optional[int] = None
+    fecha_limite: Optional[datetime] = None
+    reanudado: bool = False
+    completo: bool = False
+    segundos: float = 0.0
+
+
+def _estado_guardado(database, clave: str) -> Dict[str, Any]:
+    estado = database[COLECCION_TRABAJOS].find_one({"_id": clave})
+    return estado if isinstance(estado, dict) else {}
+
+
+def borrar_por_lotes(
+    nombre: str,
+    campo_fecha: str,
+    fecha_limite: Optional[datetime] = None,
+    max_documentos: Optional[int] = None,
+    tamano_lote: int = TAMANO_LOTE,
+    ops_por_segundo: float = OPS_POR_SEGUNDO,
+    reanudar: bool = True,
+    al_avanzar: Optional[Callable[[int, Optional[int]], None]] = None,
+    antes_de_borrar: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    database=None,
+    dormir: Callable[[float], None] = time.sleep,
+    reloj: Callable[[], float] = time.monotonic,
+) -> ResultadoBorrado:
+    """Borra los documentos más viejos de ``nombre`` en lotes.
+
+    - ``fecha_limite``: borra solo documentos con ``campo_fecha`` anterior.
+    - ``max_documentos``: borra como máximo esa cantidad (limpieza por porcentaje).
+
+    Si hay un trabajo sin terminar para la misma colección y ``reanudar`` es
+    verdadero, se continúa con su objetivo original y su conteo.
+    """
+    database = resolver_db(database if database is not None else db)
+    resultado = ResultadoBorrado(nombre, objetivo=max_documentos, fecha_limite=fecha_limite)
+    if database is None:
+        return resultado
+
+    coleccion = database[nombre]
+    trabajos = database[COLECCION_TRABAJOS]
+    clave = f"{nombre}:{campo_fecha}"
+
+    estado = _estado_guardado(database, clave) if reanudar else {}
+    if estado.get("estado") == "en_curso":
+        resultado.objetivo = estado.get("objetivo")
+        resultado.fecha_limite = estado.get("fecha_limite")
+        resultado.eliminados = int(estado.get("eliminados") or 0)
+        resultado.reanudado = True
+        logger.info("Borrado en %s retomado: %s ya eliminados", nombre, resultado.eliminados)
+
+    query: Dict[str, Any] = {campo_fecha: {"$exists": True, "$ne": None}}
+    if resultado.fecha_limite is not None:
+        query[campo_fecha] = {"$lt": resultado.fecha_limite}
+
+    inicio = reloj()
+    trabajos.update_one(
+        {"_id": clave},
+        {"$set": {
+            "estado": "en_curso",
+            "coleccion": nombre,
+            "campo_fecha": campo_fecha,
+            "objetivo": resultado.objetivo,
+            "fecha_limite": resultado.fecha_limite,
+            "eliminados": resultado.eliminados,
+            "actualizado": datetime.now(),
+        }},
+        upsert=True,
+    )
+
+    espera = 0.0
+    while True:
+        pendiente = tamano_lote
+        if resultado.objetivo is not None:
+            pendiente = min(pendiente, resultado.objetivo - resultado.eliminados)
+        if pendiente <= 0:
+            break
+        if espera > 0:
+            dormir(espera)
+
+        inicio_lote = reloj()
+        proyeccion = None if antes_de_borrar else {"_id": 1}
+        documentos = list(coleccion.find(query, proyeccion).sort(campo_fecha, 1).limit(pendiente))
+        if not documentos:
+            break
+        if antes_de_borrar:
+            antes_de_borrar(documentos)
+        lote: List[Any] = [doc["_id"] for doc in documentos]
+        eliminados = coleccion.delete_many({"_id": {"$in": lote}}).deleted_count or 0
+        resultado.eliminados += eliminados
+        resultado.lotes += 1
+
+        trabajos.update_one(
+            {"_id": clave},
+            {"$set": {"eliminados": resultado.eliminados, "actualizado": datetime.now()}},
+        )
+        if al_avanzar:
+            al_avanzar(resultado.eliminados, resultado.objetivo)
+        if len(lote) < pendiente:
+            break  # no quedan más documentos en el rango
+
+        # Pausa antes del próximo lote para no superar ``ops_por_segundo``
+        if ops_por_segundo and ops_por_segundo > 0:
+            espera = len(lote) / ops_por_segundo - (reloj() - inicio_lote)
+
+    resultado.completo = True
+    resultado.segundos = reloj() - inicio
+    trabajos.update_one(
+        {"_id": clave},
+        {"$set": {"estado": "completado", "eliminados": resultado.eliminados, "actualizado": datetime.now()}},
+    )
+    logger.info("Borrado en %s: %s documentos en %s lotes", nombre, resultado.eliminados, resultado.lotes)
+    return resultado
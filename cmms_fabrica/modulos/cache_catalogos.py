@@ -0,0 +1,103 @@
+"""🗃️ Caché de Catálogos – CMMS Fábrica
+
+Los formularios cargan listas de opciones (activos, usuarios, proveedores) en
+cada rerun de Streamlit, incluso con cada tecla dentro de un ``st.form``. Este
+módulo las guarda en memoria con:
+
+- una versión por colección que cada escritura incrementa
+  (:func:`invalidar_catalogo`), de modo que una alta o edición se ve al
+  instante en el mismo proceso;
+- un TTL que acota la antigüedad frente a escrituras de otros procesos;
+- un tamaño máximo con desalojo LRU.
+
+Normas:
+- ISO 9001:2015 (Información documentada disponible y actualizada)
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+MAX_ENTRADAS = int(os.getenv("CMMS_CACHE_CATALOGOS_MAX", "64"))
+TTL_S = float(os.getenv("CMMS_CACHE_CATALOGOS_TTL_S", "300"))
+
+
+class CacheCatalogos:
+    """Caché LRU con TTL indexada por la versión de cada colección."""
+
+    def __init__(
+        self,
+        max_entradas: int = MAX_ENTRADAS,
+        ttl_s: float = TTL_S,
+        reloj: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entradas = max(1, max_entradas)
+        self.ttl_s = ttl_s
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._versiones: Dict[str, int] = {}
+        # clave -> (base de datos, instante de carga, valor)
+        self._entradas: "OrderedDict[Tuple, Tuple[Any, float, Any]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def version(self, coleccion: str) -> int:
+        return self._versiones.get(coleccion, 0)
+
+    def invalidar(self, *colecciones: str) -> None:
+        """Incrementa la versión: las entradas anteriores dejan de usarse."""
+        with self._lock:
+            for coleccion in colecciones:
+                self._versiones[coleccion] = self._versiones.get(coleccion, 0) + 1
+            for clave in [k for k in self._entradas if k[1] in colecciones]:
+                del self._entradas[clave]
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def obtener(self, database, coleccion: str, clave: Hashable, cargar: Callable[[], T]) -> T:
+        """Devuelve una copia del valor en caché o lo carga con ``cargar()``."""
+        ahora = self._reloj()
+        llave = (id(database), coleccion, self.version(coleccion), clave)
+        with self._lock:
+            entrada = self._entradas.get(llave)
+            # La base se guarda en la entrada: un id() reutilizado no puede coincidir
+            if entrada and entrada[0] is database and ahora - entrada[1] < self.ttl_s:
+                self._entradas.move_to_end(llave)
+                self.aciertos += 1
+                return copy.deepcopy(entrada[2])
+
+        valor = cargar()
+        with self._lock:
+            self.fallos += 1
+            if llave[2] == self.version(coleccion):
+                self._entradas[llave] = (database, ahora, valor)
+                self._entradas.move_to_end(llave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return copy.deepcopy(valor)
+
+
+cache = CacheCatalogos()
+
+
+def catalogo(database, coleccion: str, clave: Hashable, cargar: Callable[[], T]) -> T:
+    """Atajo sobre la caché compartida del proceso."""
+    return cache.obtener(database, coleccion, clave, cargar)
+
+
+def invalidar_catalogo(*colecciones: str) -> None:
+    """Llamar después de escribir en ``colecciones``."""
+    cache.invalidar(*colecciones)
+
+
+def estado_cache() -> Dict[str, int]:
+    return {"entradas": len(cache._entradas), "aciertos": cache.aciertos, "fallos": cache.fallos}
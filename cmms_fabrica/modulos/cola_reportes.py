@@ -0,0 +1,286 @@
+"""🧾 Cola de Reportes en Segundo Plano – CMMS Fábrica
+
+Los reportes (PDF, Excel o ZIP con un PDF por activo) se arman en un pool de hilos del proceso, fuera
+de la ejecución del script de Streamlit: la página no se congela y un
+refresco no pierde el trabajo. El estado de cada trabajo se guarda en la
+colección ``trabajos_reportes`` (pendiente → en_curso → completado / error,
+con progreso), así que puede consultarse desde cualquier sesión.
+
+Los archivos terminados se guardan en una caché en disco indexada por la
+huella de la consulta (tipo, fechas, categorías, activos) y las marcas de
+agua de los datos que entran en el reporte: ``historial`` (último ``_id`` +
+cantidad de documentos) e ``inventario`` (última ``ultima_actualizacion`` +
+cantidad). Si nadie registró eventos ni se movió inventario desde entonces, el
+mismo pedido de otro usuario se resuelve al instante con el archivo existente.
+
+La caché es local a cada servidor, mientras que el estado de los trabajos es
+compartido: si un trabajo completado no tiene su archivo en este servidor
+(otro worker, reinicio, poda), se trata como fallo de caché y se regenera.
+
+Variables de entorno:
+- ``CMMS_REPORTES_WORKERS``: hilos del pool (por defecto 2)
+- ``CMMS_REPORTES_CACHE_DIR``: carpeta de la caché (por defecto, una en el temporal del sistema)
+- ``CMMS_REPORTES_CACHE_MAX``: archivos que se conservan (por defecto 50)
+
+Normas:
+- ISO 9001:2015 (Trazabilidad documental y registros reproducibles)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION = "trabajos_reportes"
+PENDIENTE, EN_CURSO, COMPLETADO, ERROR = "pendiente", "en_curso", "completado", "error"
+ESTADOS_ACTIVOS = (PENDIENTE, EN_CURSO)
+EXTENSIONES = {"pdf": "pdf", "xlsx": "xlsx", "zip": "zip"}
+
+WORKERS = int(os.getenv("CMMS_REPORTES_WORKERS", "2"))
+DIRECTORIO_CACHE = os.getenv("CMMS_REPORTES_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "cmms_reportes")
+MAX_ARTEFACTOS = int(os.getenv("CMMS_REPORTES_CACHE_MAX", "50"))
+# Un trabajo activo sin novedades en este lapso quedó huérfano (proceso reiniciado)
+ABANDONO = timedelta(minutes=10)
+
+# generador(tipo, parametros, database, al_avanzar) -> bytes
+Generador = Callable[[str, Dict[str, Any], Any, Callable[[int, Optional[int]], None]], bytes]
+
+
+def marca_historial(database) -> str:
+    """Marca de agua de ``historial``: cambia con cada alta o purga de eventos."""
+    ultimo = database["historial"].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return f"{ultimo['_id'] if ultimo else '-'}:{database['historial'].estimated_document_count()}"
+
+
+def marca_inventario(database) -> str:
+    """Marca de agua de ``inventario``: cambia con cada movimiento, alta o baja de ítems."""
+    ultimo = database["inventario"].find_one(
+        {"ultima_actualizacion": {"$exists": True}}, {"_id": 0, "ultima_actualizacion": 1},
+        sort=[("ultima_actualizacion", -1)],
+    )
+    return f"{ultimo['ultima_actualizacion'] if ultimo else '-'}:{database['inventario'].estimated_document_count()}"
+
+
+def marca_datos(database) -> str:
+    """Marca de agua de todo lo que entra en un reporte."""
+    return f"{marca_historial(database)}|{marca_inventario(database)}"
+
+
+def huella(parametros: Dict[str, Any], marca: str) -> str:
+    """Hash estable de los parámetros de la consulta y la marca de los datos."""
+    canonico = {
+        clave: sorted(valor) if isinstance(valor, (list, tuple, set)) else valor
+        for clave, valor in parametros.items()
+    }
+    texto = json.dumps({"parametros": canonico, "marca": marca}, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def _generador_por_defecto(tipo, parametros, database, al_avanzar) -> bytes:
+    # Import diferido: app_reportes importa este módulo para la interfaz
+    from cmms_fabrica.modulos.app_reportes import generar_reporte
+
+    return generar_reporte(tipo, parametros, database, al_avanzar)
+
+
+class ColaReportes:
+    """Pool de hilos con estado en MongoDB y caché de archivos por huella."""
+
+    def __init__(
+        self,
+        database=None,
+        workers: int = WORKERS,
+        directorio: str = DIRECTORIO_CACHE,
+        max_artefactos: int = MAX_ARTEFACTOS,
+        generador: Optional[Generador] = None,
+    ):
+        self._database = database
+        self.directorio = Path(directorio)
+        self.max_artefactos = max(1, max_artefactos)
+        self._generador = generador or _generador_por_defecto
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cmms-reportes")
+        self._lock = threading.Lock()
+
+    # --- Acceso a datos -------------------------------------------------
+
+    def _db(self):
+        return resolver_db(self._database if self._database is not None else db)
+
+    def _trabajos(self):
+        database = self._db()
+        return None if database is None else database[COLECCION]
+
+    def _ruta(self, huella_consulta: str, tipo: str) -> Path:
+        return self.directorio / f"{huella_consulta}.{EXTENSIONES.get(tipo, tipo)}"
+
+    def _actualizar(self, id_trabajo: str, **cambios: Any) -> None:
+        trabajos = self._trabajos()
+        if trabajos is not None:
+            trabajos.update_one({"_id": id_trabajo}, {"$set": {**cambios, "actualizado": datetime.now()}})
+
+    def _recuperar_abandonados(self, trabajos) -> None:
+        """Marca como error los trabajos activos sin novedades en ``ABANDONO`` (su worker ya no existe)."""
+        trabajos.update_many(
+            {"estado": {"$in": list(ESTADOS_ACTIVOS)}, "actualizado": {"$lt": datetime.now() - ABANDONO}},
+            {"$set": {"estado": ERROR, "mensaje": "Interrumpido: el servidor se reinició", "actualizado": datetime.now()}},
+        )
+
+    # --- API pública ----------------------------------------------------
+
+    def solicitar(self, tipo: str, parametros: Dict[str, Any], usuario: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Encola un reporte y devuelve el documento del trabajo.
+
+        Si el mismo reporte ya existe en la caché el trabajo nace completado;
+        si otro usuario lo está generando, se devuelve ese trabajo.
+        """
+        if tipo not in EXTENSIONES:
+            raise ValueError(f"Tipo de reporte no soportado: {tipo}")
+        trabajos = self._trabajos()
+        if trabajos is None:
+            return None
+        # En cada pedido: un worker puede morir en cualquier momento de la vida del proceso
+        self._recuperar_abandonados(trabajos)
+
+        clave = huella({"tipo": tipo, **parametros}, marca_datos(self._db()))
+        with self._lock:
+            en_curso = trabajos.find_one({
+                "huella": clave,
+                "estado": {"$in": list(ESTADOS_ACTIVOS)},
+                "actualizado": {"$gte": datetime.now() - ABANDONO},
+            })
+            if en_curso:
+                return en_curso
+
+            ahora = datetime.now()
+            trabajo = {
+                "_id": uuid.uuid4().hex,
+                "tipo": tipo,
+                "parametros": parametros,
+                "huella": clave,
+                "usuario": usuario,
+                "creado": ahora,
+                "actualizado": ahora,
+                "progreso": 0.0,
+                "filas": 0,
+            }
+            ruta = self._ruta(clave, tipo)
+            if ruta.exists():
+                ruta.touch()  # la caché descarta primero los menos usados
+                trabajo.update(estado=COMPLETADO, progreso=1.0, desde_cache=True, mensaje="Recuperado de la caché")
+                trabajos.insert_one(trabajo)
+                return trabajo
+
+            trabajo.update(estado=PENDIENTE, desde_cache=False, mensaje="En cola")
+            trabajos.insert_one(trabajo)
+        self._pool.submit(self._ejecutar, trabajo["_id"], tipo, parametros, clave)
+        return trabajo
+
+    def estado(self, id_trabajo: str) -> Optional[Dict[str, Any]]:
+        trabajos = self._trabajos()
+        return None if trabajos is None else trabajos.find_one({"_id": id_trabajo})
+
+    def recientes(self, usuario: Optional[str] = None, limite: int = 10) -> List[Dict[str, Any]]:
+        trabajos = self._trabajos()
+        if trabajos is None:
+            return []
+        query = {"usuario": usuario} if usuario else {}
+        return list(trabajos.find(query).sort("creado", -1).limit(limite))
+
+    def artefacto(self, id_trabajo: str) -> Optional[bytes]:
+        """Bytes del archivo de un trabajo completado.
+
+        ``None`` si el trabajo no terminó o si el archivo no está en la caché
+        de este servidor; en ese caso el trabajo vuelve a la cola y se regenera.
+        """
+        trabajo = self.estado(id_trabajo)
+        if not trabajo or trabajo.get("estado") != COMPLETADO:
+            return None
+        ruta = self._ruta(trabajo["huella"], trabajo["tipo"])
+        try:
+            return ruta.read_bytes()
+        except FileNotFoundError:
+            self._regenerar(trabajo)
+            return None
+
+    def cerrar(self) -> None:
+        """Cierra el pool esperando los trabajos en curso (pruebas y apagado ordenado)."""
+        self._pool.shutdown(wait=True)
+
+    # --- Ejecución ------------------------------------------------------
+
+    def _regenerar(self, trabajo: Dict[str, Any]) -> None:
+        """Reencola un trabajo completado cuyo archivo no está en esta caché (una sola vez)."""
+        trabajos = self._trabajos()
+        if trabajos is None:
+            return
+        reencolado = trabajos.find_one_and_update(
+            {"_id": trabajo["_id"], "estado": COMPLETADO},
+            {"$set": {"estado": PENDIENTE, "progreso": 0.0, "desde_cache": False,
+                      "mensaje": "Regenerando: el archivo no está en la caché", "actualizado": datetime.now()}},
+        )
+        if reencolado:
+            self._pool.submit(self._ejecutar, trabajo["_id"], trabajo["tipo"], trabajo["parametros"], trabajo["huella"])
+
+    def _ejecutar(self, id_trabajo: str, tipo: str, parametros: Dict[str, Any], clave: str) -> None:
+        self._actualizar(id_trabajo, estado=EN_CURSO, mensaje="Generando", inicio=datetime.now())
+
+        def al_avanzar(filas: int, total: Optional[int]) -> None:
+            progreso = min(0.95, filas / total) if total else 0.0
+            self._actualizar(id_trabajo, filas=filas, progreso=progreso, mensaje=f"{filas} eventos procesados")
+
+        try:
+            contenido = self._generador(tipo, parametros, self._db(), al_avanzar)
+            self._guardar(clave, tipo, contenido)
+        except Exception as exc:
+            logger.exception("Falló el reporte %s", id_trabajo)
+            self._actualizar(id_trabajo, estado=ERROR, mensaje=f"{type(exc).__name__}: {exc}")
+            return
+        self._actualizar(
+            id_trabajo, estado=COMPLETADO, progreso=1.0, mensaje="Listo", fin=datetime.now(), tamano=len(contenido)
+        )
+
+    def _guardar(self, clave: str, tipo: str, contenido: bytes) -> None:
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        ruta = self._ruta(clave, tipo)
+        temporal = ruta.with_suffix(ruta.suffix + ".tmp")
+        temporal.write_bytes(contenido)
+        os.replace(temporal, ruta)  # nunca se sirve un archivo a medio escribir
+        self._podar()
+
+    def _podar(self) -> None:
+        archivos = sorted(
+            (p for p in self.directorio.iterdir() if p.suffix.lstrip(".") in EXTENSIONES.values()),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for viejo in archivos[self.max_artefactos:]:
+            try:
+                viejo.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_cola: Optional[ColaReportes] = None
+_cola_lock = threading.Lock()
+
+
+def cola() -> ColaReportes:
+    """Cola compartida del proceso (sobrevive a los reruns de Streamlit)."""
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaReportes()
+        return _cola
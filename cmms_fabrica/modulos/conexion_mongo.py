@@ -1,30 +1,195 @@
-import pymongo
+"""Conexión a MongoDB del CMMS Fábrica.
+
+La conexión se abre de forma perezosa en el primer uso, con un pool de
+conexiones configurable por variables de entorno. Si el primer intento falla,
+un hilo en segundo plano reintenta con backoff exponencial y la base vuelve a
+estar disponible sin reiniciar Streamlit.
+
+Una vez conectado, el cliente queda fijo: ``MongoClient`` monitorea los
+servidores y se reconecta solo. Durante una caída posterior las operaciones
+lanzan ``ServerSelectionTimeoutError`` o ``AutoReconnect`` (tras
+``MONGO_SERVER_SELECTION_MS``) y vuelven a funcionar cuando el servidor
+responde, sin intervención de este módulo.
+
+Los módulos importan ``db`` (una referencia diferida) y verifican la
+disponibilidad con :func:`resolver_db` o :func:`get_db`.
+"""
+
+from __future__ import annotations
+
+import logging
 import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import pymongo
 from dotenv import load_dotenv
+from pymongo.database import Database
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "cmms")
 
-client = None
-db = None
-mongo_error = None
+# ⚙️ Parámetros del pool (ajustables por entorno)
+OPCIONES_CLIENTE: Dict[str, Any] = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "1")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+    "compressors": os.getenv("MONGO_COMPRESSORS", "zlib"),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_MS", "3000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "3000")),
+    "retryWrites": True,
+}
+
+BACKOFF_INICIAL_S = 1.0
+BACKOFF_MAXIMO_S = 60.0
+
+
+class GestorConexion:
+    """Administra el cliente MongoDB: conexión diferida y reintentos con backoff hasta el primer éxito."""
+
+    def __init__(
+        self,
+        uri: Optional[str],
+        nombre_db: str,
+        opciones: Optional[Dict[str, Any]] = None,
+        fabrica_cliente: Callable[..., Any] = pymongo.MongoClient,
+        backoff_inicial: float = BACKOFF_INICIAL_S,
+        backoff_maximo: float = BACKOFF_MAXIMO_S,
+    ):
+        self.uri = uri
+        self.nombre_db = nombre_db
+        self.opciones = dict(OPCIONES_CLIENTE if opciones is None else opciones)
+        self._fabrica_cliente = fabrica_cliente
+        self._backoff_inicial = backoff_inicial
+        self._backoff_maximo = backoff_maximo
+
+        self.cliente: Any = None
+        self.error: Optional[str] = None if uri else "Falta la variable de entorno MONGO_URI"
+        self._db: Optional[Database] = None
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+
+    @property
+    def reconectando(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def obtener_db(self) -> Optional[Database]:
+        """Devuelve la base activa, conectando en el primer uso.
+
+        Mientras el hilo de reconexión trabaja devuelve ``None`` sin bloquear.
+        """
+        if self._db is not None:
+            return self._db
+        if not self.uri or self.reconectando:
+            return None
+
+        with self._lock:
+            if self._db is not None:
+                return self._db
+            if self._intentar_conexion():
+                return self._db
+            self._iniciar_reconexion()
+        return None
+
+    def cerrar(self) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=1)
+        if self.cliente is not None:
+            self.cliente.close()
+        self.cliente = None
+        self._db = None
 
-if MONGO_URI:
-    try:
-        client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        client.server_info()
-        db = client[DB_NAME]
-    except Exception as e:
-        client = None
-        db = None
-        mongo_error = f"{type(e).__name__}: {e}"
-else:
-    mongo_error = "Falta la variable de entorno MONGO_URI"
-    db = None
+    def _intentar_conexion(self) -> bool:
+        try:
+            if self.cliente is None:
+                self.cliente = self._fabrica_cliente(self.uri, **self.opciones)
+            self.cliente.admin.command("ping")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.warning("MongoDB no disponible: %s", self.error)
+            return False
+        self._db = self.cliente[self.nombre_db]
+        self.error = None
+        return True
+
+    def _iniciar_reconexion(self) -> None:
+        if self.reconectando:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(
+            target=self._bucle_reconexion, name="mongo-reconexion", daemon=True
+        )
+        self._hilo.start()
+
+    def _bucle_reconexion(self) -> None:
+        espera = self._backoff_inicial
+        while not self._detener.wait(espera):
+            with self._lock:
+                if self._intentar_conexion():
+                    logger.info("Conexión con MongoDB restablecida")
+                    return
+            espera = min(espera * 2, self._backoff_maximo)
+
+
+class BaseDatosDiferida:
+    """Referencia a la base que resuelve la conexión recién al usarse.
+
+    ``db["coleccion"]`` y ``db.command(...)`` delegan en la base activa y
+    lanzan ``ConnectionError`` si MongoDB no está disponible.
+    """
+
+    def __init__(self, gestor: GestorConexion):
+        self._gestor = gestor
+
+    def resolver(self) -> Optional[Database]:
+        return self._gestor.obtener_db()
+
+    def _requerir(self) -> Database:
+        database = self.resolver()
+        if database is None:
+            raise ConnectionError(f"MongoDB no disponible. {self._gestor.error or ''}".strip())
+        return database
+
+    def __getitem__(self, nombre: str):
+        return self._requerir()[nombre]
+
+    def __getattr__(self, nombre: str):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return getattr(self._requerir(), nombre)
+
+
+gestor = GestorConexion(MONGO_URI, DB_NAME)
+db = BaseDatosDiferida(gestor)
+
+
+def resolver_db(database) -> Optional[Database]:
+    """Convierte ``database`` (referencia diferida o base real) en una base utilizable o ``None``."""
+    if isinstance(database, BaseDatosDiferida):
+        return database.resolver()
+    return database
 
 
 def get_db():
     """Devuelve la instancia de base de datos activa, si está disponible."""
-    return db
+    return resolver_db(db)
+
+
+def obtener_error_mongo() -> Optional[str]:
+    """Último error de conexión registrado (``None`` si la base está disponible)."""
+    return gestor.error
+
+
+def __getattr__(nombre: str):
+    # Compatibilidad con los antiguos globales del módulo
+    if nombre == "mongo_error":
+        return gestor.error
+    if nombre == "client":
+        return gestor.cliente
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
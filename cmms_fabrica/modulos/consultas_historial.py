@@ -0,0 +1,494 @@
+"""🔎 Consultas de Historial – CMMS Fábrica
+
+Compila los pasos que el tablero de KPIs y los reportes hacían en pandas
+(categorización de ``tipo_evento``, "último evento por origen" y conteos) a
+etapas de agregación de MongoDB, de modo que solo viajan las filas finales:
+
+- categoría: ``categoria_evento`` persistido al registrar el evento; para
+  documentos aún sin migrar, ``$addFields`` con ``$switch`` sobre ``$regexMatch``
+- último evento: ``$sort`` por fecha + ``$group`` con ``$first``
+- conteos de los gráficos: un único ``$facet``
+
+Si el servidor (o mongomock en las pruebas) no soporta alguna etapa, se
+resuelve la misma consulta en pandas sobre los documentos filtrados.
+
+Cuando el período incluye eventos que la limpieza ya pasó al archivo frío (ver
+``archivo_frio``), el archivo se recorre en streaming y solo se conserva el
+último evento por clave; se fusiona con el cursor de la agregación sobre los
+datos vivos, que sigue entregando lotes: la memoria crece con la cantidad de
+claves del resultado, no con la de eventos del período.
+
+Normas:
+- ISO 9001:2015 (Trazabilidad y seguimiento mediante indicadores)
+- ISO 14224 (Clasificación de eventos técnicos)
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from pymongo.errors import OperationFailure
+
+from cmms_fabrica.crud.generador_historial import (
+    CATEGORIA_POR_DEFECTO,
+    ORIGEN_FALTANTE,
+    REGLAS_CATEGORIA,
+    categorizar_tipo_evento,
+)
+from cmms_fabrica.modulos import archivo_frio
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+ORDEN_CRITICIDAD = ["Crítica", "Alta", "Media", "Baja", "Sin clasificar"]
+
+COLUMNAS_REPORTE = [
+    "fecha_evento",
+    "tipo_evento",
+    "id_activo_tecnico",
+    "id_origen",
+    "criticidad",
+    "descripcion",
+    "usuario_registro",
+    "observaciones",
+]
+
+# Errores que indican "etapa no soportada": se cae al cálculo en pandas
+ERRORES_PUSHDOWN = (OperationFailure, NotImplementedError)
+
+
+def expresion_categoria(campo: str = "$tipo_evento") -> Dict[str, Any]:
+    """Equivalente en agregación de ``categorizar_tipo_evento``."""
+    texto = {"$toLower": {"$ifNull": [campo, ""]}}
+    return {
+        "$switch": {
+            "branches": [
+                {
+                    "case": {
+                        "$regexMatch": {
+                            "input": texto,
+                            "regex": "|".join(re.escape(f) for f in fragmentos),
+                        }
+                    },
+                    "then": categoria,
+                }
+                for fragmentos, categoria in REGLAS_CATEGORIA
+            ],
+            "default": CATEGORIA_POR_DEFECTO,
+        }
+    }
+
+
+def filtro_historial(desde: date, hasta: date, ids_activos: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Filtro por rango de fechas inclusivo y, opcionalmente, por activos."""
+    query: Dict[str, Any] = {
+        "fecha_evento": {
+            "$gte": datetime.combine(desde, datetime.min.time()),
+            "$lte": datetime.combine(hasta, datetime.max.time()),
+        }
+    }
+    if ids_activos:
+        query["id_activo_tecnico"] = {"$in": list(ids_activos)}
+    return query
+
+
+def eventos_archivados(
+    desde: date,
+    hasta: date,
+    ids_activos: Optional[Sequence[str]] = None,
+    categorias: Optional[Sequence[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Eventos del período que ya están en el archivo frío, en streaming y con ``categoria_evento``."""
+    inicio = datetime.combine(desde, datetime.min.time())
+    fin = datetime.combine(hasta, datetime.max.time())
+    if not archivo_frio.hay_archivo("historial", inicio, fin):
+        return
+    ids = set(ids_activos or ())
+    filtro = (lambda evento: evento.get("id_activo_tecnico") in ids) if ids else None
+    permitidas = set(categorias) if categorias is not None else None
+    for evento in archivo_frio.leer("historial", inicio, fin, filtro):
+        if evento.get("categoria_evento") is None:
+            evento["categoria_evento"] = categorizar_tipo_evento(evento.get("tipo_evento"))
+        if permitidas is None or evento["categoria_evento"] in permitidas:
+            yield evento
+
+
+def _clave(documento: Dict[str, Any], claves: Sequence[str]) -> Tuple[Any, ...]:
+    # NaN (camino pandas) y campo ausente son la misma clave
+    return tuple(
+        None if isinstance(v := documento.get(c), float) and math.isnan(v) else v
+        for c in claves
+    )
+
+
+def _ultimos_archivados(
+    desde: date,
+    hasta: date,
+    categorias: Optional[Sequence[str]],
+    ids_activos: Optional[Sequence[str]],
+    claves: Sequence[str],
+    origen_faltante: str,
+    campos: Sequence[str],
+) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+    """Último evento archivado por clave, con solo ``campos``."""
+    ultimos: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for evento in eventos_archivados(desde, hasta, ids_activos, categorias):
+        if evento.get("id_origen") is None:
+            evento["id_origen"] = origen_faltante
+        clave = _clave(evento, claves)
+        actual = ultimos.get(clave)
+        if actual is None or evento["fecha_evento"] > actual["fecha_evento"]:
+            ultimos[clave] = {c: evento[c] for c in campos if c in evento}
+    return ultimos
+
+
+def _fusionar_ultimos(
+    vivos: Iterable[Dict[str, Any]],
+    archivados: Dict[Tuple[Any, ...], Dict[str, Any]],
+    claves: Sequence[str],
+) -> Iterator[Dict[str, Any]]:
+    """Último por clave entre los vivos (en su orden) y los archivados.
+
+    Los archivados sin contraparte viva se entregan al final, del más reciente
+    al más antiguo (la limpieza archiva siempre lo más viejo).
+    """
+    for fila in vivos:
+        archivado = archivados.pop(_clave(fila, claves), None)
+        if archivado is not None and archivado["fecha_evento"] > fila["fecha_evento"]:
+            fila = archivado
+        yield fila
+    yield from sorted(archivados.values(), key=lambda d: d["fecha_evento"], reverse=True)
+
+
+def _filtro_categorias(query: Dict[str, Any], categorias: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Agrega al filtro la categoría persistida (índice ``ix_categoria_fecha``).
+
+    Los eventos todavía sin ``categoria_evento`` (migración pendiente) pasan
+    el filtro y se categorizan en la etapa siguiente.
+    """
+    if categorias is None:
+        return query
+    return {
+        **query,
+        "$or": [
+            {"categoria_evento": {"$in": list(categorias)}},
+            {"categoria_evento": {"$exists": False}},
+        ],
+    }
+
+
+def _etapas_categoria(query: Dict[str, Any], categorias: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    etapas: List[Dict[str, Any]] = [
+        {"$match": _filtro_categorias(query, categorias)},
+        {"$addFields": {"categoria_evento": {"$ifNull": ["$categoria_evento", expresion_categoria()]}}},
+    ]
+    if categorias is not None:
+        etapas.append({"$match": {"categoria_evento": {"$in": list(categorias)}}})
+    return etapas
+
+
+def _etapas_ultimo_por(claves: Sequence[str]) -> List[Dict[str, Any]]:
+    return [
+        {"$sort": {"fecha_evento": -1}},
+        {"$group": {"_id": {c: f"${c}" for c in claves}, "doc": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$doc"}},
+    ]
+
+
+def _documentos_filtrados(coleccion, query, categorias, proyeccion=None) -> pd.DataFrame:
+    """Camino pandas: misma selección que las etapas de categoría."""
+    documentos = list(coleccion.find(_filtro_categorias(query, categorias), proyeccion))
+    df = pd.DataFrame(documentos)
+    if df.empty:
+        return df
+    df = df.drop(columns="_id", errors="ignore")
+    calculada = df.get("tipo_evento", pd.Series(index=df.index, dtype=object)).apply(categorizar_tipo_evento)
+    persistida = df.get("categoria_evento", pd.Series(index=df.index, dtype=object))
+    df["categoria_evento"] = persistida.fillna(calculada)
+    if categorias is not None:
+        df = df[df["categoria_evento"].isin(list(categorias))]
+    return df
+
+
+def _normalizar_reporte(df: pd.DataFrame) -> pd.DataFrame:
+    columnas = COLUMNAS_REPORTE + ["categoria_evento"]
+    if df.empty:
+        return pd.DataFrame(columns=columnas)
+    for columna in columnas:
+        if columna not in df.columns:
+            df[columna] = ORIGEN_FALTANTE if columna == "id_origen" else "-"
+    df["usuario_registro"] = df["usuario_registro"].fillna("desconocido")
+    df["fecha_evento"] = pd.to_datetime(df["fecha_evento"])
+    return df[columnas].reset_index(drop=True)
+
+
+def _ultimos_vivos(
+    coleccion,
+    query: Dict[str, Any],
+    categorias: Optional[Sequence[str]],
+    claves: Sequence[str],
+    origen_faltante: str,
+    campos: Sequence[str],
+    tamano_lote: int = 2000,
+) -> Iterator[Dict[str, Any]]:
+    """Último evento vivo por clave, del más reciente al más antiguo (cursor de la agregación)."""
+    pipeline = _etapas_categoria(query, categorias) + [
+        {"$addFields": {"id_origen": {"$ifNull": ["$id_origen", origen_faltante]}}},
+        *_etapas_ultimo_por(claves),
+        {"$project": {"_id": 0, **{c: 1 for c in campos}}},
+        {"$sort": {"fecha_evento": -1}},
+    ]
+    try:
+        cursor = coleccion.aggregate(pipeline, allowDiskUse=True, batchSize=tamano_lote)
+    except ERRORES_PUSHDOWN as exc:
+        logger.info("Agregación no disponible, se usa pandas: %s", exc)
+        df = _documentos_filtrados(coleccion, query, categorias)
+        if df.empty:
+            return
+        for columna in claves:
+            if columna not in df.columns:
+                df[columna] = None
+        df["id_origen"] = df["id_origen"].fillna(origen_faltante)
+        df = df.sort_values("fecha_evento", ascending=False).drop_duplicates(subset=list(claves))
+        yield from df.reindex(columns=[c for c in campos if c in df.columns]).to_dict("records")
+        return
+    yield from cursor
+
+
+def lotes_ultimos_por_tarea_y_activo(
+    desde: date,
+    hasta: date,
+    categorias: Optional[Sequence[str]] = None,
+    ids_activos: Optional[Sequence[str]] = None,
+    tamano_lote: int = 2000,
+    database=None,
+) -> Iterator[pd.DataFrame]:
+    """Como :func:`ultimos_por_tarea_y_activo`, pero en lotes de ``tamano_lote`` filas.
+
+    Recorre el cursor de la agregación sin materializar el resultado completo;
+    pensado para exportaciones de períodos largos. Los eventos archivados del
+    período se fusionan por clave sin cargar el archivo completo.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return
+    coleccion = database["historial"]
+    query = filtro_historial(desde, hasta, ids_activos)
+    columnas = COLUMNAS_REPORTE + ["categoria_evento"]
+    claves = ("id_activo_tecnico", "id_origen")
+
+    archivados = _ultimos_archivados(desde, hasta, categorias, ids_activos, claves, ORIGEN_FALTANTE, columnas)
+    vivos = _ultimos_vivos(coleccion, query, categorias, claves, ORIGEN_FALTANTE, columnas, tamano_lote)
+    lote: List[Dict[str, Any]] = []
+    for fila in _fusionar_ultimos(vivos, archivados, claves):
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            yield _normalizar_reporte(pd.DataFrame(lote))
+            lote = []
+    if lote:
+        yield _normalizar_reporte(pd.DataFrame(lote))
+
+
+def ultimos_por_tarea_y_activo(
+    desde: date,
+    hasta: date,
+    categorias: Optional[Sequence[str]] = None,
+    ids_activos: Optional[Sequence[str]] = None,
+    database=None,
+) -> pd.DataFrame:
+    """Última entrada por (activo técnico, origen) con las columnas del reporte."""
+    lotes = list(lotes_ultimos_por_tarea_y_activo(desde, hasta, categorias, ids_activos, database=database))
+    if not lotes:
+        return _normalizar_reporte(pd.DataFrame())
+    return pd.concat(lotes, ignore_index=True)
+
+
+def eventos_recientes(
+    desde: date,
+    hasta: date,
+    categorias: Optional[Sequence[str]] = None,
+    ids_activos: Optional[Sequence[str]] = None,
+    limite: int = 200,
+    columnas: Sequence[str] = ("fecha_evento", "tipo_evento", "id_activo_tecnico", "criticidad", "descripcion", "usuario_registro"),
+    database=None,
+) -> pd.DataFrame:
+    """Los ``limite`` eventos más recientes de las categorías pedidas."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return pd.DataFrame(columns=list(columnas))
+    coleccion = database["historial"]
+    query = filtro_historial(desde, hasta, ids_activos)
+
+    pipeline = _etapas_categoria(query, categorias) + [
+        {"$limit": limite},
+        {"$project": {"_id": 0, **{c: 1 for c in columnas}}},
+    ]
+    # Orden inmediatamente después del $match: usa el índice de fecha y corta temprano
+    pipeline.insert(1, {"$sort": {"fecha_evento": -1}})
+    try:
+        df = pd.DataFrame(list(coleccion.aggregate(pipeline)), columns=list(columnas))
+    except ERRORES_PUSHDOWN as exc:
+        logger.info("Agregación no disponible, se usa pandas: %s", exc)
+        df = _documentos_filtrados(coleccion, query, categorias)
+        if not df.empty:
+            df = df.sort_values("fecha_evento", ascending=False).head(limite).reindex(columns=list(columnas))
+    # Del archivo solo se retienen los ``limite`` más recientes mientras se recorre
+    archivados = heapq.nlargest(
+        limite, eventos_archivados(desde, hasta, ids_activos, categorias), key=lambda e: e["fecha_evento"]
+    )
+    if archivados:
+        df = pd.concat([df, pd.DataFrame(archivados).reindex(columns=list(columnas))], ignore_index=True)
+        df = df.sort_values("fecha_evento", ascending=False).head(limite)
+    if df.empty:
+        return pd.DataFrame(columns=list(columnas))
+    return df.reindex(columns=list(columnas)).reset_index(drop=True)
+
+
+@dataclass
+class ResumenKpis:
+    """Conteos que alimentan las tarjetas y gráficos del tablero."""
+
+    eventos: int = 0
+    activos: int = 0
+    usuarios: int = 0
+    por_criticidad: pd.Series = field(default_factory=lambda: pd.Series(0, index=ORDEN_CRITICIDAD))
+    por_tipo: pd.Series = field(default_factory=lambda: pd.Series(dtype=int))
+    mensual: pd.DataFrame = field(default_factory=pd.DataFrame)
+    por_activo: pd.Series = field(default_factory=lambda: pd.Series(dtype=int))
+
+    @property
+    def vacio(self) -> bool:
+        return self.eventos == 0
+
+
+def resumen_desde_dataframe(df: pd.DataFrame) -> ResumenKpis:
+    """Arma el resumen a partir de eventos ya deduplicados.
+
+    Espera las columnas ``id_activo_tecnico``, ``tipo_evento_categoria``,
+    ``fecha_evento``, ``criticidad`` y ``usuario_registro``.
+    """
+    if df.empty:
+        return ResumenKpis()
+    fechas = pd.to_datetime(df["fecha_evento"])
+    criticidad = df["criticidad"].fillna("").replace("", "Sin clasificar")
+    mensual = df.groupby([fechas.dt.to_period("M"), "tipo_evento_categoria"]).size().unstack(fill_value=0)
+    mensual.index = mensual.index.to_timestamp()
+    mensual.index.name = "mes"
+    return ResumenKpis(
+        eventos=len(df),
+        activos=df["id_activo_tecnico"].nunique(),
+        usuarios=df["usuario_registro"].nunique(),
+        por_criticidad=criticidad.value_counts().reindex(ORDEN_CRITICIDAD, fill_value=0),
+        por_tipo=df["tipo_evento_categoria"].value_counts().sort_index(),
+        mensual=mensual,
+        por_activo=df["id_activo_tecnico"].value_counts().sort_values(ascending=False),
+    )
+
+
+def _serie(filas: List[Dict[str, Any]]) -> pd.Series:
+    return pd.Series({f["_id"]: f["n"] for f in filas if f["_id"] is not None}, dtype=int)
+
+
+CAMPOS_KPI = ("fecha_evento", "id_activo_tecnico", "categoria_evento", "id_origen", "usuario_registro", "usuario", "criticidad")
+
+
+def _resumen_de_ultimos(df: pd.DataFrame) -> ResumenKpis:
+    """Resumen a partir de eventos ya reducidos al último por (activo, categoría, origen)."""
+    if df.empty:
+        return ResumenKpis()
+    df = df.rename(columns={"categoria_evento": "tipo_evento_categoria"})
+    if "usuario_registro" not in df.columns:
+        df["usuario_registro"] = df.get("usuario", "desconocido")
+    if "criticidad" not in df.columns:
+        df["criticidad"] = ""
+    df["fecha_evento"] = pd.to_datetime(df["fecha_evento"])
+    return resumen_desde_dataframe(df)
+
+
+def _resumen_en_pandas(coleccion, query, categorias) -> ResumenKpis:
+    df = _documentos_filtrados(coleccion, query, categorias)
+    if df.empty:
+        return ResumenKpis()
+    from cmms_fabrica.crud.dashboard_kpi_historial import filtrar_ultimo_evento_por_origen
+
+    df = df.rename(columns={"categoria_evento": "tipo_evento_categoria"})
+    df = filtrar_ultimo_evento_por_origen(df).rename(columns={"tipo_evento_categoria": "categoria_evento"})
+    return _resumen_de_ultimos(df)
+
+
+def resumen_kpis(
+    desde: date,
+    hasta: date,
+    categorias: Optional[Sequence[str]] = None,
+    ids_activos: Optional[Sequence[str]] = None,
+    database=None,
+) -> ResumenKpis:
+    """KPIs del período con el último evento por (activo, categoría, origen)."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return ResumenKpis()
+    coleccion = database["historial"]
+    query = filtro_historial(desde, hasta, ids_activos)
+
+    pipeline = _etapas_categoria(query, categorias) + [
+        {"$addFields": {"id_origen": {"$ifNull": ["$id_origen", ""]}}},
+        *_etapas_ultimo_por(["id_activo_tecnico", "categoria_evento", "id_origen"]),
+        {"$project": {
+            "id_activo_tecnico": 1,
+            "categoria_evento": 1,
+            "usuario_registro": {"$ifNull": ["$usuario_registro", "$usuario"]},
+            "criticidad": {"$cond": [{"$eq": [{"$ifNull": ["$criticidad", ""]}, ""]}, "Sin clasificar", "$criticidad"]},
+            "mes": {"$dateToString": {"format": "%Y-%m", "date": "$fecha_evento"}},
+        }},
+        {"$facet": {
+            "totales": [{"$group": {
+                "_id": None,
+                "eventos": {"$sum": 1},
+                "activos": {"$addToSet": "$id_activo_tecnico"},
+                "usuarios": {"$addToSet": "$usuario_registro"},
+            }}],
+            "por_criticidad": [{"$group": {"_id": "$criticidad", "n": {"$sum": 1}}}],
+            "por_tipo": [{"$group": {"_id": "$categoria_evento", "n": {"$sum": 1}}}],
+            "por_activo": [{"$group": {"_id": "$id_activo_tecnico", "n": {"$sum": 1}}}],
+            "mensual": [{"$group": {"_id": {"mes": "$mes", "categoria": "$categoria_evento"}, "n": {"$sum": 1}}}],
+        }},
+    ]
+    inicio, fin = query["fecha_evento"]["$gte"], query["fecha_evento"]["$lte"]
+    if archivo_frio.hay_archivo("historial", inicio, fin):
+        # Último por clave en vivo (cursor) y en el archivo (streaming), y recién ahí los conteos
+        claves = ("id_activo_tecnico", "categoria_evento", "id_origen")
+        archivados = _ultimos_archivados(desde, hasta, categorias, ids_activos, claves, "", CAMPOS_KPI)
+        vivos = _ultimos_vivos(coleccion, query, categorias, claves, "", CAMPOS_KPI)
+        return _resumen_de_ultimos(pd.DataFrame(list(_fusionar_ultimos(vivos, archivados, claves))))
+    try:
+        resultado = next(iter(coleccion.aggregate(pipeline, allowDiskUse=True)), None)
+    except ERRORES_PUSHDOWN as exc:
+        logger.info("Agregación no disponible, se usa pandas: %s", exc)
+        return _resumen_en_pandas(coleccion, query, categorias)
+
+    if not resultado or not resultado["totales"]:
+        return ResumenKpis()
+
+    totales = resultado["totales"][0]
+    mensual = pd.DataFrame(
+        [{"mes": f["_id"]["mes"], "categoria": f["_id"]["categoria"], "n": f["n"]} for f in resultado["mensual"]]
+    ).pivot_table(index="mes", columns="categoria", values="n", fill_value=0, aggfunc="sum")
+    mensual.index = pd.to_datetime(mensual.index + "-01")
+    mensual.columns.name = "tipo_evento_categoria"
+
+    return ResumenKpis(
+        eventos=totales["eventos"],
+        activos=len([a for a in totales["activos"] if a is not None]),
+        usuarios=len([u for u in totales["usuarios"] if u is not None]),
+        por_criticidad=_serie(resultado["por_criticidad"]).reindex(ORDEN_CRITICIDAD, fill_value=0),
+        por_tipo=_serie(resultado["por_tipo"]).sort_index(),
+        mensual=mensual.sort_index(),
+        por_activo=_serie(resultado["por_activo"]).sort_values(ascending=False),
+    )
@@ -1,63 +1,168 @@
-"""Detección de Tareas Correctivas Huérfanas
+"""Detección de Registros Huérfanos – Auditoría de Trazabilidad
 
-Este script revisa la base de datos buscando tareas correctivas sin trazabilidad
-completa en la colección ``historial`` y eventos correctivos mal registrados.
-Se alinea con las buenas prácticas de mantenimiento industrial y la normativa
-ISO 9001 para control de registros.
+Este script revisa la base de datos buscando documentos de origen (tareas
+correctivas, planes preventivos, calibraciones, tareas técnicas,
+observaciones e inventario) sin su evento en ``historial``, y eventos mal
+registrados. Se alinea con las buenas prácticas de mantenimiento industrial
+y la normativa ISO 9001 para control de registros.
+
+El cálculo es por conjuntos, sin una consulta por documento:
+
+1. Una agregación agrupa ``historial`` por ``id_origen`` para el tipo de
+   evento de cada colección (el cursor se recorre en streaming).
+2. Los IDs de la colección de origen se leen con una proyección mínima y se
+   comparan contra ese conjunto en memoria.
+
+Uso por consola::
+
+    python -m cmms_fabrica.modulos.deteccion_huerfanos
+    python -m cmms_fabrica.modulos.deteccion_huerfanos --coleccion tareas_correctivas --json
 """
 
 from __future__ import annotations
 
-from typing import List, Dict
-
-from cmms_fabrica.modulos.conexion_mongo import db
-
-
-def obtener_correctivas_sin_historial() -> List[str]:
-    """Devuelve los ``id_tarea`` sin evento ``historial`` tipo ``correctiva``."""
-    if db is None:
-        return []
-
-    tareas = db["tareas_correctivas"].find({}, {"_id": 0, "id_tarea": 1})
-    ids_faltantes: List[str] = []
-    for tarea in tareas:
-        id_tarea = tarea.get("id_tarea")
-        if not id_tarea:
-            continue
-        query = {"id_origen": id_tarea, "tipo_evento": "correctiva"}
-        if db["historial"].count_documents(query) == 0:
-            ids_faltantes.append(id_tarea)
-    return ids_faltantes
-
-
-def obtener_eventos_correctivos_huerfanos() -> List[Dict[str, str]]:
-    """Lista eventos ``historial`` tipo ``correctiva`` sin ``id_origen`` o ``id_activo_tecnico``."""
-    if db is None:
-        return []
-
-    query = {
-        "tipo_evento": "correctiva",
-        "$or": [
-            {"id_origen": {"$exists": False}},
-            {"id_activo_tecnico": {"$exists": False}},
-            {"id_origen": ""},
-            {"id_activo_tecnico": ""},
-        ],
+import argparse
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from cmms_fabrica.crud.generador_historial import ORIGENES_FALTANTES
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+
+@dataclass(frozen=True)
+class OrigenTrazable:
+    """Colección que registra eventos en ``historial`` con su ID como ``id_origen``."""
+
+    coleccion: str
+    campo_id: str
+    # Expresión regular (sin distinguir mayúsculas) sobre ``tipo_evento``
+    patron_evento: str
+    etiqueta: str
+    requiere_activo: bool = True
+
+
+ORIGENES: Dict[str, OrigenTrazable] = {
+    o.coleccion: o
+    for o in (
+        OrigenTrazable("tareas_correctivas", "id_tarea", "correctiv", "Tareas correctivas"),
+        OrigenTrazable("planes_preventivos", "id_plan", "preventiv", "Planes preventivos"),
+        OrigenTrazable("calibraciones", "id_calibracion", "calibraci", "Calibraciones"),
+        OrigenTrazable("tareas_tecnicas", "id_tarea_tecnica", "tarea t[ée]cnica", "Tareas técnicas"),
+        OrigenTrazable("observaciones", "id_observacion", "observaci", "Observaciones técnicas"),
+        OrigenTrazable("inventario", "id_item", "inventario", "Inventario", requiere_activo=False),
+    )
+}
+# Un origen que ya no existe pero tiene su evento de baja no es huérfano
+PATRON_BAJA = "^baja"
+
+
+def _filtro_tipo(origen: OrigenTrazable) -> Dict[str, Any]:
+    return {"tipo_evento": {"$regex": origen.patron_evento, "$options": "i"}}
+
+
+def _origenes_en_historial(database, origen: OrigenTrazable) -> Dict[str, bool]:
+    """``id_origen`` → ``True`` si tiene evento de baja. Un único ``$group``."""
+    pipeline = [
+        {"$match": {**_filtro_tipo(origen), "id_origen": {"$nin": list(ORIGENES_FALTANTES)}}},
+        {"$group": {
+            "_id": "$id_origen",
+            "baja": {"$max": {"$regexMatch": {"input": "$tipo_evento", "regex": PATRON_BAJA, "options": "i"}}},
+        }},
+    ]
+    return {
+        str(grupo["_id"]): bool(grupo.get("baja"))
+        for grupo in database["historial"].aggregate(pipeline, allowDiskUse=True, batchSize=5000)
     }
-    campos = {"_id": 0, "id_evento": 1, "id_origen": 1, "id_activo_tecnico": 1}
-    return list(db["historial"].find(query, campos))
 
 
-def main() -> None:
-    if db is None:
+def _ids_de_coleccion(database, origen: OrigenTrazable) -> Iterable[str]:
+    cursor = database[origen.coleccion].find(
+        {origen.campo_id: {"$nin": [None, ""]}}, {"_id": 0, origen.campo_id: 1}
+    ).batch_size(5000)
+    for documento in cursor:
+        valor = documento.get(origen.campo_id)
+        if valor not in (None, ""):
+            yield str(valor)
+
+
+def auditar_origen(database, origen: OrigenTrazable) -> Dict[str, List[Any]]:
+    """Huérfanos de una colección de origen.
+
+    - ``sin_historial``: documentos sin ningún evento de su tipo.
+    - ``eventos_sin_origen``: ``id_origen`` con eventos cuyo documento ya no
+      existe y que no registran la baja.
+    - ``eventos_incompletos``: eventos del tipo sin ``id_origen`` o (si
+      corresponde) sin ``id_activo_tecnico``.
+    """
+    en_historial = _origenes_en_historial(database, origen)
+    existentes: Set[str] = set()
+    sin_historial: List[str] = []
+    for id_documento in _ids_de_coleccion(database, origen):
+        existentes.add(id_documento)
+        if id_documento not in en_historial:
+            sin_historial.append(id_documento)
+
+    eventos_sin_origen = sorted(
+        id_origen for id_origen, baja in en_historial.items() if id_origen not in existentes and not baja
+    )
+
+    faltantes: List[Dict[str, Any]] = [{"id_origen": {"$exists": False}}, {"id_origen": {"$in": list(ORIGENES_FALTANTES)}}]
+    if origen.requiere_activo:
+        faltantes += [{"id_activo_tecnico": {"$exists": False}}, {"id_activo_tecnico": {"$in": [None, ""]}}]
+    campos = {"_id": 0, "id_evento": 1, "tipo_evento": 1, "id_origen": 1, "id_activo_tecnico": 1, "fecha_evento": 1}
+    incompletos = list(database["historial"].find({**_filtro_tipo(origen), "$or": faltantes}, campos))
+
+    return {
+        "sin_historial": sorted(sin_historial),
+        "eventos_sin_origen": eventos_sin_origen,
+        "eventos_incompletos": incompletos,
+    }
+
+
+def auditar_trazabilidad(
+    database=None,
+    colecciones: Optional[Iterable[str]] = None,
+) -> Dict[str, Dict[str, List[Any]]]:
+    """Resultado de :func:`auditar_origen` para cada colección de ``ORIGENES``."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return {}
+    nombres = list(colecciones) if colecciones else list(ORIGENES)
+    return {nombre: auditar_origen(database, ORIGENES[nombre]) for nombre in nombres}
+
+
+def obtener_correctivas_sin_historial(database=None) -> List[str]:
+    """Devuelve los ``id_tarea`` sin evento correctivo en ``historial``."""
+    resultado = auditar_trazabilidad(database, ["tareas_correctivas"])
+    return resultado.get("tareas_correctivas", {}).get("sin_historial", [])
+
+
+def obtener_eventos_correctivos_huerfanos(database=None) -> List[Dict[str, str]]:
+    """Lista eventos correctivos sin ``id_origen`` o ``id_activo_tecnico``."""
+    resultado = auditar_trazabilidad(database, ["tareas_correctivas"])
+    return resultado.get("tareas_correctivas", {}).get("eventos_incompletos", [])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Auditoría de trazabilidad entre historial y colecciones de origen")
+    parser.add_argument("--coleccion", action="append", choices=sorted(ORIGENES), help="Repetible; por defecto, todas")
+    parser.add_argument("--json", action="store_true", help="Salida completa en JSON")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
         print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
         return
 
-    correctivas_sin_hist = obtener_correctivas_sin_historial()
-    eventos_huerfanos = obtener_eventos_correctivos_huerfanos()
-
-    print("correctivas_sin_historial:", correctivas_sin_hist)
-    print("eventos_correctivos_huerfanos:", eventos_huerfanos)
+    resultado = auditar_trazabilidad(database, args.coleccion)
+    if args.json:
+        print(json.dumps(resultado, ensure_ascii=False, indent=2, default=str))
+        return
+    for nombre, hallazgos in resultado.items():
+        print(f"{nombre}:")
+        for clave, valores in hallazgos.items():
+            print(f"  {clave}: {len(valores)}", valores[:10] if valores else "")
 
 
 if __name__ == "__main__":
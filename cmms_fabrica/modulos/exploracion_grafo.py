@@ -0,0 +1,208 @@
+"""🧩 Exploración Jerárquica del Grafo – CMMS Fábrica
+
+Recorre el grafo CMMS bajo demanda en lugar de cargarlo completo. Arranca en
+los activos de nivel superior (sin ``pertenece_a``) y cada expansión trae
+solo la vecindad del nodo con una consulta indexada:
+
+- activo → subactivos (``ix_pertenece_a``) y sus eventos más recientes
+  (``ix_activo_fecha``)
+- evento → documento de origen y proveedor externo (datos ya leídos con el evento)
+- origen → eventos del mismo origen (``ix_origen_tipo``)
+- proveedor → eventos del proveedor (``ix_proveedor_fecha``)
+
+Las vecindades ya consultadas quedan en una caché de adyacencia del
+explorador, que la página guarda en ``st.session_state``: contraer y volver a
+expandir no consulta MongoDB.
+
+Normas:
+- ISO 14224 (Taxonomía y jerarquía de equipos)
+- ISO 55001 (Información del activo)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from cmms_fabrica.modulos.app_grafo_cmms import (
+    COLOR_ACTIVO,
+    COLOR_HISTORIAL,
+    COLOR_ORIGEN,
+    COLOR_PROVEEDOR,
+    CAMPOS_HISTORIAL_GRAFO,
+    nx,
+)
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+EVENTOS_POR_EXPANSION = 25
+CAMPOS_ACTIVO = {"_id": 0, "id_activo_tecnico": 1, "nombre": 1, "nivel": 1, "pertenece_a": 1}
+
+Nodo = Tuple[str, Dict[str, Any]]
+
+
+def nodo_activo(activo: Dict[str, Any]) -> Nodo:
+    activo_id = activo["id_activo_tecnico"]
+    nombre = activo.get("nombre", activo_id)
+    nivel = activo.get("nivel")
+    return activo_id, {
+        "label": nombre,
+        "title": f"Activo: {nombre}" + (f" ({nivel})" if nivel else ""),
+        "tipo": "activo",
+        "color": COLOR_ACTIVO,
+    }
+
+
+def nodo_evento(evento: Dict[str, Any]) -> Nodo:
+    fecha = evento.get("fecha_evento")
+    fecha_txt = fecha.isoformat() if hasattr(fecha, "isoformat") else str(fecha or "")
+    nodo = str(evento.get("_id"))
+    return nodo, {
+        "label": fecha_txt or nodo,
+        "title": f"Historial: {evento.get('descripcion', 'Evento en historial')}",
+        "tipo": "historial",
+        "color": COLOR_HISTORIAL,
+        # Datos para expandir el evento sin volver a consultarlo
+        "id_activo_tecnico": evento.get("id_activo_tecnico"),
+        "tipo_evento": evento.get("tipo_evento"),
+        "id_origen": evento.get("id_origen"),
+        "proveedor_externo": evento.get("proveedor_externo"),
+    }
+
+
+def nodo_origen(id_origen: str, tipo_evento: Optional[str] = None) -> Nodo:
+    return f"origen::{id_origen}", {
+        "label": id_origen,
+        "title": f"Origen ({tipo_evento}): {id_origen}" if tipo_evento else f"Origen: {id_origen}",
+        "tipo": "origen",
+        "color": COLOR_ORIGEN,
+        "id_origen": id_origen,
+    }
+
+
+def nodo_proveedor(proveedor: str) -> Nodo:
+    return f"proveedor::{proveedor}", {
+        "label": proveedor,
+        "title": f"Proveedor externo: {proveedor}",
+        "tipo": "proveedor",
+        "color": COLOR_PROVEEDOR,
+        "proveedor": proveedor,
+    }
+
+
+class ExploradorGrafo:
+    """Estado de una exploración: nodos visibles, expandidos y caché de vecindades."""
+
+    def __init__(self, database=None, eventos_por_expansion: int = EVENTOS_POR_EXPANSION):
+        self._database = database
+        self.eventos_por_expansion = eventos_por_expansion
+        self.nodos: Dict[str, Dict[str, Any]] = {}
+        self.expandidos: Set[str] = set()
+        # nodo -> vecinos (id, atributos); se llena una vez por nodo
+        self._adyacencia: Dict[str, List[Nodo]] = {}
+        self._raices: Optional[List[str]] = None
+        self.consultas = 0
+
+    def _db(self):
+        return resolver_db(self._database if self._database is not None else db)
+
+    def raices(self) -> List[str]:
+        """Activos sin ``pertenece_a`` (los sistemas de nivel superior)."""
+        if self._raices is None:
+            database = self._db()
+            self._raices = []
+            if database is not None:
+                self.consultas += 1
+                cursor = database["activos_tecnicos"].find({"pertenece_a": {"$in": [None, ""]}}, CAMPOS_ACTIVO)
+                for activo in sorted(cursor, key=lambda a: a.get("id_activo_tecnico") or ""):
+                    if activo.get("id_activo_tecnico"):
+                        nodo, atributos = nodo_activo(activo)
+                        self.nodos.setdefault(nodo, atributos)
+                        self._raices.append(nodo)
+        return list(self._raices)
+
+    def vecinos(self, nodo: str) -> List[Nodo]:
+        """Vecindad de ``nodo``: de la caché o con una única consulta indexada."""
+        if nodo in self._adyacencia:
+            return self._adyacencia[nodo]
+        atributos = self.nodos.get(nodo, {})
+        tipo = atributos.get("tipo")
+        database = self._db()
+        vecinos: List[Nodo] = []
+        if database is not None and tipo == "activo":
+            vecinos = self._vecinos_activo(database, nodo)
+        elif tipo == "historial":
+            if atributos.get("id_origen"):
+                vecinos.append(nodo_origen(atributos["id_origen"], atributos.get("tipo_evento")))
+            if atributos.get("proveedor_externo"):
+                vecinos.append(nodo_proveedor(atributos["proveedor_externo"]))
+        elif database is not None and tipo == "origen":
+            vecinos = self._eventos(database, {"id_origen": atributos["id_origen"]})
+        elif database is not None and tipo == "proveedor":
+            vecinos = self._eventos(database, {"proveedor_externo": atributos["proveedor"]})
+        self._adyacencia[nodo] = vecinos
+        return vecinos
+
+    def _vecinos_activo(self, database, id_activo: str) -> List[Nodo]:
+        self.consultas += 1
+        hijos = database["activos_tecnicos"].find({"pertenece_a": id_activo}, CAMPOS_ACTIVO)
+        vecinos = [nodo_activo(h) for h in sorted(hijos, key=lambda a: a.get("id_activo_tecnico") or "") if h.get("id_activo_tecnico")]
+        return vecinos + self._eventos(database, {"id_activo_tecnico": id_activo})
+
+    def _eventos(self, database, query: Dict[str, Any]) -> List[Nodo]:
+        self.consultas += 1
+        cursor = (
+            database["historial"]
+            .find(query, CAMPOS_HISTORIAL_GRAFO)
+            .sort("fecha_evento", -1)
+            .limit(self.eventos_por_expansion)
+        )
+        return [nodo_evento(e) for e in cursor]
+
+    def expandir(self, nodo: str) -> int:
+        """Muestra los vecinos de ``nodo``. Devuelve cuántos nodos nuevos aparecieron."""
+        nuevos = 0
+        for vecino, atributos in self.vecinos(nodo):
+            if vecino not in self.nodos:
+                nuevos += 1
+            self.nodos.setdefault(vecino, atributos)
+        self.expandidos.add(nodo)
+        return nuevos
+
+    def contraer(self, nodo: str) -> None:
+        """Oculta lo que se abrió desde ``nodo`` (la caché de vecindades se conserva)."""
+        self.expandidos.discard(nodo)
+        visibles = self._alcanzables()
+        self.expandidos &= visibles
+        self.nodos = {n: a for n, a in self.nodos.items() if n in visibles}
+
+    def _alcanzables(self) -> Set[str]:
+        visibles = set(self.raices())
+        pendientes = [n for n in visibles if n in self.expandidos]
+        while pendientes:
+            nodo = pendientes.pop()
+            for vecino, _ in self._adyacencia.get(nodo, []):
+                if vecino not in visibles:
+                    visibles.add(vecino)
+                    if vecino in self.expandidos:
+                        pendientes.append(vecino)
+        return visibles
+
+    def grafo(self) -> "nx.DiGraph":
+        """Grafo con las raíces y las vecindades expandidas."""
+        if nx is None:
+            raise RuntimeError(
+                "NetworkX no está instalado. Instale el paquete `networkx` para construir el grafo."
+            )
+        grafo = nx.DiGraph()
+        self.raices()
+        visibles = self._alcanzables()
+        for nodo in visibles:
+            atributos = dict(self.nodos.get(nodo, {}))
+            atributos = {k: v for k, v in atributos.items() if k in ("label", "title", "tipo", "color")}
+            if nodo in self.expandidos:
+                atributos["borderWidth"] = 3
+            grafo.add_node(nodo, **atributos)
+        for nodo in self.expandidos & visibles:
+            for vecino, _ in self._adyacencia.get(nodo, []):
+                if vecino in visibles:
+                    grafo.add_edge(nodo, vecino)
+        return grafo
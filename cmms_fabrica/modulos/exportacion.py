@@ -0,0 +1,350 @@
+"""📤 Exportación de Colecciones – CMMS Fábrica
+
+Exporta ``historial`` (o cualquier colección) leyendo un cursor proyectado
+por lotes y escribiendo cada lote apenas llega, sin armar el DataFrame
+completo:
+
+- **xlsx**: ``xlsxwriter`` en modo ``constant_memory`` (cada fila se vuelca a
+  disco al pasar a la siguiente).
+- **csv**: escritura incremental con el módulo ``csv``.
+- **parquet**: un *row group* por lote con ``pyarrow`` (dependencia opcional).
+
+Se usa desde ``app_reportes`` y por consola para los volcados nocturnos::
+
+    python -m cmms_fabrica.modulos.exportacion --formato parquet --desde 2025-01-01
+    python -m cmms_fabrica.modulos.exportacion --coleccion activos_tecnicos --formato csv --salida activos.csv
+
+Normas:
+- ISO 9001:2015 (Conservación de la información documentada)
+- ISO 55001 (Información del activo disponible para auditoría)
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+import xlsxwriter
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+try:  # Parquet es opcional: sin pyarrow solo se ofrecen xlsx y csv
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ("xlsx", "csv", "parquet")
+TAMANO_LOTE = 5000
+LIMITE_FILAS_XLSX = 1_048_575  # filas de datos por hoja (Excel), sin el encabezado
+
+# Columnas por defecto de las colecciones que se exportan habitualmente
+COLUMNAS_POR_COLECCION: Dict[str, List[str]] = {
+    "historial": [
+        "fecha_evento",
+        "tipo_evento",
+        "categoria_evento",
+        "id_activo_tecnico",
+        "id_origen",
+        "criticidad",
+        "descripcion",
+        "usuario_registro",
+        "observaciones",
+    ],
+}
+CAMPO_FECHA_POR_COLECCION = {"historial": "fecha_evento"}
+
+Destino = Union[str, os.PathLike, BinaryIO]
+Lotes = Iterable[Union[pd.DataFrame, Sequence[Dict[str, Any]]]]
+
+
+class FormatoNoDisponibleError(RuntimeError):
+    """El formato pedido necesita una dependencia que no está instalada."""
+
+
+def parquet_disponible() -> bool:
+    return pa is not None
+
+
+def filtro_fechas(campo: str, desde: Optional[date] = None, hasta: Optional[date] = None) -> Dict[str, Any]:
+    """Rango inclusivo sobre ``campo``; vacío si no se indica ninguna fecha."""
+    rango: Dict[str, datetime] = {}
+    if desde:
+        rango["$gte"] = datetime.combine(desde, datetime.min.time())
+    if hasta:
+        rango["$lte"] = datetime.combine(hasta, datetime.max.time())
+    return {campo: rango} if rango else {}
+
+
+def lotes_de_coleccion(
+    coleccion: str = "historial",
+    query: Optional[Dict[str, Any]] = None,
+    columnas: Optional[Sequence[str]] = None,
+    orden: Optional[str] = None,
+    tamano_lote: int = TAMANO_LOTE,
+    database=None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Recorre ``coleccion`` con un cursor proyectado y entrega listas de documentos."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return
+    proyeccion = {"_id": 0, **{c: 1 for c in columnas}} if columnas else None
+    cursor = database[coleccion].find(query or {}, proyeccion).batch_size(tamano_lote)
+    if orden:
+        cursor = cursor.sort(orden, 1)
+    lote: List[Dict[str, Any]] = []
+    for documento in cursor:
+        lote.append(documento)
+        if len(lote) >= tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _registros(lotes: Lotes) -> Iterator[List[Dict[str, Any]]]:
+    """Normaliza lotes de DataFrames o de dicts a listas de dicts."""
+    for lote in lotes:
+        if isinstance(lote, pd.DataFrame):
+            yield lote.to_dict("records")
+        else:
+            yield list(lote)
+
+
+def _valor_plano(valor: Any) -> Any:
+    """Valor escribible en una celda: fechas y números tal cual, el resto como texto."""
+    if valor is None or valor is pd.NaT:
+        return None
+    if isinstance(valor, float) and pd.isna(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, (datetime, date, bool, int, float, str)):
+        return valor
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return str(valor)
+
+
+def _columnas(primer_lote: List[Dict[str, Any]], columnas: Optional[Sequence[str]]) -> List[str]:
+    if columnas:
+        return list(columnas)
+    vistas: Dict[str, None] = {}
+    for documento in primer_lote:
+        for clave in documento:
+            if clave != "_id":
+                vistas.setdefault(clave, None)
+    return list(vistas)
+
+
+def _abrir_texto(destino: Destino):
+    if isinstance(destino, (str, os.PathLike)):
+        return open(destino, "w", encoding="utf-8-sig", newline=""), True
+    return io.TextIOWrapper(destino, encoding="utf-8-sig", newline="", write_through=True), False
+
+
+def escribir_csv(lotes: Lotes, destino: Destino, columnas: Optional[Sequence[str]] = None) -> int:
+    """Escribe los lotes en CSV a medida que llegan. Devuelve las filas escritas."""
+    archivo, propio = _abrir_texto(destino)
+    escritas = 0
+    try:
+        escritor = None
+        for registros in _registros(lotes):
+            if escritor is None:
+                escritor = csv.DictWriter(archivo, fieldnames=_columnas(registros, columnas), extrasaction="ignore")
+                escritor.writeheader()
+            escritor.writerows({c: _valor_plano(r.get(c)) for c in escritor.fieldnames} for r in registros)
+            escritas += len(registros)
+        if escritor is None and columnas:
+            csv.DictWriter(archivo, fieldnames=list(columnas)).writeheader()
+    finally:
+        if propio:
+            archivo.close()
+        else:
+            # El envoltorio no debe cerrar el buffer del llamador
+            archivo.detach()
+    return escritas
+
+
+def escribir_xlsx(hojas: Dict[str, Any], destino: Destino) -> int:
+    """Escribe un libro con una hoja por entrada de ``hojas``.
+
+    ``hojas`` mapea el nombre de la hoja a sus lotes, o a ``(lotes, columnas)``.
+    Con ``constant_memory`` las filas se escriben en orden y se liberan al
+    avanzar; una hoja que supera el límite de Excel continúa en "<nombre> (2)".
+    Devuelve las filas escritas en total.
+    """
+    libro = xlsxwriter.Workbook(destino, {"constant_memory": True, "remove_timezone": True})
+    negrita = libro.add_format({"bold": True})
+    formato_fecha = libro.add_format({"num_format": "yyyy-mm-dd hh:mm"})
+    total = 0
+    try:
+        for nombre, contenido in hojas.items():
+            lotes, columnas = contenido if isinstance(contenido, tuple) else (contenido, None)
+            hoja, fila, parte = None, 0, 1
+            encabezado: List[str] = list(columnas or [])
+            for registros in _registros(lotes):
+                if hoja is None:
+                    encabezado = _columnas(registros, columnas)
+                for registro in registros:
+                    if hoja is None or fila > LIMITE_FILAS_XLSX:
+                        titulo = nombre if hoja is None else f"{nombre} ({parte})"
+                        parte += 1
+                        hoja = libro.add_worksheet(titulo[:31])
+                        hoja.write_row(0, 0, encabezado, negrita)
+                        fila = 1
+                    for col, campo in enumerate(encabezado):
+                        valor = _valor_plano(registro.get(campo))
+                        if isinstance(valor, (datetime, date)):
+                            hoja.write_datetime(fila, col, valor, formato_fecha)
+                        elif valor is not None:
+                            hoja.write(fila, col, valor)
+                    fila += 1
+                    total += 1
+            if hoja is None and encabezado:
+                libro.add_worksheet(nombre[:31]).write_row(0, 0, encabezado, negrita)
+        if not libro.worksheets():
+            libro.add_worksheet("Sin datos")
+    finally:
+        libro.close()
+    return total
+
+
+def _tipo_arrow(valor: Any):
+    if isinstance(valor, bool):
+        return pa.bool_()
+    if isinstance(valor, int):
+        return pa.int64()
+    if isinstance(valor, float):
+        return pa.float64()
+    if isinstance(valor, (datetime, date)):
+        return pa.timestamp("ms")
+    return pa.string()
+
+
+def _esquema(registros: List[Dict[str, Any]], columnas: List[str]):
+    campos = []
+    for columna in columnas:
+        muestra = next((_valor_plano(r.get(columna)) for r in registros if _valor_plano(r.get(columna)) is not None), None)
+        campos.append(pa.field(columna, _tipo_arrow(muestra) if muestra is not None else pa.string()))
+    return pa.schema(campos)
+
+
+def _columna_arrow(valores: List[Any], tipo):
+    """Convierte una columna al tipo del esquema; lo que no encaja pasa a nulo o texto."""
+    if tipo == pa.string():
+        return pa.array([None if v is None else str(v) for v in valores], type=tipo)
+    try:
+        return pa.array(valores, type=tipo)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        return pa.array([v if isinstance(v, (datetime, date, bool, int, float)) else None for v in valores], type=tipo)
+
+
+def escribir_parquet(lotes: Lotes, destino: Destino, columnas: Optional[Sequence[str]] = None) -> int:
+    """Escribe un *row group* por lote. El esquema se fija con el primer lote."""
+    if pa is None:
+        raise FormatoNoDisponibleError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+    escritor = None
+    escritas = 0
+    try:
+        for registros in _registros(lotes):
+            if escritor is None:
+                nombres = _columnas(registros, columnas)
+                esquema = _esquema(registros, nombres)
+                escritor = pq.ParquetWriter(destino, esquema)
+            tabla = pa.Table.from_arrays(
+                [
+                    _columna_arrow([_valor_plano(r.get(campo.name)) for r in registros], campo.type)
+                    for campo in esquema
+                ],
+                schema=esquema,
+            )
+            escritor.write_table(tabla)
+            escritas += len(registros)
+        if escritor is None:
+            nombres = list(columnas or [])
+            vacio = pa.schema([pa.field(c, pa.string()) for c in nombres])
+            pq.write_table(vacio.empty_table(), destino)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return escritas
+
+
+def escribir(formato: str, lotes: Lotes, destino: Destino, columnas: Optional[Sequence[str]] = None, hoja: str = "Datos") -> int:
+    """Despacha al escritor de ``formato``. Devuelve las filas escritas."""
+    if formato == "xlsx":
+        return escribir_xlsx({hoja: (lotes, columnas)}, destino)
+    if formato == "csv":
+        return escribir_csv(lotes, destino, columnas)
+    if formato == "parquet":
+        return escribir_parquet(lotes, destino, columnas)
+    raise ValueError(f"Formato no soportado: {formato}. Opciones: {', '.join(FORMATOS)}")
+
+
+def exportar_coleccion(
+    formato: str,
+    destino: Destino,
+    coleccion: str = "historial",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    columnas: Optional[Sequence[str]] = None,
+    tamano_lote: int = TAMANO_LOTE,
+    database=None,
+) -> int:
+    """Exporta ``coleccion`` (filtrada por fecha si la colección tiene campo de fecha)."""
+    columnas = list(columnas) if columnas else COLUMNAS_POR_COLECCION.get(coleccion)
+    campo_fecha = CAMPO_FECHA_POR_COLECCION.get(coleccion)
+    query = filtro_fechas(campo_fecha, desde, hasta) if campo_fecha else {}
+    lotes = lotes_de_coleccion(coleccion, query, columnas, campo_fecha, tamano_lote, database)
+    return escribir(formato, lotes, destino, columnas, hoja=coleccion)
+
+
+def exportar_a_bytes(formato: str, lotes: Lotes, columnas: Optional[Sequence[str]] = None, hoja: str = "Datos") -> bytes:
+    """Variante para ``st.download_button``: escribe en memoria y devuelve los bytes."""
+    buffer = io.BytesIO()
+    escribir(formato, lotes, buffer, columnas, hoja=hoja)
+    return buffer.getvalue()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exportación de colecciones por lotes (xlsx, csv, parquet)")
+    parser.add_argument("--coleccion", default="historial", help="Colección a exportar")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument("--columnas", help="Campos separados por coma (por defecto, los de la colección)")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Documentos por lote")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto <coleccion>_<AAAAMMDD>.<formato>)")
+    args = parser.parse_args(argv)
+
+    if args.formato == "parquet" and not parquet_disponible():
+        print("❌ La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+        return
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+
+    salida = args.salida or f"{args.coleccion}_{date.today():%Y%m%d}.{args.formato}"
+    columnas = [c.strip() for c in args.columnas.split(",") if c.strip()] if args.columnas else None
+    filas = exportar_coleccion(
+        args.formato, salida, args.coleccion, args.desde, args.hasta, columnas, args.lote, database
+    )
+    print("filas_exportadas:", filas)
+    print("archivo:", salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""🔢 Generador de Identificadores – CMMS Fábrica
+
+Emite identificadores monótonos con los prefijos históricos (``TC-``,
+``PP-``, ``CAL-``, ``OBS_``, ``HIST_``...) a partir de un contador atómico por
+prefijo en la colección ``contadores``. Cada proceso reserva bloques de
+números con un único ``find_one_and_update`` y los entrega desde memoria.
+
+La primera vez que se usa un prefijo (el ``find_one_and_update`` no encuentra
+el contador) se inicializa con el timestamp actual, de modo que los nuevos IDs
+quedan siempre por encima de los generados con ``int(datetime.now().timestamp())``
+y no pueden colisionar con ellos. Esto permite índices únicos sobre cada ``id_*``.
+
+Los IDs que el usuario puede escribir en un formulario se validan con
+:func:`verificar_id_libre` antes de guardar; :func:`id_unico` traduce el
+``DuplicateKeyError`` de un alta simultánea a ``IdDuplicadoError``, que las
+páginas muestran con ``st.error``.
+
+Normas:
+- ISO 9001:2015 (Identificación y trazabilidad)
+"""
+
+from __future__ import annotations
+
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION_CONTADORES = "contadores"
+TAMANO_BLOQUE = 20
+
+# Prefijos con alto volumen reservan bloques más grandes
+TAMANOS_BLOQUE: Dict[str, int] = {"HIST_": 200}
+
+
+def _id_de_respaldo(prefijo: str) -> str:
+    """ID sin contador: timestamp más sufijo aleatorio para evitar la colisión por segundo."""
+    return f"{prefijo}{int(time.time())}-{secrets.token_hex(2)}"
+
+
+class IdDuplicadoError(ValueError):
+    """Ya existe otro documento con el mismo ID (índice único ``uq_<campo>``)."""
+
+
+def _mensaje_duplicado(entidad: str, valor: Any) -> str:
+    return f"Ya existe {entidad} con el ID '{valor}'."
+
+
+def verificar_id_libre(coleccion, campo: str, valor: Any, entidad: str, excluir: Any = None) -> None:
+    """Lanza ``IdDuplicadoError`` si otro documento (distinto de ``excluir``) ya usa ``valor``."""
+    filtro: Dict[str, Any] = {campo: valor}
+    if excluir is not None:
+        filtro["_id"] = {"$ne": excluir}
+    if coleccion.find_one(filtro, {"_id": 1}):
+        raise IdDuplicadoError(_mensaje_duplicado(entidad, valor))
+
+
+@contextmanager
+def id_unico(valor: Any, entidad: str) -> Iterator[None]:
+    """Traduce el ``DuplicateKeyError`` de una escritura a ``IdDuplicadoError``."""
+    try:
+        yield
+    except DuplicateKeyError:
+        raise IdDuplicadoError(_mensaje_duplicado(entidad, valor)) from None
+
+
+class GeneradorIds:
+    """Reserva bloques de un contador atómico y entrega IDs desde memoria."""
+
+    def __init__(self, tamano_bloque: int = TAMANO_BLOQUE):
+        self.tamano_bloque = tamano_bloque
+        self._lock = threading.Lock()
+        # prefijo -> (base, próximo número, último número reservado)
+        self._bloques: Dict[str, Tuple[Any, int, int]] = {}
+
+    def siguiente(self, prefijo: str, database=None) -> str:
+        database = resolver_db(database if database is not None else db)
+        if database is None:
+            return _id_de_respaldo(prefijo)
+
+        with self._lock:
+            base, proximo, ultimo = self._bloques.get(prefijo, (None, 1, 0))
+            if base is not database or proximo > ultimo:
+                try:
+                    proximo, ultimo = self._reservar_bloque(database, prefijo)
+                except Exception as exc:
+                    # Generar un ID nunca debe impedir registrar el documento
+                    logger.warning("No se pudo reservar bloque de IDs %s: %s", prefijo, exc)
+                    return _id_de_respaldo(prefijo)
+            self._bloques[prefijo] = (database, proximo + 1, ultimo)
+        return f"{prefijo}{proximo}"
+
+    def _reservar_bloque(self, database, prefijo: str) -> Tuple[int, int]:
+        contadores = database[COLECCION_CONTADORES]
+        bloque = TAMANOS_BLOQUE.get(prefijo, self.tamano_bloque)
+        documento = contadores.find_one_and_update(
+            {"_id": prefijo},
+            {"$inc": {"valor": bloque}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if documento is None:
+            # Semilla: nunca por debajo de los IDs históricos basados en timestamp.
+            # ``$max`` deja igual un contador que otro proceso ya inicializó.
+            contadores.update_one({"_id": prefijo}, {"$max": {"valor": int(time.time())}}, upsert=True)
+            documento = contadores.find_one_and_update(
+                {"_id": prefijo},
+                {"$inc": {"valor": bloque}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        ultimo = int(documento["valor"])
+        return ultimo - bloque + 1, ultimo
+
+
+_generador = GeneradorIds()
+
+
+def generar_id(prefijo: str, database=None) -> str:
+    """Devuelve el próximo ID para ``prefijo`` (p. ej. ``generar_id("TC-")``)."""
+    return _generador.siguiente(prefijo, database)
+
+
+def _eventos_duplicados(historial):
+    """Grupos de ``_id`` que comparten ``id_evento``, en orden de inserción."""
+    return historial.aggregate([
+        {"$match": {"id_evento": {"$type": "string"}}},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$id_evento", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+
+def contar_eventos_duplicados(database=None) -> int:
+    """Cuántos eventos renumeraría :func:`renumerar_eventos_duplicados` (sin escribir)."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+    return sum(grupo["n"] - 1 for grupo in _eventos_duplicados(database["historial"]))
+
+
+def renumerar_eventos_duplicados(database=None) -> int:
+    """Asigna un ``id_evento`` nuevo a los eventos de ``historial`` que lo comparten.
+
+    Conserva el primer evento de cada grupo. Solo aplica a ``historial``:
+    ningún otro documento referencia ``id_evento``, a diferencia de los IDs de
+    tareas o planes que ``historial`` usa como ``id_origen``.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+
+    historial = database["historial"]
+    renumerados = 0
+    for grupo in _eventos_duplicados(historial):
+        for _id in grupo["ids"][1:]:
+            historial.update_one({"_id": _id}, {"$set": {"id_evento": generar_id("HIST_", database)}})
+            renumerados += 1
+    return renumerados
@@ -0,0 +1,172 @@
+"""📈 Renderizado de Gráficos – CMMS Fábrica
+
+Capa común para los gráficos de los tableros:
+
+- Las figuras de matplotlib se crean con la API orientada a objetos
+  (``Figure`` + ``FigureCanvasAgg``), fuera del registro global de
+  ``pyplot``, y se liberan siempre: la memoria del worker no crece con las
+  sesiones.
+- El PNG resultante se guarda en una caché LRU indexada por un hash de los
+  datos agregados y del tipo de gráfico; un rerun con los mismos datos no
+  vuelve a dibujar.
+- Con ``nativo=True`` (o ``CMMS_GRAFICOS_NATIVOS=1``) se emiten gráficos
+  nativos de Streamlit (Vega-Lite), que se dibujan en el navegador.
+
+Normas:
+- ISO 9001:2015 (Seguimiento y medición: presentación de indicadores)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Callable, Optional
+
+import matplotlib
+
+# Backend sin interfaz gráfica para compatibilidad con Render y otros entornos headless.
+if not matplotlib.get_backend().lower().startswith("agg"):
+    matplotlib.use("Agg", force=True)
+
+import matplotlib.dates as mdates
+import pandas as pd
+import streamlit as st
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+MAX_IMAGENES = int(os.getenv("CMMS_GRAFICOS_CACHE_MAX", "128"))
+GRAFICOS_NATIVOS = os.getenv("CMMS_GRAFICOS_NATIVOS", "0") == "1"
+
+_imagenes: "OrderedDict[str, bytes]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def hash_datos(datos: Any) -> str:
+    """Huella estable de una Series/DataFrame agregada (valores, índice y columnas)."""
+    h = hashlib.sha1()
+    if isinstance(datos, (pd.Series, pd.DataFrame)):
+        h.update(pd.util.hash_pandas_object(datos, index=True).values.tobytes())
+        if isinstance(datos, pd.DataFrame):
+            h.update(repr(list(datos.columns)).encode())
+        else:
+            h.update(repr(datos.name).encode())
+    else:
+        h.update(repr(datos).encode())
+    return h.hexdigest()
+
+
+def renderizar_png(clave: str, dibujar: Callable[[Figure], None], dpi: int = 100) -> bytes:
+    """Devuelve el PNG de ``dibujar(fig)``; reutiliza el de la caché si ``clave`` ya existe."""
+    with _lock:
+        if clave in _imagenes:
+            _imagenes.move_to_end(clave)
+            return _imagenes[clave]
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    try:
+        dibujar(fig)
+        buffer = BytesIO()
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+        png = buffer.getvalue()
+    finally:
+        fig.clear()
+
+    with _lock:
+        _imagenes[clave] = png
+        while len(_imagenes) > MAX_IMAGENES:
+            _imagenes.popitem(last=False)
+    return png
+
+
+def limpiar_cache() -> None:
+    with _lock:
+        _imagenes.clear()
+
+
+def grafico_barras(
+    serie: pd.Series,
+    titulo: str,
+    xlabel: str,
+    ylabel: str = "Cantidad",
+    color: str = "skyblue",
+    rotacion: int = 0,
+    nativo: Optional[bool] = None,
+) -> None:
+    """Barras de una serie agregada."""
+    if nativo if nativo is not None else GRAFICOS_NATIVOS:
+        st.bar_chart(serie, x_label=xlabel, y_label=ylabel)
+        return
+
+    def dibujar(fig: Figure) -> None:
+        ax = fig.subplots()
+        serie.plot(kind="bar", ax=ax, color=color, edgecolor="black")
+        ax.set_ylabel(ylabel)
+        ax.set_xlabel(xlabel)
+        ax.set_title(titulo)
+        ax.tick_params(axis="x", rotation=rotacion)
+
+    clave = hash_datos((("barras", titulo, xlabel, ylabel, color, rotacion), hash_datos(serie)))
+    st.image(renderizar_png(clave, dibujar))
+
+
+def grafico_lineas_mensual(
+    df: pd.DataFrame,
+    titulo: str,
+    leyenda: str,
+    desde: Optional[pd.Timestamp] = None,
+    hasta: Optional[pd.Timestamp] = None,
+    nativo: Optional[bool] = None,
+) -> None:
+    """Líneas por columna con un índice mensual de fechas."""
+    if nativo if nativo is not None else GRAFICOS_NATIVOS:
+        st.line_chart(df, x_label="Mes", y_label="Cantidad")
+        return
+
+    def dibujar(fig: Figure) -> None:
+        ax = fig.subplots()
+        df.plot(ax=ax, marker="o")
+        ax.set_ylabel("Cantidad")
+        ax.set_xlabel("Mes")
+        ax.set_title(titulo)
+        ax.legend(title=leyenda, loc="upper left")
+        if desde is not None and hasta is not None:
+            ax.set_xlim([desde, hasta])
+        ax.xaxis.set_major_locator(mdates.MonthLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%b"))
+        ax.tick_params(axis="x", rotation=0)
+
+    clave = hash_datos((("lineas", titulo, leyenda, str(desde), str(hasta)), hash_datos(df)))
+    st.image(renderizar_png(clave, dibujar))
+
+
+def grafico_mapa_calor(
+    df: pd.DataFrame,
+    titulo: str,
+    xlabel: str,
+    ylabel: str,
+    nativo: Optional[bool] = None,
+) -> None:
+    """Mapa de calor de una matriz (filas × columnas de fechas semanales)."""
+    if nativo if nativo is not None else GRAFICOS_NATIVOS:
+        tabla = df.rename(columns=lambda c: f"{c:%d/%m}" if isinstance(c, pd.Timestamp) else c)
+        st.dataframe(tabla.style.background_gradient(cmap="YlOrRd", axis=None), use_container_width=True)
+        return
+
+    def dibujar(fig: Figure) -> None:
+        fig.set_size_inches(max(8, 0.25 * df.shape[1]), max(2, 0.35 * df.shape[0] + 1))
+        ax = fig.subplots()
+        imagen = ax.imshow(df.to_numpy(), aspect="auto", cmap="YlOrRd", interpolation="nearest")
+        ax.set_yticks(range(df.shape[0]), [str(i) for i in df.index])
+        marcas = range(0, df.shape[1], 4)
+        ax.set_xticks(list(marcas), [f"{df.columns[i]:%d/%m}" for i in marcas])
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(titulo)
+        fig.colorbar(imagen, ax=ax, label="Intervenciones")
+
+    clave = hash_datos((("mapa_calor", titulo, xlabel, ylabel), hash_datos(df)))
+    st.image(renderizar_png(clave, dibujar))
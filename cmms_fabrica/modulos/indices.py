@@ -0,0 +1,327 @@
+"""🗂️ Gestión de Índices MongoDB – CMMS Fábrica
+
+Declara los índices que necesitan las consultas del CMMS y los reconcilia
+contra la base real. Se ejecuta al iniciar la app y también desde consola:
+
+    python -m cmms_fabrica.modulos.indices            # informa la deriva
+    python -m cmms_fabrica.modulos.indices --aplicar  # crea lo faltante
+
+La deriva se informa como índices faltantes, sobrantes (presentes en la base
+pero no declarados) y divergentes (mismo nombre con otra definición).
+
+Normas:
+- ISO 9001:2015 (Control de registros: consultas de trazabilidad sostenibles)
+- ISO 55001 (Información del activo disponible para la toma de decisiones)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.generador_ids import contar_eventos_duplicados, renumerar_eventos_duplicados
+
+logger = logging.getLogger(__name__)
+
+Clave = Tuple[Tuple[str, int], ...]
+
+
+@dataclass(frozen=True)
+class IndiceDeclarado:
+    """Definición de un índice esperado en una colección."""
+
+    nombre: str
+    campos: Clave
+    unico: bool = False
+    # Filtro parcial: evita que documentos sin el campo colisionen en índices únicos
+    filtro_parcial: Optional[Dict[str, Any]] = field(default=None, hash=False, compare=False)
+    # Nombres anteriores del mismo índice: se eliminan una vez creado el nuevo
+    reemplaza: Tuple[str, ...] = ()
+
+    def opciones(self) -> Dict[str, Any]:
+        opciones: Dict[str, Any] = {"name": self.nombre}
+        if self.unico:
+            opciones["unique"] = True
+        if self.filtro_parcial:
+            opciones["partialFilterExpression"] = self.filtro_parcial
+        return opciones
+
+
+def _id_unico(campo: str) -> IndiceDeclarado:
+    """Índice único sobre un identificador de negocio (``id_*``)."""
+    return IndiceDeclarado(
+        nombre=f"uq_{campo}",
+        campos=((campo, 1),),
+        unico=True,
+        filtro_parcial={campo: {"$type": "string"}},
+        reemplaza=(f"ix_{campo}",),
+    )
+
+
+# 📐 Índices declarados por colección
+INDICES: Dict[str, List[IndiceDeclarado]] = {
+    "historial": [
+        IndiceDeclarado("ix_fecha_evento", (("fecha_evento", -1),)),
+        IndiceDeclarado("ix_fecha_activo", (("fecha_evento", 1), ("id_activo_tecnico", 1))),
+        IndiceDeclarado("ix_activo_fecha", (("id_activo_tecnico", 1), ("fecha_evento", -1))),
+        IndiceDeclarado("ix_origen_tipo", (("id_origen", 1), ("tipo_evento", 1))),
+        IndiceDeclarado("ix_categoria_fecha", (("categoria_evento", 1), ("fecha_evento", -1))),
+        IndiceDeclarado("ix_proveedor_fecha", (("proveedor_externo", 1), ("fecha_evento", -1))),
+        _id_unico("id_evento"),
+    ],
+    "historial_rollups": [
+        IndiceDeclarado(
+            "uq_bucket",
+            (
+                ("periodo", 1),
+                ("fecha", 1),
+                ("categoria", 1),
+                ("id_activo_tecnico", 1),
+                ("criticidad", 1),
+                ("usuario_registro", 1),
+            ),
+            unico=True,
+        ),
+    ],
+    "trabajos_reportes": [
+        IndiceDeclarado("ix_huella_estado", (("huella", 1), ("estado", 1))),
+        IndiceDeclarado("ix_usuario_creado", (("usuario", 1), ("creado", -1))),
+    ],
+    "almacenamiento_muestras": [
+        IndiceDeclarado("ix_fecha", (("fecha", -1),)),
+    ],
+    "planificador_historial": [
+        IndiceDeclarado("ix_tarea_inicio", (("tarea", 1), ("inicio", -1))),
+    ],
+    "activos_tecnicos": [
+        _id_unico("id_activo_tecnico"),
+        IndiceDeclarado("ix_pertenece_a", (("pertenece_a", 1),)),
+        IndiceDeclarado("ix_ancestros", (("ancestros", 1),)),
+    ],
+    "planes_preventivos": [
+        _id_unico("id_plan"),
+        IndiceDeclarado("ix_activo", (("id_activo_tecnico", 1),)),
+        IndiceDeclarado(
+            "ix_estado_proxima_dt",
+            (("estado", 1), ("proxima_fecha_dt", 1)),
+            reemplaza=("ix_estado_proxima",),
+        ),
+        IndiceDeclarado("ix_estado_uso_restante", (("estado", 1), ("uso_restante", 1))),
+    ],
+    "tareas_correctivas": [
+        _id_unico("id_tarea"),
+        IndiceDeclarado("ix_incompleto_fecha", (("incompleto", 1), ("fecha_evento", -1))),
+        IndiceDeclarado("ix_fecha_evento", (("fecha_evento", -1),)),
+    ],
+    "tareas_tecnicas": [
+        _id_unico("id_tarea_tecnica"),
+        IndiceDeclarado("ix_fecha_evento", (("fecha_evento", -1),)),
+    ],
+    "observaciones": [
+        _id_unico("id_observacion"),
+        IndiceDeclarado("ix_fecha_evento", (("fecha_evento", -1),)),
+    ],
+    "calibraciones": [
+        _id_unico("id_calibracion"),
+        IndiceDeclarado("ix_fecha_calibracion", (("fecha_calibracion", -1),)),
+        IndiceDeclarado("ix_fecha_proxima", (("fecha_proxima", 1),)),
+    ],
+    "consumos": [
+        _id_unico("id_consumo"),
+        IndiceDeclarado("ix_tipo_fecha", (("tipo_consumo", 1), ("fecha", -1))),
+    ],
+    "medidores_uso": [
+        IndiceDeclarado("uq_medidor", (("medidor", 1),), unico=True),
+    ],
+    "inventario": [
+        _id_unico("id_item"),
+        IndiceDeclarado("ix_ultima_actualizacion", (("ultima_actualizacion", 1),)),
+    ],
+    "servicios_externos": [
+        _id_unico("id_proveedor"),
+        IndiceDeclarado("ix_nombre", (("nombre", 1),)),
+        IndiceDeclarado("ix_fecha_realizacion", (("fecha_realizacion", 1),)),
+    ],
+    "usuarios": [
+        _id_unico("usuario"),
+    ],
+}
+
+
+@dataclass
+class DerivaIndices:
+    """Diferencias entre los índices declarados y los existentes."""
+
+    faltantes: Dict[str, List[str]] = field(default_factory=dict)
+    sobrantes: Dict[str, List[str]] = field(default_factory=dict)
+    divergentes: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def hay_deriva(self) -> bool:
+        return bool(self.faltantes or self.sobrantes or self.divergentes)
+
+
+def _normalizar_clave(clave: Sequence[Tuple[str, Any]]) -> Clave:
+    return tuple((campo, int(orden)) for campo, orden in clave)
+
+
+def _coincide(declarado: IndiceDeclarado, existente: Dict[str, Any]) -> bool:
+    if _normalizar_clave(existente.get("key", [])) != declarado.campos:
+        return False
+    if bool(existente.get("unique", False)) != declarado.unico:
+        return False
+    return existente.get("partialFilterExpression") == declarado.filtro_parcial
+
+
+def detectar_deriva(
+    database=None,
+    declarados: Optional[Dict[str, List[IndiceDeclarado]]] = None,
+) -> DerivaIndices:
+    """Compara los índices declarados con los presentes en la base."""
+    database = resolver_db(database if database is not None else db)
+    declarados = declarados if declarados is not None else INDICES
+    deriva = DerivaIndices()
+    if database is None:
+        return deriva
+
+    for coleccion, indices in declarados.items():
+        existentes = database[coleccion].index_information()
+        nombres_declarados = {indice.nombre for indice in indices}
+
+        for indice in indices:
+            actual = existentes.get(indice.nombre)
+            if actual is None:
+                deriva.faltantes.setdefault(coleccion, []).append(indice.nombre)
+            elif not _coincide(indice, actual):
+                deriva.divergentes.setdefault(coleccion, []).append(indice.nombre)
+
+        for nombre in existentes:
+            if nombre != "_id_" and nombre not in nombres_declarados:
+                deriva.sobrantes.setdefault(coleccion, []).append(nombre)
+
+    return deriva
+
+
+def asegurar_indices(
+    database=None,
+    declarados: Optional[Dict[str, List[IndiceDeclarado]]] = None,
+    eliminar_sobrantes: bool = False,
+) -> Dict[str, List[str]]:
+    """Crea los índices faltantes y recrea los divergentes.
+
+    Devuelve un resumen ``{"creados": [...], "eliminados": [...], "errores": [...]}``
+    con entradas ``coleccion.indice``. Un índice único que no puede crearse
+    (por ejemplo por duplicados existentes) se informa como error sin cortar
+    el resto de la reconciliación.
+    """
+    database = resolver_db(database if database is not None else db)
+    declarados = declarados if declarados is not None else INDICES
+    resumen: Dict[str, List[str]] = {"creados": [], "eliminados": [], "errores": []}
+    if database is None:
+        return resumen
+
+    deriva = detectar_deriva(database, declarados)
+
+    for coleccion, indices in declarados.items():
+        col = database[coleccion]
+        pendientes = set(deriva.faltantes.get(coleccion, []))
+        divergentes = set(deriva.divergentes.get(coleccion, []))
+        sobrantes = deriva.sobrantes.get(coleccion, [])
+
+        for indice in indices:
+            try:
+                if indice.nombre in pendientes or indice.nombre in divergentes:
+                    if indice.nombre in divergentes:
+                        col.drop_index(indice.nombre)
+                    col.create_index(list(indice.campos), **indice.opciones())
+                    resumen["creados"].append(f"{coleccion}.{indice.nombre}")
+                # El índice nuevo ya existe: el nombre anterior deja de hacer falta
+                for anterior in indice.reemplaza:
+                    if anterior in sobrantes:
+                        col.drop_index(anterior)
+                        resumen["eliminados"].append(f"{coleccion}.{anterior}")
+            except (OperationFailure, PyMongoError) as exc:
+                logger.warning("No se pudo crear %s.%s: %s", coleccion, indice.nombre, exc)
+                resumen["errores"].append(f"{coleccion}.{indice.nombre}: {exc}")
+
+        if eliminar_sobrantes:
+            for nombre in sobrantes:
+                if f"{coleccion}.{nombre}" in resumen["eliminados"]:
+                    continue
+                try:
+                    col.drop_index(nombre)
+                    resumen["eliminados"].append(f"{coleccion}.{nombre}")
+                except PyMongoError as exc:
+                    resumen["errores"].append(f"{coleccion}.{nombre}: {exc}")
+
+    return resumen
+
+
+_indices_verificados = False
+
+
+def asegurar_indices_al_iniciar(database=None) -> None:
+    """Reconcilia los índices una sola vez por proceso (arranque de la app)."""
+    global _indices_verificados
+    if _indices_verificados:
+        return
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return
+    try:
+        resumen = asegurar_indices(database)
+    except PyMongoError as exc:
+        logger.warning("Reconciliación de índices omitida: %s", exc)
+        return
+    _indices_verificados = True
+    if resumen["creados"]:
+        logger.info("Índices creados: %s", ", ".join(resumen["creados"]))
+    for error in resumen["errores"]:
+        logger.warning("Índice pendiente: %s", error)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reconciliación de índices del CMMS")
+    parser.add_argument("--aplicar", action="store_true", help="Crea los índices faltantes o divergentes")
+    parser.add_argument(
+        "--renumerar-eventos",
+        action="store_true",
+        help="Antes de aplicar, renumera id_evento duplicados en historial (sin --aplicar solo los cuenta)",
+    )
+    parser.add_argument(
+        "--eliminar-sobrantes",
+        action="store_true",
+        help="Junto con --aplicar, elimina índices no declarados",
+    )
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+
+    if args.renumerar_eventos:
+        if args.aplicar:
+            print("eventos_renumerados:", renumerar_eventos_duplicados(database))
+        else:
+            print("eventos_a_renumerar:", contar_eventos_duplicados(database))
+
+    if args.aplicar:
+        resumen = asegurar_indices(database, eliminar_sobrantes=args.eliminar_sobrantes)
+        print("creados:", resumen["creados"])
+        print("eliminados:", resumen["eliminados"])
+        print("errores:", resumen["errores"])
+
+    deriva = detectar_deriva(database)
+    print("faltantes:", deriva.faltantes)
+    print("sobrantes:", deriva.sobrantes)
+    print("divergentes:", deriva.divergentes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""🌳 Jerarquía de Activos Técnicos – CMMS Fábrica
+
+Materializa en cada activo el arreglo ``ancestros`` (IDs desde la raíz hasta
+el padre directo) a partir de ``pertenece_a``. Con el índice ``ix_ancestros``
+los subactivos de cualquier nivel (sistema → subsistema → equipo) salen de
+una única consulta: ``{"ancestros": id}``.
+
+``pertenece_a`` sigue siendo la relación vigente; ``ancestros`` es un dato
+derivado que se mantiene al crear, editar o eliminar activos y que puede
+recalcularse completo::
+
+    python -m cmms_fabrica.modulos.jerarquia_activos
+
+Normas:
+- ISO 14224 (Taxonomía y jerarquía de equipos)
+- ISO 55001 (Información del activo)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION = "activos_tecnicos"
+
+
+class CicloJerarquiaError(ValueError):
+    """El padre elegido es el propio activo o uno de sus descendientes."""
+
+
+def calcular_ancestros(id_activo: Optional[str], pertenece_a: Optional[str], database=None) -> List[str]:
+    """Ancestros de un activo cuyo padre directo es ``pertenece_a``.
+
+    Si el padre no existe, la cadena termina en él (``[pertenece_a]``).
+    """
+    database = resolver_db(database if database is not None else db)
+    if not pertenece_a or database is None:
+        return []
+    padre = database[COLECCION].find_one(
+        {"id_activo_tecnico": pertenece_a}, {"_id": 0, "ancestros": 1, "pertenece_a": 1}
+    )
+    ancestros = list((padre or {}).get("ancestros") or []) + [pertenece_a]
+    if id_activo and id_activo in ancestros:
+        raise CicloJerarquiaError(f"'{pertenece_a}' no puede ser padre de '{id_activo}': genera un ciclo")
+    return ancestros
+
+
+def descendientes(id_activo: str, database=None) -> List[str]:
+    """IDs de todos los subactivos de ``id_activo``, en cualquier nivel."""
+    database = resolver_db(database if database is not None else db)
+    if database is None or not id_activo:
+        return []
+    cursor = database[COLECCION].find({"ancestros": id_activo}, {"_id": 0, "id_activo_tecnico": 1})
+    return sorted(d["id_activo_tecnico"] for d in cursor if d.get("id_activo_tecnico"))
+
+
+def ids_del_subarbol(id_activo: str, database=None) -> List[str]:
+    """``id_activo`` seguido de todos sus descendientes (filtros de KPIs y reportes)."""
+    return [id_activo] + descendientes(id_activo, database)
+
+
+def reubicar_subarbol(
+    id_anterior: str,
+    id_nuevo: Optional[str],
+    ancestros_nuevos: Optional[List[str]],
+    database=None,
+) -> int:
+    """Reescribe ``ancestros`` de los descendientes de ``id_anterior``.
+
+    - Edición: el nodo pasa a colgar de ``ancestros_nuevos`` y puede haber
+      cambiado de ID (``id_nuevo``); los hijos directos actualizan ``pertenece_a``.
+    - Baja (``id_nuevo=None``): los descendientes conservan el ID eliminado como
+      raíz de su cadena, igual que ``pertenece_a`` sigue apuntándolo.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+    coleccion = database[COLECCION]
+    prefijo = [id_anterior] if id_nuevo is None else list(ancestros_nuevos or []) + [id_nuevo]
+
+    operaciones = []
+    for doc in coleccion.find({"ancestros": id_anterior}, {"_id": 1, "ancestros": 1, "pertenece_a": 1}):
+        ancestros = doc.get("ancestros") or []
+        sufijo = ancestros[ancestros.index(id_anterior) + 1:]
+        cambios = {"ancestros": prefijo + sufijo}
+        if id_nuevo and id_nuevo != id_anterior and doc.get("pertenece_a") == id_anterior:
+            cambios["pertenece_a"] = id_nuevo
+        operaciones.append(UpdateOne({"_id": doc["_id"]}, {"$set": cambios}))
+    if operaciones:
+        coleccion.bulk_write(operaciones, ordered=False)
+    return len(operaciones)
+
+
+def reconstruir_jerarquia(database=None) -> int:
+    """Recalcula ``ancestros`` de todos los activos desde ``pertenece_a``.
+
+    Devuelve la cantidad de activos modificados. Un ciclo existente se corta
+    en el primer activo repetido y se informa en el log.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+    coleccion = database[COLECCION]
+    documentos = list(coleccion.find({}, {"_id": 1, "id_activo_tecnico": 1, "pertenece_a": 1, "ancestros": 1}))
+    padres: Dict[str, Optional[str]] = {
+        d["id_activo_tecnico"]: d.get("pertenece_a") for d in documentos if d.get("id_activo_tecnico")
+    }
+    memo: Dict[str, List[str]] = {}
+
+    def _ancestros(id_activo: str) -> List[str]:
+        cadena: List[str] = []
+        actual = padres.get(id_activo)
+        vistos = {id_activo}
+        while actual:
+            if actual in memo:
+                cadena = memo[actual] + [actual] + cadena
+                break
+            if actual in vistos:
+                logger.warning("Ciclo en pertenece_a a partir de %s", id_activo)
+                break
+            vistos.add(actual)
+            cadena.insert(0, actual)
+            actual = padres.get(actual)
+        memo[id_activo] = cadena
+        return cadena
+
+    operaciones = []
+    for doc in documentos:
+        id_activo = doc.get("id_activo_tecnico")
+        ancestros = _ancestros(id_activo) if id_activo else []
+        if doc.get("ancestros") != ancestros:
+            operaciones.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"ancestros": ancestros}}))
+    for i in range(0, len(operaciones), 1000):
+        coleccion.bulk_write(operaciones[i:i + 1000], ordered=False)
+    return len(operaciones)
+
+
+_jerarquia_verificada = False
+
+
+def asegurar_jerarquia_al_iniciar(database=None) -> None:
+    """Completa ``ancestros`` una vez por proceso si hay activos sin el campo."""
+    global _jerarquia_verificada
+    if _jerarquia_verificada:
+        return
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return
+    try:
+        if database[COLECCION].count_documents({"ancestros": {"$exists": False}}, limit=1):
+            logger.info("Activos actualizados con ancestros: %s", reconstruir_jerarquia(database))
+    except PyMongoError as exc:
+        logger.warning("Reconstrucción de jerarquía omitida: %s", exc)
+        return
+    _jerarquia_verificada = True
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recalcula la jerarquía materializada de activos")
+    parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+    print("activos_actualizados:", reconstruir_jerarquia(database))
+
+
+if __name__ == "__main__":
+    main()
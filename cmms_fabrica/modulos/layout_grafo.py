@@ -0,0 +1,193 @@
+"""🧭 Disposición de Grafos – CMMS Fábrica
+
+Calcula en el servidor las posiciones de los nodos del grafo CMMS para que
+el HTML de Pyvis se emita con la física desactivada y coordenadas fijas: el
+navegador no simula fuerzas y la página abre al instante.
+
+- Grafos chicos: ``networkx.spring_layout`` con semilla fija.
+- Grafos grandes (o sin SciPy): disposición en estrella, O(n): los activos
+  en una grilla y sus eventos, orígenes y proveedores en anillos alrededor.
+- Las posiciones se guardan en una caché LRU indexada por un hash del
+  contenido del grafo (nodos y aristas). Si el grafo cambió en pocos nodos,
+  los que ya tenían posición quedan fijos y solo se ubican los nuevos.
+
+Las posiciones son normalizadas (aprox. ``[-1, 1]``); :func:`a_pixeles` las
+escala según la cantidad de nodos.
+
+Variables de entorno:
+- ``CMMS_LAYOUT_CACHE_MAX``: disposiciones completas en caché (por defecto 32)
+
+Normas:
+- ISO 55001 (Información del activo: visualización de relaciones)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+Posicion = Tuple[float, float]
+
+MAX_LAYOUTS = int(os.getenv("CMMS_LAYOUT_CACHE_MAX", "32"))
+# spring_layout usa SciPy desde 500 nodos; sin SciPy, o por encima de este
+# tamaño, se usa la disposición en estrella
+MAX_NODOS_SPRING = 500 if importlib.util.find_spec("scipy") is None else 1500
+# Si cambió más de esta fracción de nodos se recalcula todo
+FRACCION_INCREMENTAL = 0.25
+MAX_POSICIONES_CONOCIDAS = 50_000
+SEMILLA = 7
+
+_layouts: "OrderedDict[str, Dict[str, Posicion]]" = OrderedDict()
+_conocidas: "OrderedDict[str, Posicion]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def hash_grafo(grafo) -> str:
+    """Huella del contenido: IDs de nodos y aristas (sin estilos ni etiquetas)."""
+    h = hashlib.sha1()
+    for nodo in sorted(str(n) for n in grafo.nodes):
+        h.update(nodo.encode("utf-8", "ignore"))
+        h.update(b"\x00")
+    h.update(b"\x01")
+    for origen, destino in sorted((str(o), str(d)) for o, d in grafo.edges):
+        h.update(f"{origen}\x00{destino}\x00".encode("utf-8", "ignore"))
+    return h.hexdigest()
+
+
+def limpiar_cache() -> None:
+    with _lock:
+        _layouts.clear()
+        _conocidas.clear()
+
+
+def _recordar(posiciones: Dict[str, Posicion]) -> None:
+    for nodo, pos in posiciones.items():
+        _conocidas[nodo] = pos
+        _conocidas.move_to_end(nodo)
+    while len(_conocidas) > MAX_POSICIONES_CONOCIDAS:
+        _conocidas.popitem(last=False)
+
+
+def _es_centro(datos: Dict[str, Any]) -> bool:
+    return datos.get("tipo") == "activo"
+
+
+def _disposicion_estrella(grafo, previas: Dict[str, Posicion]) -> Dict[str, Posicion]:
+    """Activos en grilla; el resto en anillos alrededor del nodo del que cuelga.
+
+    Con ``previas`` se conservan las posiciones conocidas y solo se ubican los
+    nodos nuevos, salvo que aparezcan activos nuevos (cambia la grilla).
+    """
+    centros = sorted(str(n) for n, d in grafo.nodes(data=True) if _es_centro(d))
+    if not centros:
+        # Sin activos: los nodos de mayor grado hacen de centro
+        grados = sorted(grafo.degree, key=lambda t: (-t[1], str(t[0])))
+        centros = sorted(str(n) for n, _ in grados[: max(1, int(math.sqrt(len(grados))))])
+
+    nodos = {str(n): n for n in grafo.nodes}
+    posiciones: Dict[str, Posicion] = {}
+    if previas and all(c in previas for c in centros):
+        posiciones.update({n: p for n, p in previas.items() if n in nodos})
+    lado = max(1, math.ceil(math.sqrt(len(centros))))
+    celda = 2.0 / lado
+    for i, centro in enumerate(centros):
+        if centro not in posiciones:
+            fila, columna = divmod(i, lado)
+            posiciones[centro] = (-1 + celda * (columna + 0.5), -1 + celda * (fila + 0.5))
+
+    no_dirigido = grafo.to_undirected(as_view=True)
+    ocupados: Dict[str, int] = {}
+    for nodo in posiciones:
+        for vecino in no_dirigido.neighbors(nodos[nodo]):
+            if str(vecino) in posiciones and str(vecino) != nodo:
+                ocupados[nodo] = ocupados.get(nodo, 0) + 1
+
+    # Recorrido en anchura desde los centros: cada nodo se ubica junto a su padre
+    frente: List[str] = list(posiciones)
+    nivel = 0
+    while frente:
+        siguiente: List[str] = []
+        radio_base = celda * (0.32 if nivel == 0 else 0.12)
+        for padre in frente:
+            nuevos = sorted(str(v) for v in no_dirigido.neighbors(nodos[padre]) if str(v) not in posiciones)
+            px, py = posiciones[padre]
+            for vecino in nuevos:
+                k = ocupados.get(padre, 0)
+                ocupados[padre] = k + 1
+                # Anillos concéntricos: 12, 18, 24, ... nodos por vuelta
+                anillo, capacidad = 0, 12
+                while k >= capacidad:
+                    k -= capacidad
+                    anillo += 1
+                    capacidad += 6
+                radio = radio_base * (1 + 0.45 * anillo)
+                angulo = 2 * math.pi * k / capacidad + 0.3 * anillo
+                posiciones[vecino] = (px + radio * math.cos(angulo), py + radio * math.sin(angulo))
+                siguiente.append(vecino)
+        frente = siguiente
+        nivel += 1
+
+    # Componentes sin conexión con ningún centro: una fila debajo de la grilla
+    sueltos = sorted(n for n in nodos if n not in posiciones)
+    for i, nodo in enumerate(sueltos):
+        posiciones[nodo] = (-1 + 2.0 * (i + 0.5) / len(sueltos), 1 + celda * 0.5)
+    return posiciones
+
+
+def _disposicion_spring(grafo, previas: Dict[str, Posicion]) -> Dict[str, Posicion]:
+    import networkx as nx
+
+    nodos = {str(n): n for n in grafo.nodes}
+    fijos = [nodos[n] for n in previas if n in nodos]
+    pos_inicial = {nodos[n]: previas[n] for n in previas if n in nodos} or None
+    posiciones = nx.spring_layout(
+        grafo.to_undirected(as_view=True),
+        pos=pos_inicial,
+        fixed=fijos or None,
+        iterations=30 if fijos else 50,
+        seed=SEMILLA,
+    )
+    return {str(n): (float(p[0]), float(p[1])) for n, p in posiciones.items()}
+
+
+def calcular_posiciones(grafo, clave: Optional[str] = None) -> Dict[str, Posicion]:
+    """Posiciones normalizadas de cada nodo (clave: ``str(nodo)``).
+
+    Reutiliza la disposición completa si el contenido no cambió y, si cambió
+    poco, las posiciones ya conocidas de los nodos que siguen presentes.
+    """
+    clave = clave or hash_grafo(grafo)
+    with _lock:
+        if clave in _layouts:
+            _layouts.move_to_end(clave)
+            return dict(_layouts[clave])
+        previas = {str(n): _conocidas[str(n)] for n in grafo.nodes if str(n) in _conocidas}
+
+    total = grafo.number_of_nodes()
+    nuevos = total - len(previas)
+    if total and nuevos / total > FRACCION_INCREMENTAL:
+        previas = {}
+    if total and not nuevos:
+        posiciones = previas
+    elif total <= MAX_NODOS_SPRING:
+        posiciones = _disposicion_spring(grafo, previas)
+    else:
+        posiciones = _disposicion_estrella(grafo, previas)
+
+    with _lock:
+        _layouts[clave] = posiciones
+        while len(_layouts) > MAX_LAYOUTS:
+            _layouts.popitem(last=False)
+        _recordar(posiciones)
+    return dict(posiciones)
+
+
+def a_pixeles(posiciones: Dict[Hashable, Posicion], separacion: float = 60.0) -> Dict[Hashable, Posicion]:
+    """Escala las posiciones normalizadas para que los nodos no se superpongan."""
+    escala = separacion * max(4.0, math.sqrt(len(posiciones)))
+    return {n: (round(x * escala, 1), round(y * escala, 1)) for n, (x, y) in posiciones.items()}
@@ -0,0 +1,215 @@
+"""⏲️ Medidores de Uso – CMMS Fábrica
+
+Vincula los horómetros que se registran en ``consumos`` (lecturas acumuladas
+de los compresores) con su activo técnico y con los planes preventivos por
+uso, para que la lectura del plan no dependa de cargarla a mano:
+
+- ``medidores_uso`` guarda un documento por medidor: ``medidor`` (el
+  ``tipo_consumo`` de la lectura), ``id_activo_tecnico`` y ``planes``.
+- Cada lectura nueva actualiza ``lectura_actual_uso`` y ``uso_restante`` de
+  los planes vinculados (tipo ``uso`` o ``ambos``) en un solo ``bulk_write``.
+  Una lectura con fecha anterior a la última registrada no se aplica: el
+  contador es acumulado y la lectura vigente es siempre la más reciente. Al
+  editar o eliminar una lectura se vuelve a aplicar la más reciente que quede
+  (:func:`aplicar_ultima_lectura`).
+- La tasa medida (horas por día entre lecturas de los últimos
+  ``DIAS_TASA`` días) se guarda en el plan como ``tasa_uso_diaria`` junto con
+  ``fecha_estimada_uso``, la fecha en que se agotaría el ``uso_restante``; la
+  proyección de preventivos usa esa tasa.
+
+Por consola::
+
+    python -m cmms_fabrica.modulos.medidores_uso
+    python -m cmms_fabrica.modulos.medidores_uso --vincular "Schulz SRP 3040" --activo COMP-01 --planes PP-1 PP-2
+
+Normas:
+- ISO 55001 (Planificación del mantenimiento basada en la condición de uso)
+- ISO 14224 (Datos de mantenimiento: tiempo de operación)
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.vencimientos_planes import COLECCION as COLECCION_PLANES
+from cmms_fabrica.modulos.vencimientos_planes import POR_USO, campos_derivados
+
+COLECCION = "medidores_uso"
+COLECCION_LECTURAS = "consumos"
+# Lecturas acumuladas en horas (``tipo_consumo`` de ``consumos``)
+MEDIDORES_HORAS = ("Schulz SRP 3040", "Atlas Copco GX7")
+DIAS_TASA = 30
+
+CAMPOS_PLAN = {
+    "id_plan": 1,
+    "tipo_programacion": 1,
+    "proxima_fecha": 1,
+    "umbral_uso": 1,
+    "ultima_lectura_uso": 1,
+}
+
+
+def _como_fecha(valor: Any) -> Optional[date]:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return datetime.strptime(str(valor)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def vinculos(database=None) -> List[Dict[str, Any]]:
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    return list(database[COLECCION].find({}, {"_id": 0}).sort("medidor", 1))
+
+
+def tasa_medida(medidor: str, hasta: Optional[date] = None, dias: int = DIAS_TASA, database=None) -> Optional[float]:
+    """Uso por día entre la primera y la última lectura de los últimos ``dias``.
+
+    Con menos de dos lecturas en la ventana usa las dos últimas registradas.
+    ``None`` si no hay avance del contador o las lecturas son del mismo día.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return None
+    hasta = hasta or date.today()
+    coleccion = database[COLECCION_LECTURAS]
+    proyeccion = {"_id": 0, "fecha": 1, "valor": 1}
+    lecturas = list(
+        coleccion.find(
+            {"tipo_consumo": medidor, "fecha": {"$gte": str(hasta - timedelta(days=dias)), "$lte": str(hasta)}},
+            proyeccion,
+        ).sort("fecha", 1)
+    )
+    if len(lecturas) < 2:
+        lecturas = list(coleccion.find({"tipo_consumo": medidor}, proyeccion).sort("fecha", -1).limit(2))[::-1]
+    if len(lecturas) < 2:
+        return None
+    primera, ultima = lecturas[0], lecturas[-1]
+    inicio, fin = _como_fecha(primera.get("fecha")), _como_fecha(ultima.get("fecha"))
+    if inicio is None or fin is None or fin <= inicio:
+        return None
+    avance = float(ultima.get("valor") or 0) - float(primera.get("valor") or 0)
+    return avance / (fin - inicio).days if avance > 0 else None
+
+
+def fecha_estimada(uso_restante: Optional[float], tasa: Optional[float], desde: date) -> Optional[datetime]:
+    """Día en que se agota ``uso_restante`` al ritmo ``tasa`` (``desde`` si ya está vencido)."""
+    if uso_restante is None or not tasa:
+        return None
+    dias = math.ceil(max(uso_restante, 0) / tasa)
+    return datetime.combine(desde + timedelta(days=dias), datetime.min.time())
+
+
+def aplicar_lectura(
+    medidor: str,
+    lectura: float,
+    fecha: Optional[date] = None,
+    database=None,
+) -> List[Dict[str, Any]]:
+    """Actualiza los planes vinculados a ``medidor`` con ``lectura`` (un ``bulk_write``).
+
+    Devuelve una fila por plan actualizado con el restante y la fecha estimada;
+    ninguna si ya hay una lectura registrada con fecha posterior.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    vinculo = database[COLECCION].find_one({"medidor": medidor})
+    if not vinculo or not vinculo.get("planes"):
+        return []
+    fecha = _como_fecha(fecha) or date.today()
+    if database[COLECCION_LECTURAS].find_one({"tipo_consumo": medidor, "fecha": {"$gt": str(fecha)}}, {"_id": 1}):
+        return []
+    tasa = tasa_medida(medidor, fecha, database=database)
+
+    coleccion = database[COLECCION_PLANES]
+    planes = coleccion.find(
+        {"id_plan": {"$in": vinculo["planes"]}, "tipo_programacion": {"$in": list(POR_USO)}}, CAMPOS_PLAN
+    )
+    operaciones: List[UpdateOne] = []
+    filas: List[Dict[str, Any]] = []
+    for plan in planes:
+        plan["lectura_actual_uso"] = lectura
+        derivados = campos_derivados(plan)
+        estimada = fecha_estimada(derivados["uso_restante"], tasa, fecha)
+        cambios = {
+            "lectura_actual_uso": lectura,
+            **derivados,
+            "medidor_uso": medidor,
+            "tasa_uso_diaria": tasa,
+            "fecha_estimada_uso": estimada,
+        }
+        operaciones.append(UpdateOne({"_id": plan["_id"]}, {"$set": cambios}))
+        filas.append({"id_plan": plan["id_plan"], "uso_restante": derivados["uso_restante"],
+                      "tasa_uso_diaria": tasa, "fecha_estimada_uso": estimada})
+    if operaciones:
+        coleccion.bulk_write(operaciones, ordered=False)
+    return filas
+
+
+def aplicar_ultima_lectura(medidor: str, database=None) -> List[Dict[str, Any]]:
+    """Aplica a los planes vinculados la lectura más reciente registrada de ``medidor``."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    ultima = database[COLECCION_LECTURAS].find_one(
+        {"tipo_consumo": medidor}, {"_id": 0, "fecha": 1, "valor": 1}, sort=[("fecha", -1), ("valor", -1)]
+    )
+    if not ultima:
+        return []
+    return aplicar_lectura(medidor, float(ultima.get("valor") or 0), _como_fecha(ultima.get("fecha")), database)
+
+
+def vincular_medidor(
+    medidor: str,
+    id_activo_tecnico: str,
+    planes: List[str],
+    database=None,
+) -> List[Dict[str, Any]]:
+    """Guarda el vínculo del medidor y aplica su última lectura a los planes."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    database[COLECCION].update_one(
+        {"medidor": medidor},
+        {"$set": {"id_activo_tecnico": id_activo_tecnico, "planes": list(planes), "actualizado": datetime.utcnow()}},
+        upsert=True,
+    )
+    return aplicar_ultima_lectura(medidor, database)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Horómetros vinculados a planes preventivos por uso")
+    parser.add_argument("--vincular", choices=MEDIDORES_HORAS, help="Medidor a vincular")
+    parser.add_argument("--activo", help="ID del activo técnico del medidor")
+    parser.add_argument("--planes", nargs="*", default=[], help="IDs de planes por uso")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+    if args.vincular:
+        if not args.activo:
+            parser.error("--vincular requiere --activo")
+        for fila in vincular_medidor(args.vincular, args.activo, args.planes, database):
+            print(f"  {fila['id_plan']}: restante {fila['uso_restante']}, estimado {fila['fecha_estimada_uso']}")
+    for vinculo in vinculos(database):
+        tasa = tasa_medida(vinculo["medidor"], database=database)
+        ritmo = f"{tasa:.1f} h/día" if tasa else "sin tasa"
+        print(f"{vinculo['medidor']} → {vinculo.get('id_activo_tecnico')}: {', '.join(vinculo.get('planes', []))} ({ritmo})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""🏷️ Migración de categoría de eventos – CMMS Fábrica
+
+Completa ``categoria_evento`` en los documentos de ``historial`` registrados
+antes de que el campo se persistiera al escribir. Recorre la colección por
+``_id`` en lotes y escribe cada lote con un único ``bulk_write``.
+
+El avance se guarda en la colección ``migraciones`` después de cada lote, de
+modo que una ejecución interrumpida continúa desde el último ``_id`` escrito::
+
+    python -m cmms_fabrica.modulos.migracion_categoria_evento
+    python -m cmms_fabrica.modulos.migracion_categoria_evento --lote 2000 --reiniciar
+
+Normas:
+- ISO 9001:2015 (Control de registros: cambios trazables sobre el historial)
+- ISO 14224 (Clasificación de eventos técnicos)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from cmms_fabrica.crud.generador_historial import categorizar_tipo_evento
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION_MIGRACIONES = "migraciones"
+ID_MIGRACION = "historial.categoria_evento"
+
+
+def _estado(database) -> Dict[str, Any]:
+    return database[COLECCION_MIGRACIONES].find_one({"_id": ID_MIGRACION}) or {}
+
+
+def migrar_categoria_evento(
+    database=None,
+    tamano_lote: int = 1000,
+    reiniciar: bool = False,
+    max_lotes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Completa ``categoria_evento`` en ``historial`` y devuelve el estado final.
+
+    ``max_lotes`` limita el trabajo de una ejecución (útil desde la app o un
+    planificador); la siguiente llamada retoma donde quedó.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return {}
+
+    migraciones = database[COLECCION_MIGRACIONES]
+    historial = database["historial"]
+    estado = {} if reiniciar else _estado(database)
+    ultimo_id = estado.get("ultimo_id")
+    actualizados = 0 if reiniciar else estado.get("actualizados", 0)
+
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        query: Dict[str, Any] = {"categoria_evento": {"$exists": False}}
+        if ultimo_id is not None:
+            query["_id"] = {"$gt": ultimo_id}
+        lote: List[Dict[str, Any]] = list(
+            historial.find(query, {"_id": 1, "tipo_evento": 1}).sort("_id", 1).limit(tamano_lote)
+        )
+        if not lote:
+            migraciones.update_one(
+                {"_id": ID_MIGRACION},
+                {"$set": {"completada": True, "fecha_fin": datetime.now(), "actualizados": actualizados}},
+                upsert=True,
+            )
+            break
+
+        operaciones = [
+            UpdateOne(
+                {"_id": doc["_id"], "categoria_evento": {"$exists": False}},
+                {"$set": {"categoria_evento": categorizar_tipo_evento(doc.get("tipo_evento"))}},
+            )
+            for doc in lote
+        ]
+        resultado = historial.bulk_write(operaciones, ordered=False)
+        actualizados += resultado.modified_count
+        ultimo_id = lote[-1]["_id"]
+        lotes += 1
+
+        # Punto de control: una interrupción retoma desde aquí
+        migraciones.update_one(
+            {"_id": ID_MIGRACION},
+            {"$set": {
+                "ultimo_id": ultimo_id,
+                "actualizados": actualizados,
+                "completada": False,
+                "fecha_actualizacion": datetime.now(),
+            }},
+            upsert=True,
+        )
+        logger.info("Migración categoria_evento: %s documentos actualizados", actualizados)
+
+    return _estado(database)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Completa categoria_evento en historial")
+    parser.add_argument("--lote", type=int, default=1000, help="Documentos por bulk_write")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignora el punto de control guardado")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+
+    estado = migrar_categoria_evento(database, tamano_lote=args.lote, reiniciar=args.reiniciar)
+    print("actualizados:", estado.get("actualizados", 0))
+    print("completada:", estado.get("completada", False))
+
+
+if __name__ == "__main__":
+    main()
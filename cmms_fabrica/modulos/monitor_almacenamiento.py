@@ -0,0 +1,261 @@
+"""📈 Monitor de Almacenamiento – CMMS Fábrica
+
+Mide el espacio de MongoDB por colección y lo guarda como serie temporal en
+``almacenamiento_muestras`` para anticipar la limpieza en lugar de
+reaccionar a ella:
+
+- cada muestra toma ``collStats`` de cada colección (documentos, tamaño de
+  datos, almacenamiento, índices y ``avgObjSize``); sin ``collStats`` (p. ej.
+  mongomock) se estima con el conteo de metadatos y una muestra de documentos;
+- una regresión lineal sobre las últimas muestras proyecta cuándo se alcanza
+  ``almacenamiento.LIMITE_MB``;
+- la limpieza se estima antes de borrar nada: documentos alcanzados (conteo
+  sobre el índice de fecha, o el porcentaje del conteo de metadatos) por
+  ``avgObjSize``.
+
+Las muestras se toman a demanda o cuando la última supera
+``CMMS_MONITOR_INTERVALO_MIN``; la consola sirve para programarlas::
+
+    python -m cmms_fabrica.modulos.monitor_almacenamiento --muestrear
+    python -m cmms_fabrica.modulos.monitor_almacenamiento
+
+Variables de entorno:
+- ``CMMS_MONITOR_INTERVALO_MIN``: antigüedad máxima de la última muestra (por defecto 60)
+- ``CMMS_MONITOR_RETENCION_DIAS``: días de muestras que se conservan (por defecto 180)
+
+Normas:
+- ISO 9001:2015 (Control de registros)
+- ISO 55001 (Gestión del ciclo de vida del activo: planificación de capacidad)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import bson
+import numpy as np
+from pymongo.errors import OperationFailure
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION_MUESTRAS = "almacenamiento_muestras"
+INTERVALO_MIN = int(os.getenv("CMMS_MONITOR_INTERVALO_MIN", "60"))
+RETENCION_DIAS = int(os.getenv("CMMS_MONITOR_RETENCION_DIAS", "180"))
+# Muestras (días hacia atrás) que entran en la regresión
+VENTANA_PRONOSTICO_DIAS = 30
+# Más allá de este horizonte el pronóstico no es útil (tendencia prácticamente plana)
+HORIZONTE_MAX_DIAS = 3650
+DOCUMENTOS_MUESTRA = 200
+MB = 1024 * 1024
+
+ERRORES_STATS = (OperationFailure, NotImplementedError)
+
+
+def estadisticas_coleccion(database, nombre: str) -> Dict[str, Any]:
+    """``collStats`` de ``nombre`` reducido a los campos que usa el monitor.
+
+    Si el servidor no lo permite, estima con ``estimated_document_count`` y
+    el tamaño BSON de hasta ``DOCUMENTOS_MUESTRA`` documentos.
+    """
+    try:
+        stats = database.command({"collStats": nombre})
+        return {
+            "documentos": int(stats.get("count", 0)),
+            "bytes_datos": int(stats.get("size", 0)),
+            "bytes_almacenamiento": int(stats.get("storageSize", 0)),
+            "bytes_indices": int(stats.get("totalIndexSize", 0)),
+            "tamano_medio": float(stats.get("avgObjSize", 0)),
+            "estimado": False,
+        }
+    except ERRORES_STATS as exc:
+        logger.debug("collStats no disponible para %s: %s", nombre, exc)
+
+    coleccion = database[nombre]
+    documentos = coleccion.estimated_document_count()
+    tamanos = [len(bson.encode(d)) for d in coleccion.find().limit(DOCUMENTOS_MUESTRA)]
+    tamano_medio = sum(tamanos) / len(tamanos) if tamanos else 0.0
+    bytes_datos = int(documentos * tamano_medio)
+    return {
+        "documentos": documentos,
+        "bytes_datos": bytes_datos,
+        "bytes_almacenamiento": bytes_datos,
+        "bytes_indices": 0,
+        "tamano_medio": tamano_medio,
+        "estimado": True,
+    }
+
+
+def tomar_muestra(database=None, colecciones: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Mide todas las colecciones (o las indicadas) y guarda la muestra."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return None
+    nombres = colecciones or sorted(
+        n for n in database.list_collection_names() if n != COLECCION_MUESTRAS and not n.startswith("system.")
+    )
+    por_coleccion = {nombre: estadisticas_coleccion(database, nombre) for nombre in nombres}
+    ahora = datetime.utcnow()
+    muestra = {
+        "fecha": ahora,
+        "total_mb": sum(c["bytes_almacenamiento"] for c in por_coleccion.values()) / MB,
+        "indices_mb": sum(c["bytes_indices"] for c in por_coleccion.values()) / MB,
+        "colecciones": por_coleccion,
+    }
+    muestras = database[COLECCION_MUESTRAS]
+    muestras.insert_one(dict(muestra))
+    muestras.delete_many({"fecha": {"$lt": ahora - timedelta(days=RETENCION_DIAS)}})
+    return muestra
+
+
+def ultima_muestra(database=None) -> Optional[Dict[str, Any]]:
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return None
+    return database[COLECCION_MUESTRAS].find_one({}, {"_id": 0}, sort=[("fecha", -1)])
+
+
+def muestra_vigente(database=None, intervalo_min: int = INTERVALO_MIN) -> Optional[Dict[str, Any]]:
+    """Última muestra si tiene menos de ``intervalo_min`` minutos; si no, toma una nueva."""
+    muestra = ultima_muestra(database)
+    if muestra and datetime.utcnow() - muestra["fecha"] < timedelta(minutes=intervalo_min):
+        return muestra
+    return tomar_muestra(database)
+
+
+def serie_total(database=None, dias: int = VENTANA_PRONOSTICO_DIAS) -> List[Dict[str, Any]]:
+    """``[{"fecha", "total_mb"}]`` de los últimos ``dias``, en orden cronológico."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    desde = datetime.utcnow() - timedelta(days=dias)
+    cursor = database[COLECCION_MUESTRAS].find(
+        {"fecha": {"$gte": desde}}, {"_id": 0, "fecha": 1, "total_mb": 1}
+    ).sort("fecha", 1)
+    return list(cursor)
+
+
+@dataclass
+class Pronostico:
+    """Tendencia del tamaño total y fecha estimada en que se alcanza el límite."""
+
+    mb_por_dia: float
+    total_mb: float
+    fecha_limite: Optional[datetime]
+
+
+def pronosticar(serie: List[Dict[str, Any]], limite_mb: float) -> Optional[Pronostico]:
+    """Regresión lineal de ``total_mb`` en el tiempo. ``None`` con menos de dos muestras.
+
+    ``fecha_limite`` es ``None`` si el tamaño no crece (o se alcanzaría
+    después de ``HORIZONTE_MAX_DIAS``); si ya se superó, es la fecha de la
+    última muestra.
+    """
+    if len(serie) < 2:
+        return None
+    origen = serie[0]["fecha"]
+    dias = np.array([(m["fecha"] - origen).total_seconds() / 86400 for m in serie])
+    totales = np.array([m["total_mb"] for m in serie], dtype=float)
+    if np.ptp(dias) == 0:
+        return None
+    pendiente, ordenada = np.polyfit(dias, totales, 1)
+    ultimo = serie[-1]
+    actual = float(pendiente * dias[-1] + ordenada)
+    if ultimo["total_mb"] >= limite_mb:
+        return Pronostico(float(pendiente), ultimo["total_mb"], ultimo["fecha"])
+    faltan = max(0.0, (limite_mb - actual) / pendiente) if pendiente > 0 else None
+    if faltan is None or faltan > HORIZONTE_MAX_DIAS:
+        return Pronostico(float(pendiente), ultimo["total_mb"], None)
+    return Pronostico(float(pendiente), ultimo["total_mb"], ultimo["fecha"] + timedelta(days=float(faltan)))
+
+
+def estimar_limpieza(
+    nombre: str,
+    campo_fecha: str,
+    fecha_limite: Optional[datetime] = None,
+    porcentaje: Optional[float] = None,
+    minimo: int = 100,
+    estadisticas: Optional[Dict[str, Any]] = None,
+    database=None,
+) -> Dict[str, Any]:
+    """Documentos y MB que liberaría una limpieza, sin borrar nada.
+
+    Por antigüedad cuenta sobre el índice de ``campo_fecha``; por porcentaje
+    usa el conteo de metadatos. Los bytes salen de ``avgObjSize``.
+    """
+    database = resolver_db(database if database is not None else db)
+    estimacion = {"coleccion": nombre, "documentos": 0, "mb": 0.0}
+    if database is None:
+        return estimacion
+    estadisticas = estadisticas or estadisticas_coleccion(database, nombre)
+    total = estadisticas["documentos"]
+    if total < minimo:
+        return estimacion
+    if fecha_limite is not None:
+        documentos = database[nombre].count_documents({campo_fecha: {"$lt": fecha_limite}})
+    else:
+        documentos = int(total * (porcentaje or 0))
+    estimacion["documentos"] = documentos
+    estimacion["mb"] = documentos * estadisticas["tamano_medio"] / MB
+    return estimacion
+
+
+def estimar_plan_limpieza(database=None, muestra: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Estimación de :func:`almacenamiento.limpiar_coleccion` para cada colección rotable."""
+    # Import diferido: almacenamiento usa este módulo para sus estimaciones
+    from cmms_fabrica.modulos import almacenamiento
+
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    por_coleccion = (muestra or {}).get("colecciones", {})
+    plan = []
+    for nombre, campo_fecha in almacenamiento.COLECCIONES_ROTABLES.items():
+        if nombre in almacenamiento.COLECCIONES_CRITICAS:
+            criterio = {"fecha_limite": datetime.utcnow() - timedelta(days=almacenamiento.MAX_DIAS_HISTORIAL)}
+        else:
+            criterio = {"porcentaje": 0.3}
+        estimacion = estimar_limpieza(
+            nombre, campo_fecha, estadisticas=por_coleccion.get(nombre), database=database, **criterio
+        )
+        estimacion["criterio"] = (
+            f"anteriores a {almacenamiento.MAX_DIAS_HISTORIAL} días" if "fecha_limite" in criterio else "30% más antiguo"
+        )
+        plan.append(estimacion)
+    return plan
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Monitor de almacenamiento de MongoDB")
+    parser.add_argument("--muestrear", action="store_true", help="Toma y guarda una muestra nueva")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+
+    from cmms_fabrica.modulos.almacenamiento import LIMITE_MB
+
+    muestra = tomar_muestra(database) if args.muestrear else ultima_muestra(database)
+    if not muestra:
+        print("ℹ️ No hay muestras. Ejecutá con --muestrear.")
+        return
+    print(f"Muestra {muestra['fecha']:%Y-%m-%d %H:%M} UTC: {muestra['total_mb']:.1f} MB de {LIMITE_MB} MB")
+    for nombre, stats in sorted(muestra["colecciones"].items(), key=lambda t: -t[1]["bytes_almacenamiento"]):
+        print(f"  {nombre}: {stats['documentos']} docs, {stats['bytes_almacenamiento'] / MB:.2f} MB")
+    pronostico = pronosticar(serie_total(database), LIMITE_MB)
+    if pronostico and pronostico.fecha_limite:
+        print(f"Límite estimado: {pronostico.fecha_limite:%Y-%m-%d} ({pronostico.mb_por_dia:+.2f} MB/día)")
+    elif pronostico:
+        print(f"Sin crecimiento ({pronostico.mb_por_dia:+.2f} MB/día)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""⏱️ Planificador de Tareas de Mantenimiento – CMMS Fábrica
+
+Ejecuta tareas periódicas (limpieza de almacenamiento, muestras del monitor,
+reconciliación de rollups) en un hilo de fondo, fuera
+de las peticiones de los usuarios:
+
+- cada tarea tiene un documento en ``planificador_tareas`` con su próxima
+  ejecución y un *lease* (``propietario`` + ``vence``): el proceso que lo
+  toma con un ``find_one_and_update`` atómico la ejecuta y los demás
+  workers de Streamlit la saltean; si el proceso muere, el lease vence y
+  otro la retoma. Mientras la tarea corre, un hilo renueva ``vence`` cada
+  tercio de ``duracion_max_s``; las tareas largas llaman a
+  :func:`renovar_lease` entre lotes y se detienen (:class:`LeasePerdido`)
+  si otro proceso ya la tomó;
+- cada ejecución queda en ``planificador_historial`` (duración, estado,
+  resultado o error);
+- los valores que una tarea conserva entre ejecuciones (p. ej. el uso medido
+  en la última limpieza) se guardan en ``valores_derivados``; las páginas
+  consultan en vivo lo que una consulta indexada ya resuelve.
+
+Variables de entorno:
+- ``CMMS_PLANIFICADOR``: ``0`` desactiva el hilo de fondo en este proceso
+- ``CMMS_PLANIFICADOR_TICK_S``: segundos entre revisiones (por defecto 30)
+
+Normas:
+- ISO 9001:2015 (Control operacional y registros de las tareas)
+- ISO 55001 (Gestión del ciclo de vida del activo)
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import socket
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION_TAREAS = "planificador_tareas"
+COLECCION_HISTORIAL = "planificador_historial"
+COLECCION_DERIVADOS = "valores_derivados"
+TICK_S = float(os.getenv("CMMS_PLANIFICADOR_TICK_S", "30"))
+HABILITADO = os.getenv("CMMS_PLANIFICADOR", "1") != "0"
+MAX_HISTORIAL_POR_TAREA = 200
+
+OK = "ok"
+ERROR = "error"
+EN_CURSO = "en_curso"
+
+
+@dataclass(frozen=True)
+class TareaProgramada:
+    """Tarea periódica: ``funcion(database)`` cada ``intervalo_s`` segundos."""
+
+    nombre: str
+    funcion: Callable[[Any], Any]
+    intervalo_s: float
+    descripcion: str = ""
+    # Duración del lease: si la tarea no termina antes, otro proceso puede tomarla
+    duracion_max_s: float = 600
+
+
+_tareas: Dict[str, TareaProgramada] = {}
+
+
+def registrar_tarea(
+    nombre: str,
+    funcion: Callable[[Any], Any],
+    intervalo_s: float,
+    descripcion: str = "",
+    duracion_max_s: float = 600,
+) -> TareaProgramada:
+    """Agrega (o reemplaza) una tarea en el registro del proceso."""
+    tarea = TareaProgramada(nombre, funcion, intervalo_s, descripcion, duracion_max_s)
+    _tareas[nombre] = tarea
+    return tarea
+
+
+def tareas_registradas() -> Dict[str, TareaProgramada]:
+    return dict(_tareas)
+
+
+# ---------------------------------------------------------------------
+# Valores derivados
+# ---------------------------------------------------------------------
+def guardar_derivado(database, clave: str, valor: Any) -> None:
+    database[COLECCION_DERIVADOS].update_one(
+        {"_id": clave},
+        {"$set": {"valor": valor, "calculado": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def leer_derivado(database, clave: str, max_edad_s: Optional[float] = None) -> Optional[Tuple[Any, datetime]]:
+    """``(valor, calculado)`` si existe y no es más viejo que ``max_edad_s``."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return None
+    documento = database[COLECCION_DERIVADOS].find_one({"_id": clave})
+    if not documento:
+        return None
+    if max_edad_s is not None and datetime.utcnow() - documento["calculado"] > timedelta(seconds=max_edad_s):
+        return None
+    return documento["valor"], documento["calculado"]
+
+
+# ---------------------------------------------------------------------
+# Lease y ejecución
+# ---------------------------------------------------------------------
+class LeasePerdido(RuntimeError):
+    """Otro proceso tomó la tarea: la ejecución en curso debe detenerse."""
+
+
+class _RenovadorLease:
+    """Renueva el lease de una tarea en curso desde un hilo y a pedido de la tarea."""
+
+    def __init__(self, database, tarea: TareaProgramada, propietario: str):
+        self._coleccion = database[COLECCION_TAREAS]
+        self._tarea = tarea
+        self._propietario = propietario
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.perdido = threading.Event()
+
+    def renovar(self) -> bool:
+        """Extiende ``vence``; ``False`` (y marca el lease como perdido) si ya no es del propietario."""
+        if self.perdido.is_set():
+            return False
+        renovada = self._coleccion.find_one_and_update(
+            {"_id": self._tarea.nombre, "propietario": self._propietario},
+            {"$set": {"vence": datetime.utcnow() + timedelta(seconds=self._tarea.duracion_max_s)}},
+        )
+        if renovada is None:
+            self.perdido.set()
+        return renovada is not None
+
+    def _bucle(self) -> None:
+        while not self._detener.wait(self._tarea.duracion_max_s / 3):
+            try:
+                if not self.renovar():
+                    logger.warning("Tarea %s: el lease pasó a otro proceso", self._tarea.nombre)
+                    return
+            except PyMongoError as exc:
+                logger.warning("Tarea %s: no se pudo renovar el lease (%s)", self._tarea.nombre, exc)
+
+    def __enter__(self) -> "_RenovadorLease":
+        self._token = _lease_actual.set(self)
+        self._hilo = threading.Thread(target=self._bucle, name=f"lease-{self._tarea.nombre}", daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+        _lease_actual.reset(self._token)
+
+
+_lease_actual: contextvars.ContextVar[Optional[_RenovadorLease]] = contextvars.ContextVar(
+    "lease_actual", default=None
+)
+
+
+def renovar_lease() -> None:
+    """Renueva el lease de la tarea en curso; lanza :class:`LeasePerdido` si otro proceso la tomó.
+
+    Fuera de una tarea del planificador no hace nada.
+    """
+    renovador = _lease_actual.get()
+    if renovador is not None and not renovador.renovar():
+        raise LeasePerdido("el lease de la tarea pasó a otro proceso")
+
+
+def identificador_proceso() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def tomar_lease(database, tarea: TareaProgramada, propietario: str, ahora: Optional[datetime] = None) -> bool:
+    """Toma la tarea si le toca ejecutarse y nadie tiene un lease vigente."""
+    ahora = ahora or datetime.utcnow()
+    coleccion = database[COLECCION_TAREAS]
+    coleccion.update_one(
+        {"_id": tarea.nombre},
+        {"$setOnInsert": {"proxima": ahora, "vence": None, "propietario": None}},
+        upsert=True,
+    )
+    tomada = coleccion.find_one_and_update(
+        {
+            "_id": tarea.nombre,
+            "proxima": {"$lte": ahora},
+            "$or": [{"vence": None}, {"vence": {"$lte": ahora}}],
+        },
+        {"$set": {
+            "propietario": propietario,
+            "vence": ahora + timedelta(seconds=tarea.duracion_max_s),
+            "estado": EN_CURSO,
+            "inicio": ahora,
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    return tomada is not None
+
+
+def ejecutar_tarea(
+    database,
+    tarea: TareaProgramada,
+    propietario: str,
+    reloj: Callable[[], datetime] = datetime.utcnow,
+) -> Optional[Dict[str, Any]]:
+    """Ejecuta ``tarea`` si obtiene el lease. Devuelve el registro de historial o ``None``."""
+    inicio = reloj()
+    if not tomar_lease(database, tarea, propietario, inicio):
+        return None
+    estado, resultado, error = OK, None, None
+    try:
+        with _RenovadorLease(database, tarea, propietario):
+            resultado = tarea.funcion(database)
+    except LeasePerdido as exc:
+        logger.warning("Tarea %s detenida: %s", tarea.nombre, exc)
+        estado, error = ERROR, str(exc)
+    except Exception as exc:  # la tarea falla, el planificador sigue
+        logger.exception("Tarea %s falló", tarea.nombre)
+        estado, error = ERROR, str(exc)
+    fin = reloj()
+    registro = {
+        "tarea": tarea.nombre,
+        "propietario": propietario,
+        "inicio": inicio,
+        "fin": fin,
+        "duracion_s": (fin - inicio).total_seconds(),
+        "estado": estado,
+        "resultado": None if resultado is None else str(resultado)[:500],
+        "error": error,
+    }
+    database[COLECCION_HISTORIAL].insert_one(dict(registro))
+    database[COLECCION_TAREAS].update_one(
+        {"_id": tarea.nombre, "propietario": propietario},
+        {"$set": {
+            "propietario": None,
+            "vence": None,
+            "proxima": fin + timedelta(seconds=tarea.intervalo_s),
+            "estado": estado,
+            "ultima_ejecucion": fin,
+            "ultima_duracion_s": registro["duracion_s"],
+            "ultimo_error": error,
+        }},
+    )
+    _recortar_historial(database, tarea.nombre)
+    return registro
+
+
+def _recortar_historial(database, nombre: str) -> None:
+    coleccion = database[COLECCION_HISTORIAL]
+    corte = list(
+        coleccion.find({"tarea": nombre}, {"inicio": 1}).sort("inicio", -1).skip(MAX_HISTORIAL_POR_TAREA).limit(1)
+    )
+    if corte:
+        coleccion.delete_many({"tarea": nombre, "inicio": {"$lte": corte[0]["inicio"]}})
+
+
+def ejecutar_pendientes(database=None, propietario: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Una pasada por todas las tareas registradas. Devuelve las ejecutadas."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    propietario = propietario or identificador_proceso()
+    ejecutadas = []
+    for tarea in list(_tareas.values()):
+        registro = ejecutar_tarea(database, tarea, propietario)
+        if registro:
+            ejecutadas.append(registro)
+    return ejecutadas
+
+
+def solicitar_ejecucion(database, nombre: str) -> None:
+    """Adelanta la próxima ejecución de ``nombre`` (la toma el próximo tick)."""
+    database[COLECCION_TAREAS].update_one(
+        {"_id": nombre}, {"$set": {"proxima": datetime.utcnow()}}, upsert=True
+    )
+
+
+def estado_tareas(database=None) -> List[Dict[str, Any]]:
+    """Estado persistido de cada tarea registrada, para el panel de administración."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    documentos = {d["_id"]: d for d in database[COLECCION_TAREAS].find({"_id": {"$in": list(_tareas)}})}
+    return [
+        {
+            "tarea": nombre,
+            "descripcion": tarea.descripcion,
+            "intervalo_min": tarea.intervalo_s / 60,
+            **{k: v for k, v in documentos.get(nombre, {}).items() if k != "_id"},
+        }
+        for nombre, tarea in _tareas.items()
+    ]
+
+
+def historial_tareas(database=None, nombre: Optional[str] = None, limite: int = 50) -> List[Dict[str, Any]]:
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    query = {"tarea": nombre} if nombre else {}
+    return list(database[COLECCION_HISTORIAL].find(query, {"_id": 0}).sort("inicio", -1).limit(limite))
+
+
+class Planificador:
+    """Hilo de fondo que revisa las tareas cada ``tick_s`` segundos."""
+
+    def __init__(self, database=None, tick_s: float = TICK_S):
+        self._database = database
+        self.tick_s = tick_s
+        self.propietario = identificador_proceso()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="cmms-planificador", daemon=True)
+        self._hilo.start()
+
+    def detener(self, espera_s: float = 5) -> None:
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(espera_s)
+
+    def _bucle(self) -> None:
+        while not self._detener.is_set():
+            try:
+                ejecutar_pendientes(self._database, self.propietario)
+            except PyMongoError as exc:
+                logger.warning("Planificador: MongoDB no disponible (%s)", exc)
+            self._detener.wait(self.tick_s)
+
+
+# ---------------------------------------------------------------------
+# Tareas del CMMS
+# ---------------------------------------------------------------------
+def _tarea_muestra_almacenamiento(database) -> str:
+    from cmms_fabrica.modulos.monitor_almacenamiento import tomar_muestra
+
+    muestra = tomar_muestra(database)
+    return f"{muestra['total_mb']:.1f} MB" if muestra else "sin muestra"
+
+
+def _tarea_limpieza_almacenamiento(database) -> str:
+    from cmms_fabrica.modulos.almacenamiento import ejecutar_limpieza_si_es_necesario
+
+    # Entre lotes: renueva el lease y se detiene si otro worker tomó la tarea
+    limpio = ejecutar_limpieza_si_es_necesario(al_avanzar=lambda *_: renovar_lease())
+    return "limpieza ejecutada" if limpio else "sin limpieza necesaria"
+
+
+def _tarea_rollups_historial(database) -> str:
+    from cmms_fabrica.crud.rollups_historial import COLECCION_ROLLUPS, reconstruir_rollups
+
+    # Solo períodos cerrados, con los meses archivados incluidos (ver rollups_historial)
+    if not database[COLECCION_ROLLUPS].count_documents({}, limit=1):
+        return f"{reconstruir_rollups(database)} eventos (reconstrucción completa)"
+    # Reconcilia el mes anterior y el actual
+    hoy = datetime.utcnow().date()
+    desde = (hoy.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return f"{reconstruir_rollups(database, desde=desde)} eventos desde {desde}"
+
+
+registrar_tarea(
+    "muestra_almacenamiento", _tarea_muestra_almacenamiento, 3600,
+    "Muestra collStats por colección para el monitor de almacenamiento",
+)
+registrar_tarea(
+    "limpieza_almacenamiento", _tarea_limpieza_almacenamiento, 6 * 3600,
+    "Archiva y limpia colecciones rotables si se supera el límite",
+    duracion_max_s=3600,
+)
+registrar_tarea(
+    "rollups_historial", _tarea_rollups_historial, 24 * 3600,
+    "Reconcilia los indicadores precalculados del historial",
+    duracion_max_s=1800,
+)
+
+
+_planificador: Optional[Planificador] = None
+_planificador_lock = threading.Lock()
+
+
+def iniciar_planificador_al_iniciar(database=None) -> Optional[Planificador]:
+    """Arranca el hilo de fondo una sola vez por proceso (arranque de la app)."""
+    global _planificador
+    if not HABILITADO:
+        return None
+    with _planificador_lock:
+        if _planificador is None:
+            _planificador = Planificador(database)
+            _planificador.iniciar()
+        return _planificador
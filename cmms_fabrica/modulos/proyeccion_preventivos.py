@@ -0,0 +1,232 @@
+"""📆 Proyección de Planes Preventivos – CMMS Fábrica
+
+Proyecta las intervenciones preventivas de los planes activos sobre un
+horizonte de planificación (6 a 12 meses) y las cuenta por semana y por
+activo o responsable (matriz de carga de trabajo).
+
+- Por tiempo: desde ``proxima_fecha_dt`` (o hoy, si el plan está vencido)
+  se repite cada ``frecuencia`` ``unidad_frecuencia``; los meses conservan
+  el día del mes, recortado al último día cuando no existe.
+- Por uso: ``uso_restante`` y ``umbral_uso`` se convierten en días con la
+  tasa de uso medida: ``tasa_uso_diaria`` del horómetro vinculado
+  (``medidores_uso``) o, sin medidor, el consumo desde la última ejecución
+  sobre los días transcurridos desde ``ultima_fecha``.
+- Ambos: la primera intervención es la más próxima y se repite con el
+  intervalo más corto.
+
+Toda la expansión es aritmética de fechas de NumPy sobre arreglos (sin un
+bucle por plan): miles de planes se proyectan en milisegundos. Por consola::
+
+    python -m cmms_fabrica.modulos.proyeccion_preventivos --meses 6 --por responsable
+
+Normas:
+- ISO 55001 (Planificación del mantenimiento del activo)
+- ISO 9001:2015 (Planificación de recursos)
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.vencimientos_planes import COLECCION, POR_TIEMPO, POR_USO
+
+HORIZONTE_MESES = 12
+DIAS_POR_UNIDAD = {"días": 1, "semanas": 7}
+# Días medios de un mes, para comparar intervalos mensuales con intervalos por uso
+DIAS_POR_MES = 30.4375
+AGRUPACIONES = {"activo": "id_activo_tecnico", "responsable": "responsable"}
+SIN_ASIGNAR = "Sin asignar"
+
+CAMPOS_PLAN = [
+    "id_plan",
+    "id_activo_tecnico",
+    "responsable",
+    "tipo_programacion",
+    "frecuencia",
+    "unidad_frecuencia",
+    "proxima_fecha_dt",
+    "ultima_fecha",
+    "umbral_uso",
+    "ultima_lectura_uso",
+    "lectura_actual_uso",
+    "uso_restante",
+    "tasa_uso_diaria",
+]
+COLUMNAS_OCURRENCIA = ["id_plan", "id_activo_tecnico", "responsable", "origen", "fecha", "semana"]
+
+
+def cargar_planes(database=None) -> pd.DataFrame:
+    """Planes activos con los campos que usa la proyección (una consulta)."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return pd.DataFrame(columns=CAMPOS_PLAN)
+    proyeccion = {"_id": 0, **{campo: 1 for campo in CAMPOS_PLAN}}
+    planes = list(database[COLECCION].find({"estado": "Activo"}, proyeccion))
+    return pd.DataFrame(planes, columns=CAMPOS_PLAN)
+
+
+def _numerico(planes: pd.DataFrame, campo: str) -> np.ndarray:
+    return pd.to_numeric(planes[campo], errors="coerce").to_numpy(dtype=float)
+
+
+def _dias(planes: pd.DataFrame, campo: str, formato: Optional[str] = None) -> np.ndarray:
+    return pd.to_datetime(planes[campo], format=formato, errors="coerce").to_numpy().astype("M8[D]")
+
+
+def sumar_meses(fechas: np.ndarray, meses: np.ndarray) -> np.ndarray:
+    """Suma ``meses`` a fechas ``datetime64[D]`` conservando el día del mes (recortado al último)."""
+    mes = fechas.astype("M8[M]")
+    dia = (fechas - mes.astype("M8[D]")).astype(np.int64)
+    destino = mes + meses.astype(np.int64)
+    largo = ((destino + 1).astype("M8[D]") - destino.astype("M8[D]")).astype(np.int64)
+    return destino.astype("M8[D]") + np.minimum(dia, largo - 1)
+
+
+def inicio_de_semana(fechas: np.ndarray) -> np.ndarray:
+    """Lunes de la semana de cada fecha ``datetime64[D]`` (el 1970-01-01 fue jueves)."""
+    return fechas - (fechas.astype(np.int64) + 3) % 7
+
+
+def tasas_de_uso(planes: pd.DataFrame, hoy: date) -> np.ndarray:
+    """Uso por día: la tasa del horómetro vinculado o, sin ella, la medida desde la última ejecución.
+
+    ``nan`` si no hay medidor, consumo o fecha válida.
+    """
+    del_medidor = _numerico(planes, "tasa_uso_diaria")
+    consumido = np.nan_to_num(_numerico(planes, "lectura_actual_uso")) - np.nan_to_num(
+        _numerico(planes, "ultima_lectura_uso")
+    )
+    transcurridos = (np.datetime64(hoy, "D") - _dias(planes, "ultima_fecha", "%Y-%m-%d")).astype(float)
+    validas = (consumido > 0) & (transcurridos > 0)
+    desde_ultima = np.where(validas, consumido / np.where(validas, transcurridos, 1.0), np.nan)
+    return np.where(del_medidor > 0, del_medidor, desde_ultima)
+
+
+def proyectar(
+    planes: pd.DataFrame,
+    hoy: Optional[date] = None,
+    meses: int = HORIZONTE_MESES,
+    tasas: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """Una fila por intervención proyectada entre ``hoy`` y ``hoy + meses``.
+
+    ``tasas`` (uso por día, alineado con ``planes``) reemplaza a
+    :func:`tasas_de_uso`. La columna ``origen`` indica qué criterio fija el
+    intervalo de cada plan.
+    """
+    hoy = hoy or date.today()
+    if planes.empty:
+        return pd.DataFrame(columns=COLUMNAS_OCURRENCIA)
+    hoy_d = np.datetime64(hoy, "D")
+    hasta = sumar_meses(np.array([hoy_d]), np.array([meses]))[0]
+
+    tipo = planes["tipo_programacion"].fillna("tiempo").to_numpy()
+    unidad = planes["unidad_frecuencia"].fillna("días").to_numpy()
+    frecuencia = np.maximum(np.nan_to_num(_numerico(planes, "frecuencia"), nan=1.0), 1).astype(np.int64)
+
+    # Criterio por tiempo
+    proxima = _dias(planes, "proxima_fecha_dt")
+    por_tiempo = np.isin(tipo, POR_TIEMPO) & ~np.isnat(proxima)
+    primera_t = np.where(proxima < hoy_d, hoy_d, proxima)
+    por_meses = unidad == "meses"
+    paso_t = frecuencia * np.where(por_meses, DIAS_POR_MES, pd.Series(unidad).map(DIAS_POR_UNIDAD).fillna(1).to_numpy())
+
+    # Criterio por uso
+    tasa = tasas_de_uso(planes, hoy) if tasas is None else np.asarray(tasas, dtype=float)
+    umbral = _numerico(planes, "umbral_uso")
+    restante = _numerico(planes, "uso_restante")
+    por_uso = np.isin(tipo, POR_USO) & (umbral > 0) & ~np.isnan(restante) & (tasa > 0)
+    tasa_valida = np.where(por_uso, tasa, 1.0)
+    dias_hasta_uso = np.ceil(np.maximum(np.nan_to_num(restante), 0) / tasa_valida)
+    primera_u = hoy_d + np.minimum(dias_hasta_uso, (hasta - hoy_d).astype(np.int64)).astype("m8[D]")
+    paso_u = np.maximum(np.nan_to_num(umbral) / tasa_valida, 1.0)
+
+    # Cada plan repite con el intervalo más corto y empieza en la fecha más próxima
+    usa_uso = por_uso & (~por_tiempo | (paso_u < paso_t))
+    primera = np.where(por_tiempo & por_uso, np.minimum(primera_t, primera_u), np.where(por_uso, primera_u, primera_t))
+    paso_dias = np.where(usa_uso, paso_u, paso_t)
+    paso_meses = np.where(usa_uso | ~por_meses, 0, frecuencia)
+    vigente = (por_tiempo | por_uso) & (primera < hasta)
+
+    # Cantidad de repeticiones por plan (cota superior para los mensuales; se filtra después)
+    horizonte = np.where(vigente, (hasta - primera).astype(np.int64), 0)
+    meses_restantes = (hasta.astype("M8[M]") - primera.astype("M8[M]")).astype(np.int64)
+    cuenta = np.where(
+        paso_meses > 0,
+        meses_restantes // np.maximum(paso_meses, 1) + 1,
+        np.ceil(horizonte / paso_dias),
+    )
+    cuenta = np.where(vigente, cuenta, 0).astype(np.int64)
+
+    indice = np.repeat(np.arange(len(planes)), cuenta)
+    k = np.arange(indice.size) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+    inicio = primera[indice]
+    fechas = np.where(
+        paso_meses[indice] > 0,
+        sumar_meses(inicio, k * paso_meses[indice]),
+        inicio + np.floor(k * paso_dias[indice]).astype(np.int64).astype("m8[D]"),
+    )
+    dentro = fechas < hasta
+    indice, fechas = indice[dentro], fechas[dentro]
+
+    return pd.DataFrame(
+        {
+            "id_plan": planes["id_plan"].to_numpy()[indice],
+            "id_activo_tecnico": planes["id_activo_tecnico"].fillna(SIN_ASIGNAR).to_numpy()[indice],
+            "responsable": planes["responsable"].replace("", np.nan).fillna(SIN_ASIGNAR).to_numpy()[indice],
+            "origen": np.where(usa_uso, "uso", "tiempo")[indice],
+            "fecha": fechas.astype("M8[ns]"),
+            "semana": inicio_de_semana(fechas).astype("M8[ns]"),
+        },
+        columns=COLUMNAS_OCURRENCIA,
+    )
+
+
+def matriz_carga(
+    ocurrencias: pd.DataFrame,
+    por: str = "activo",
+    hoy: Optional[date] = None,
+    meses: int = HORIZONTE_MESES,
+) -> pd.DataFrame:
+    """Intervenciones por activo/responsable (filas) y semana (columnas, lunes), con ceros."""
+    hoy = hoy or date.today()
+    hoy_d = np.datetime64(hoy, "D")
+    hasta = sumar_meses(np.array([hoy_d]), np.array([meses]))[0]
+    semanas = pd.date_range(inicio_de_semana(hoy_d), hasta - 1, freq="W-MON")
+    campo = AGRUPACIONES[por]
+    if ocurrencias.empty:
+        return pd.DataFrame(0, index=pd.Index([], name=campo), columns=semanas)
+    matriz = pd.crosstab(ocurrencias[campo], ocurrencias["semana"])
+    return matriz.reindex(columns=semanas, fill_value=0).rename_axis(columns=None)
+
+
+def proyectar_calendario(database=None, hoy: Optional[date] = None, meses: int = HORIZONTE_MESES) -> pd.DataFrame:
+    """Carga los planes activos y proyecta sus intervenciones."""
+    return proyectar(cargar_planes(database), hoy, meses)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Proyección de intervenciones preventivas por semana")
+    parser.add_argument("--meses", type=int, default=HORIZONTE_MESES, help="Horizonte de planificación")
+    parser.add_argument("--por", choices=list(AGRUPACIONES), default="activo")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+    ocurrencias = proyectar_calendario(database, meses=args.meses)
+    matriz = matriz_carga(ocurrencias, args.por, meses=args.meses)
+    print(f"Intervenciones proyectadas ({args.meses} meses): {len(ocurrencias)}")
+    for grupo, total in matriz.sum(axis=1).sort_values(ascending=False).items():
+        print(f"  {grupo}: {total} (máx. {matriz.loc[grupo].max()} en una semana)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""🗂️ Reportes por Activo en Lote – CMMS Fábrica
+
+Genera, para un período, un PDF por subárbol de activo técnico y los
+entrega juntos en un único ZIP (auditoría mensual):
+
+1. Una sola agregación de ``historial`` para todo el período (último evento
+   por tarea y activo) y una sola lectura de la jerarquía (``ancestros``).
+2. Las filas se reparten en memoria: cada evento va al reporte de su activo
+   y de cada ancestro que sea raíz de un reporte.
+3. Los PDF se arman en paralelo en un ``ProcessPoolExecutor`` con
+   ``generar_pdf``; cada proceso recibe solo sus filas.
+
+Por defecto se genera un reporte por activo raíz (sin ``pertenece_a``); con
+``todos=True``, uno por cada activo con eventos en el período::
+
+    python -m cmms_fabrica.modulos.reportes_lote --desde 2025-06-01 --hasta 2025-06-30
+    python -m cmms_fabrica.modulos.reportes_lote --desde 2025-06-01 --hasta 2025-06-30 --todos --procesos 4
+
+Normas:
+- ISO 9001:2015 (Trazabilidad documental)
+- ISO 55001 (Información por activo para auditoría)
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+from cmms_fabrica.modulos.consultas_historial import ultimos_por_tarea_y_activo
+
+logger = logging.getLogger(__name__)
+
+PROCESOS = int(os.getenv("CMMS_REPORTES_PROCESOS", "0")) or (os.cpu_count() or 1)
+# "spawn": los procesos no heredan los hilos del cliente de MongoDB ni los de Streamlit
+CONTEXTO_PROCESOS = os.getenv("CMMS_REPORTES_CONTEXTO", "spawn")
+
+
+def cadenas_de_activos(database=None) -> Dict[str, List[str]]:
+    """``id_activo`` → ``ancestros + [id_activo]`` con una única consulta."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return {}
+    cursor = database["activos_tecnicos"].find({}, {"_id": 0, "id_activo_tecnico": 1, "ancestros": 1})
+    return {
+        a["id_activo_tecnico"]: list(a.get("ancestros") or []) + [a["id_activo_tecnico"]]
+        for a in cursor
+        if a.get("id_activo_tecnico")
+    }
+
+
+def repartir_por_subarbol(
+    df: pd.DataFrame,
+    cadenas: Dict[str, List[str]],
+    raices: Optional[Iterable[str]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Reparte las filas entre los reportes de cada raíz.
+
+    Un evento pertenece a todas las raíces de su cadena de ancestros. Sin
+    ``raices``, cada activo con eventos es su propia raíz (subárbol incluido).
+    Los eventos sin activo (proveedores, consumos, limpiezas) no entran en
+    ningún reporte por activo.
+    """
+    if df.empty:
+        return {}
+    elegidas = set(raices) if raices is not None else None
+    posiciones: Dict[str, List[int]] = {}
+    for posicion, id_activo in enumerate(df["id_activo_tecnico"].tolist()):
+        if pd.isna(id_activo) or id_activo == "":
+            continue
+        cadena = cadenas.get(id_activo, [id_activo])
+        for raiz in cadena:
+            if elegidas is None or raiz in elegidas:
+                posiciones.setdefault(raiz, []).append(posicion)
+    return {raiz: df.iloc[filas].reset_index(drop=True) for raiz, filas in sorted(posiciones.items())}
+
+
+def _nombre_archivo(id_activo: str, desde: date, hasta: date) -> str:
+    seguro = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(id_activo)).strip("_") or "activo"
+    return f"reporte_{seguro}_{desde:%Y%m%d}_{hasta:%Y%m%d}.pdf"
+
+
+def _pdf_de_activo(trabajo: Tuple[str, pd.DataFrame]) -> Tuple[str, bytes]:
+    """Se ejecuta en un proceso del pool: arma el PDF de un subárbol."""
+    from cmms_fabrica.modulos.app_reportes import generar_pdf
+
+    id_activo, df = trabajo
+    return id_activo, generar_pdf(df, None, nombre=f"Reporte {id_activo}")
+
+
+def generar_pdfs(
+    grupos: Dict[str, pd.DataFrame],
+    procesos: int = PROCESOS,
+    contexto: str = CONTEXTO_PROCESOS,
+) -> Iterable[Tuple[str, bytes]]:
+    """PDF por grupo, en paralelo cuando hay más de un proceso disponible."""
+    trabajos = list(grupos.items())
+    procesos = max(1, min(procesos, len(trabajos)))
+    if procesos == 1:
+        yield from map(_pdf_de_activo, trabajos)
+        return
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context(contexto)) as pool:
+        # Los grupos grandes primero: el último proceso no queda solo con el más pesado
+        trabajos.sort(key=lambda t: len(t[1]), reverse=True)
+        yield from pool.map(_pdf_de_activo, trabajos)
+
+
+def generar_zip_por_activo(
+    desde: date,
+    hasta: date,
+    categorias: Optional[Sequence[str]] = None,
+    raices: Optional[Iterable[str]] = None,
+    todos: bool = False,
+    procesos: int = PROCESOS,
+    database=None,
+) -> bytes:
+    """ZIP con un PDF por subárbol de activo y un ``indice.csv`` con los conteos.
+
+    ``raices`` fija los activos a reportar; si no se indica, se usan los
+    activos raíz de la jerarquía, o todos los activos con ``todos=True``.
+    """
+    database = resolver_db(database if database is not None else db)
+    cadenas = cadenas_de_activos(database)
+    if raices is None and not todos:
+        raices = [id_activo for id_activo, cadena in cadenas.items() if len(cadena) == 1]
+
+    # Una única agregación para todos los reportes
+    df = ultimos_por_tarea_y_activo(desde, hasta, categorias, database=database)
+    grupos = repartir_por_subarbol(df, cadenas, raices)
+    logger.info("Reportes por activo: %s grupos a partir de %s eventos", len(grupos), len(df))
+
+    buffer = io.BytesIO()
+    indice = io.StringIO()
+    escritor = csv.writer(indice)
+    escritor.writerow(["id_activo_tecnico", "eventos", "archivo"])
+    # Los PDF ya van comprimidos: se guardan sin volver a comprimir
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archivo_zip:
+        for id_activo, contenido in generar_pdfs(grupos, procesos):
+            nombre = _nombre_archivo(id_activo, desde, hasta)
+            archivo_zip.writestr(nombre, contenido)
+            escritor.writerow([id_activo, len(grupos[id_activo]), nombre])
+        archivo_zip.writestr("indice.csv", indice.getvalue(), compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Un PDF por activo técnico para un período, en un ZIP")
+    parser.add_argument("--desde", type=date.fromisoformat, required=True, help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, required=True, help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument("--categorias", help="Categorías separadas por coma (por defecto, todas)")
+    parser.add_argument("--activos", help="IDs de activos raíz separados por coma")
+    parser.add_argument("--todos", action="store_true", help="Un reporte por cada activo con eventos")
+    parser.add_argument("--procesos", type=int, default=PROCESOS, help="Procesos en paralelo")
+    parser.add_argument("--salida", help="Archivo ZIP (por defecto reportes_activos_<desde>_<hasta>.zip)")
+    args = parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+
+    def _lista(valor: Optional[str]) -> Optional[List[str]]:
+        return [v.strip() for v in valor.split(",") if v.strip()] if valor else None
+
+    contenido = generar_zip_por_activo(
+        args.desde,
+        args.hasta,
+        _lista(args.categorias),
+        _lista(args.activos),
+        args.todos,
+        args.procesos,
+        database,
+    )
+    salida = args.salida or f"reportes_activos_{args.desde:%Y%m%d}_{args.hasta:%Y%m%d}.zip"
+    with open(salida, "wb") as f:
+        f.write(contenido)
+    print("archivo:", salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ from pymongo.collection import Collection
 from pymongo.database import Database
 
 from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+from cmms_fabrica.modulos.cache_catalogos import invalidar_catalogo
 from cmms_fabrica.modulos.conexion_mongo import get_db
 
 
@@ -73,6 +74,7 @@ class CMMSRepository:
             raise ValueError("id_activo_tecnico es obligatorio para mantener trazabilidad")
 
         result = self._collection.insert_one(payload)
+        invalidar_catalogo(self._collection.name)
 
         id_origen = (
             event.id_origen
@@ -109,6 +111,7 @@ class CMMSRepository:
         result = self._collection.update_one(filtro, {"$set": payload})
         if result.matched_count == 0:
             raise LookupError("Documento no encontrado para actualizar")
+        invalidar_catalogo(self._collection.name)
 
         id_origen = (
             event.id_origen
@@ -148,6 +151,7 @@ class CMMSRepository:
         result = self._collection.delete_one({"_id": registro["_id"]})
 
         if result.deleted_count:
+            invalidar_catalogo(self._collection.name)
             id_origen = (
                 event.id_origen
                 or registro.get("id_tarea")
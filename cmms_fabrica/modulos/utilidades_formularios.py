@@ -1,29 +1,59 @@
-"""Funciones auxiliares para cargar opciones en formularios Streamlit."""
+"""Funciones auxiliares para cargar opciones en formularios Streamlit.
+
+Las listas se sirven desde ``cache_catalogos``: se consultan en MongoDB solo
+después de una escritura en la colección (o al vencer el TTL).
+"""
 
 from __future__ import annotations
-from typing import List
-from cmms_fabrica.modulos.conexion_mongo import db
+from typing import Any, Dict, List
+from cmms_fabrica.modulos.cache_catalogos import catalogo
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
 
 
-def select_activo_tecnico(database=db) -> List[str]:
-    """Devuelve lista ordenada de IDs de activos técnicos."""
+def catalogo_activos(database=db) -> List[Dict[str, Any]]:
+    """Devuelve ``id_activo_tecnico``, ``nombre`` y ``pertenece_a`` de cada activo, ordenados por ID."""
+    database = resolver_db(database)
     if database is None:
         return []
-    activos = database["activos_tecnicos"].find({}, {"_id": 0, "id_activo_tecnico": 1})
-    return sorted(a.get("id_activo_tecnico") for a in activos if a.get("id_activo_tecnico"))
+
+    def cargar():
+        activos = database["activos_tecnicos"].find(
+            {}, {"_id": 0, "id_activo_tecnico": 1, "nombre": 1, "pertenece_a": 1}
+        )
+        return sorted(
+            (a for a in activos if a.get("id_activo_tecnico")),
+            key=lambda a: a["id_activo_tecnico"],
+        )
+
+    return catalogo(database, "activos_tecnicos", "catalogo", cargar)
+
+
+def select_activo_tecnico(database=db) -> List[str]:
+    """Devuelve lista ordenada de IDs de activos técnicos."""
+    return [a["id_activo_tecnico"] for a in catalogo_activos(database)]
 
 
 def select_usuarios(database=db) -> List[str]:
     """Devuelve lista ordenada de nombres de usuario."""
+    database = resolver_db(database)
     if database is None:
         return []
-    usuarios = database["usuarios"].find({}, {"_id": 0, "nombre": 1})
-    return sorted(u.get("nombre") for u in usuarios if u.get("nombre"))
+
+    def cargar():
+        usuarios = database["usuarios"].find({}, {"_id": 0, "nombre": 1})
+        return sorted(u.get("nombre") for u in usuarios if u.get("nombre"))
+
+    return catalogo(database, "usuarios", "nombres", cargar)
 
 
 def select_proveedores_externos(database=db) -> List[str]:
     """Devuelve lista ordenada de proveedores externos."""
+    database = resolver_db(database)
     if database is None:
         return []
-    proveedores = database["servicios_externos"].find({}, {"_id": 0, "nombre": 1})
-    return sorted(p.get("nombre") for p in proveedores if p.get("nombre"))
+
+    def cargar():
+        proveedores = database["servicios_externos"].find({}, {"_id": 0, "nombre": 1})
+        return sorted(p.get("nombre") for p in proveedores if p.get("nombre"))
+
+    return catalogo(database, "servicios_externos", "nombres", cargar)
@@ -0,0 +1,205 @@
+"""⏰ Vencimientos de Planes Preventivos – CMMS Fábrica
+
+Cada plan guarda dos campos derivados, tipados e indexados, para que
+"vencidos" y "vencen en los próximos N días" sean una única consulta:
+
+- ``proxima_fecha_dt``: ``proxima_fecha`` (texto ``AAAA-MM-DD``, se conserva
+  tal cual) como ``datetime``; ``None`` si el plan no se programa por tiempo.
+- ``uso_restante``: ``umbral_uso - (lectura_actual_uso - ultima_lectura_uso)``;
+  ``None`` si el plan no se programa por uso. Vence con ``uso_restante <= 0``.
+
+Se mantienen al crear y editar un plan y al registrar una lectura de uso. Los
+planes anteriores se completan al iniciar la app o por consola::
+
+    python -m cmms_fabrica.modulos.vencimientos_planes
+
+Normas:
+- ISO 55001 (Planificación del mantenimiento del activo)
+- ISO 9001:2015 (Control operacional)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from cmms_fabrica.modulos.conexion_mongo import db, resolver_db
+
+logger = logging.getLogger(__name__)
+
+COLECCION = "planes_preventivos"
+POR_TIEMPO = ("tiempo", "ambos")
+POR_USO = ("uso", "ambos")
+CAMPOS_FILA = {
+    "_id": 0,
+    "id_plan": 1,
+    "id_activo_tecnico": 1,
+    "tipo_programacion": 1,
+    "proxima_fecha": 1,
+    "proxima_fecha_dt": 1,
+    "umbral_uso": 1,
+    "ultima_lectura_uso": 1,
+    "lectura_actual_uso": 1,
+    "uso_restante": 1,
+    "responsable": 1,
+}
+
+_campos_verificados = False
+
+
+def _numero(valor: Any) -> float:
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _inicio_del_dia(dia: date) -> datetime:
+    return datetime.combine(dia, datetime.min.time())
+
+
+def campos_derivados(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """``proxima_fecha_dt`` y ``uso_restante`` calculados a partir del plan."""
+    tipo_prog = plan.get("tipo_programacion") or "tiempo"
+    proxima_dt = None
+    if tipo_prog in POR_TIEMPO and plan.get("proxima_fecha"):
+        try:
+            proxima_dt = datetime.strptime(str(plan["proxima_fecha"])[:10], "%Y-%m-%d")
+        except ValueError:
+            # fecha mal cargada: el plan no vence por tiempo
+            proxima_dt = None
+    uso_restante = None
+    umbral = _numero(plan.get("umbral_uso"))
+    if tipo_prog in POR_USO and umbral > 0:
+        consumido = _numero(plan.get("lectura_actual_uso")) - _numero(plan.get("ultima_lectura_uso"))
+        uso_restante = umbral - consumido
+    return {"proxima_fecha_dt": proxima_dt, "uso_restante": uso_restante}
+
+
+def _fila(plan: Dict[str, Any], hoy: datetime) -> Dict[str, Any]:
+    proxima_dt = plan.get("proxima_fecha_dt")
+    uso_restante = plan.get("uso_restante")
+    return {
+        "id_plan": plan.get("id_plan"),
+        "id_activo_tecnico": plan.get("id_activo_tecnico"),
+        "tipo_programacion": plan.get("tipo_programacion", "tiempo"),
+        "proxima_fecha": plan.get("proxima_fecha", ""),
+        "venció_por_tiempo": proxima_dt is not None and proxima_dt < hoy,
+        "umbral_uso": plan.get("umbral_uso", ""),
+        "ultima_lectura_uso": plan.get("ultima_lectura_uso", ""),
+        "lectura_actual_uso": plan.get("lectura_actual_uso", ""),
+        "consumido": _numero(plan.get("lectura_actual_uso")) - _numero(plan.get("ultima_lectura_uso")),
+        "uso_restante": uso_restante,
+        "venció_por_uso": uso_restante is not None and uso_restante <= 0,
+        "responsable": plan.get("responsable", ""),
+    }
+
+
+def planes_vencidos(database=None, hoy: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Filas de los planes activos vencidos por tiempo, por uso o por ambos.
+
+    Una consulta: cada rama del ``$or`` usa su índice compuesto con ``estado``.
+    """
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    hoy_dt = _inicio_del_dia(hoy or date.today())
+    cursor = database[COLECCION].find(
+        {
+            "estado": "Activo",
+            "$or": [{"proxima_fecha_dt": {"$lt": hoy_dt}}, {"uso_restante": {"$lte": 0}}],
+        },
+        CAMPOS_FILA,
+    ).sort("id_plan", 1)
+    return [_fila(p, hoy_dt) for p in cursor]
+
+
+def planes_por_vencer(database=None, dias: int = 30, hoy: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Planes activos cuya fecha cae entre hoy y los próximos ``dias`` (rango en ``ix_estado_proxima_dt``)."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return []
+    hoy_dt = _inicio_del_dia(hoy or date.today())
+    cursor = database[COLECCION].find(
+        {"estado": "Activo", "proxima_fecha_dt": {"$gte": hoy_dt, "$lt": hoy_dt + timedelta(days=dias + 1)}},
+        CAMPOS_FILA,
+    ).sort("proxima_fecha_dt", 1)
+    return [_fila(p, hoy_dt) for p in cursor]
+
+
+def registrar_lectura_uso(id_plan: str, lectura: float, database=None) -> Optional[float]:
+    """Guarda la lectura actual del plan y su ``uso_restante``. Devuelve el restante."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return None
+    coleccion = database[COLECCION]
+    plan = coleccion.find_one({"id_plan": id_plan})
+    if not plan:
+        return None
+    plan["lectura_actual_uso"] = lectura
+    derivados = campos_derivados(plan)
+    coleccion.update_one({"_id": plan["_id"]}, {"$set": {"lectura_actual_uso": lectura, **derivados}})
+    return derivados["uso_restante"]
+
+
+def recalcular_campos(database=None, solo_faltantes: bool = False, tamano_lote: int = 500) -> int:
+    """Recalcula los campos derivados de todos los planes (o de los que no los tienen)."""
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return 0
+    coleccion = database[COLECCION]
+    query = {"proxima_fecha_dt": {"$exists": False}} if solo_faltantes else {}
+    campos = {
+        "tipo_programacion": 1,
+        "proxima_fecha": 1,
+        "umbral_uso": 1,
+        "ultima_lectura_uso": 1,
+        "lectura_actual_uso": 1,
+    }
+    operaciones: List[UpdateOne] = []
+    total = 0
+    for plan in coleccion.find(query, campos):
+        operaciones.append(UpdateOne({"_id": plan["_id"]}, {"$set": campos_derivados(plan)}))
+        if len(operaciones) >= tamano_lote:
+            total += coleccion.bulk_write(operaciones, ordered=False).modified_count
+            operaciones = []
+    if operaciones:
+        total += coleccion.bulk_write(operaciones, ordered=False).modified_count
+    return total
+
+
+def asegurar_campos_al_iniciar(database=None) -> None:
+    """Completa los campos derivados una vez por proceso si hay planes sin ellos."""
+    global _campos_verificados
+    if _campos_verificados:
+        return
+    database = resolver_db(database if database is not None else db)
+    if database is None:
+        return
+    try:
+        if database[COLECCION].count_documents({"proxima_fecha_dt": {"$exists": False}}, limit=1):
+            logger.info("Planes actualizados con vencimientos: %s", recalcular_campos(database, solo_faltantes=True))
+    except PyMongoError as exc:
+        logger.warning("Cálculo de vencimientos omitido: %s", exc)
+        return
+    _campos_verificados = True
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recalcula proxima_fecha_dt y uso_restante de los planes preventivos")
+    parser.parse_args(argv)
+
+    database = resolver_db(db)
+    if database is None:
+        print("❌ MongoDB no disponible. Revisá la conexión en conexion_mongo.py")
+        return
+    print("planes_actualizados:", recalcular_campos(database))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import pytest
+
+from cmms_fabrica.modulos import archivo_frio
+
+
+@pytest.fixture(autouse=True)
+def archivo_frio_temporal(tmp_path, monkeypatch):
+    """Cada prueba archiva en su propia carpeta temporal."""
+    directorio = tmp_path / "archivo_frio"
+    monkeypatch.setattr(archivo_frio, "DIRECTORIO_ARCHIVO", str(directorio))
+    return directorio
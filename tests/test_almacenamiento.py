@@ -31,3 +31,36 @@ def test_limpiar_coleccion_no_elimina_si_pocos():
         assert eliminados == 0
         coleccion_mock.delete_many.assert_not_called()
         log.assert_not_called()
+
+
+def test_tamano_descuenta_espacio_libre_o_usa_datasize():
+    db_mock = MagicMock()
+    mb = almacenamiento.MB
+    db_mock.command.return_value = {"storageSize": 500 * mb, "freeStorageSize": 300 * mb, "dataSize": 150 * mb}
+    with patch.object(almacenamiento, "db", db_mock):
+        assert almacenamiento.obtener_tamano_total_mb() == 200
+        db_mock.command.assert_called_with("dbstats", freeStorage=1)
+        db_mock.command.return_value = {"storageSize": 500 * mb, "dataSize": 150 * mb}
+        assert almacenamiento.obtener_tamano_total_mb() == 150
+
+
+def test_no_repite_la_limpieza_si_el_uso_no_bajo():
+    import mongomock
+
+    database = mongomock.MongoClient().db
+    usos = iter([500.0, 450.0, 450.0, 100.0])
+    with patch.object(almacenamiento, "db", database), \
+         patch.object(almacenamiento, "obtener_tamano_total_mb", side_effect=lambda: next(usos)), \
+         patch.object(almacenamiento, "listar_colecciones_ordenadas", return_value=[("observaciones", 0, "fecha_evento", False)]), \
+         patch.object(almacenamiento, "estadisticas_coleccion", return_value={"tamano_medio": 10.0}), \
+         patch.object(almacenamiento, "limpiar_coleccion", return_value=10) as limpiar, \
+         patch("cmms_fabrica.modulos.almacenamiento.registrar_evento_historial"):
+        assert almacenamiento.ejecutar_limpieza_si_es_necesario()
+        # bajó de 500 a 450: vuelve a limpiar
+        assert almacenamiento.ejecutar_limpieza_si_es_necesario()
+        # sigue en 450 después de limpiar: no borra más
+        assert not almacenamiento.ejecutar_limpieza_si_es_necesario()
+        assert limpiar.call_count == 2
+        # por debajo del límite se olvida la marca
+        assert not almacenamiento.ejecutar_limpieza_si_es_necesario()
+        assert database[almacenamiento.COLECCION_DERIVADOS].count_documents({}) == 0
@@ -0,0 +1,150 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import mongomock
+
+from cmms_fabrica.modulos import almacenamiento, archivo_frio
+from cmms_fabrica.modulos.borrado_por_lotes import borrar_por_lotes
+from cmms_fabrica.modulos.consultas_historial import resumen_kpis, ultimos_por_tarea_y_activo
+
+EVENTOS = [
+    {"fecha_evento": datetime(2023, 3, 10), "tipo_evento": "Alta de tarea correctiva", "id_activo_tecnico": "A1",
+     "id_origen": "TC-1", "usuario_registro": "u1", "criticidad": "Alta", "descripcion": "vieja"},
+    {"fecha_evento": datetime(2023, 4, 2), "tipo_evento": "Calibración de instrumento", "id_activo_tecnico": "A2",
+     "id_origen": "CAL-1", "usuario_registro": "u2", "descripcion": "vieja"},
+    {"fecha_evento": datetime(2025, 1, 5), "tipo_evento": "Cierre de tarea correctiva", "id_activo_tecnico": "A1",
+     "id_origen": "TC-2", "usuario_registro": "u1", "criticidad": "Media", "descripcion": "viva"},
+]
+
+
+def _db():
+    database = mongomock.MongoClient().db
+    database.historial.insert_many([dict(e) for e in EVENTOS])
+    return database
+
+
+def _archivar_y_borrar_viejos(database):
+    archivo = archivo_frio.ArchivoFrio("historial", "fecha_evento")
+    resultado = borrar_por_lotes(
+        "historial", "fecha_evento", fecha_limite=datetime(2024, 1, 1),
+        tamano_lote=1, ops_por_segundo=0, antes_de_borrar=archivo.guardar, database=database,
+    )
+    return archivo, resultado
+
+
+def test_archiva_por_mes_antes_de_borrar_y_conserva_los_tipos(archivo_frio_temporal):
+    database = _db()
+    archivo, resultado = _archivar_y_borrar_viejos(database)
+
+    assert resultado.eliminados == 2 and archivo.archivados == 2
+    assert database.historial.count_documents({}) == 1
+    entradas = archivo_frio.particiones("historial")
+    assert [e["particion"] for e in entradas] == ["2023-03", "2023-04"]
+    assert (archivo_frio_temporal / entradas[0]["archivo"]).exists()
+
+    leidos = list(archivo_frio.leer("historial", datetime(2023, 4, 1), datetime(2023, 4, 30)))
+    assert [d["id_origen"] for d in leidos] == ["CAL-1"]
+    assert leidos[0]["fecha_evento"] == datetime(2023, 4, 2)
+    assert not archivo_frio.hay_archivo("historial", datetime(2024, 1, 1), datetime(2025, 12, 31))
+
+
+def test_reportes_y_kpis_suman_el_archivo_fuera_del_rango_vivo():
+    database = _db()
+    _archivar_y_borrar_viejos(database)
+
+    df = ultimos_por_tarea_y_activo(date(2023, 1, 1), date(2025, 12, 31), database=database)
+    assert sorted(df["id_origen"]) == ["CAL-1", "TC-1", "TC-2"]
+
+    resumen = resumen_kpis(date(2023, 1, 1), date(2023, 12, 31), database=database)
+    assert resumen.eventos == 2
+    assert resumen.activos == 2
+
+
+def test_limpiar_coleccion_archiva_lo_que_borra():
+    database = _db()
+    with patch.object(almacenamiento, "db", database):
+        eliminados = almacenamiento._limpiar_por_porcentaje("historial", "fecha_evento", porcentaje=0.7, minimo=1)
+    assert eliminados == 2
+    assert sum(e["documentos"] for e in archivo_frio.particiones("historial")) == 2
+
+
+def test_sin_directorio_configurado_no_archiva_ni_borra(monkeypatch):
+    monkeypatch.setattr(archivo_frio, "DIRECTORIO_ARCHIVO", None)
+    database = _db()
+    with patch.object(almacenamiento, "db", database):
+        assert almacenamiento._limpiar_por_porcentaje("historial", "fecha_evento", porcentaje=0.7, minimo=1) == 0
+    assert database.historial.count_documents({}) == 3
+    assert not archivo_frio.hay_archivo("historial")
+
+
+def _archivar_desde_otro_proceso(directorio, inicio):
+    archivo = archivo_frio.ArchivoFrio("historial", "fecha_evento", directorio)
+    for i in range(inicio, inicio + 20):
+        archivo.guardar([{"_id": i, "fecha_evento": datetime(2023, 1 + i % 2, 1)}])
+
+
+def test_varios_procesos_no_pierden_entradas_del_manifiesto(archivo_frio_temporal):
+    import multiprocessing
+
+    contexto = multiprocessing.get_context("fork")
+    procesos = [contexto.Process(target=_archivar_desde_otro_proceso, args=(str(archivo_frio_temporal), n * 100))
+                for n in range(3)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(30)
+    assert sum(e["documentos"] for e in archivo_frio.particiones("historial")) == 60
+    assert len(list(archivo_frio.leer("historial"))) == 60
+
+
+def test_el_archivo_se_recorre_en_streaming_y_se_fusiona_por_clave():
+    import inspect
+
+    from cmms_fabrica.modulos import consultas_historial
+
+    database = _db()
+    _archivar_y_borrar_viejos(database)
+    leer_original = archivo_frio.leer
+    pendientes = []
+
+    def leer_contando(*args, **kwargs):
+        for documento in leer_original(*args, **kwargs):
+            pendientes.append(documento["id_origen"])
+            yield documento
+
+    assert inspect.isgenerator(consultas_historial.eventos_archivados(date(2023, 1, 1), date(2023, 12, 31)))
+    # Un evento vivo más reciente de TC-1 reemplaza al archivado
+    database.historial.insert_one({**EVENTOS[0], "fecha_evento": datetime(2025, 2, 1), "descripcion": "reabierta"})
+    with patch.object(archivo_frio, "leer", leer_contando):
+        lotes = list(consultas_historial.lotes_ultimos_por_tarea_y_activo(
+            date(2023, 1, 1), date(2025, 12, 31), tamano_lote=2, database=database))
+    assert sorted(pendientes) == ["CAL-1", "TC-1"]
+    assert [len(lote) for lote in lotes] == [2, 1]
+    filas = {f["id_origen"]: f for lote in lotes for f in lote.to_dict("records")}
+    assert filas["TC-1"]["descripcion"] == "reabierta"
+    assert filas["CAL-1"]["descripcion"] == "vieja"
+
+
+def test_reconstruir_rollups_incluye_los_meses_archivados():
+    from cmms_fabrica.crud.rollups_historial import reconstruir_rollups
+
+    database = _db()
+    _archivar_y_borrar_viejos(database)
+    # Limpieza interrumpida: un evento archivado que todavía sigue vivo se cuenta una vez
+    archivo_frio.ArchivoFrio("historial", "fecha_evento").guardar([database.historial.find_one()])
+
+    assert reconstruir_rollups(database) == 3
+    mensuales = {(b["fecha"].year, b["fecha"].month): b["cantidad"]
+                 for b in database.historial_rollups.find({"periodo": "mes"})}
+    assert mensuales == {(2023, 3): 1, (2023, 4): 1, (2025, 1): 1}
+
+
+def test_un_lote_archivado_dos_veces_se_lee_una_vez_por_particion():
+    archivo = archivo_frio.ArchivoFrio("historial", "fecha_evento")
+    lote = [{"_id": i, "fecha_evento": datetime(2023, 1 + i % 3, 1)} for i in range(9)]
+    archivo.guardar(lote)
+    archivo.guardar(lote[:4])  # reintento tras una limpieza interrumpida
+
+    assert sorted(d["_id"] for d in archivo_frio.leer("historial")) == list(range(9))
+    febrero = archivo_frio.leer("historial", datetime(2023, 2, 1), datetime(2023, 2, 28))
+    assert sorted(d["_id"] for d in febrero) == [1, 4, 7]
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import mongomock
+
+from cmms_fabrica.modulos.borrado_por_lotes import COLECCION_TRABAJOS, borrar_por_lotes
+
+
+def _db_con_observaciones(cantidad):
+    db_mock = mongomock.MongoClient().db
+    base = datetime(2024, 1, 1)
+    db_mock.observaciones.insert_many([
+        {"id_observacion": f"OBS-{i}", "fecha_evento": base + timedelta(days=i)} for i in range(cantidad)
+    ])
+    return db_mock
+
+
+def test_borra_en_lotes_los_mas_viejos_con_pausas_y_avance():
+    db_mock = _db_con_observaciones(25)
+    pausas, avances = [], []
+    resultado = borrar_por_lotes(
+        "observaciones",
+        "fecha_evento",
+        max_documentos=12,
+        tamano_lote=5,
+        ops_por_segundo=100,
+        al_avanzar=lambda n, objetivo: avances.append((n, objetivo)),
+        database=db_mock,
+        dormir=pausas.append,
+        reloj=lambda: 0.0,
+    )
+    assert resultado.eliminados == 12
+    assert resultado.lotes == 3
+    assert avances == [(5, 12), (10, 12), (12, 12)]
+    assert pausas == [0.05, 0.05]
+    restantes = sorted(d["id_observacion"] for d in db_mock.observaciones.find())
+    assert "OBS-11" not in restantes and "OBS-12" in restantes
+    assert db_mock[COLECCION_TRABAJOS].find_one()["estado"] == "completado"
+
+
+def test_respeta_fecha_limite():
+    db_mock = _db_con_observaciones(10)
+    resultado = borrar_por_lotes(
+        "observaciones", "fecha_evento", fecha_limite=datetime(2024, 1, 4),
+        tamano_lote=2, ops_por_segundo=0, database=db_mock,
+    )
+    assert resultado.eliminados == 3
+    assert db_mock.observaciones.count_documents({}) == 7
+
+
+def test_retoma_trabajo_interrumpido_con_su_objetivo_original():
+    db_mock = _db_con_observaciones(20)
+    db_mock[COLECCION_TRABAJOS].insert_one({
+        "_id": "observaciones:fecha_evento",
+        "estado": "en_curso",
+        "objetivo": 8,
+        "fecha_limite": None,
+        "eliminados": 5,
+    })
+    resultado = borrar_por_lotes(
+        "observaciones", "fecha_evento", max_documentos=6, tamano_lote=10, ops_por_segundo=0, database=db_mock
+    )
+    assert resultado.reanudado
+    assert resultado.objetivo == 8
+    assert resultado.eliminados == 8
+    assert db_mock.observaciones.count_documents({}) == 17
@@ -0,0 +1,70 @@
+import mongomock
+from unittest.mock import patch
+
+from cmms_fabrica.crud import crud_activos_tecnicos
+from cmms_fabrica.modulos import utilidades_formularios
+from cmms_fabrica.modulos.cache_catalogos import CacheCatalogos
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_cache_ttl_lru_e_invalidacion_por_version():
+    reloj = Reloj()
+    cache = CacheCatalogos(max_entradas=2, ttl_s=10, reloj=reloj)
+    base = object()
+    cargas = []
+
+    def cargar(valor):
+        def _cargar():
+            cargas.append(valor)
+            return [valor]
+        return _cargar
+
+    assert cache.obtener(base, "a", "k", cargar(1)) == [1]
+    copia = cache.obtener(base, "a", "k", cargar(2))
+    copia.append("mutado")
+    assert cache.obtener(base, "a", "k", cargar(2)) == [1]
+    assert cargas == [1]
+
+    cache.invalidar("a")
+    assert cache.obtener(base, "a", "k", cargar(3)) == [3]
+
+    reloj.t = 11
+    assert cache.obtener(base, "a", "k", cargar(4)) == [4]
+
+    cache.obtener(base, "b", "k", cargar(5))
+    cache.obtener(base, "c", "k", cargar(6))
+    # "a" fue la menos usada: se desaloja
+    assert cache.obtener(base, "a", "k", cargar(7)) == [7]
+    assert cache.aciertos == 2
+
+
+def test_select_activo_tecnico_consulta_mongo_solo_tras_una_escritura():
+    db_mock = mongomock.MongoClient().db
+    db_mock.activos_tecnicos.insert_one({"id_activo_tecnico": "B"})
+    coleccion = db_mock.activos_tecnicos
+    consultas = []
+    find_original = coleccion.find
+
+    def find_contado(*args, **kwargs):
+        consultas.append(args)
+        return find_original(*args, **kwargs)
+
+    with patch.object(type(coleccion), "find", autospec=True, side_effect=lambda self, *a, **k: find_contado(*a, **k)), \
+         patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        assert utilidades_formularios.select_activo_tecnico(db_mock) == ["B"]
+        assert utilidades_formularios.select_activo_tecnico(db_mock) == ["B"]
+        assert len(consultas) == 1
+
+        crud_activos_tecnicos.crear_activo(
+            {"id_activo_tecnico": "A", "nombre": "Bomba", "usuario_registro": "u"}, db_mock
+        )
+        consultas.clear()
+        assert utilidades_formularios.select_activo_tecnico(db_mock) == ["A", "B"]
+        assert len(consultas) == 1
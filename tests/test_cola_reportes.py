@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import mongomock
+
+from cmms_fabrica.modulos.cola_reportes import COMPLETADO, ERROR, ColaReportes
+
+PARAMETROS = {"desde": "2025-01-01", "hasta": "2025-01-31", "categorias": ["correctiva"], "ids": None}
+
+
+def _db_con_evento():
+    db_mock = mongomock.MongoClient().db
+    db_mock.historial.insert_one({
+        "fecha_evento": datetime(2025, 1, 10),
+        "tipo_evento": "Alta de tarea correctiva",
+        "categoria_evento": "correctiva",
+        "id_activo_tecnico": "AT-1",
+        "id_origen": "TC-1",
+        "descripcion": "Falla en bomba",
+        "usuario_registro": "tecnico",
+    })
+    return db_mock
+
+
+def test_reporte_repetido_sale_de_la_cache_hasta_que_cambia_historial(tmp_path):
+    db_mock = _db_con_evento()
+    llamadas = []
+
+    def generador(tipo, parametros, database, al_avanzar):
+        llamadas.append(parametros)
+        al_avanzar(1, 2)
+        return b"%PDF-contenido"
+
+    cola = ColaReportes(db_mock, workers=1, directorio=str(tmp_path), generador=generador)
+    primero = cola.solicitar("pdf", PARAMETROS, "ana")
+    cola._pool.submit(lambda: None).result()  # espera al trabajo encolado antes
+
+    estado = cola.estado(primero["_id"])
+    assert estado["estado"] == COMPLETADO and estado["progreso"] == 1.0
+    assert cola.artefacto(primero["_id"]) == b"%PDF-contenido"
+
+    segundo = cola.solicitar("pdf", dict(PARAMETROS, categorias=["correctiva"]), "beto")
+    assert segundo["estado"] == COMPLETADO and segundo["desde_cache"]
+    assert cola.artefacto(segundo["_id"]) == b"%PDF-contenido"
+    assert len(llamadas) == 1
+
+    db_mock.historial.insert_one({"fecha_evento": datetime(2025, 1, 11), "tipo_evento": "Alta de tarea correctiva"})
+    tercero = cola.solicitar("pdf", PARAMETROS, "ana")
+    cola.cerrar()
+    assert not tercero.get("desde_cache")
+    assert len(llamadas) == 2
+    assert [t["_id"] for t in cola.recientes("ana")] == [tercero["_id"], primero["_id"]]
+
+
+def test_error_del_generador_queda_registrado(tmp_path):
+    def generador(tipo, parametros, database, al_avanzar):
+        raise RuntimeError("sin memoria")
+
+    cola = ColaReportes(_db_con_evento(), workers=1, directorio=str(tmp_path), generador=generador)
+    trabajo = cola.solicitar("xlsx", PARAMETROS)
+    cola.cerrar()
+
+    estado = cola.estado(trabajo["_id"])
+    assert estado["estado"] == ERROR
+    assert "sin memoria" in estado["mensaje"]
+    assert cola.artefacto(trabajo["_id"]) is None
+
+
+def test_generador_por_defecto_arma_el_pdf_desde_historial(tmp_path):
+    cola = ColaReportes(_db_con_evento(), workers=1, directorio=str(tmp_path))
+    trabajo = cola.solicitar("pdf", PARAMETROS)
+    cola.cerrar()
+
+    estado = cola.estado(trabajo["_id"])
+    assert estado["estado"] == COMPLETADO, estado.get("mensaje")
+    assert estado["filas"] == 1
+    assert cola.artefacto(trabajo["_id"]).startswith(b"%PDF")
+
+
+def test_inventario_invalida_la_cache_y_un_archivo_ausente_se_regenera(tmp_path):
+    db_mock = _db_con_evento()
+    db_mock.inventario.insert_one({"id_item": "RL-1", "ultima_actualizacion": "2025-01-05"})
+    llamadas = []
+
+    def generador(tipo, parametros, database, al_avanzar):
+        llamadas.append(parametros)
+        return b"%PDF-contenido"
+
+    cola = ColaReportes(db_mock, workers=1, directorio=str(tmp_path), generador=generador)
+    primero = cola.solicitar("pdf", PARAMETROS)
+    cola._pool.submit(lambda: None).result()
+
+    db_mock.inventario.update_one({"id_item": "RL-1"}, {"$set": {"ultima_actualizacion": "2025-01-20"}})
+    segundo = cola.solicitar("pdf", PARAMETROS)
+    cola._pool.submit(lambda: None).result()
+    assert not segundo.get("desde_cache") and len(llamadas) == 2
+
+    # Otro servidor (o un reinicio) no tiene el archivo: se regenera una sola vez
+    for archivo in tmp_path.iterdir():
+        archivo.unlink()
+    assert cola.artefacto(primero["_id"]) is None
+    assert cola.artefacto(primero["_id"]) is None
+    cola.cerrar()
+    assert len(llamadas) == 3
+    assert cola.artefacto(primero["_id"]) == b"%PDF-contenido"
+
+
+def test_un_trabajo_que_queda_colgado_despues_se_reemplaza(tmp_path):
+    from cmms_fabrica.modulos.cola_reportes import ABANDONO, COLECCION, huella, marca_datos
+
+    db_mock = _db_con_evento()
+    cola = ColaReportes(db_mock, workers=1, directorio=str(tmp_path), generador=lambda *a: b"%PDF-contenido")
+    cola.solicitar("xlsx", PARAMETROS)
+    cola._pool.submit(lambda: None).result()
+
+    # Más tarde, un worker de otro proceso muere con el mismo reporte en curso
+    db_mock[COLECCION].insert_one({
+        "_id": "colgado", "tipo": "pdf", "parametros": PARAMETROS, "estado": "en_curso",
+        "huella": huella({"tipo": "pdf", **PARAMETROS}, marca_datos(db_mock)),
+        "actualizado": datetime.now() - 2 * ABANDONO,
+    })
+
+    nuevo = cola.solicitar("pdf", PARAMETROS)
+    cola.cerrar()
+    assert nuevo["_id"] != "colgado"
+    assert cola.estado("colgado")["estado"] == ERROR
+    assert cola.estado(nuevo["_id"])["estado"] == COMPLETADO
@@ -0,0 +1,70 @@
+import time
+
+import mongomock
+
+from cmms_fabrica.modulos.conexion_mongo import (
+    BaseDatosDiferida,
+    GestorConexion,
+    resolver_db,
+)
+
+
+class FabricaIntermitente:
+    """Cliente que falla en los primeros ``fallos`` intentos de ping."""
+
+    def __init__(self, fallos):
+        self.fallos = fallos
+        self.creados = 0
+        self.cliente = mongomock.MongoClient()
+        fabrica = self
+
+        class Admin:
+            def command(self, nombre):
+                if fabrica.fallos > 0:
+                    fabrica.fallos -= 1
+                    raise ConnectionError("red caída")
+                return {"ok": 1}
+
+        self.cliente.admin.command = Admin().command
+
+    def __call__(self, uri, **opciones):
+        self.creados += 1
+        self.opciones = opciones
+        return self.cliente
+
+
+def test_gestor_conecta_en_primer_uso_con_opciones_de_pool():
+    fabrica = FabricaIntermitente(fallos=0)
+    gestor = GestorConexion("mongodb://x", "cmms", opciones={"maxPoolSize": 5}, fabrica_cliente=fabrica)
+    assert fabrica.creados == 0
+
+    database = resolver_db(BaseDatosDiferida(gestor))
+    assert database is not None
+    assert fabrica.opciones == {"maxPoolSize": 5}
+    assert gestor.error is None
+
+
+def test_gestor_reconecta_en_segundo_plano_tras_fallo_inicial():
+    fabrica = FabricaIntermitente(fallos=2)
+    gestor = GestorConexion("mongodb://x", "cmms", fabrica_cliente=fabrica, backoff_inicial=0.01)
+    diferida = BaseDatosDiferida(gestor)
+
+    assert diferida.resolver() is None
+    assert "red caída" in gestor.error
+
+    for _ in range(200):
+        if gestor.obtener_db() is not None:
+            break
+        time.sleep(0.01)
+
+    assert gestor.obtener_db() is not None
+    assert gestor.error is None
+    diferida["historial"].insert_one({"ok": True})
+    assert diferida["historial"].count_documents({}) == 1
+    gestor.cerrar()
+
+
+def test_gestor_sin_uri_no_bloquea():
+    gestor = GestorConexion(None, "cmms")
+    assert gestor.obtener_db() is None
+    assert gestor.error == "Falta la variable de entorno MONGO_URI"
@@ -0,0 +1,83 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import mongomock
+import pandas as pd
+
+from cmms_fabrica.crud.generador_historial import categorizar_tipo_evento
+from cmms_fabrica.modulos import consultas_historial
+
+EVENTOS = [
+    {"fecha_evento": datetime(2025, 1, 5), "tipo_evento": "Alta de tarea correctiva", "id_activo_tecnico": "A1",
+     "id_origen": "TC-1", "usuario_registro": "u1", "criticidad": "Alta", "descripcion": "alta"},
+    {"fecha_evento": datetime(2025, 1, 9), "tipo_evento": "Cierre de tarea correctiva", "id_activo_tecnico": "A1",
+     "id_origen": "TC-1", "usuario_registro": "u2", "criticidad": "Alta", "descripcion": "cierre"},
+    {"fecha_evento": datetime(2025, 2, 1), "tipo_evento": "Registro de observación técnica", "id_activo_tecnico": "A2",
+     "id_origen": None, "usuario_registro": "u1", "criticidad": "", "descripcion": "obs"},
+    {"fecha_evento": datetime(2025, 2, 3), "tipo_evento": "Calibración de instrumento", "id_activo_tecnico": "A2",
+     "id_origen": "CAL-1", "usuario_registro": "u3", "descripcion": "cal"},
+    {"fecha_evento": datetime(2025, 2, 4), "tipo_evento": "limpieza", "id_activo_tecnico": "A3",
+     "id_origen": "X", "usuario_registro": "u4", "descripcion": "otro"},
+    {"fecha_evento": datetime(2024, 12, 31), "tipo_evento": "Alta de plan preventivo", "id_activo_tecnico": "A1",
+     "id_origen": "PP-1", "usuario_registro": "u1", "descripcion": "fuera de rango"},
+]
+CATEGORIAS = ["preventiva", "correctiva", "tecnica", "calibracion", "observacion"]
+
+
+def _db():
+    database = mongomock.MongoClient().db
+    database.historial.insert_many([dict(e) for e in EVENTOS])
+    return database
+
+
+def _sin_agregacion(*args, **kwargs):
+    raise NotImplementedError("aggregate")
+
+
+def test_expresion_categoria_coincide_con_categorizar_tipo_evento():
+    database = mongomock.MongoClient().db
+    tipos = [e["tipo_evento"] for e in EVENTOS] + ["Tarea técnica", "TECNICA", None, "Plan PREVENTIVO"]
+    database.t.insert_many([{"i": i, "tipo_evento": t} for i, t in enumerate(tipos)])
+    filas = database.t.aggregate([
+        {"$addFields": {"c": consultas_historial.expresion_categoria()}},
+        {"$sort": {"i": 1}},
+    ])
+    assert [f["c"] for f in filas] == [categorizar_tipo_evento(t) for t in tipos]
+
+
+def test_ultimos_por_tarea_y_activo_agregado_y_pandas_coinciden():
+    database = _db()
+    args = (date(2025, 1, 1), date(2025, 2, 28), CATEGORIAS)
+
+    agregado = consultas_historial.ultimos_por_tarea_y_activo(*args, database=database)
+    with patch.object(mongomock.collection.Collection, "aggregate", _sin_agregacion):
+        fallback = consultas_historial.ultimos_por_tarea_y_activo(*args, database=database)
+
+    assert list(agregado["descripcion"]) == ["cal", "obs", "cierre"]
+    assert agregado.loc[agregado["descripcion"] == "obs", "id_origen"].iloc[0] == "HUÉRFANO"
+    pd.testing.assert_frame_equal(agregado, fallback, check_dtype=False)
+
+
+def test_resumen_kpis_con_facet_y_fallback_pandas():
+    database = _db()
+    args = (date(2025, 1, 1), date(2025, 2, 28), CATEGORIAS)
+
+    resumen = consultas_historial.resumen_kpis(*args, database=database)
+    with patch.object(mongomock.collection.Collection, "aggregate", _sin_agregacion):
+        fallback = consultas_historial.resumen_kpis(*args, database=database)
+
+    for r in (resumen, fallback):
+        assert (r.eventos, r.activos, r.usuarios) == (3, 2, 3)
+        assert r.por_tipo.to_dict() == {"calibracion": 1, "correctiva": 1, "observacion": 1}
+        assert r.por_criticidad["Alta"] == 1
+        assert r.por_criticidad["Sin clasificar"] == 2
+        assert r.mensual.loc[pd.Timestamp("2025-02-01"), "observacion"] == 1
+    assert list(resumen.mensual.index) == list(fallback.mensual.index)
+
+
+def test_eventos_recientes_filtra_categoria_en_servidor_y_limita():
+    database = _db()
+    detalle = consultas_historial.eventos_recientes(
+        date(2025, 1, 1), date(2025, 2, 28), ["correctiva", "calibracion"], limite=2, database=database
+    )
+    assert list(detalle["tipo_evento"]) == ["Calibración de instrumento", "Cierre de tarea correctiva"]
@@ -26,3 +26,23 @@ def test_crear_activo_registra_historial():
         assert evento["descripcion"] == "Se dio de alta el activo 'Compresor'"
         assert evento["usuario_registro"] == "user"
         assert evento["id_origen"] == "A1"
+
+
+def test_id_duplicado_no_escribe_ni_registra_historial():
+    import pytest
+
+    db_mock = mongomock.MongoClient().db
+    db_mock.activos_tecnicos.insert_many([
+        {"id_activo_tecnico": "A1", "nombre": "Compresor"},
+        {"id_activo_tecnico": "A2", "nombre": "Secador"},
+    ])
+    base = {"nombre": "Otro", "usuario_registro": "user"}
+    with patch("cmms_fabrica.crud.crud_activos_tecnicos.registrar_evento_historial") as log:
+        with pytest.raises(crud_activos_tecnicos.ActivoDuplicadoError):
+            crud_activos_tecnicos.crear_activo({**base, "id_activo_tecnico": "A1"}, db_mock)
+        anterior = db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "A2"})
+        with pytest.raises(crud_activos_tecnicos.ActivoDuplicadoError):
+            crud_activos_tecnicos.editar_activo(anterior, {**base, "id_activo_tecnico": "A1"}, db_mock)
+    log.assert_not_called()
+    assert db_mock.activos_tecnicos.count_documents({"id_activo_tecnico": "A1"}) == 1
+    assert db_mock.activos_tecnicos.find_one({"_id": anterior["_id"]})["nombre"] == "Secador"
@@ -0,0 +1,27 @@
+from unittest.mock import patch
+
+import mongomock
+import pytest
+
+from cmms_fabrica.crud import crud_inventario
+from cmms_fabrica.modulos.generador_ids import IdDuplicadoError
+
+
+def test_id_de_item_duplicado_no_escribe_ni_registra_historial():
+    db_mock = mongomock.MongoClient().db
+    db_mock.inventario.create_index("id_item", unique=True)
+    db_mock.inventario.insert_many([
+        {"id_item": "IT-1", "descripcion": "Filtro"},
+        {"id_item": "IT-2", "descripcion": "Correa"},
+    ])
+    with patch.object(crud_inventario, "db", db_mock), \
+         patch("cmms_fabrica.crud.crud_inventario.registrar_evento_historial") as log:
+        with pytest.raises(IdDuplicadoError):
+            crud_inventario.crear_item_inventario({"id_item": "IT-1", "descripcion": "Otro"})
+        anterior = db_mock.inventario.find_one({"id_item": "IT-2"})
+        with pytest.raises(IdDuplicadoError):
+            crud_inventario.editar_item_inventario(anterior, {"id_item": "IT-1", "descripcion": "Correa"}, "ana")
+        # Sin cambio de ID la edición no choca consigo misma
+        crud_inventario.editar_item_inventario(anterior, {"id_item": "IT-2", "descripcion": "Correa B"}, "ana")
+    assert log.call_count == 1
+    assert db_mock.inventario.find_one({"_id": anterior["_id"]})["descripcion"] == "Correa B"
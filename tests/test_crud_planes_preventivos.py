@@ -26,3 +26,32 @@ def test_crear_plan_preventivo_registra_historial():
         crud_planes_preventivos.crear_plan_preventivo(data, db_mock)
         assert db_mock.planes_preventivos.count_documents({"id_plan": "PP1"}) == 1
         assert db_mock.historial.count_documents({"id_origen": "PP1"}) == 1
+
+
+def test_ids_duplicados_de_planes_y_proveedores_se_informan_sin_escribir():
+    import pytest
+
+    from cmms_fabrica.crud import crud_servicios_externos
+    from cmms_fabrica.modulos.generador_ids import IdDuplicadoError
+
+    db_mock = mongomock.MongoClient().db
+    db_mock.planes_preventivos.insert_many([
+        {"id_plan": "PP1", "id_activo_tecnico": "A1"},
+        {"id_plan": "PP2", "id_activo_tecnico": "A1"},
+    ])
+    db_mock.servicios_externos.create_index("id_proveedor", unique=True)
+    db_mock.servicios_externos.insert_one({"id_proveedor": "PROV_1", "nombre": "Taller"})
+    with patch("cmms_fabrica.crud.crud_planes_preventivos.registrar_evento_historial") as log, \
+         patch("cmms_fabrica.crud.crud_servicios_externos.registrar_evento_historial"):
+        with pytest.raises(IdDuplicadoError):
+            crud_planes_preventivos.crear_plan_preventivo({"id_plan": "PP1", "id_activo_tecnico": "A2"}, db_mock)
+        anterior = db_mock.planes_preventivos.find_one({"id_plan": "PP2"})
+        with pytest.raises(IdDuplicadoError):
+            crud_planes_preventivos.editar_plan_preventivo(
+                anterior, {"id_plan": "PP1", "id_activo_tecnico": "A1", "usuario_registro": "u"}, db_mock)
+        # Alta simultánea: la verificación no lo ve y el índice único lo rechaza
+        with patch.object(crud_servicios_externos, "verificar_id_libre"), pytest.raises(IdDuplicadoError):
+            crud_servicios_externos.crear_proveedor({"id_proveedor": "PROV_1", "nombre": "Otro"}, db_mock)
+    log.assert_not_called()
+    assert db_mock.planes_preventivos.count_documents({"id_plan": "PP1"}) == 1
+    assert db_mock.servicios_externos.count_documents({}) == 1
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import mongomock
+
+from cmms_fabrica.modulos.deteccion_huerfanos import (
+    auditar_trazabilidad,
+    obtener_correctivas_sin_historial,
+    obtener_eventos_correctivos_huerfanos,
+)
+
+
+def _evento(tipo, id_origen, id_activo="AT-1"):
+    return {"fecha_evento": datetime(2025, 1, 1), "tipo_evento": tipo, "id_origen": id_origen, "id_activo_tecnico": id_activo}
+
+
+def _db_auditoria():
+    db_mock = mongomock.MongoClient().db
+    db_mock.tareas_correctivas.insert_many([{"id_tarea": "TC-1"}, {"id_tarea": "TC-2"}, {"id_tarea": "TC-3"}])
+    db_mock.planes_preventivos.insert_many([{"id_plan": "PP-1"}, {"id_plan": "PP-2"}])
+    db_mock.inventario.insert_many([{"id_item": "IT-1"}])
+    db_mock.historial.insert_many([
+        _evento("Alta de tarea correctiva", "TC-1"),
+        _evento("Cierre de tarea correctiva", "TC-1"),
+        _evento("correctiva", "TC-2"),
+        # TC-3 solo tiene un evento de otro tipo: sigue huérfana
+        _evento("Alta de plan preventivo", "TC-3"),
+        _evento("Alta de plan preventivo", "PP-1"),
+        # Origen borrado sin evento de baja / con baja registrada
+        _evento("Alta de tarea correctiva", "TC-9"),
+        _evento("Alta de tarea correctiva", "TC-8"),
+        _evento("Baja de tarea correctiva", "TC-8"),
+        _evento("Alta de tarea correctiva", None),
+        # Registrado sin origen por generador_historial
+        _evento("Alta de tarea correctiva", "HUÉRFANO"),
+        _evento("Alta de inventario", "IT-1", id_activo=None),
+    ])
+    return db_mock
+
+
+def test_auditoria_por_conjuntos_cubre_todas_las_colecciones():
+    resultado = auditar_trazabilidad(_db_auditoria())
+
+    correctivas = resultado["tareas_correctivas"]
+    assert correctivas["sin_historial"] == ["TC-3"]
+    assert correctivas["eventos_sin_origen"] == ["TC-9"]
+    assert len(correctivas["eventos_incompletos"]) == 2
+
+    assert resultado["planes_preventivos"]["sin_historial"] == ["PP-2"]
+    assert resultado["planes_preventivos"]["eventos_sin_origen"] == ["TC-3"]
+    # El inventario no exige activo técnico
+    assert resultado["inventario"] == {"sin_historial": [], "eventos_sin_origen": [], "eventos_incompletos": []}
+    assert set(resultado) >= {"calibraciones", "tareas_tecnicas", "observaciones"}
+
+
+def test_funciones_anteriores_reconocen_tipos_de_evento_reales():
+    db_mock = _db_auditoria()
+    assert obtener_correctivas_sin_historial(db_mock) == ["TC-3"]
+    assert [e.get("id_origen") for e in obtener_eventos_correctivos_huerfanos(db_mock)] == [None, "HUÉRFANO"]
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import mongomock
+
+from cmms_fabrica.modulos.exploracion_grafo import ExploradorGrafo
+
+
+def _db_planta():
+    db_mock = mongomock.MongoClient().db
+    db_mock.activos_tecnicos.insert_many([
+        {"id_activo_tecnico": "SIS1", "nombre": "Aire comprimido", "nivel": "sistema"},
+        {"id_activo_tecnico": "SIS2", "nombre": "Vapor", "nivel": "sistema", "pertenece_a": ""},
+        {"id_activo_tecnico": "EQ1", "nombre": "Compresor", "pertenece_a": "SIS1"},
+    ])
+    db_mock.historial.insert_many([
+        {"fecha_evento": datetime(2025, 1, d), "id_activo_tecnico": "EQ1", "tipo_evento": "Alta de tarea correctiva",
+         "id_origen": "TC-1", "proveedor_externo": "Servicios SA", "descripcion": f"evento {d}"}
+        for d in range(1, 4)
+    ])
+    return db_mock
+
+
+def test_expandir_trae_solo_la_vecindad_y_usa_la_cache():
+    explorador = ExploradorGrafo(_db_planta(), eventos_por_expansion=2)
+    assert explorador.raices() == ["SIS1", "SIS2"]
+    assert set(explorador.grafo().nodes) == {"SIS1", "SIS2"}
+
+    explorador.expandir("SIS1")
+    assert set(explorador.grafo().nodes) == {"SIS1", "SIS2", "EQ1"}
+
+    explorador.expandir("EQ1")
+    eventos = [n for n, d in explorador.grafo().nodes(data=True) if d["tipo"] == "historial"]
+    assert len(eventos) == 2  # límite por expansión
+
+    explorador.expandir(eventos[0])
+    grafo = explorador.grafo()
+    assert grafo.has_edge(eventos[0], "origen::TC-1")
+    assert grafo.has_edge(eventos[0], "proveedor::Servicios SA")
+
+    consultas = explorador.consultas
+    explorador.contraer("SIS1")
+    assert set(explorador.grafo().nodes) == {"SIS1", "SIS2"}
+    explorador.expandir("SIS1")
+    explorador.expandir("EQ1")
+    assert explorador.consultas == consultas
+    assert len(explorador.grafo()) == 5
+
+
+def test_expandir_origen_y_proveedor_trae_sus_eventos():
+    explorador = ExploradorGrafo(_db_planta())
+    explorador.raices()
+    explorador.expandir("SIS1")
+    explorador.expandir("EQ1")
+    evento = next(n for n, d in explorador.nodos.items() if d["tipo"] == "historial")
+    explorador.expandir(evento)
+
+    assert explorador.expandir("origen::TC-1") == 0  # los eventos ya estaban visibles
+    assert len(explorador.vecinos("origen::TC-1")) == 3
+    assert len(explorador.vecinos("proveedor::Servicios SA")) == 3
@@ -0,0 +1,69 @@
+import io
+import zipfile
+from datetime import date, datetime
+
+import mongomock
+import pandas as pd
+import pytest
+
+from cmms_fabrica.modulos.exportacion import exportar_a_bytes, exportar_coleccion, lotes_de_coleccion
+
+
+def _db_con_historial(cantidad=12):
+    db_mock = mongomock.MongoClient().db
+    db_mock.historial.insert_many([
+        {
+            "fecha_evento": datetime(2025, 1, 1 + i, 8, 30),
+            "tipo_evento": "Alta de tarea correctiva",
+            "categoria_evento": "correctiva",
+            "id_activo_tecnico": f"AT-{i % 3}",
+            "id_origen": f"TC-{i}",
+            "descripcion": f"evento {i}",
+            "usuario_registro": "tecnico",
+            "datos_extra": {"no": "exportado"},
+        }
+        for i in range(cantidad)
+    ])
+    return db_mock
+
+
+def test_exportar_csv_por_lotes_respeta_rango_y_proyeccion(tmp_path):
+    db_mock = _db_con_historial()
+    destino = tmp_path / "historial.csv"
+
+    filas = exportar_coleccion(
+        "csv", destino, "historial", date(2025, 1, 3), date(2025, 1, 10), tamano_lote=3, database=db_mock
+    )
+
+    df = pd.read_csv(destino, encoding="utf-8-sig")
+    assert filas == len(df) == 8
+    assert "datos_extra" not in df.columns
+    assert df["id_origen"].tolist() == [f"TC-{i}" for i in range(2, 10)]
+    assert df["observaciones"].isna().all()
+
+
+def test_lotes_de_coleccion_no_supera_el_tamano_pedido():
+    db_mock = _db_con_historial(7)
+    lotes = list(lotes_de_coleccion("historial", columnas=["id_origen"], tamano_lote=3, database=db_mock))
+    assert [len(lote) for lote in lotes] == [3, 3, 1]
+    assert lotes[0][0] == {"id_origen": "TC-0"}
+
+
+def test_exportar_xlsx_y_parquet_en_memoria():
+    db_mock = _db_con_historial(5)
+    columnas = ["fecha_evento", "id_origen", "descripcion"]
+
+    xlsx = exportar_a_bytes("xlsx", lotes_de_coleccion("historial", {}, columnas, tamano_lote=2, database=db_mock), columnas)
+    with zipfile.ZipFile(io.BytesIO(xlsx)) as libro:
+        hoja = libro.read("xl/worksheets/sheet1.xml").decode()
+    # constant_memory escribe cadenas en línea: encabezado + 5 filas
+    assert hoja.count("<row ") == 6
+    assert "fecha_evento" in hoja and "TC-4" in hoja
+
+    pytest.importorskip("pyarrow")
+    parquet = exportar_a_bytes("parquet", lotes_de_coleccion("historial", {}, columnas, tamano_lote=2, database=db_mock), columnas)
+    import pyarrow.parquet as pq
+
+    archivo = pq.ParquetFile(io.BytesIO(parquet))
+    assert archivo.metadata.num_row_groups == 3
+    assert archivo.read().to_pandas()["id_origen"].tolist() == [f"TC-{i}" for i in range(5)]
@@ -0,0 +1,60 @@
+import time
+
+import mongomock
+
+from cmms_fabrica.modulos import generador_ids, indices
+
+
+def test_generar_id_es_monotono_y_supera_ids_por_timestamp():
+    db_mock = mongomock.MongoClient().db
+    legado = int(time.time())
+
+    ids = [generador_ids.generar_id("TC-", db_mock) for _ in range(50)]
+
+    numeros = [int(i.removeprefix("TC-")) for i in ids]
+    assert len(set(ids)) == 50
+    assert numeros == sorted(numeros)
+    assert numeros[0] > legado
+    # 50 IDs con bloques de 20: tres reservas contra el contador
+    contador = db_mock.contadores.find_one({"_id": "TC-"})
+    assert contador["valor"] == numeros[0] + 59
+
+
+def test_generadores_de_procesos_distintos_no_colisionan():
+    db_mock = mongomock.MongoClient().db
+    proceso_a = generador_ids.GeneradorIds(tamano_bloque=5)
+    proceso_b = generador_ids.GeneradorIds(tamano_bloque=5)
+
+    emitidos = []
+    for _ in range(12):
+        emitidos.append(proceso_a.siguiente("PP-", db_mock))
+        emitidos.append(proceso_b.siguiente("PP-", db_mock))
+
+    assert len(set(emitidos)) == len(emitidos)
+
+
+def test_renumerar_eventos_duplicados_habilita_indice_unico():
+    db_mock = mongomock.MongoClient().db
+    db_mock.historial.insert_many([
+        {"id_evento": "HIST_1700000000"},
+        {"id_evento": "HIST_1700000000"},
+        {"id_evento": "HIST_1700000001"},
+    ])
+
+    assert generador_ids.renumerar_eventos_duplicados(db_mock) == 1
+    assert len(db_mock.historial.distinct("id_evento")) == 3
+    resumen = indices.asegurar_indices(db_mock)
+    assert "historial.uq_id_evento" in resumen["creados"]
+
+
+def test_la_semilla_solo_se_escribe_la_primera_vez():
+    from unittest.mock import patch
+
+    db_mock = mongomock.MongoClient().db
+    generador = generador_ids.GeneradorIds(tamano_bloque=2)
+    coleccion = type(db_mock.contadores)
+    with patch.object(coleccion, "update_one", autospec=True, side_effect=coleccion.update_one) as semilla:
+        for _ in range(6):
+            generador.siguiente("CAL-", db_mock)
+    # Tres reservas; solo la primera inicializa el contador
+    assert semilla.call_count == 1
@@ -0,0 +1,32 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from cmms_fabrica.modulos import graficos
+
+
+def test_renderizar_png_cachea_por_datos_y_no_deja_figuras_abiertas():
+    graficos.limpiar_cache()
+    dibujos = []
+
+    def dibujar(serie):
+        def _dibujar(fig):
+            dibujos.append(1)
+            serie.plot(kind="bar", ax=fig.subplots())
+        return _dibujar
+
+    abiertas = len(plt.get_fignums())
+    serie = pd.Series({"correctiva": 3, "preventiva": 5})
+    clave = graficos.hash_datos(serie)
+
+    png = graficos.renderizar_png(clave, dibujar(serie))
+    assert png.startswith(b"\x89PNG")
+    # Mismos datos en otro objeto: misma clave, sin volver a dibujar
+    igual = pd.Series({"correctiva": 3, "preventiva": 5})
+    assert graficos.renderizar_png(graficos.hash_datos(igual), dibujar(igual)) == png
+    assert len(dibujos) == 1
+
+    distinta = pd.Series({"correctiva": 4, "preventiva": 5})
+    assert graficos.hash_datos(distinta) != clave
+    graficos.renderizar_png(graficos.hash_datos(distinta), dibujar(distinta))
+    assert len(dibujos) == 2
+    assert len(plt.get_fignums()) == abiertas
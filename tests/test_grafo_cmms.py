@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import mongomock
+
+from cmms_fabrica.modulos.app_grafo_cmms import construir_grafo
+
+
+def _db_con_eventos():
+    db_mock = mongomock.MongoClient().db
+    db_mock.activos_tecnicos.insert_many([
+        {"id_activo_tecnico": "AT-1", "nombre": "Bomba"},
+        {"id_activo_tecnico": "AT-2", "nombre": "Compresor"},
+    ])
+    eventos = [
+        ("AT-1", "Alta de tarea correctiva", "TC-1", "Servicios SA", 1),
+        ("AT-1", "Cierre de tarea correctiva", "TC-1", "Servicios SA", 2),
+        ("AT-1", "Alta de plan preventivo", "PP-1", None, 3),
+        ("AT-2", "Alta de tarea correctiva", "TC-2", None, 4),
+        ("AT-2", "Registro de observación", "OBS-1", None, 5),
+    ]
+    db_mock.historial.insert_many([
+        {
+            "fecha_evento": datetime(2025, 1, dia),
+            "tipo_evento": tipo,
+            "id_activo_tecnico": activo,
+            "id_origen": origen,
+            "proveedor_externo": proveedor,
+            "descripcion": "evento",
+        }
+        for activo, tipo, origen, proveedor, dia in eventos
+    ])
+    return db_mock
+
+
+def test_limite_toma_los_eventos_mas_recientes_y_omite_origenes():
+    grafo = construir_grafo(_db_con_eventos(), limite=2, incluir_origenes=False)
+
+    historial = [n for n, d in grafo.nodes(data=True) if d["tipo"] == "historial"]
+    assert len(historial) == 2
+    assert sorted(grafo.nodes[n]["label"][:10] for n in historial) == ["2025-01-04", "2025-01-05"]
+    assert not [n for n, d in grafo.nodes(data=True) if d["tipo"] == "origen"]
+
+
+def test_modo_agregado_pondera_aristas_por_cantidad_de_eventos():
+    grafo = construir_grafo(_db_con_eventos(), agregado=True)
+
+    assert not [n for n, d in grafo.nodes(data=True) if d["tipo"] == "historial"]
+    assert grafo.edges["AT-1", "origen::TC-1"]["weight"] == 2
+    assert grafo.edges["AT-1", "proveedor::Servicios SA"]["weight"] == 2
+    assert grafo.edges["AT-2", "origen::OBS-1"]["weight"] == 1
+    assert grafo.number_of_nodes() == 2 + 4 + 1
+
+    filtrado = construir_grafo(_db_con_eventos(), {"id_activo_tecnico": "AT-2"}, agregado=True)
+    assert set(filtrado.nodes) == {"AT-2", "origen::TC-2", "origen::OBS-1"}
@@ -21,6 +21,7 @@ def test_registrar_evento_historial_persiste_campos_trazables():
     evento = db_mock.historial.find_one({"id_origen": "PP-001"})
     assert evento is not None
     assert evento["tipo_evento"] == "Alta de plan preventivo"
+    assert evento["categoria_evento"] == "preventiva"
     assert evento["id_activo_tecnico"] == "AT-001"
     assert evento["descripcion"] == "Alta de plan para activo: AT-001"
     assert evento["usuario_registro"] == "tecnico_a"
@@ -56,3 +57,56 @@ def test_crear_tarea_tecnica_registra_historial_con_campos_reales():
     assert evento["proveedor_externo"] is None
     assert evento["observaciones"] == ""
     assert evento["id_evento"].startswith("HIST_")
+
+
+def test_registro_en_lote_vuelca_por_tamano_y_al_salir():
+    from cmms_fabrica.crud import generador_historial
+
+    db_mock = mongomock.MongoClient().db
+    with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        with generador_historial.registro_en_lote(tamano_lote=3, intervalo_s=None) as buffer:
+            for i in range(4):
+                generador_historial.registrar_evento_historial(
+                    tipo_evento="limpieza",
+                    id_activo=None,
+                    descripcion=f"Evento {i}",
+                    usuario="sistema",
+                    id_origen=f"LOTE-{i}",
+                )
+            # el tercer evento completó un lote; el cuarto queda pendiente
+            assert db_mock.historial.count_documents({}) == 3
+            assert len(buffer) == 1
+            assert generador_historial.flush() == 1
+
+        assert generador_historial._buffer_actual.get() is None
+
+    assert db_mock.historial.count_documents({}) == 4
+    evento = db_mock.historial.find_one({"id_origen": "LOTE-3"})
+    assert evento["usuario_registro"] == "sistema"
+    assert evento["observaciones"] == ""
+    assert evento["id_evento"].startswith("HIST_")
+
+
+def test_modo_lote_no_alcanza_a_otros_hilos_y_acota_la_cola():
+    import threading
+
+    from pymongo.errors import AutoReconnect
+
+    from cmms_fabrica.crud import generador_historial
+
+    db_mock = mongomock.MongoClient().db
+    with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        with generador_historial.registro_en_lote(tamano_lote=2, intervalo_s=None) as buffer:
+            otro = threading.Thread(target=generador_historial.registrar_evento_historial,
+                                    args=("limpieza", None, "otra sesión", "ana"))
+            otro.start()
+            otro.join()
+            # El evento del otro hilo se insertó directo, sin esperar al lote
+            assert db_mock.historial.count_documents({}) == 1 and len(buffer) == 0
+
+            buffer.max_pendientes = 3
+            with patch.object(type(db_mock.historial), "insert_many", side_effect=AutoReconnect("caída")):
+                for i in range(5):
+                    generador_historial.registrar_evento_historial("limpieza", None, f"Evento {i}", "sistema")
+            assert len(buffer) == 3 and buffer.descartados == 2
+    assert db_mock.historial.count_documents({}) == 4
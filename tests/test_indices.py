@@ -0,0 +1,63 @@
+import mongomock
+
+from cmms_fabrica.modulos import indices
+
+
+def test_asegurar_indices_crea_declarados_y_elimina_deriva():
+    db_mock = mongomock.MongoClient().db
+
+    deriva_inicial = indices.detectar_deriva(db_mock)
+    assert "ix_fecha_activo" in deriva_inicial.faltantes["historial"]
+
+    resumen = indices.asegurar_indices(db_mock)
+    assert "historial.ix_origen_tipo" in resumen["creados"]
+    assert resumen["errores"] == []
+
+    deriva = indices.detectar_deriva(db_mock)
+    assert not deriva.hay_deriva
+    info = db_mock.historial.index_information()
+    assert info["ix_fecha_activo"]["key"] == [("fecha_evento", 1), ("id_activo_tecnico", 1)]
+    assert db_mock.activos_tecnicos.index_information()["uq_id_activo_tecnico"]["unique"] is True
+
+
+def test_detectar_deriva_informa_sobrantes_y_divergentes():
+    db_mock = mongomock.MongoClient().db
+    indices.asegurar_indices(db_mock)
+    db_mock.historial.create_index([("descripcion", 1)], name="ix_descripcion")
+    db_mock.inventario.drop_index("uq_id_item")
+    db_mock.inventario.create_index([("id_item", 1)], name="uq_id_item")
+
+    deriva = indices.detectar_deriva(db_mock)
+    assert deriva.sobrantes == {"historial": ["ix_descripcion"]}
+    assert deriva.divergentes == {"inventario": ["uq_id_item"]}
+
+    resumen = indices.asegurar_indices(db_mock, eliminar_sobrantes=True)
+    assert "historial.ix_descripcion" in resumen["eliminados"]
+    assert not indices.detectar_deriva(db_mock).hay_deriva
+
+
+def test_indice_unico_reemplaza_al_indice_simple_anterior():
+    db_mock = mongomock.MongoClient().db
+    db_mock.planes_preventivos.create_index([("id_plan", 1)], name="ix_id_plan")
+
+    assert "ix_id_plan" in indices.detectar_deriva(db_mock).sobrantes["planes_preventivos"]
+
+    resumen = indices.asegurar_indices(db_mock)
+    assert "planes_preventivos.uq_id_plan" in resumen["creados"]
+    assert "planes_preventivos.ix_id_plan" in resumen["eliminados"]
+    assert "ix_id_plan" not in db_mock.planes_preventivos.index_information()
+
+
+def test_renumerar_eventos_sin_aplicar_solo_cuenta(capsys):
+    from unittest.mock import patch
+
+    db_mock = mongomock.MongoClient().db
+    db_mock.historial.insert_many([{"id_evento": "HIST_1"}, {"id_evento": "HIST_1"}, {"id_evento": "HIST_1"}])
+    with patch.object(indices, "db", db_mock):
+        indices.main(["--renumerar-eventos"])
+        assert "eventos_a_renumerar: 2" in capsys.readouterr().out
+        assert db_mock.historial.distinct("id_evento") == ["HIST_1"]
+
+        indices.main(["--renumerar-eventos", "--aplicar"])
+    assert "eventos_renumerados: 2" in capsys.readouterr().out
+    assert len(db_mock.historial.distinct("id_evento")) == 3
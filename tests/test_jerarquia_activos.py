@@ -0,0 +1,79 @@
+import mongomock
+from unittest.mock import patch
+
+import pytest
+
+from cmms_fabrica.crud import crud_activos_tecnicos
+from cmms_fabrica.modulos import jerarquia_activos
+
+
+def _activo(id_activo, padre=None):
+    data = {
+        "id_activo_tecnico": id_activo,
+        "nombre": id_activo,
+        "usuario_registro": "user",
+    }
+    if padre:
+        data["pertenece_a"] = padre
+    return data
+
+
+def _arbol(db_mock):
+    # SIS → SUB → EQ1, EQ2 ; SIS2
+    for id_activo, padre in [("SIS", None), ("SUB", "SIS"), ("EQ1", "SUB"), ("EQ2", "SUB"), ("SIS2", None)]:
+        crud_activos_tecnicos.crear_activo(_activo(id_activo, padre), db_mock)
+
+
+def test_descendientes_incluye_todos_los_niveles():
+    db_mock = mongomock.MongoClient().db
+    with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        _arbol(db_mock)
+
+    assert db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "EQ1"})["ancestros"] == ["SIS", "SUB"]
+    assert jerarquia_activos.descendientes("SIS", db_mock) == ["EQ1", "EQ2", "SUB"]
+    assert jerarquia_activos.ids_del_subarbol("SUB", db_mock) == ["SUB", "EQ1", "EQ2"]
+
+
+def test_editar_y_eliminar_mantienen_la_jerarquia():
+    db_mock = mongomock.MongoClient().db
+    with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        _arbol(db_mock)
+        sub = db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "SUB"})
+
+        # Mover SUB bajo SIS2 y renombrarlo: los equipos lo siguen
+        crud_activos_tecnicos.editar_activo(sub, _activo("SUB-B", "SIS2"), db_mock)
+        assert jerarquia_activos.descendientes("SIS", db_mock) == []
+        assert jerarquia_activos.descendientes("SIS2", db_mock) == ["EQ1", "EQ2", "SUB-B"]
+        eq1 = db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "EQ1"})
+        assert eq1["pertenece_a"] == "SUB-B"
+        assert eq1["ancestros"] == ["SIS2", "SUB-B"]
+
+        # Un descendiente no puede pasar a ser padre
+        sis2 = db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "SIS2"})
+        with pytest.raises(jerarquia_activos.CicloJerarquiaError):
+            crud_activos_tecnicos.editar_activo(sis2, _activo("SIS2", "EQ1"), db_mock)
+
+        crud_activos_tecnicos.eliminar_activo(db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "SIS2"}), db_mock)
+
+    # pertenece_a sigue apuntando al activo eliminado: la cadena se corta en él
+    assert db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "EQ2"})["ancestros"] == ["SIS2", "SUB-B"]
+    assert db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "SUB-B"})["ancestros"] == ["SIS2"]
+    assert jerarquia_activos.reconstruir_jerarquia(db_mock) == 0
+
+
+def test_reconstruir_jerarquia_desde_pertenece_a():
+    db_mock = mongomock.MongoClient().db
+    db_mock.activos_tecnicos.insert_many([
+        {"id_activo_tecnico": "EQ", "pertenece_a": "SUB"},
+        {"id_activo_tecnico": "SUB", "pertenece_a": "SIS"},
+        {"id_activo_tecnico": "SIS"},
+        {"id_activo_tecnico": "A", "pertenece_a": "B"},
+        {"id_activo_tecnico": "B", "pertenece_a": "A"},
+    ])
+
+    assert jerarquia_activos.reconstruir_jerarquia(db_mock) == 5
+    assert db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "EQ"})["ancestros"] == ["SIS", "SUB"]
+    assert jerarquia_activos.descendientes("SIS", db_mock) == ["EQ", "SUB"]
+    # El ciclo se corta sin colgar la reconstrucción
+    assert db_mock.activos_tecnicos.find_one({"id_activo_tecnico": "A"})["ancestros"] == ["B"]
+    assert jerarquia_activos.reconstruir_jerarquia(db_mock) == 0
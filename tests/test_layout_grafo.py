@@ -0,0 +1,40 @@
+import networkx as nx
+
+from cmms_fabrica.modulos import layout_grafo
+from cmms_fabrica.modulos.app_grafo_cmms import generar_html_grafo
+
+
+def _grafo_estrella(activos=3, eventos=10):
+    grafo = nx.DiGraph()
+    for a in range(activos):
+        grafo.add_node(f"AT-{a}", tipo="activo")
+        for e in range(eventos):
+            grafo.add_node(f"EV-{a}-{e}", tipo="historial")
+            grafo.add_edge(f"AT-{a}", f"EV-{a}-{e}")
+    return grafo
+
+
+def test_posiciones_en_cache_y_reutilizadas_al_agregar_pocos_nodos(monkeypatch):
+    layout_grafo.limpiar_cache()
+    grafo = _grafo_estrella()
+    primeras = layout_grafo.calcular_posiciones(grafo)
+    assert layout_grafo.calcular_posiciones(grafo.copy()) == primeras
+
+    grafo.add_node("EV-0-nuevo", tipo="historial")
+    grafo.add_edge("AT-0", "EV-0-nuevo")
+    segundas = layout_grafo.calcular_posiciones(grafo)
+    assert all(segundas[n] == pos for n, pos in primeras.items())
+    assert "EV-0-nuevo" in segundas
+
+    # Grafos grandes: disposición en estrella, también incremental
+    monkeypatch.setattr(layout_grafo, "MAX_NODOS_SPRING", 10)
+    grande = _grafo_estrella(activos=4, eventos=30)
+    base = layout_grafo.calcular_posiciones(grande)
+    grande.add_edge("AT-3", "EV-3-extra")
+    assert all(layout_grafo.calcular_posiciones(grande)[n] == pos for n, pos in base.items())
+
+
+def test_html_sin_fisica_y_con_coordenadas_fijas():
+    html = generar_html_grafo(_grafo_estrella(activos=1, eventos=2))
+    assert '"physics": false' in html
+    assert '"x": ' in html and '"y": ' in html
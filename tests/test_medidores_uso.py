@@ -0,0 +1,81 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import mongomock
+
+from cmms_fabrica.modulos import medidores_uso
+from cmms_fabrica.modulos.proyeccion_preventivos import proyectar_calendario
+from cmms_fabrica.modulos.vencimientos_planes import recalcular_campos
+
+MEDIDOR = "Schulz SRP 3040"
+
+
+def _base():
+    database = mongomock.MongoClient().db
+    database.planes_preventivos.insert_many([
+        {"id_plan": "PP-1", "estado": "Activo", "id_activo_tecnico": "COMP-01", "tipo_programacion": "uso",
+         "umbral_uso": 500, "ultima_lectura_uso": 1000, "lectura_actual_uso": 1000},
+        {"id_plan": "PP-2", "estado": "Activo", "id_activo_tecnico": "COMP-01", "tipo_programacion": "ambos",
+         "proxima_fecha": "2025-06-01", "umbral_uso": 2000, "ultima_lectura_uso": 0, "lectura_actual_uso": 0},
+        {"id_plan": "PP-3", "estado": "Activo", "id_activo_tecnico": "COMP-01", "tipo_programacion": "tiempo",
+         "proxima_fecha": "2025-06-01"},
+    ])
+    recalcular_campos(database)
+    database.consumos.insert_many([
+        {"id_consumo": "CON-1", "tipo_consumo": MEDIDOR, "fecha": "2025-01-01", "valor": 1000.0},
+        {"id_consumo": "CON-2", "tipo_consumo": MEDIDOR, "fecha": "2025-01-11", "valor": 1200.0},
+        {"id_consumo": "CON-3", "tipo_consumo": "UTE", "fecha": "2025-01-11", "valor": 99999.0},
+    ])
+    return database
+
+
+def test_tasa_medida_con_lecturas_acumuladas():
+    database = _base()
+    assert medidores_uso.tasa_medida(MEDIDOR, date(2025, 1, 11), database=database) == 20
+    # Fuera de la ventana usa las dos últimas lecturas
+    assert medidores_uso.tasa_medida(MEDIDOR, date(2025, 6, 1), database=database) == 20
+    assert medidores_uso.tasa_medida("Atlas Copco GX7", database=database) is None
+
+
+def test_lectura_actualiza_planes_vinculados_en_un_bulk_write():
+    database = _base()
+    filas = medidores_uso.vincular_medidor(MEDIDOR, "COMP-01", ["PP-1", "PP-2", "PP-3"], database)
+    # La última lectura (1200 h) se aplica al vincular; PP-3 es por tiempo y no cambia
+    assert {f["id_plan"]: f["uso_restante"] for f in filas} == {"PP-1": 300, "PP-2": 800}
+
+    database.consumos.insert_one({"id_consumo": "CON-4", "tipo_consumo": MEDIDOR, "fecha": "2025-01-21", "valor": 1400.0})
+    coleccion = database.planes_preventivos
+    with patch.object(type(coleccion), "bulk_write", autospec=True, side_effect=type(coleccion).bulk_write) as bulk:
+        medidores_uso.aplicar_lectura(MEDIDOR, 1400.0, "2025-01-21", database)
+    assert bulk.call_count == 1
+
+    pp1 = coleccion.find_one({"id_plan": "PP-1"})
+    assert pp1["lectura_actual_uso"] == 1400 and pp1["uso_restante"] == 100
+    assert pp1["tasa_uso_diaria"] == 20 and pp1["fecha_estimada_uso"] == datetime(2025, 1, 26)
+    assert "tasa_uso_diaria" not in coleccion.find_one({"id_plan": "PP-3"})
+
+
+def test_la_proyeccion_usa_la_tasa_del_medidor():
+    database = _base()
+    medidores_uso.vincular_medidor(MEDIDOR, "COMP-01", ["PP-1"], database)
+    ocurrencias = proyectar_calendario(database, date(2025, 1, 11), meses=1)
+    # 300 h restantes a 20 h/día: 15 días; luego cada 500 h (25 días)
+    assert [f"{f:%Y-%m-%d}" for f in ocurrencias.loc[ocurrencias["id_plan"] == "PP-1", "fecha"]] == ["2025-01-26"]
+
+
+def test_una_lectura_atrasada_no_pisa_la_vigente_y_borrar_reaplica_la_ultima():
+    database = _base()
+    medidores_uso.vincular_medidor(MEDIDOR, "COMP-01", ["PP-1"], database)
+    database.consumos.insert_one({"id_consumo": "CON-4", "tipo_consumo": MEDIDOR, "fecha": "2025-01-21", "valor": 1400.0})
+    medidores_uso.aplicar_ultima_lectura(MEDIDOR, database)
+
+    # Carga tardía de una lectura del 5/1: no vuelve atrás el contador del plan
+    database.consumos.insert_one({"id_consumo": "CON-5", "tipo_consumo": MEDIDOR, "fecha": "2025-01-05", "valor": 1100.0})
+    assert medidores_uso.aplicar_lectura(MEDIDOR, 1100.0, "2025-01-05", database) == []
+    assert medidores_uso.aplicar_ultima_lectura(MEDIDOR, database)[0]["uso_restante"] == 100
+
+    # Se elimina la lectura vigente: rige la anterior más reciente
+    database.consumos.delete_one({"id_consumo": "CON-4"})
+    medidores_uso.aplicar_ultima_lectura(MEDIDOR, database)
+    pp1 = database.planes_preventivos.find_one({"id_plan": "PP-1"})
+    assert pp1["lectura_actual_uso"] == 1200 and pp1["uso_restante"] == 300
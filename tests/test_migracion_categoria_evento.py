@@ -0,0 +1,47 @@
+from datetime import date, datetime
+
+import mongomock
+
+from cmms_fabrica.modulos import consultas_historial
+from cmms_fabrica.modulos.migracion_categoria_evento import migrar_categoria_evento
+
+
+def test_migracion_por_lotes_es_reanudable():
+    db_mock = mongomock.MongoClient().db
+    tipos = ["Alta de plan preventivo", "Tarea correctiva registrada", "Registro de observación", "limpieza", "Calibración"]
+    db_mock.historial.insert_many([
+        {"tipo_evento": t, "fecha_evento": datetime(2025, 3, i + 1)} for i, t in enumerate(tipos)
+    ])
+    db_mock.historial.insert_one({"tipo_evento": "x", "categoria_evento": "tecnica", "fecha_evento": datetime(2025, 3, 9)})
+
+    # Primera ejecución interrumpida tras un lote
+    estado = migrar_categoria_evento(db_mock, tamano_lote=2, max_lotes=1)
+    assert estado["actualizados"] == 2
+    assert estado["completada"] is False
+    assert db_mock.historial.count_documents({"categoria_evento": {"$exists": False}}) == 3
+
+    estado = migrar_categoria_evento(db_mock, tamano_lote=2)
+    assert estado["actualizados"] == 5
+    assert estado["completada"] is True
+    categorias = [d["categoria_evento"] for d in db_mock.historial.find().sort("fecha_evento", 1)]
+    assert categorias == ["preventiva", "correctiva", "observacion", "otro", "calibracion", "tecnica"]
+
+
+def test_consultas_usan_la_categoria_persistida_y_la_calculada():
+    db_mock = mongomock.MongoClient().db
+    db_mock.historial.insert_many([
+        # Persistida: prevalece sobre el texto libre
+        {"tipo_evento": "limpieza", "categoria_evento": "preventiva", "fecha_evento": datetime(2025, 3, 1),
+         "id_activo_tecnico": "A1", "id_origen": "PP-1"},
+        # Sin migrar: se categoriza en la consulta
+        {"tipo_evento": "Alta de plan preventivo", "fecha_evento": datetime(2025, 3, 2),
+         "id_activo_tecnico": "A2", "id_origen": "PP-2"},
+        {"tipo_evento": "Tarea correctiva", "categoria_evento": "correctiva", "fecha_evento": datetime(2025, 3, 3),
+         "id_activo_tecnico": "A3", "id_origen": "TC-1"},
+    ])
+
+    df = consultas_historial.ultimos_por_tarea_y_activo(
+        date(2025, 3, 1), date(2025, 3, 31), ["preventiva"], database=db_mock
+    )
+    assert sorted(df["id_origen"]) == ["PP-1", "PP-2"]
+    assert set(df["categoria_evento"]) == {"preventiva"}
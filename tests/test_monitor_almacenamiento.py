@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import mongomock
+
+from cmms_fabrica.modulos import monitor_almacenamiento as monitor
+
+
+def test_muestra_usa_collstats_y_estima_sin_el():
+    database = mongomock.MongoClient().db
+    database.historial.insert_many([{"i": i, "descripcion": "x" * 50} for i in range(10)])
+    database.observaciones.insert_one({"i": 1})
+
+    muestra = monitor.tomar_muestra(database, ["historial"])
+    stats = muestra["colecciones"]["historial"]
+    assert stats["estimado"] and stats["documentos"] == 10 and stats["tamano_medio"] > 50
+    assert database[monitor.COLECCION_MUESTRAS].count_documents({}) == 1
+
+    collstats = {"count": 4, "size": 4 * monitor.MB, "storageSize": 8 * monitor.MB, "totalIndexSize": 1024,
+                 "avgObjSize": monitor.MB}
+    with patch.object(database, "command", return_value=collstats):
+        muestra = monitor.tomar_muestra(database, ["observaciones"])
+    assert muestra["total_mb"] == 8
+    assert not muestra["colecciones"]["observaciones"]["estimado"]
+
+
+def test_pronostico_lineal_del_limite():
+    inicio = datetime(2025, 1, 1)
+    serie = [{"fecha": inicio + timedelta(days=d), "total_mb": 100 + 10 * d} for d in range(5)]
+    pronostico = monitor.pronosticar(serie, 400)
+    assert round(pronostico.mb_por_dia, 6) == 10
+    assert abs(pronostico.fecha_limite - (inicio + timedelta(days=30))) < timedelta(minutes=1)
+
+    plana = [{"fecha": inicio + timedelta(days=d), "total_mb": 100} for d in range(3)]
+    assert monitor.pronosticar(plana, 400).fecha_limite is None
+    assert monitor.pronosticar(serie[:1], 400) is None
+
+
+def test_estimacion_de_limpieza_no_borra():
+    database = mongomock.MongoClient().db
+    base = datetime(2024, 1, 1)
+    database.historial.insert_many([{"fecha_evento": base + timedelta(days=d)} for d in range(150)])
+    estadisticas = {"documentos": 150, "tamano_medio": 1024.0}
+
+    por_fecha = monitor.estimar_limpieza(
+        "historial", "fecha_evento", fecha_limite=base + timedelta(days=40), estadisticas=estadisticas, database=database
+    )
+    assert por_fecha["documentos"] == 40
+    assert por_fecha["mb"] == 40 * 1024 / monitor.MB
+
+    por_porcentaje = monitor.estimar_limpieza(
+        "historial", "fecha_evento", porcentaje=0.3, estadisticas=estadisticas, database=database
+    )
+    assert por_porcentaje["documentos"] == 45
+    assert database.historial.count_documents({}) == 150
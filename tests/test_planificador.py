@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import mongomock
+
+from cmms_fabrica.modulos import planificador
+
+
+def test_el_lease_permite_una_sola_ejecucion_entre_procesos():
+    database = mongomock.MongoClient().db
+    llamadas = []
+    tarea = planificador.TareaProgramada("prueba", lambda d: llamadas.append(1) or "listo", intervalo_s=3600)
+
+    ahora = datetime.utcnow()
+    assert planificador.tomar_lease(database, tarea, "worker-a", ahora)
+    # Otro worker no la toma mientras el lease está vigente
+    assert planificador.ejecutar_tarea(database, tarea, "worker-b") is None
+    # Lease vencido (el worker A murió): B la retoma y deja el historial
+    registro = planificador.ejecutar_tarea(
+        database, tarea, "worker-b", reloj=lambda: ahora + timedelta(seconds=tarea.duracion_max_s + 1)
+    )
+    assert registro["estado"] == planificador.OK and registro["resultado"] == "listo"
+    assert llamadas == [1]
+
+    estado = database[planificador.COLECCION_TAREAS].find_one({"_id": "prueba"})
+    assert estado["propietario"] is None and estado["proxima"] > ahora + timedelta(minutes=59)
+    # No vuelve a ejecutarse antes de su intervalo
+    assert planificador.ejecutar_tarea(database, tarea, "worker-a") is None
+
+
+def test_error_de_tarea_queda_en_el_historial():
+    database = mongomock.MongoClient().db
+
+    def falla(_):
+        raise ValueError("sin datos")
+
+    tarea = planificador.TareaProgramada("falla", falla, intervalo_s=60)
+    registro = planificador.ejecutar_tarea(database, tarea, "worker-a")
+    assert registro["estado"] == planificador.ERROR and registro["error"] == "sin datos"
+    assert database[planificador.COLECCION_HISTORIAL].count_documents({"tarea": "falla"}) == 1
+
+
+def test_la_tarea_renueva_el_lease_y_se_detiene_si_lo_pierde():
+    database = mongomock.MongoClient().db
+    coleccion = database[planificador.COLECCION_TAREAS]
+    lotes = []
+
+    def larga(d):
+        for lote in range(5):
+            planificador.renovar_lease()
+            lotes.append(lote)
+            if lote == 0:
+                assert coleccion.find_one({"_id": "larga"})["vence"] > datetime.utcnow() + timedelta(seconds=3500)
+            if lote == 1:
+                # Otro worker tomó la tarea (p. ej. el lease venció antes de renovarse)
+                coleccion.update_one({"_id": "larga"}, {"$set": {"propietario": "worker-b"}})
+
+    tarea = planificador.TareaProgramada("larga", larga, intervalo_s=60, duracion_max_s=3600)
+    ahora = datetime.utcnow()
+    registro = planificador.ejecutar_tarea(database, tarea, "worker-a", reloj=lambda: ahora)
+    assert lotes == [0, 1]
+    assert registro["estado"] == planificador.ERROR and "lease" in registro["error"]
+    # El cierre no pisa el lease del nuevo propietario
+    assert coleccion.find_one({"_id": "larga"})["propietario"] == "worker-b"
+    planificador.renovar_lease()  # fuera de una tarea no hace nada
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+
+import mongomock
+import numpy as np
+import pandas as pd
+
+from cmms_fabrica.modulos import proyeccion_preventivos as proyeccion
+from cmms_fabrica.modulos.vencimientos_planes import recalcular_campos
+
+HOY = date(2025, 1, 10)
+
+
+def test_suma_de_meses_recorta_al_fin_de_mes_y_semanas_empiezan_en_lunes():
+    fechas = np.array(["2025-01-31", "2024-01-31", "2025-03-15"], dtype="M8[D]")
+    resultado = proyeccion.sumar_meses(fechas, np.array([1, 1, 12]))
+    assert list(resultado.astype(str)) == ["2025-02-28", "2024-02-29", "2026-03-15"]
+    assert str(proyeccion.inicio_de_semana(np.datetime64("2025-01-12"))) == "2025-01-06"
+
+
+def test_proyeccion_por_tiempo_y_por_uso_desde_mongo():
+    database = mongomock.MongoClient().db
+    database.planes_preventivos.insert_many([
+        {"id_plan": "PP-1", "estado": "Activo", "id_activo_tecnico": "A1", "responsable": "Ana",
+         "tipo_programacion": "tiempo", "frecuencia": 1, "unidad_frecuencia": "meses", "proxima_fecha": "2025-01-31"},
+        # Vencido: la primera intervención es hoy y luego cada dos semanas
+        {"id_plan": "PP-2", "estado": "Activo", "id_activo_tecnico": "A2", "responsable": "",
+         "tipo_programacion": "tiempo", "frecuencia": 2, "unidad_frecuencia": "semanas", "proxima_fecha": "2024-12-01"},
+        # 50 h en 10 días: 5 h/día; faltan 50 h (10 días) y el umbral de 100 h son 20 días
+        {"id_plan": "PP-3", "estado": "Activo", "id_activo_tecnico": "A1", "responsable": "Ana",
+         "tipo_programacion": "uso", "umbral_uso": 100, "ultima_lectura_uso": 0, "lectura_actual_uso": 50,
+         "ultima_fecha": "2024-12-31"},
+        {"id_plan": "PP-4", "estado": "Suspendido", "id_activo_tecnico": "A3", "responsable": "Ana",
+         "tipo_programacion": "tiempo", "frecuencia": 1, "unidad_frecuencia": "días", "proxima_fecha": "2025-01-11"},
+    ])
+    recalcular_campos(database)
+
+    ocurrencias = proyeccion.proyectar_calendario(database, HOY, meses=3)
+    fechas = ocurrencias.groupby("id_plan")["fecha"].apply(lambda s: [f"{f:%Y-%m-%d}" for f in s]).to_dict()
+    assert fechas["PP-1"] == ["2025-01-31", "2025-02-28", "2025-03-31"]
+    assert fechas["PP-2"][:3] == ["2025-01-10", "2025-01-24", "2025-02-07"] and len(fechas["PP-2"]) == 7
+    assert fechas["PP-3"] == ["2025-01-20", "2025-02-09", "2025-03-01", "2025-03-21"]
+    assert "PP-4" not in fechas
+    assert set(ocurrencias.loc[ocurrencias["id_plan"] == "PP-3", "origen"]) == {"uso"}
+
+    matriz = proyeccion.matriz_carga(ocurrencias, "responsable", HOY, meses=3)
+    assert list(matriz.index) == ["Ana", "Sin asignar"]
+    assert matriz.columns[0] == pd.Timestamp("2025-01-06") and len(matriz.columns) == 14
+    assert matriz.to_numpy().sum() == len(ocurrencias)
+    assert matriz.loc["Ana", pd.Timestamp("2025-01-20")] == 1
+
+
+def test_ambos_usa_el_intervalo_mas_corto_y_sin_datos_no_proyecta():
+    planes = pd.DataFrame([
+        {"id_plan": "PP-5", "tipo_programacion": "ambos", "frecuencia": 3, "unidad_frecuencia": "meses",
+         "proxima_fecha_dt": datetime(2025, 3, 1), "umbral_uso": 300, "uso_restante": 100},
+        {"id_plan": "PP-6", "tipo_programacion": "uso", "umbral_uso": 300, "uso_restante": 100},
+    ], columns=proyeccion.CAMPOS_PLAN)
+    # 10 h/día: el uso vence antes (10 días) y se repite cada 30 días, antes que cada 3 meses
+    ocurrencias = proyeccion.proyectar(planes, HOY, meses=2, tasas=np.array([10.0, np.nan]))
+    assert [f"{f:%Y-%m-%d}" for f in ocurrencias["fecha"]] == ["2025-01-20", "2025-02-19"]
+    assert set(ocurrencias["origen"]) == {"uso"}
+    assert proyeccion.proyectar(planes.iloc[:0], HOY).empty
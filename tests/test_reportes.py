@@ -36,8 +36,8 @@ def test_generar_reportes_con_observaciones(tmp_path):
         "observaciones",
         "usuario_registro",
     ]
-    pdf_path = generar_pdf(df_eventos[columnas_eventos], df_inventario, "tmp")
-    assert pdf_path.endswith(".pdf")
+    pdf_bytes = generar_pdf(df_eventos[columnas_eventos], df_inventario, "tmp")
+    assert pdf_bytes.startswith(b"%PDF")
     excel_buffer = generar_excel(df_eventos[columnas_eventos], df_inventario)
     assert excel_buffer.getbuffer().nbytes > 0
 
@@ -119,3 +119,26 @@ def test_kpi_filtra_ultimo_evento_por_origen_para_evitar_duplicados():
     assert len(filtrado) == 2
     correctiva = filtrado[filtrado["id_origen"] == "TC-1"].iloc[0]
     assert correctiva["fecha_evento"] == pd.Timestamp("2024-01-05")
+
+
+def test_optimizacion_de_fpdf_atada_a_la_version_y_equivalente_a_la_api_publica():
+    import re
+
+    import fpdf
+
+    from cmms_fabrica.modulos import app_reportes
+
+    # _Fpdf172 reemplaza internos de FPDF: al actualizar fpdf hay que revisarla
+    assert fpdf.__version__ == app_reportes.VERSION_FPDF_OPTIMIZADA
+    assert issubclass(app_reportes.PDF, app_reportes._Fpdf172)
+
+    def documento(base):
+        pdf = base()
+        pdf.set_font("Arial", "", 7)
+        for pagina in range(2):
+            pdf.add_page()
+            for i in range(80):
+                pdf.cell(pdf._ancho(f"fila {i}") + 5, 5, f"fila {pagina}-{i}", border=1, ln=True)
+        return re.sub(rb"/CreationDate \(D:\d+\)", b"", pdf.output(dest="S").encode("latin1"))
+
+    assert documento(app_reportes._Fpdf172) == documento(app_reportes._FpdfPublico)
@@ -0,0 +1,84 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+
+import mongomock
+
+from cmms_fabrica.modulos.consultas_historial import ultimos_por_tarea_y_activo
+from cmms_fabrica.modulos.reportes_lote import (
+    cadenas_de_activos,
+    generar_pdfs,
+    generar_zip_por_activo,
+    repartir_por_subarbol,
+)
+
+
+def _db_con_jerarquia():
+    db_mock = mongomock.MongoClient().db
+    db_mock.activos_tecnicos.insert_many([
+        {"id_activo_tecnico": "SIS1", "ancestros": []},
+        {"id_activo_tecnico": "SUB1", "pertenece_a": "SIS1", "ancestros": ["SIS1"]},
+        {"id_activo_tecnico": "EQ1", "pertenece_a": "SUB1", "ancestros": ["SIS1", "SUB1"]},
+        {"id_activo_tecnico": "SIS2", "ancestros": []},
+    ])
+    db_mock.historial.insert_many([
+        {
+            "fecha_evento": datetime(2025, 6, dia),
+            "tipo_evento": "Alta de tarea correctiva",
+            "categoria_evento": "correctiva",
+            "id_activo_tecnico": activo,
+            "id_origen": f"TC-{dia}",
+            "descripcion": "Falla",
+            "usuario_registro": "tecnico",
+        }
+        for dia, activo in [(2, "EQ1"), (3, "SUB1"), (4, "SIS2")]
+    ])
+    return db_mock
+
+
+def _indice(contenido):
+    with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+        nombres = archivo.namelist()
+        filas = list(csv.DictReader(io.StringIO(archivo.read("indice.csv").decode())))
+        assert all(archivo.read(f["archivo"]).startswith(b"%PDF") for f in filas)
+    return nombres, {f["id_activo_tecnico"]: int(f["eventos"]) for f in filas}
+
+
+def test_zip_por_activo_raiz_incluye_subactivos():
+    contenido = generar_zip_por_activo(date(2025, 6, 1), date(2025, 6, 30), procesos=1, database=_db_con_jerarquia())
+
+    nombres, conteos = _indice(contenido)
+    assert conteos == {"SIS1": 2, "SIS2": 1}
+    assert "reporte_SIS1_20250601_20250630.pdf" in nombres
+
+
+def test_zip_con_todos_los_activos_y_raices_elegidas():
+    db_mock = _db_con_jerarquia()
+    _, conteos = _indice(generar_zip_por_activo(date(2025, 6, 1), date(2025, 6, 30), todos=True, procesos=1, database=db_mock))
+    assert conteos == {"EQ1": 1, "SIS1": 2, "SIS2": 1, "SUB1": 2}
+
+    _, conteos = _indice(
+        generar_zip_por_activo(date(2025, 6, 1), date(2025, 6, 30), raices=["SUB1", "EQ1"], procesos=1, database=db_mock)
+    )
+    assert conteos == {"EQ1": 1, "SUB1": 2}
+
+
+def test_pdfs_en_procesos_separados():
+    db_mock = _db_con_jerarquia()
+    df = ultimos_por_tarea_y_activo(date(2025, 6, 1), date(2025, 6, 30), database=db_mock)
+    grupos = repartir_por_subarbol(df, cadenas_de_activos(db_mock), ["SIS1", "SIS2"])
+
+    resultado = dict(generar_pdfs(grupos, procesos=2))
+    assert set(resultado) == {"SIS1", "SIS2"}
+    assert all(pdf.startswith(b"%PDF") for pdf in resultado.values())
+
+
+def test_eventos_sin_activo_no_rompen_el_lote():
+    db_mock = _db_con_jerarquia()
+    db_mock.historial.insert_many([
+        {"fecha_evento": datetime(2025, 6, 5), "tipo_evento": "consumo", "id_activo_tecnico": None, "id_origen": "CON-1"},
+        {"fecha_evento": datetime(2025, 6, 6), "tipo_evento": "Alta de proveedor externo", "id_origen": "PROV-1"},
+    ])
+    _, conteos = _indice(generar_zip_por_activo(date(2025, 6, 1), date(2025, 6, 30), todos=True, procesos=1, database=db_mock))
+    assert conteos == {"EQ1": 1, "SIS1": 2, "SIS2": 1, "SUB1": 2}
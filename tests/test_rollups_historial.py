@@ -0,0 +1,117 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import mongomock
+
+from cmms_fabrica.crud import rollups_historial
+from cmms_fabrica.crud.dashboard_kpi_historial import (
+    filtrar_ultimo_evento_por_origen,
+    origenes_desde_rollups,
+)
+from cmms_fabrica.crud.generador_historial import registrar_evento_historial
+
+
+def _buckets(db_mock, periodo):
+    return sorted(
+        db_mock.historial_rollups.find({"periodo": periodo}, {"_id": 0}),
+        key=lambda b: (b["categoria"], b["fecha"]),
+    )
+
+
+def test_registrar_evento_actualiza_buckets_diario_y_mensual():
+    db_mock = mongomock.MongoClient().db
+    with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        for tipo, origen in [
+            ("Alta de tarea correctiva", "TC-1"),
+            ("Cierre de tarea correctiva", "TC-1"),
+            ("Alta de plan preventivo", "PP-1"),
+        ]:
+            registrar_evento_historial(tipo, "AT-1", "desc", "tecnico_a", id_origen=origen, criticidad="Alta")
+
+    mensuales = _buckets(db_mock, "mes")
+    assert [(b["categoria"], b["cantidad"], b["origenes"]) for b in mensuales] == [
+        ("correctiva", 2, ["TC-1"]),
+        ("preventiva", 1, ["PP-1"]),
+    ]
+    assert mensuales[0]["criticidad"] == "Alta"
+    assert mensuales[0]["fecha"].day == 1
+    assert len(_buckets(db_mock, "dia")) == 2
+
+
+def test_reconstruir_rollups_coincide_con_la_carga_incremental():
+    db_mock = mongomock.MongoClient().db
+    db_mock.historial.insert_many([
+        {"fecha_evento": datetime(2025, 1, 10, 8), "tipo_evento": "Registro de observación técnica",
+         "id_activo_tecnico": "AT-1", "id_origen": "OBS_1", "usuario_registro": "u1", "criticidad": ""},
+        {"fecha_evento": datetime(2025, 1, 31, 9), "tipo_evento": "Alta de tarea correctiva",
+         "id_activo_tecnico": "AT-2", "id_origen": "TC-2", "usuario_registro": "u2", "criticidad": "Media"},
+        {"fecha_evento": datetime(2025, 2, 3, 9), "tipo_evento": "Cierre de tarea correctiva",
+         "id_activo_tecnico": "AT-2", "id_origen": "TC-2", "usuario_registro": "u2", "criticidad": "Media"},
+    ])
+
+    assert rollups_historial.reconstruir_rollups(db_mock, tamano_lote=2) == 3
+    mensuales = _buckets(db_mock, "mes")
+    assert [(b["categoria"], b["fecha"].month, b["cantidad"]) for b in mensuales] == [
+        ("correctiva", 1, 1),
+        ("correctiva", 2, 1),
+        ("observacion", 1, 1),
+    ]
+    assert mensuales[2]["criticidad"] == "Sin clasificar"
+
+    # 15/01 → 03/02: días sueltos en ambos bordes, sin meses completos
+    buckets = rollups_historial.consultar_rollups(date(2025, 1, 15), date(2025, 2, 3), database=db_mock)
+    assert {b["periodo"] for b in buckets} == {"dia"}
+    df = filtrar_ultimo_evento_por_origen(origenes_desde_rollups(buckets))
+    assert len(df) == 1
+    assert df.iloc[0]["fecha_evento"] == datetime(2025, 2, 3, 9)
+
+    # Enero completo se lee del bucket mensual
+    buckets = rollups_historial.consultar_rollups(
+        date(2025, 1, 1), date(2025, 1, 31), categorias=["observacion"], database=db_mock
+    )
+    assert [(b["periodo"], b["id_activo_tecnico"]) for b in buckets] == [("mes", "AT-1")]
+
+
+def test_filtro_rango_combina_meses_completos_y_dias_de_borde():
+    filtro = rollups_historial.filtro_rango(date(2025, 1, 20), date(2025, 4, 5))
+    tramos = {(t["periodo"], t["fecha"]["$gte"].date()) for t in filtro["$or"]}
+    assert tramos == {
+        ("mes", date(2025, 2, 1)),
+        ("dia", date(2025, 1, 20)),
+        ("dia", date(2025, 4, 1)),
+    }
+    mensual = next(t for t in filtro["$or"] if t["periodo"] == "mes")
+    assert mensual["fecha"]["$lte"] == datetime(2025, 3, 1)
+
+
+def test_reconstruir_reemplaza_periodos_cerrados_y_no_toca_el_dia_en_curso():
+    db_mock = mongomock.MongoClient().db
+    with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+        registrar_evento_historial("Alta de tarea correctiva", "AT-1", "hoy", "u1", id_origen="TC-9")
+    db_mock.historial.insert_one({"fecha_evento": datetime(2025, 1, 10, 8), "tipo_evento": "Alta de tarea correctiva",
+                                  "id_activo_tecnico": "AT-1", "id_origen": "TC-1", "usuario_registro": "u1"})
+    # Bucket viejo desfasado y otro que ya no tiene eventos
+    db_mock.historial_rollups.insert_many([
+        {"periodo": "mes", "fecha": datetime(2025, 1, 1), "categoria": "correctiva", "id_activo_tecnico": "AT-1",
+         "criticidad": "Sin clasificar", "usuario_registro": "u1", "cantidad": 7, "origenes": ["TC-1"]},
+        {"periodo": "dia", "fecha": datetime(2025, 1, 11), "categoria": "otro", "id_activo_tecnico": None,
+         "criticidad": "Sin clasificar", "usuario_registro": "u9", "cantidad": 1, "origenes": [""]},
+    ])
+
+    # Un evento que llega mientras se reconstruye solo suma en el día/mes en curso
+    def eventos_con_registro_intermedio(*args):
+        for evento in original(*args):
+            with patch("cmms_fabrica.crud.generador_historial.db", db_mock):
+                registrar_evento_historial("Alta de tarea correctiva", "AT-1", "durante", "u1", id_origen="TC-10")
+            yield evento
+
+    original = rollups_historial._eventos_a_reconstruir
+    with patch.object(rollups_historial, "_eventos_a_reconstruir", eventos_con_registro_intermedio):
+        assert rollups_historial.reconstruir_rollups(db_mock) == 1
+
+    enero = db_mock.historial_rollups.find_one({"periodo": "mes", "fecha": datetime(2025, 1, 1)})
+    assert enero["cantidad"] == 1
+    assert not db_mock.historial_rollups.find_one({"usuario_registro": "u9"})
+    hoy = rollups_historial.inicio_periodo(datetime.now(), "dia")
+    assert db_mock.historial_rollups.find_one({"periodo": "dia", "fecha": hoy})["cantidad"] == 2
+    assert not [c for c in db_mock.list_collection_names() if c.startswith(rollups_historial.COLECCION_RECONSTRUCCION)]
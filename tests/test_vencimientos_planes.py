@@ -0,0 +1,42 @@
+from datetime import date, datetime
+
+import mongomock
+
+from cmms_fabrica.modulos.vencimientos_planes import (
+    campos_derivados,
+    planes_por_vencer,
+    planes_vencidos,
+    recalcular_campos,
+    registrar_lectura_uso,
+)
+
+PLANES = [
+    {"id_plan": "PP-1", "estado": "Activo", "tipo_programacion": "tiempo", "proxima_fecha": "2020-01-01"},
+    {"id_plan": "PP-2", "estado": "Activo", "tipo_programacion": "uso", "umbral_uso": 250,
+     "ultima_lectura_uso": 1000, "lectura_actual_uso": 1300},
+    {"id_plan": "PP-3", "estado": "Suspendido", "tipo_programacion": "tiempo", "proxima_fecha": "2020-01-01"},
+    {"id_plan": "PP-4", "estado": "Activo", "tipo_programacion": "ambos", "proxima_fecha": "2025-01-20",
+     "umbral_uso": 500, "ultima_lectura_uso": 0, "lectura_actual_uso": 100},
+    {"id_plan": "PP-5", "estado": "Activo", "proxima_fecha": "fecha mal cargada"},
+]
+
+
+def test_campos_derivados_tipados():
+    assert campos_derivados(PLANES[0]) == {"proxima_fecha_dt": datetime(2020, 1, 1), "uso_restante": None}
+    assert campos_derivados(PLANES[1]) == {"proxima_fecha_dt": None, "uso_restante": -50}
+    assert campos_derivados(PLANES[4]) == {"proxima_fecha_dt": None, "uso_restante": None}
+
+
+def test_vencidos_y_por_vencer_con_una_consulta_y_lecturas():
+    database = mongomock.MongoClient().db
+    database.planes_preventivos.insert_many([dict(p) for p in PLANES])
+    assert recalcular_campos(database) == len(PLANES)
+
+    hoy = date(2025, 1, 10)
+    assert [p["id_plan"] for p in planes_vencidos(database, hoy)] == ["PP-1", "PP-2"]
+    assert [p["id_plan"] for p in planes_por_vencer(database, 10, hoy)] == ["PP-4"]
+    assert planes_por_vencer(database, 5, hoy) == []
+
+    assert registrar_lectura_uso("PP-4", 600, database) == -100
+    vencidos = {p["id_plan"]: p for p in planes_vencidos(database, hoy)}
+    assert vencidos["PP-4"]["venció_por_uso"] and not vencidos["PP-4"]["venció_por_tiempo"]